@@ -8,6 +8,7 @@ import {
   Tooltip,
   CircularProgress,
   Divider,
+  Button,
 } from '@mui/material';
 import {
   Assignment,
@@ -52,6 +53,8 @@ interface ActionItem {
 
 interface ActionCenterData {
   items: ActionItem[];
+  next_cursor: string | null;
+  has_more: boolean;
   summary: {
     overdue_count: number;
     today_count: number;
@@ -65,6 +68,7 @@ const ActionCenter: React.FC = () => {
   const navigate = useNavigate();
   const [data, setData] = useState<ActionCenterData | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [lastRefreshed, setLastRefreshed] = useState<Date>(new Date());
 
@@ -82,6 +86,24 @@ const ActionCenter: React.FC = () => {
     }
   };
 
+  const fetchMoreItems = async () => {
+    if (!data?.next_cursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await ApiService.getActionCenterItems({ cursor: data.next_cursor });
+      setData({
+        ...data,
+        items: [...data.items, ...response.items],
+        next_cursor: response.next_cursor,
+        has_more: response.has_more,
+      });
+    } catch (err: any) {
+      setError(err.message || 'Failed to load more action items');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchActionItems();
   }, []);
@@ -383,6 +405,13 @@ const ActionCenter: React.FC = () => {
           {renderSection('Overdue', <ErrorOutline />, '#d32f2f', overdueItems)}
           {renderSection('Due Today & Tomorrow', <Today />, '#FFA500', todayItems)}
           {renderSection('Coming Up', <CalendarMonth />, '#1976d2', upcomingItems)}
+          {data.has_more && (
+            <Box sx={{ display: 'flex', justifyContent: 'center' }}>
+              <Button variant="outlined" onClick={fetchMoreItems} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </Button>
+            </Box>
+          )}
         </>
       )}
     </Box>
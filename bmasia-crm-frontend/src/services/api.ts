@@ -32,9 +32,14 @@ class ApiService {
     return response.data;
   }
 
-  // Action Center (Today page)
-  async getActionCenterItems(): Promise<any> {
-    const response = await authApi.get('/action-center/');
+  // Action Center (Today page) - cursor paginated; the first page also carries the summary
+  async getActionCenterItems(params?: { cursor?: string; limit?: number; sections?: string }): Promise<any> {
+    const response = await authApi.get('/action-center/', { params });
+    return response.data;
+  }
+
+  async getActionCenterSummary(params?: { sections?: string }): Promise<any> {
+    const response = await authApi.get('/action-center/summary/', { params });
     return response.data;
   }
 
@@ -262,12 +262,43 @@ CORS_ALLOW_HEADERS = [
 ]
 
 # Cache Configuration (using dummy cache for development)
+# The 'dashboard' alias holds the dashboard stats snapshots (crm_app.services.dashboard_snapshot_service).
+# It uses Redis when REDIS_URL is set (shared across gunicorn workers) and a per-process
+# local-memory cache otherwise. 'default' stays a DummyCache so DRF throttling is unchanged.
+REDIS_URL = config('REDIS_URL', default='')
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'bmasia-crm',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bmasia-crm-dashboard',
+    },
 }
 
+# Dashboard snapshot cache: snapshots are served fresh for DASHBOARD_CACHE_TTL seconds,
+# then served stale (while being rebuilt in the background) up to DASHBOARD_CACHE_STALE_TTL.
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=300, cast=int)
+DASHBOARD_CACHE_STALE_TTL = config('DASHBOARD_CACHE_STALE_TTL', default=3600, cast=int)
+DASHBOARD_CACHE_BACKGROUND_REFRESH = True
+
+# Email open/click tracking: with a shared cache (Redis) pixel loads and link clicks are queued
+# and applied in batches by `manage.py flush_email_tracking`; without one they are written immediately.
+EMAIL_TRACKING_CACHE_ALIAS = 'dashboard'
+EMAIL_TRACKING_BUFFERED = config('EMAIL_TRACKING_BUFFERED', default=bool(REDIS_URL), cast=bool)
+EMAIL_TRACKING_BUCKET_SECONDS = 60
+EMAIL_TRACKING_FLUSH_BATCH_SIZE = config('EMAIL_TRACKING_FLUSH_BATCH_SIZE', default=500, cast=int)
+OPEN_TRACKING_DEDUP_TTL = config('OPEN_TRACKING_DEDUP_TTL', default=86400, cast=int)
+# Seconds an open/click whose EmailLog is not written yet keeps being queued again
+EMAIL_TRACKING_REQUEUE_SECONDS = config('EMAIL_TRACKING_REQUEUE_SECONDS', default=900, cast=int)
+# Rewrite links in outgoing HTML emails to signed /c/<token>/ redirects that record clicks
+EMAIL_CLICK_TRACKING = config('EMAIL_CLICK_TRACKING', default=True, cast=bool)
+
 # Security Settings for Production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -290,6 +321,13 @@ ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
 PROSPECT_REPLY_EMAIL = config('PROSPECT_REPLY_EMAIL', default='norbert@bmasiamusic.com')
 PROSPECT_REPLY_IMAP_PASSWORD = config('PROSPECT_REPLY_IMAP_PASSWORD', default='')
 PROSPECT_IMAP_HOST = config('PROSPECT_IMAP_HOST', default='imap.gmail.com')
+PROSPECT_IMAP_PORT = config('PROSPECT_IMAP_PORT', default=993, cast=int)
+PROSPECT_IMAP_SSL = config('PROSPECT_IMAP_SSL', default=True, cast=bool)
+# New messages whose headers are fetched per IMAP round trip
+PROSPECT_IMAP_FETCH_BATCH_SIZE = config('PROSPECT_IMAP_FETCH_BATCH_SIZE', default=200, cast=int)
+# Ambiguous replies sent to the AI classifier per request, and requests in flight at once
+PROSPECT_AI_CLASSIFY_BATCH_SIZE = config('PROSPECT_AI_CLASSIFY_BATCH_SIZE', default=10, cast=int)
+PROSPECT_AI_CLASSIFY_CONCURRENCY = config('PROSPECT_AI_CLASSIFY_CONCURRENCY', default=4, cast=int)
 
 # ============================================================
 # MCP Server Configuration (django-mcp-server)
@@ -308,6 +346,13 @@ DJANGO_MCP_AUTHENTICATION_CLASSES = [
 SOUNDTRACK_API_TOKEN = config('SOUNDTRACK_API_TOKEN', default='')
 SOUNDTRACK_CLIENT_ID = config('SOUNDTRACK_CLIENT_ID', default='')
 SOUNDTRACK_CLIENT_SECRET = config('SOUNDTRACK_CLIENT_SECRET', default='')
+# sync_all_zones: parallel account fetches, and per-request retries with exponential backoff
+SOUNDTRACK_SYNC_CONCURRENCY = config('SOUNDTRACK_SYNC_CONCURRENCY', default=8, cast=int)
+SOUNDTRACK_API_RETRIES = config('SOUNDTRACK_API_RETRIES', default=3, cast=int)
+SOUNDTRACK_API_BACKOFF = config('SOUNDTRACK_API_BACKOFF', default=0.5, cast=float)
+SOUNDTRACK_API_PAGE_SIZE = config('SOUNDTRACK_API_PAGE_SIZE', default=100, cast=int)  # locations/zones per GraphQL page
+# Offline alerts: one digest email per company when several of its zones are due in the same sync
+OFFLINE_ALERT_DIGEST = config('OFFLINE_ALERT_DIGEST', default=True, cast=bool)
 
 # Field Encryption Key for encrypted model fields (Equipment credentials, etc.)
 # Generate a new key with: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
@@ -342,6 +387,12 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='notifications@bmasiamusic.com')
+# Batch senders keep SMTP connections open (EmailService.smtp_pool); close them after this many idle seconds
+SMTP_POOL_MAX_IDLE = config('SMTP_POOL_MAX_IDLE', default=60, cast=int)
+# EmailLog rows written per bulk flush inside EmailService.batched_logging()
+EMAIL_LOG_BATCH_SIZE = config('EMAIL_LOG_BATCH_SIZE', default=50, cast=int)
+# Compiled EmailTemplates kept per process (services/template_cache.py); 0 disables the cache
+EMAIL_TEMPLATE_CACHE_SIZE = config('EMAIL_TEMPLATE_CACHE_SIZE', default=128, cast=int)
 SERVER_EMAIL = config('SERVER_EMAIL', default='server@bmasiamusic.com')
 
 # Email settings for different departments
@@ -360,6 +411,18 @@ ADMIN_EMAIL = config('ADMIN_EMAIL', default='norbert@bmasiamusic.com')
 BUSINESS_HOURS_START = 9  # 9 AM
 BUSINESS_HOURS_END = 17   # 5 PM
 BUSINESS_TIMEZONE = 'Asia/Bangkok'
+# Sequence steps: SMTP send threads per run, and minutes before a dead worker's claimed steps are retried
+SEQUENCE_SEND_CONCURRENCY = config('SEQUENCE_SEND_CONCURRENCY', default=4, cast=int)
+SEQUENCE_CLAIM_TIMEOUT = config('SEQUENCE_CLAIM_TIMEOUT', default=30, cast=int)
+
+# Campaign sending: 'queued' = the API only enqueues, `manage.py process_campaign_queue`
+# sends; 'sync' = sent inside the request (small campaigns / local development only).
+CAMPAIGN_SEND_MODE = config('CAMPAIGN_SEND_MODE', default='queued')
+CAMPAIGN_SEND_CHUNK_SIZE = config('CAMPAIGN_SEND_CHUNK_SIZE', default=50, cast=int)
+# Max emails per minute per sender address (0 = no limit)
+CAMPAIGN_SEND_RATE_PER_MINUTE = config('CAMPAIGN_SEND_RATE_PER_MINUTE', default=60, cast=int)
+# Minutes after which recipients claimed by a worker that died mid-chunk are queued again
+CAMPAIGN_SEND_CLAIM_TIMEOUT = config('CAMPAIGN_SEND_CLAIM_TIMEOUT', default=30, cast=int)
 
 # Email sender configurations (legacy - will be replaced by per-user SMTP)
 # Each user will use their own SMTP credentials via User.get_smtp_config()
@@ -20,7 +20,7 @@ from django.views.generic import RedirectView
 from rest_framework.authtoken.views import obtain_auth_token
 from django.conf import settings
 from crm_app.admin_setup import create_admin_view
-from crm_app.views import debug_soundtrack_api, apply_migration_0025_view, email_tracking_pixel
+from crm_app.views import debug_soundtrack_api, apply_migration_0025_view, email_tracking_pixel, email_click_redirect
 from django.http import HttpResponse
 import subprocess
 import os
@@ -84,6 +84,8 @@ urlpatterns = [
     path('api/apply-migration-0025/', apply_migration_0025_view, name='apply_migration_0025'),
     # Email open tracking pixel (unauthenticated - called by email clients)
     path('t/<str:token>/', email_tracking_pixel, name='email_tracking_pixel'),
+    # Tracked email link redirect (unauthenticated - the signed token carries the destination)
+    path('c/<str:token>/', email_click_redirect, name='email_click_redirect'),
     # For now, redirect root to admin until React frontend is properly deployed
     path('', RedirectView.as_view(url='/admin/', permanent=False)),
 ]
@@ -3,10 +3,13 @@ Management command to check for prospect replies via IMAP.
 Detects replies to prospect sequence emails, classifies them,
 and triggers auto-actions (pause enrollment, create tasks, etc.).
 
+Only messages that arrived since the previous run are fetched; --lookback is
+the catch-up window for the first run, a renumbered mailbox or --reset.
+
 Usage:
     python manage.py check_prospect_replies
     python manage.py check_prospect_replies --dry-run
-    python manage.py check_prospect_replies --lookback 48
+    python manage.py check_prospect_replies --reset --lookback 48
 """
 
 import logging
@@ -28,7 +31,12 @@ class Command(BaseCommand):
             '--lookback',
             type=int,
             default=24,
-            help='Hours to look back for emails (default: 24)',
+            help='Hours to look back for emails when there is no UID cursor (default: 24)',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Ignore the stored UID cursor and catch up over --lookback hours',
         )
 
     def handle(self, *args, **options):
@@ -51,9 +59,20 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Checking IMAP inbox ({service.reply_email}) for replies...")
 
-        stats = service.check_for_replies(dry_run=dry_run, lookback_hours=lookback)
+        stats = service.check_for_replies(dry_run=dry_run, lookback_hours=lookback, reset=options['reset'])
 
         self.stdout.write(self.style.SUCCESS(
             f"Done: {stats['detected']} detected, {stats['matched']} matched, "
             f"{stats['classified']} classified, {stats['actions_taken']} actions taken"
         ))
+        self.stdout.write(
+            f"IMAP: {stats['headers_fetched']} headers, {stats['bodies_fetched']} bodies, "
+            f"{stats['bytes_received']} bytes received"
+        )
+        looked_up = stats['ai_cache_hits'] + stats['ai_cache_misses']
+        if looked_up:
+            self.stdout.write(
+                f"AI classification: {looked_up} replies, {stats['ai_cache_hits']} from cache "
+                f"({stats['ai_cache_hits'] / looked_up:.0%} hit rate), {stats['ai_requests']} requests "
+                f"({stats['ai_failures']} failed), {stats['classify_seconds']:.2f}s"
+            )
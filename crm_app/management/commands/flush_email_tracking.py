@@ -0,0 +1,49 @@
+"""
+Management command to apply buffered email opens and clicks.
+Run once per cron tick, or as a long-running worker with --loop.
+
+The tracking pixel and the click redirect queue events in the shared cache
+(EMAIL_TRACKING_BUFFERED); this command writes them to EmailLog, EmailClick,
+CampaignRecipient and the campaign counters in batches. Without buffering,
+events are written by the tracking views themselves and there is nothing to
+flush.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from crm_app.services.tracking_buffer import click_tracking_buffer, open_tracking_buffer
+
+
+class Command(BaseCommand):
+    help = 'Apply email opens and clicks queued by the tracking views'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep flushing instead of exiting',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between flushes with --loop (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.EMAIL_TRACKING_BUFFERED:
+            self.stdout.write("Email tracking is not buffered (EMAIL_TRACKING_BUFFERED=False), nothing to flush")
+            return
+
+        while True:
+            opened = open_tracking_buffer.flush()
+            clicks = click_tracking_buffer.flush()
+            self.stdout.write(f"Flushed email tracking at {timezone.now()}: {opened} new opens, {clicks} clicks")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
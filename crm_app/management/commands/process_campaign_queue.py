@@ -0,0 +1,88 @@
+"""
+Management command to send queued email campaigns.
+Run once per cron tick, or as a long-running worker with --loop.
+
+Campaigns are queued by POST /api/v1/campaigns/{id}/send/ (status 'sending').
+Pending recipients are sent in chunks with a per-sender rate limit; progress is
+committed per chunk, so a crashed or stopped worker resumes where it left off.
+Paused campaigns are skipped until they are resumed.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import logging
+
+from crm_app.services.campaign_send_service import CampaignSendService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send pending recipients of queued email campaigns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Recipients per chunk/transaction (default: CAMPAIGN_SEND_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            default=None,
+            help='Max emails per minute per sender, 0 = unlimited (default: CAMPAIGN_SEND_RATE_PER_MINUTE)',
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            default=None,
+            help='Stop each campaign after this many chunks (default: drain it)',
+        )
+        parser.add_argument(
+            '--campaign',
+            action='append',
+            dest='campaign_ids',
+            help='Only process this campaign ID (repeatable)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for queued campaigns instead of exiting',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between polls with --loop (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        service = CampaignSendService(
+            chunk_size=options['chunk_size'],
+            rate_per_minute=options['rate'],
+        )
+
+        while True:
+            self.stdout.write(f"Processing campaign queue at {timezone.now()}")
+            results = service.process_queue(
+                max_chunks=options['max_chunks'],
+                campaign_ids=options['campaign_ids'],
+            )
+            for result in results:
+                progress = result['progress']
+                self.stdout.write(
+                    f"  Campaign {result['campaign_id']}: {result['sent_count']} sent, "
+                    f"{result['failed_count']} failed, {progress['pending']} pending "
+                    f"({progress['percent_complete']}% complete) - {result['status']}"
+                )
+            if not results:
+                self.stdout.write("  No queued campaigns")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Campaign queue processed"))
@@ -0,0 +1,43 @@
+"""
+Roll zone status history up into per-zone, per-day uptime (ZoneUptimeDaily)
+
+Run nightly after midnight Bangkok time to roll up the previous day:
+    python manage.py rollup_zone_uptime
+
+Backfill or recompute a range (idempotent):
+    python manage.py rollup_zone_uptime --date 2026-10-15 --days 90
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.services.zone_uptime_service import business_today, rollup_range
+
+
+class Command(BaseCommand):
+    help = 'Roll up zone status transitions into daily uptime minutes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Last day to roll up, YYYY-MM-DD (default: yesterday, business timezone)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Number of days ending at --date to roll up (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['date']) if options.get('date') else business_today() - timedelta(days=1)
+        except ValueError:
+            raise CommandError(f"Invalid --date {options['date']!r}, expected YYYY-MM-DD")
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        start = end - timedelta(days=options['days'] - 1)
+
+        written = rollup_range(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {written} zone-days for {start} to {end}'))
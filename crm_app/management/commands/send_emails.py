@@ -36,6 +36,11 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # One SMTP connection per sender for the whole run
+        with email_service.smtp_pool():
+            self._send(options)
+
+    def _send(self, options):
         email_type = options['type']
         dry_run = options['dry_run']
         force = options['force']
@@ -174,6 +179,12 @@ class Command(BaseCommand):
                     f"{results['failed']} failed, "
                     f"{results['skipped']} skipped"
                 )
+                self.stdout.write(
+                    f"Sequence throughput: {results['claimed']} claimed in {results['seconds']}s "
+                    f"({results['per_second']}/s, {results['concurrency']} send threads, "
+                    f"{results['smtp_connections']} SMTP connections), "
+                    f"{results['waiting']} due steps waiting for business hours or the next run"
+                )
             else:
                 try:
                     from crm_app.models import SequenceStepExecution
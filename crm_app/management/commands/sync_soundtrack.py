@@ -13,6 +13,12 @@ class Command(BaseCommand):
             type=str,
             help='Sync zones for a specific company ID only',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Accounts fetched from the API in parallel (default: SOUNDTRACK_SYNC_CONCURRENCY)',
+        )
         parser.add_argument(
             '--skip-alerts',
             action='store_true',
@@ -46,10 +52,19 @@ class Command(BaseCommand):
         else:
             # Sync all companies
             self.stdout.write('Starting Soundtrack zone sync for all companies...')
-            synced, errors = soundtrack_api.sync_all_zones()
+            synced, errors = soundtrack_api.sync_all_zones(concurrency=options.get('concurrency'))
             self.stdout.write(
                 self.style.SUCCESS(f'Synced {synced} zones across all companies, {errors} errors')
             )
+            report = soundtrack_api.last_sync_report
+            self.stdout.write(
+                f"  {report['companies']} companies, concurrency {report['concurrency']}: "
+                f"{report['total_seconds']}s total, {report['db_write_seconds']}s writing zones"
+            )
+            self.stdout.write(
+                f"  Zones: {report['created']} created, {report['changed']} changed, "
+                f"{report['unchanged']} unchanged, {report['orphaned']} orphaned"
+            )
 
         # Check for offline alerts (unless skipped)
         if not skip_alerts:
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add 'campaign' to EmailLog.email_type so emails sent by the queued campaign worker
+    (process_campaign_queue) are logged as campaign sends rather than 'manual'. Choices are
+    not stored in the DB for a CharField, so this AlterField only keeps the migration state
+    in sync (it also picks up the earlier choices that were added without a migration)."""
+
+    dependencies = [
+        ('crm_app', '0096_quote_billing_frequency_onetime'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emaillog',
+            name='email_type',
+            field=models.CharField(
+                choices=[
+                    ('renewal', 'Renewal Reminder'),
+                    ('invoice', 'Invoice'),
+                    ('invoice_send', 'Invoice Sent'),
+                    ('payment', 'Payment Reminder'),
+                    ('quarterly', 'Quarterly Check-in'),
+                    ('seasonal', 'Seasonal Campaign'),
+                    ('support', 'Technical Support'),
+                    ('manual', 'Manual Email'),
+                    ('test', 'Test Email'),
+                    ('quote_send', 'Quote Sent'),
+                    ('quote_followup', 'Quote Follow-up'),
+                    ('contract_send', 'Contract Sent'),
+                    ('contract_followup', 'Contract Follow-up'),
+                    ('sequence', 'Prospect Sequence'),
+                    ('receipt_send', 'Receipt/Tax Invoice Sent'),
+                    ('campaign', 'Email Campaign'),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
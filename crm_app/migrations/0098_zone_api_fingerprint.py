@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add Zone.api_fingerprint so the Soundtrack sync can skip zones whose API payload did not
+    change since the last run. Existing rows start blank and are rewritten (and fingerprinted)
+    once on the next sync."""
+
+    dependencies = [
+        ('crm_app', '0097_emaillog_email_type_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='api_fingerprint',
+            field=models.CharField(
+                blank=True,
+                help_text='SHA-256 of the last synced API payload; unchanged zones are not rewritten',
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add ZoneStatusChange (append-only history, one row per zone status transition) and
+    ZoneUptimeDaily (nightly per-zone, per-day uptime rollup served by the zone uptime
+    endpoints). History starts with the first sync after deploy; no backfill."""
+
+    dependencies = [
+        ('crm_app', '0098_zone_api_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('online', 'Online'), ('offline', 'Offline'), ('no_device', 'No Device Paired'), ('expired', 'Subscription Expired'), ('pending', 'Pending Activation'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('previous_status', models.CharField(blank=True, help_text='Status before the transition (blank for a new zone)', max_length=20)),
+                ('changed_at', models.DateTimeField()),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='crm_app.zone')),
+            ],
+            options={
+                'ordering': ['zone', 'changed_at'],
+                'indexes': [
+                    models.Index(fields=['zone', 'changed_at'], name='crm_app_zon_zone_id_c88285_idx'),
+                    models.Index(fields=['changed_at'], name='crm_app_zon_changed_a0ecf5_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ZoneUptimeDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('online_minutes', models.PositiveIntegerField(default=0)),
+                ('monitored_minutes', models.PositiveIntegerField(default=0)),
+                ('transitions', models.PositiveIntegerField(default=0, help_text='Status changes during the day')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uptime_days', to='crm_app.zone')),
+            ],
+            options={
+                'verbose_name': 'Zone Uptime (Daily)',
+                'verbose_name_plural': 'Zone Uptime (Daily)',
+                'ordering': ['zone', 'date'],
+                'indexes': [
+                    models.Index(fields=['date'], name='crm_app_zon_date_c184db_idx'),
+                ],
+                'unique_together': {('zone', 'date')},
+            },
+        ),
+    ]
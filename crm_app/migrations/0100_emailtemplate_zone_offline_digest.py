@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add the zone_offline_digest EmailTemplate type: one email per company listing all of its
+    zones that are due an offline alert in the same sync (OFFLINE_ALERT_DIGEST). Without a
+    template of this type the digest falls back to the built-in text in offline_alert_service."""
+
+    dependencies = [
+        ('crm_app', '0099_zone_status_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailtemplate',
+            name='template_type',
+            field=models.CharField(choices=[('renewal_30_days', '30-Day Renewal Reminder'), ('renewal_14_days', '14-Day Renewal Reminder'), ('renewal_7_days', '7-Day Renewal Reminder'), ('renewal_urgent', 'Urgent Renewal Notice'), ('invoice_new', 'New Invoice'), ('payment_reminder_7_days', '7-Day Payment Reminder'), ('payment_reminder_14_days', '14-Day Payment Reminder'), ('payment_overdue', 'Payment Overdue Notice'), ('quarterly_checkin', 'Quarterly Check-in'), ('seasonal_christmas', 'Christmas Season Preparation'), ('seasonal_newyear', 'Chinese New Year Preparation'), ('seasonal_valentines', "Valentine's Day Preparation"), ('seasonal_songkran', 'Songkran Preparation'), ('seasonal_loy_krathong', 'Loy Krathong Preparation'), ('seasonal_ramadan', 'Ramadan Preparation'), ('seasonal_singapore_national_day', 'Singapore National Day Preparation'), ('seasonal_diwali', 'Diwali Preparation'), ('seasonal_mid_autumn', 'Mid-Autumn Festival Preparation'), ('seasonal_eid_fitr', 'Eid al-Fitr Preparation'), ('zone_offline_alert', 'Zone Offline Alert (Auto)'), ('zone_offline_digest', 'Zone Offline Digest (Auto)'), ('zone_offline_48h', 'Zone Offline 48 Hours'), ('zone_offline_7d', 'Zone Offline 7 Days'), ('welcome', 'Welcome Email'), ('contract_signed', 'Contract Signed Confirmation')], max_length=50, unique=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add EmailClick: one row per click on a tracked email link (/c/<token>/), bulk-inserted
+    by the click tracking buffer. Links are rewritten from this release on; emails sent
+    before it have no tracked links."""
+
+    dependencies = [
+        ('crm_app', '0100_emailtemplate_zone_offline_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailClick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(help_text='Destination of the clicked link')),
+                ('clicked_at', models.DateTimeField()),
+                ('email_log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clicks', to='crm_app.emaillog')),
+            ],
+            options={
+                'ordering': ['-clicked_at'],
+                'indexes': [
+                    models.Index(fields=['email_log', 'clicked_at'], name='crm_app_ema_email_l_2ea233_idx'),
+                    models.Index(fields=['clicked_at'], name='crm_app_ema_clicked_62ace7_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add ImapMailboxState: the UIDVALIDITY and last polled UID of the prospect reply inbox,
+    so ReplyDetectionService only fetches messages that arrived since its previous run. The
+    first run after deploy catches up over the usual lookback window."""
+
+    dependencies = [
+        ('crm_app', '0101_emailclick'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImapMailboxState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255)),
+                ('account', models.CharField(max_length=255)),
+                ('mailbox', models.CharField(default='INBOX', max_length=255)),
+                ('uidvalidity', models.BigIntegerField(blank=True, null=True)),
+                ('last_uid', models.BigIntegerField(default=0, help_text='Highest UID already polled')),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'IMAP Mailbox State',
+                'unique_together': {('host', 'account', 'mailbox')},
+            },
+        ),
+    ]
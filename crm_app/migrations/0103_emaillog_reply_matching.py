@@ -0,0 +1,62 @@
+"""Index EmailLog for batched reply matching.
+
+ReplyDetectionService resolves the In-Reply-To/References Message-IDs of a whole
+IMAP batch with one message_id__in query (index on message_id). Replies without
+a known Message-ID fall back to the new normalized_subject column (subject without
+Re:/Fwd: prefixes, lowercased) instead of a 30-day subject__icontains scan.
+Sequence emails from the matching window are backfilled.
+"""
+
+import re
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def normalize_subject(subject):
+    # Copy of EmailLog.normalize_subject at the time of this migration
+    subject = re.sub(r'^\s*((re|fwd?|aw|sv)\s*(\[\d+\])?\s*:\s*)+', '', subject or '', flags=re.IGNORECASE)
+    return ' '.join(subject.split()).lower()[:200]
+
+
+def backfill_normalized_subject(apps, schema_editor):
+    EmailLog = apps.get_model('crm_app', 'EmailLog')
+
+    logs = EmailLog.objects.filter(
+        email_type='sequence',
+        created_at__gte=timezone.now() - timedelta(days=30),
+    ).only('id', 'subject')
+    batch = []
+    for log in logs.iterator(chunk_size=1000):
+        log.normalized_subject = normalize_subject(log.subject)
+        batch.append(log)
+        if len(batch) >= 1000:
+            EmailLog.objects.bulk_update(batch, ['normalized_subject'])
+            batch = []
+    if batch:
+        EmailLog.objects.bulk_update(batch, ['normalized_subject'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0102_imapmailboxstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='normalized_subject',
+            field=models.CharField(blank=True, help_text='Lowercased subject without Re:/Fwd: prefixes (reply matching)', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['message_id'], name='crm_app_ema_message_31414a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['email_type', 'normalized_subject', '-created_at'], name='crm_app_ema_email_t_702066_idx'),
+        ),
+        migrations.RunPython(backfill_normalized_subject, migrations.RunPython.noop),
+    ]
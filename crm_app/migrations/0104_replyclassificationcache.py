@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add ReplyClassificationCache: AI classifications of prospect replies keyed on a hash of
+    the normalised subject and body, so repeated auto-replies and forwarded threads are sent
+    to the model once and the results survive restarts. Starts empty."""
+
+    dependencies = [
+        ('crm_app', '0103_emaillog_reply_matching'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplyClassificationCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of model + normalised subject and body', max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('classification', models.CharField(max_length=20)),
+                ('confidence', models.FloatField(default=0.0)),
+                ('subject', models.CharField(blank=True, help_text='Subject of the first reply classified', max_length=200)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Reply Classification Cache',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+"""Index SequenceEnrollment for set-based auto-enrollment.
+
+AutoEnrollmentService selects the contracts, invoices and companies of a trigger
+with a NOT EXISTS on (sequence, trigger_entity_type, trigger_entity_id), one
+query per sequence instead of one existence check per triggering row.
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0104_replyclassificationcache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sequenceenrollment',
+            index=models.Index(fields=['sequence', 'trigger_entity_type', 'trigger_entity_id'], name='crm_app_seq_sequenc_f7412c_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+"""Give every zone a starting ZoneStatusChange.
+
+History used to start with a zone's first status transition after deploy, so a
+zone whose status never changed had no history and no ZoneUptimeDaily rows. Each
+zone without history gets one row with its current status as of this migration;
+the Soundtrack sync does the same for zones it finds without history.
+"""
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def add_starting_rows(apps, schema_editor):
+    Zone = apps.get_model('crm_app', 'Zone')
+    ZoneStatusChange = apps.get_model('crm_app', 'ZoneStatusChange')
+
+    now = timezone.now()
+    zones = Zone.objects.filter(status_changes__isnull=True).values_list('pk', 'status')
+    batch = []
+    for zone_id, status in zones.iterator(chunk_size=1000):
+        batch.append(ZoneStatusChange(zone_id=zone_id, status=status, previous_status='', changed_at=now))
+        if len(batch) >= 1000:
+            ZoneStatusChange.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ZoneStatusChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0105_sequenceenrollment_trigger_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_starting_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+"""Add the 'sending' CampaignRecipient status.
+
+The campaign worker marks a chunk of recipients 'sending' in a short
+transaction, sends outside it, then writes the results; claims older than
+CAMPAIGN_SEND_CLAIM_TIMEOUT go back to 'pending'. Choices only, no schema change.
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0106_zone_status_history_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaignrecipient',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('bounced', 'Bounced'), ('opened', 'Opened'), ('clicked', 'Clicked'), ('unsubscribed', 'Unsubscribed'), ('failed', 'Failed')], default='pending', help_text='Current status of this campaign recipient', max_length=20),
+        ),
+    ]
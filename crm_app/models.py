@@ -1714,6 +1714,11 @@ class Zone(TimestampedModel):
     # Auto-update from API
     last_api_sync = models.DateTimeField(null=True, blank=True)
     api_raw_data = models.JSONField(null=True, blank=True)
+    api_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of the last synced API payload; unchanged zones are not rewritten"
+    )
     
     class Meta:
         ordering = ['company', 'name']
@@ -1770,8 +1775,13 @@ class Zone(TimestampedModel):
         Mark zone as cancelled when contract terminates.
         Used by signal handler when contract status changes to 'Terminated'.
         """
+        previous_status = self.status
         self.status = 'cancelled'
         self.save(update_fields=['status'])
+        if previous_status != self.status:
+            ZoneStatusChange.objects.create(
+                zone=self, status=self.status, previous_status=previous_status, changed_at=timezone.now()
+            )
 
     def get_contract_history(self):
         """Get all contracts this zone has ever been linked to"""
@@ -1828,6 +1838,58 @@ class ZoneOfflineAlert(TimestampedModel):
         return (end_time - self.detected_at).total_seconds() / 3600
 
 
+class ZoneStatusChange(models.Model):
+    """
+    Append-only zone status history: one row per status transition, not per poll.
+    Written by the Soundtrack sync (ZoneReconciler) and Zone.mark_as_cancelled();
+    a zone's status at any instant is the status of its latest row at or before it.
+    """
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='status_changes')
+    status = models.CharField(max_length=20, choices=Zone.STATUS_CHOICES)
+    previous_status = models.CharField(
+        max_length=20, blank=True, help_text="Status before the transition (blank for a new zone)"
+    )
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['zone', 'changed_at']
+        indexes = [
+            models.Index(fields=['zone', 'changed_at']),
+            models.Index(fields=['changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.zone.name}: {self.previous_status or '-'} -> {self.status} ({self.changed_at:%Y-%m-%d %H:%M})"
+
+
+class ZoneUptimeDaily(models.Model):
+    """
+    Per-zone, per-day uptime rolled up nightly from ZoneStatusChange
+    (see services/zone_uptime_service.py). Days are BUSINESS_TIMEZONE calendar days.
+
+    monitored_minutes excludes time the zone was pending, expired or cancelled,
+    so uptime = online_minutes / monitored_minutes.
+    """
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='uptime_days')
+    date = models.DateField()
+    online_minutes = models.PositiveIntegerField(default=0)
+    monitored_minutes = models.PositiveIntegerField(default=0)
+    transitions = models.PositiveIntegerField(default=0, help_text="Status changes during the day")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['zone', 'date']
+        unique_together = [['zone', 'date']]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        verbose_name = 'Zone Uptime (Daily)'
+        verbose_name_plural = 'Zone Uptime (Daily)'
+
+    def __str__(self):
+        return f"{self.zone.name} {self.date}: {self.online_minutes}/{self.monitored_minutes} min"
+
+
 # Email System Models
 class EmailTemplate(TimestampedModel):
     """Store reusable email templates for different communication types"""
@@ -1859,6 +1921,7 @@ class EmailTemplate(TimestampedModel):
         
         # Technical Support templates
         ('zone_offline_alert', 'Zone Offline Alert (Auto)'),
+        ('zone_offline_digest', 'Zone Offline Digest (Auto)'),
         ('zone_offline_48h', 'Zone Offline 48 Hours'),
         ('zone_offline_7d', 'Zone Offline 7 Days'),
         
@@ -1894,32 +1957,19 @@ class EmailTemplate(TimestampedModel):
     def __str__(self):
         return f"{self.name} ({self.language})"
     
-    def render(self, context):
-        """Render template with context variables"""
-        from django.template import Template, Context
-        
-        # Render subject
-        subject_template = Template(self.subject)
-        rendered_subject = subject_template.render(Context(context))
-        
-        # Render text body
-        text_template = Template(self.body_text)
-        rendered_text = text_template.render(Context(context))
-        
-        # Generate HTML from text if HTML is empty
-        if not self.body_html or self.body_html.strip() == '':
-            from crm_app.utils.email_utils import text_to_html
-            rendered_html = text_to_html(rendered_text)
-        else:
-            # Render HTML body
-            html_template = Template(self.body_html)
-            rendered_html = html_template.render(Context(context))
-        
-        return {
-            'subject': rendered_subject,
-            'body_html': rendered_html,
-            'body_text': rendered_text
-        }
+    def render(self, context, many=False):
+        """Render template with context variables
+
+        Uses the compiled-template cache (services/template_cache.py). With
+        many=True, `context` is an iterable of contexts and a list of rendered
+        dicts is returned, all rendered against one compiled template.
+        """
+        from crm_app.services.template_cache import template_cache
+
+        compiled = template_cache.get(self)
+        if many:
+            return [compiled.render(item) for item in context]
+        return compiled.render(context)
     
     def save(self, *args, **kwargs):
         """Auto-generate plain text from HTML"""
@@ -1939,6 +1989,14 @@ class EmailTemplate(TimestampedModel):
 
         super().save(*args, **kwargs)
 
+        from crm_app.services.template_cache import template_cache
+        template_cache.invalidate(self.pk)
+
+    def delete(self, *args, **kwargs):
+        from crm_app.services.template_cache import template_cache
+        template_cache.invalidate(self.pk)
+        return super().delete(*args, **kwargs)
+
 
 class EmailLog(TimestampedModel):
     """Track all emails sent by the system"""
@@ -1968,6 +2026,7 @@ class EmailLog(TimestampedModel):
         ('contract_followup', 'Contract Follow-up'),
         ('sequence', 'Prospect Sequence'),
         ('receipt_send', 'Receipt/Tax Invoice Sent'),
+        ('campaign', 'Email Campaign'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -1998,6 +2057,10 @@ class EmailLog(TimestampedModel):
 
     # Tracking
     message_id = models.CharField(max_length=255, blank=True, help_text="Email message ID for tracking")
+    normalized_subject = models.CharField(
+        max_length=200, blank=True,
+        help_text="Lowercased subject without Re:/Fwd: prefixes (reply matching)"
+    )
     tracking_token = models.CharField(max_length=64, unique=True, null=True, blank=True, db_index=True)
     in_reply_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
     
@@ -2010,15 +2073,27 @@ class EmailLog(TimestampedModel):
             models.Index(fields=['company', 'status', '-created_at']),
             models.Index(fields=['email_type', 'status']),
             models.Index(fields=['contact', '-created_at']),
+            models.Index(fields=['message_id']),
+            models.Index(fields=['email_type', 'normalized_subject', '-created_at']),
         ]
     
     def __str__(self):
         return f"{self.email_type} to {self.to_email} - {self.status}"
     
+    @staticmethod
+    def normalize_subject(subject):
+        """Subject as a reply to it is matched: reply/forward prefixes stripped,
+        whitespace collapsed, lowercased"""
+        import re
+        subject = re.sub(r'^\s*((re|fwd?|aw|sv)\s*(\[\d+\])?\s*:\s*)+', '', subject or '', flags=re.IGNORECASE)
+        return ' '.join(subject.split()).lower()[:200]
+
     def save(self, *args, **kwargs):
         if not self.tracking_token:
             import secrets
             self.tracking_token = secrets.token_urlsafe(32)
+        if not self.normalized_subject:
+            self.normalized_subject = self.normalize_subject(self.subject)
         super().save(*args, **kwargs)
 
     def mark_as_sent(self):
@@ -2028,7 +2103,11 @@ class EmailLog(TimestampedModel):
         self.save()
         
         # Also create a Note for tracking
-        Note.objects.create(
+        self.build_sent_note().save()
+
+    def build_sent_note(self):
+        """Unsaved tracking Note for a sent email (bulk-created by EmailLogBatch)"""
+        return Note(
             company=self.company,
             contact=self.contact,
             title=f"Email sent: {self.subject}",
@@ -2044,6 +2123,27 @@ class EmailLog(TimestampedModel):
         self.save()
 
 
+class EmailClick(models.Model):
+    """
+    One click on a tracked link (/c/<token>/) of an email. Bulk-inserted by the
+    click tracking buffer (services/tracking_buffer.py); the first click of an
+    email also sets EmailLog.clicked_at and moves its CampaignRecipient to 'clicked'.
+    """
+    email_log = models.ForeignKey(EmailLog, on_delete=models.CASCADE, related_name='clicks')
+    url = models.TextField(help_text="Destination of the clicked link")
+    clicked_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-clicked_at']
+        indexes = [
+            models.Index(fields=['email_log', 'clicked_at']),
+            models.Index(fields=['clicked_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.email_log_id} -> {self.url} ({self.clicked_at:%Y-%m-%d %H:%M})"
+
+
 class EmailCampaign(TimestampedModel):
     """Track email campaigns and blast emails with advanced targeting and analytics"""
     CAMPAIGN_TYPE_CHOICES = [
@@ -2067,6 +2167,16 @@ class EmailCampaign(TimestampedModel):
         ('cancelled', 'Cancelled'),
     ]
 
+    # Recipient statuses counted by each analytics counter
+    COUNTER_STATUSES = {
+        'total_sent': ('sent', 'delivered', 'opened', 'clicked', 'bounced'),
+        'total_delivered': ('delivered', 'opened', 'clicked'),
+        'total_bounced': ('bounced',),
+        'total_opened': ('opened', 'clicked'),
+        'total_clicked': ('clicked',),
+        'total_unsubscribed': ('unsubscribed',),
+    }
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, help_text="Campaign name for internal tracking")
     campaign_type = models.CharField(max_length=20, choices=CAMPAIGN_TYPE_CHOICES)
@@ -2150,26 +2260,62 @@ class EmailCampaign(TimestampedModel):
         return 0
 
     def update_analytics(self):
-        """Recalculate analytics from campaign recipients"""
-        from django.db.models import Count, Q
+        """Recalculate analytics from campaign recipients
 
-        recipients = self.recipients.all()
+        One conditional aggregate over the recipients. Status transitions keep
+        the counters current with bump_counters(); this full recount is for
+        reconciliation (e.g. when a campaign finishes sending).
+        """
+        from django.db.models import Count, Max, Q
 
-        self.total_sent = recipients.filter(status__in=['sent', 'delivered', 'opened', 'clicked', 'bounced']).count()
-        self.total_delivered = recipients.filter(status__in=['delivered', 'opened', 'clicked']).count()
-        self.total_bounced = recipients.filter(status='bounced').count()
-        self.total_opened = recipients.filter(status__in=['opened', 'clicked']).count()
-        self.total_clicked = recipients.filter(status='clicked').count()
-        self.total_unsubscribed = recipients.filter(status='unsubscribed').count()
+        totals = self.recipients.aggregate(
+            last_sent_at=Max('sent_at'),
+            **{
+                field: Count('pk', filter=Q(status__in=statuses))
+                for field, statuses in self.COUNTER_STATUSES.items()
+            }
+        )
+        last_sent_at = totals.pop('last_sent_at')
+        for field, value in totals.items():
+            setattr(self, field, value)
 
         # Update legacy fields
         self.emails_sent = self.total_sent
-        if self.total_sent > 0:
-            last_sent = recipients.exclude(sent_at__isnull=True).order_by('-sent_at').first()
-            if last_sent:
-                self.last_email_sent = last_sent.sent_at
+        if self.total_sent > 0 and last_sent_at:
+            self.last_email_sent = last_sent_at
 
-        self.save()
+        self.save(update_fields=[*self.COUNTER_STATUSES, 'emails_sent', 'last_email_sent', 'updated_at'])
+
+    @classmethod
+    def bump_counters(cls, campaign_id, from_status, to_status, count=1):
+        """Atomically move `count` recipients' worth of counters from one status to
+        another with F() expressions (no recount, safe under concurrent updates)"""
+        from django.db.models import F
+
+        deltas = {
+            field: ((to_status in statuses) - (from_status in statuses)) * count
+            for field, statuses in cls.COUNTER_STATUSES.items()
+        }
+        deltas['emails_sent'] = deltas['total_sent']
+        changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not changes:
+            return 0
+        if deltas['total_sent'] > 0:
+            changes['last_email_sent'] = timezone.now()
+        return cls.objects.filter(pk=campaign_id).update(**changes)
+
+    @staticmethod
+    def recipient_count_annotations():
+        """Count() expressions for the recipient counters of the campaign list
+        (EmailCampaignSerializer reads them when annotated)"""
+        from django.db.models import Count, Q
+
+        return {
+            'recipients_count': Count('recipients'),
+            'pending_count': Count('recipients', filter=Q(recipients__status__in=['pending', 'sending'])),
+            'sent_count': Count('recipients', filter=Q(recipients__status__in=['sent', 'delivered', 'opened', 'clicked'])),
+            'failed_count': Count('recipients', filter=Q(recipients__status__in=['failed', 'bounced'])),
+        }
 
 
 class CampaignRecipient(TimestampedModel):
@@ -2177,6 +2323,7 @@ class CampaignRecipient(TimestampedModel):
 
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('delivered', 'Delivered'),
         ('bounced', 'Bounced'),
@@ -2243,47 +2390,62 @@ class CampaignRecipient(TimestampedModel):
     def __str__(self):
         return f"{self.campaign.name} - {self.contact.email}"
 
+    def _transition(self, previous_status):
+        """Save, and bump the campaign counters for previous_status -> status"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            self.save()
+            if previous_status != self.status:
+                EmailCampaign.bump_counters(self.campaign_id, previous_status, self.status)
+
     def mark_as_sent(self):
         """Mark recipient as sent"""
+        previous_status = self.status
         self.status = 'sent'
         self.sent_at = timezone.now()
-        self.save()
+        self._transition(previous_status)
 
     def mark_as_delivered(self):
         """Mark recipient as delivered"""
+        previous_status = self.status
         self.status = 'delivered'
         self.delivered_at = timezone.now()
-        self.save()
+        self._transition(previous_status)
 
     def mark_as_opened(self):
         """Mark recipient as opened"""
         if self.status not in ['opened', 'clicked']:
+            previous_status = self.status
             self.status = 'opened'
             self.opened_at = timezone.now()
-            self.save()
+            self._transition(previous_status)
 
     def mark_as_clicked(self):
         """Mark recipient as clicked"""
+        previous_status = self.status
         self.status = 'clicked'
         if not self.clicked_at:
             self.clicked_at = timezone.now()
         if not self.opened_at:
             self.opened_at = timezone.now()
-        self.save()
+        self._transition(previous_status)
 
     def mark_as_bounced(self, error_msg=''):
         """Mark recipient as bounced"""
+        previous_status = self.status
         self.status = 'bounced'
         self.bounced_at = timezone.now()
         self.error_message = error_msg
-        self.save()
+        self._transition(previous_status)
 
     def mark_as_failed(self, error_msg=''):
         """Mark recipient as failed"""
+        previous_status = self.status
         self.status = 'failed'
         self.failed_at = timezone.now()
         self.error_message = error_msg
-        self.save()
+        self._transition(previous_status)
 
 
 class SeasonalTriggerDate(models.Model):
@@ -2739,6 +2901,7 @@ class SequenceEnrollment(TimestampedModel):
         indexes = [
             models.Index(fields=['status', '-enrolled_at']),
             models.Index(fields=['sequence', 'status']),
+            models.Index(fields=['sequence', 'trigger_entity_type', 'trigger_entity_id']),
         ]
 
     def __str__(self):
@@ -5168,6 +5331,49 @@ class ProspectReply(TimestampedModel):
         return f"Reply from {self.from_email} ({self.classification})"
 
 
+class ImapMailboxState(models.Model):
+    """
+    Poll cursor of an IMAP mailbox (ReplyDetectionService): the mailbox UIDVALIDITY
+    and the highest UID already looked at. A changed UIDVALIDITY means the server
+    renumbered the mailbox, so the cursor is reset to a date-based catch-up.
+    """
+    host = models.CharField(max_length=255)
+    account = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255, default='INBOX')
+    uidvalidity = models.BigIntegerField(null=True, blank=True)
+    last_uid = models.BigIntegerField(default=0, help_text="Highest UID already polled")
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [['host', 'account', 'mailbox']]
+        verbose_name = 'IMAP Mailbox State'
+
+    def __str__(self):
+        return f"{self.account}@{self.host}/{self.mailbox}: UID {self.last_uid}"
+
+
+class ReplyClassificationCache(models.Model):
+    """
+    AI classification of a prospect reply, keyed on a hash of its normalised
+    subject and body (ReplyClassifier). Auto-replies and forwarded threads come
+    back with the same text again and again; they are classified once.
+    """
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of model + normalised subject and body")
+    model = models.CharField(max_length=100)
+    classification = models.CharField(max_length=20)
+    confidence = models.FloatField(default=0.0)
+    subject = models.CharField(max_length=200, blank=True, help_text="Subject of the first reply classified")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Reply Classification Cache'
+
+    def __str__(self):
+        return f"{self.classification} ({self.confidence:.0%}): {self.subject}"
+
+
 class AIEmailDraft(TimestampedModel):
     """AI-generated email draft pending human approval"""
     STATUS_CHOICES = [
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from .models import (
     User, Company, Contact, Note, Task, TaskComment, AuditLog,
     Opportunity, OpportunityActivity, Contract, ContractLineItem, Invoice, InvoiceLineItem, Zone, ContractZone,
@@ -23,6 +24,32 @@ from .models import (
 )
 
 
+def _is_prefetched(obj, relation):
+    """True when `relation` was loaded by prefetch_related() on `obj`"""
+    return relation in getattr(obj, '_prefetched_objects_cache', {})
+
+
+def parse_sparse_fields(value):
+    """Parse a `fields=a,b,c` query parameter into a list of field names (None if absent)"""
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _aggregate_subquery(queryset, fk, aggregate, output_field):
+    """Aggregate over the `queryset` rows whose `fk` points at the outer row, as a correlated
+    subquery (unlike joined aggregates, several of these never fan out)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{fk: OuterRef('pk')}).order_by()
+            .values(fk).annotate(value=aggregate).values('value'),
+            output_field=output_field,
+        ),
+        0,
+        output_field=output_field,
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model with role-based field access"""
     password = serializers.CharField(write_only=True, required=False, min_length=8)
@@ -192,7 +219,11 @@ class ZoneSerializer(serializers.ModelSerializer):
 
     def get_current_contract(self, obj):
         """Get the currently active contract for this zone"""
-        active_link = obj.zone_contracts.filter(is_active=True).select_related('contract').first()
+        if _is_prefetched(obj, 'zone_contracts'):
+            # Prefetched links keep ZoneContract ordering, so the first active one matches .first()
+            active_link = next((link for link in obj.zone_contracts.all() if link.is_active), None)
+        else:
+            active_link = obj.zone_contracts.filter(is_active=True).select_related('contract').first()
         if active_link:
             return {
                 'id': str(active_link.contract.id),
@@ -205,6 +236,8 @@ class ZoneSerializer(serializers.ModelSerializer):
 
     def get_contract_count(self, obj):
         """Total number of contracts this zone has been linked to"""
+        if _is_prefetched(obj, 'zone_contracts'):
+            return len(obj.zone_contracts.all())
         return obj.zone_contracts.count()
 
 
@@ -218,7 +251,7 @@ class CompanySerializer(serializers.ModelSerializer):
     zones_summary = serializers.SerializerMethodField()
     subscription_summary = serializers.SerializerMethodField()
     primary_contact = serializers.SerializerMethodField()
-    total_contract_value = serializers.ReadOnlyField()
+    total_contract_value = serializers.SerializerMethodField()
     full_address = serializers.ReadOnlyField()
     avg_zones_per_location = serializers.ReadOnlyField()
     opportunities_count = serializers.SerializerMethodField()
@@ -249,6 +282,77 @@ class CompanySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def __init__(self, *args, **kwargs):
+        """Accept `fields=[...]` to serialize only a subset of fields (sparse fieldset)"""
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """
+        Load everything the requested fields need up front, so a page of companies
+        costs a fixed number of queries instead of several per company.
+
+        Counts and totals become annotations, the primary contact, active contracts
+        and zones come from (filtered) Prefetch objects. Relations for fields that
+        were not requested are not loaded at all.
+        """
+        wanted = set(fields) if fields is not None else set(cls.Meta.fields)
+        queryset = queryset.prefetch_related(None)
+
+        annotations = {}
+        if 'opportunities_count' in wanted:
+            annotations['annotated_opportunities_count'] = _aggregate_subquery(
+                Opportunity.objects.filter(is_active=True), 'company', Count('pk'), IntegerField()
+            )
+        if 'active_contracts_count' in wanted:
+            annotations['annotated_active_contracts_count'] = _aggregate_subquery(
+                Contract.objects.filter(is_active=True), 'company', Count('pk'), IntegerField()
+            )
+        if 'total_contract_value' in wanted:
+            annotations['annotated_total_contract_value'] = _aggregate_subquery(
+                Contract.objects.filter(is_active=True), 'company', Sum('value'),
+                DecimalField(max_digits=12, decimal_places=2)
+            )
+        if 'child_companies_count' in wanted:
+            annotations['annotated_child_companies_count'] = _aggregate_subquery(
+                Company.objects.all(), 'parent_company', Count('pk'), IntegerField()
+            )
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        if 'parent_company_name' in wanted:
+            queryset = queryset.select_related('parent_company')
+
+        prefetches = []
+        if 'contacts' in wanted:
+            prefetches.append('contacts')
+        if 'primary_contact' in wanted:
+            prefetches.append(Prefetch(
+                'contacts',
+                queryset=Contact.objects.filter(is_primary=True, is_active=True),
+                to_attr='prefetched_primary_contacts',
+            ))
+        if 'zones' in wanted:
+            prefetches.append(Prefetch(
+                'zones',
+                queryset=Zone.objects.select_related('device').prefetch_related('zone_contracts__contract'),
+            ))
+        elif 'zones_summary' in wanted:
+            prefetches.append(Prefetch('zones', queryset=Zone.objects.only('id', 'company_id', 'name', 'status')))
+        if 'subscription_summary' in wanted:
+            prefetches.append(Prefetch(
+                'contracts',
+                queryset=Contract.objects.filter(is_active=True).only('id', 'company_id', 'contract_type', 'start_date'),
+                to_attr='prefetched_active_contracts',
+            ))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
     def to_representation(self, instance):
         """Override to handle errors in nested serializers gracefully"""
         try:
@@ -298,7 +402,10 @@ class CompanySerializer(serializers.ModelSerializer):
 
     def get_primary_contact(self, obj):
         try:
-            primary = obj.contacts.filter(is_primary=True, is_active=True).first()
+            if hasattr(obj, 'prefetched_primary_contacts'):
+                primary = next(iter(obj.prefetched_primary_contacts), None)
+            else:
+                primary = obj.contacts.filter(is_primary=True, is_active=True).first()
             if primary:
                 return ContactSerializer(primary).data
             return None
@@ -309,22 +416,34 @@ class CompanySerializer(serializers.ModelSerializer):
             logger.error(f"Error serializing primary contact for company {obj.id}: {str(e)}")
             return None
 
+    def get_total_contract_value(self, obj):
+        if hasattr(obj, 'annotated_total_contract_value'):
+            return obj.annotated_total_contract_value or 0
+        return obj.total_contract_value
+
     def get_opportunities_count(self, obj):
+        if hasattr(obj, 'annotated_opportunities_count'):
+            return obj.annotated_opportunities_count
         try:
             return obj.opportunities.filter(is_active=True).count()
         except Exception:
             return 0
 
     def get_active_contracts_count(self, obj):
+        if hasattr(obj, 'annotated_active_contracts_count'):
+            return obj.annotated_active_contracts_count
         try:
             return obj.contracts.filter(is_active=True).count()
         except Exception:
             return 0
-    
+
     def get_subscription_summary(self, obj):
         """Get a summary of active contracts/subscriptions"""
         try:
-            active_contracts = obj.contracts.filter(is_active=True)
+            if hasattr(obj, 'prefetched_active_contracts'):
+                active_contracts = obj.prefetched_active_contracts
+            else:
+                active_contracts = obj.contracts.filter(is_active=True)
             if not active_contracts:
                 return "No active subscriptions"
 
@@ -366,13 +485,15 @@ class CompanySerializer(serializers.ModelSerializer):
 
     def get_is_subsidiary(self, obj):
         """Check if company is a subsidiary (has a parent)"""
-        return obj.parent_company is not None
+        return obj.parent_company_id is not None
 
     def get_child_companies_count(self, obj):
         """Count of child companies (only for corporate parents)"""
-        if obj.is_corporate_parent:
-            return obj.child_companies.count()
-        return 0
+        if not obj.is_corporate_parent:
+            return 0
+        if hasattr(obj, 'annotated_child_companies_count'):
+            return obj.annotated_child_companies_count
+        return obj.child_companies.count()
 
 
 class NoteSerializer(serializers.ModelSerializer):
@@ -720,41 +841,109 @@ class ContractSerializer(serializers.ModelSerializer):
             'contract_number': {'required': False}
         }
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Precompute the per-contract invoice/zone/renewal figures as annotations and
+        prefetch the nested relations, so a page of contracts costs a fixed number of
+        queries instead of several per contract.
+        """
+        count = IntegerField()
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return queryset.select_related(
+            'company', 'opportunity', 'quote', 'master_contract', 'renewed_from',
+            'preamble_template', 'payment_template', 'activation_template'
+        ).prefetch_related(
+            None
+        ).prefetch_related(
+            'line_items', 'service_locations', 'service_items',
+            Prefetch('invoices', queryset=Invoice.objects.select_related('company').prefetch_related('line_items')),
+            Prefetch('contract_zones', queryset=ContractZone.objects.select_related('zone')),
+            Prefetch('contract_documents', queryset=ContractDocument.objects.select_related('uploaded_by')),
+        ).annotate(
+            annotated_paid_invoices_count=_aggregate_subquery(
+                Invoice.objects.filter(status='Paid'), 'contract', Count('pk'), count
+            ),
+            annotated_outstanding_amount=_aggregate_subquery(
+                Invoice.objects.exclude(status='Paid'), 'contract', Sum('total_amount'), money
+            ),
+            annotated_service_location_count=_aggregate_subquery(
+                ContractServiceLocation.objects.all(), 'contract', Count('pk'), count
+            ),
+            annotated_active_contract_zone_count=_aggregate_subquery(
+                ContractZone.objects.filter(is_active=True), 'contract', Count('pk'), count
+            ),
+            annotated_contract_zone_count=_aggregate_subquery(
+                ContractZone.objects.all(), 'contract', Count('pk'), count
+            ),
+            annotated_participation_agreements_count=_aggregate_subquery(
+                Contract.objects.all(), 'master_contract', Count('pk'), count
+            ),
+            annotated_renewal_count=_aggregate_subquery(
+                Contract.objects.all(), 'renewed_from', Count('pk'), count
+            ),
+            annotated_effective_soundtrack_account_id=Coalesce(
+                NullIf('soundtrack_account_id', Value('')), 'company__soundtrack_account_id'
+            ),
+        )
+
     def get_paid_invoices_count(self, obj):
+        if hasattr(obj, 'annotated_paid_invoices_count'):
+            return obj.annotated_paid_invoices_count
         return obj.invoices.filter(status='Paid').count()
 
     def get_outstanding_amount(self, obj):
+        if hasattr(obj, 'annotated_outstanding_amount'):
+            return obj.annotated_outstanding_amount or 0
         outstanding = obj.invoices.exclude(status='Paid').aggregate(
             total=Sum('total_amount')
         )['total']
         return outstanding or 0
 
+    def _service_location_count(self, obj):
+        if hasattr(obj, 'annotated_service_location_count'):
+            return obj.annotated_service_location_count
+        # Cache on the instance: both zone counts need it
+        if not hasattr(obj, '_cached_service_location_count'):
+            obj._cached_service_location_count = obj.service_locations.count()
+        return obj._cached_service_location_count
+
     def get_active_zone_count(self, obj):
         """Count of currently active zones (prefers service_locations)"""
-        loc_count = obj.service_locations.count()
+        loc_count = self._service_location_count(obj)
         if loc_count > 0:
             return loc_count
+        if hasattr(obj, 'annotated_active_contract_zone_count'):
+            return obj.annotated_active_contract_zone_count
         return obj.contract_zones.filter(is_active=True).count()
 
     def get_total_zone_count(self, obj):
         """Total count of all zones (prefers service_locations)"""
-        loc_count = obj.service_locations.count()
+        loc_count = self._service_location_count(obj)
         if loc_count > 0:
             return loc_count
+        if hasattr(obj, 'annotated_contract_zone_count'):
+            return obj.annotated_contract_zone_count
         return obj.contract_zones.count()
 
     def get_participation_agreements_count(self, obj):
         """Count of participation agreements under this master contract"""
         if obj.contract_category == 'corporate_master':
+            if hasattr(obj, 'annotated_participation_agreements_count'):
+                return obj.annotated_participation_agreements_count
             return obj.participation_agreements.count()
         return 0
 
     def get_renewal_count(self, obj):
         """Count how many times this contract has been renewed"""
+        if hasattr(obj, 'annotated_renewal_count'):
+            return obj.annotated_renewal_count
         return obj.renewals.count()
 
     def get_effective_soundtrack_account_id(self, obj):
         """Get the effective Soundtrack account ID (contract override or company default)"""
+        if hasattr(obj, 'annotated_effective_soundtrack_account_id'):
+            return obj.annotated_effective_soundtrack_account_id
         return obj.soundtrack_account_id or obj.company.soundtrack_account_id
 
     def _calculate_tax_fields(self, validated_data):
@@ -1215,21 +1404,30 @@ class EmailCampaignSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
+    def _recipient_count(self, obj, name):
+        """Counter annotated by CampaignViewSet (EmailCampaign.recipient_count_annotations),
+        or one aggregate over the recipients for instances loaded without it"""
+        if not hasattr(obj, name):
+            counts = EmailCampaign.objects.filter(pk=obj.pk).aggregate(**EmailCampaign.recipient_count_annotations())
+            for key, value in counts.items():
+                setattr(obj, key, value)
+        return getattr(obj, name)
+
     def get_recipients_count(self, obj):
         """Get total number of recipients"""
-        return obj.recipients.count()
+        return self._recipient_count(obj, 'recipients_count')
 
     def get_pending_count(self, obj):
         """Get number of pending recipients"""
-        return obj.recipients.filter(status='pending').count()
+        return self._recipient_count(obj, 'pending_count')
 
     def get_sent_count(self, obj):
         """Get number of sent recipients"""
-        return obj.recipients.filter(status__in=['sent', 'delivered', 'opened', 'clicked']).count()
+        return self._recipient_count(obj, 'sent_count')
 
     def get_failed_count(self, obj):
         """Get number of failed/bounced recipients"""
-        return obj.recipients.filter(status__in=['failed', 'bounced']).count()
+        return self._recipient_count(obj, 'failed_count')
 
     def validate_scheduled_send_date(self, value):
         """Ensure scheduled date is in the future"""
@@ -0,0 +1,462 @@
+"""
+Action Center (Today page) feed for BMAsia CRM
+
+Builds the prioritized feed of items needing attention as a lazy merge of
+per-section querysets instead of one big in-memory list.
+
+Sections (urgency tier -> sections, each ordered by age at the database level):
+    overdue:  overdue_tasks, overdue_invoices, stale_opportunities
+    today:    tasks_due_soon, invoices_due_this_week
+    upcoming: expiring_contracts, tasks_this_week, upcoming_follow_ups
+
+The feed is ordered by (urgency, reference date, section, id). Each section
+reads at most `limit + 1` rows, the sections are merged with heapq.merge, and
+only the contacts for the returned page are resolved (one query).
+
+Pagination uses an opaque cursor holding each section's last emitted
+(reference date, id) plus the "now" the first page was computed with, so
+later pages resume every section exactly where it stopped without drifting.
+
+Usage:
+    from crm_app.services.action_center_service import ActionCenterFeed
+
+    feed = ActionCenterFeed(request.user, sections=['overdue_tasks'])
+    page = feed.page(cursor=None, limit=50)
+    summary = feed.summary()
+"""
+
+import base64
+import heapq
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.db.models import Q, F, Count, Window
+from django.db.models.functions import Coalesce, RowNumber, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+URGENCY_ORDER = {'overdue': 0, 'today': 1, 'upcoming': 2}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CURSOR_VERSION = 1
+
+
+class InvalidFeedRequest(ValueError):
+    """Raised for an unknown section or a malformed cursor (callers return a 400)."""
+
+
+@dataclass(frozen=True)
+class FeedSection:
+    key: str
+    urgency: str
+    sort_field: str
+    is_datetime: bool
+
+
+SECTIONS = [
+    FeedSection('overdue_tasks', 'overdue', 'due_date', True),
+    FeedSection('overdue_invoices', 'overdue', 'due_date', False),
+    FeedSection('stale_opportunities', 'overdue', 'stale_since', False),
+    FeedSection('tasks_due_soon', 'today', 'due_date', True),
+    FeedSection('invoices_due_this_week', 'today', 'due_date', False),
+    FeedSection('expiring_contracts', 'upcoming', 'end_date', False),
+    FeedSection('tasks_this_week', 'upcoming', 'due_date', True),
+    FeedSection('upcoming_follow_ups', 'upcoming', 'follow_up_date', False),
+]
+SECTION_KEYS = [section.key for section in SECTIONS]
+TASK_SECTIONS = {'overdue_tasks', 'tasks_due_soon', 'tasks_this_week'}
+
+
+def primary_contacts_by_company(company_ids):
+    """Map company_id -> primary active contact (fallback: first active by name) in one query."""
+    from crm_app.models import Contact
+    company_ids = {company_id for company_id in company_ids if company_id}
+    if not company_ids:
+        return {}
+    ranked = Contact.objects.filter(
+        company_id__in=company_ids, is_active=True
+    ).annotate(
+        company_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('company_id')],
+            order_by=[F('is_primary').desc(), F('name').asc()],
+        )
+    ).filter(company_rank=1)
+    return {contact.company_id: contact for contact in ranked}
+
+
+def parse_sections(value):
+    """Parse a `sections=` query param (comma separated) into section keys."""
+    if not value:
+        return list(SECTION_KEYS)
+    keys = [key.strip() for key in value.split(',') if key.strip()]
+    unknown = [key for key in keys if key not in SECTION_KEYS]
+    if unknown:
+        raise InvalidFeedRequest(
+            f"Unknown section(s): {', '.join(unknown)}. Valid sections: {', '.join(SECTION_KEYS)}"
+        )
+    return [key for key in SECTION_KEYS if key in keys]
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidFeedRequest('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(now, positions):
+    payload = {'v': CURSOR_VERSION, 'now': now.isoformat(), 'pos': positions}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (now, positions) from an opaque cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        now = parse_datetime(payload['now'])
+        positions = payload['pos']
+        if payload.get('v') != CURSOR_VERSION or now is None or not isinstance(positions, dict):
+            raise ValueError
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise InvalidFeedRequest('Invalid cursor')
+    return now, positions
+
+
+class ActionCenterFeed:
+    """
+    Lazy, cursor-paginated Action Center feed for one user.
+    """
+
+    def __init__(self, user, sections=None, now=None):
+        from crm_app.models import Contract, Invoice, Opportunity, Task
+        self.Contract = Contract
+        self.Invoice = Invoice
+        self.Opportunity = Opportunity
+        self.Task = Task
+
+        self.user = user
+        self.sections = [section for section in SECTIONS if section.key in (sections or SECTION_KEYS)]
+        self.set_now(now or timezone.now())
+
+    def set_now(self, now):
+        self.now = now
+        self.today = now.date()
+        self.week_end = self.today + timedelta(days=7)
+        self.two_weeks = self.today + timedelta(days=14)
+        self.sixty_days = self.today + timedelta(days=60)
+        self.stale_threshold = now - timedelta(days=14)
+        self.tomorrow_end = now.replace(hour=23, minute=59, second=59) + timedelta(days=1)
+        self.week_end_dt = now.replace(hour=23, minute=59, second=59) + timedelta(days=7)
+
+    # ------------------------------------------------------------------
+    # Section querysets
+    # ------------------------------------------------------------------
+
+    def _open_tasks(self):
+        task_qs = self.Task.objects.select_related('company', 'assigned_to', 'related_contact')
+        if self.user.role == 'Sales':
+            task_qs = task_qs.filter(assigned_to=self.user)
+        return task_qs.filter(status__in=['To Do', 'In Progress'])
+
+    def _open_opportunities(self):
+        opportunities = self.Opportunity.objects.filter(is_active=True).exclude(stage__in=['Won', 'Lost'])
+        if self.user.role == 'Sales':
+            opportunities = opportunities.filter(owner=self.user)
+        return opportunities
+
+    def _stale_filter(self):
+        return (
+            Q(follow_up_date__lt=self.today) |
+            Q(follow_up_date__isnull=True, updated_at__lt=self.stale_threshold)
+        )
+
+    def section_queryset(self, key):
+        """Unordered queryset of the rows that belong to a section."""
+        if key == 'overdue_tasks':
+            return self._open_tasks().filter(due_date__lt=self.now)
+        if key == 'overdue_invoices':
+            return self.Invoice.objects.filter(
+                status__in=['Sent', 'Overdue'], due_date__lt=self.today
+            ).select_related('company')
+        if key == 'stale_opportunities':
+            return self._open_opportunities().filter(self._stale_filter()).annotate(
+                stale_since=Coalesce('follow_up_date', TruncDate('updated_at', tzinfo=dt_timezone.utc)),
+            ).select_related('company', 'owner')
+        if key == 'tasks_due_soon':
+            return self._open_tasks().filter(due_date__gte=self.now, due_date__lte=self.tomorrow_end)
+        if key == 'invoices_due_this_week':
+            return self.Invoice.objects.filter(
+                status='Sent', due_date__gte=self.today, due_date__lte=self.week_end
+            ).select_related('company')
+        if key == 'expiring_contracts':
+            return self.Contract.objects.filter(
+                status='Active', end_date__gte=self.today, end_date__lte=self.sixty_days
+            ).select_related('company')
+        if key == 'tasks_this_week':
+            return self._open_tasks().filter(due_date__gt=self.tomorrow_end, due_date__lte=self.week_end_dt)
+        if key == 'upcoming_follow_ups':
+            return self._open_opportunities().filter(
+                follow_up_date__gte=self.today, follow_up_date__lte=self.two_weeks
+            ).select_related('company', 'owner')
+        raise InvalidFeedRequest(f'Unknown section: {key}')
+
+    # ------------------------------------------------------------------
+    # Merge-sorted stream
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _position_value(section, raw):
+        value = parse_datetime(raw) if section.is_datetime else parse_date(raw)
+        if value is None:
+            raise InvalidFeedRequest('Invalid cursor')
+        return value
+
+    @staticmethod
+    def _merge_key(section, value):
+        """Comparable UTC timestamp string for dates and datetimes alike."""
+        if not section.is_datetime:
+            value = timezone.make_aware(datetime.combine(value, time.min))
+        return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+    def _stream(self, section_index, section, position, fetch):
+        """Yield (sort_key, section, row) for one section, resuming after `position`."""
+        field = section.sort_field
+        queryset = self.section_queryset(section.key)
+        if position:
+            raw_value, last_pk = position
+            value = self._position_value(section, raw_value)
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': last_pk})
+            )
+        urgency = URGENCY_ORDER[section.urgency]
+        for row in queryset.order_by(field, 'pk')[:fetch]:
+            value = getattr(row, field)
+            yield (urgency, self._merge_key(section, value), section_index, str(row.pk)), section, row
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Return one page of the feed.
+
+        Returns:
+            Dict with items, next_cursor (None on the last page) and has_more
+        """
+        positions = {}
+        if cursor:
+            now, positions = decode_cursor(cursor)
+            self.set_now(now)
+
+        streams = [
+            self._stream(index, section, positions.get(section.key), limit + 1)
+            for index, section in enumerate(self.sections)
+        ]
+        picked = list(islice(heapq.merge(*streams, key=lambda entry: entry[0]), limit + 1))
+        has_more = len(picked) > limit
+        picked = picked[:limit]
+
+        next_positions = dict(positions)
+        for _key, section, row in picked:
+            value = getattr(row, section.sort_field)
+            next_positions[section.key] = [value.isoformat(), str(row.pk)]
+
+        contacts = primary_contacts_by_company(self._contact_company_ids(picked))
+        items = [self._build_item(section, row, contacts) for _key, section, row in picked]
+
+        return {
+            'items': items,
+            'next_cursor': encode_cursor(self.now, next_positions) if has_more else None,
+            'has_more': has_more,
+        }
+
+    # ------------------------------------------------------------------
+    # Summary (count aggregates only)
+    # ------------------------------------------------------------------
+
+    def section_counts(self):
+        """Row count per section, using one aggregate query per model."""
+        counts = {}
+        invoice_keys = {'overdue_invoices', 'invoices_due_this_week'}
+        opportunity_keys = {'stale_opportunities', 'upcoming_follow_ups'}
+        selected = {section.key for section in self.sections}
+
+        if selected & TASK_SECTIONS:
+            counts.update(self._open_tasks().order_by().aggregate(
+                overdue_tasks=Count('pk', filter=Q(due_date__lt=self.now)),
+                tasks_due_soon=Count('pk', filter=Q(due_date__gte=self.now, due_date__lte=self.tomorrow_end)),
+                tasks_this_week=Count('pk', filter=Q(due_date__gt=self.tomorrow_end, due_date__lte=self.week_end_dt)),
+            ))
+        if selected & invoice_keys:
+            counts.update(self.Invoice.objects.order_by().aggregate(
+                overdue_invoices=Count('pk', filter=Q(status__in=['Sent', 'Overdue'], due_date__lt=self.today)),
+                invoices_due_this_week=Count('pk', filter=Q(
+                    status='Sent', due_date__gte=self.today, due_date__lte=self.week_end,
+                )),
+            ))
+        if selected & opportunity_keys:
+            counts.update(self._open_opportunities().order_by().aggregate(
+                stale_opportunities=Count('pk', filter=self._stale_filter()),
+                upcoming_follow_ups=Count('pk', filter=Q(
+                    follow_up_date__gte=self.today, follow_up_date__lte=self.two_weeks,
+                )),
+            ))
+        if 'expiring_contracts' in selected:
+            counts['expiring_contracts'] = self.section_queryset('expiring_contracts').count()
+
+        return {section.key: counts.get(section.key, 0) for section in self.sections}
+
+    def summary(self):
+        """Legacy summary totals plus per-section counts."""
+        sections = self.section_counts()
+        totals = {urgency: 0 for urgency in URGENCY_ORDER}
+        for section in self.sections:
+            totals[section.urgency] += sections[section.key]
+        return {
+            'summary': {
+                'overdue_count': totals['overdue'],
+                'today_count': totals['today'],
+                'upcoming_count': totals['upcoming'],
+                'expiring_count': sections.get('expiring_contracts', 0),
+            },
+            'sections': sections,
+        }
+
+    # ------------------------------------------------------------------
+    # Item builders
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _contact_company_ids(picked):
+        company_ids = set()
+        for _key, section, row in picked:
+            if section.key in TASK_SECTIONS:
+                if not row.related_contact_id:
+                    company_ids.add(row.company_id)
+            elif section.key == 'expiring_contracts':
+                if not row.customer_signatory_name:
+                    company_ids.add(row.company_id)
+            else:
+                company_ids.add(row.company_id)
+        return company_ids
+
+    @staticmethod
+    def _contact_dict(contact):
+        if not contact:
+            return {'contact_name': None, 'contact_email': None, 'contact_phone': None}
+        return {
+            'contact_name': contact.name,
+            'contact_email': contact.email,
+            'contact_phone': contact.phone or None,
+        }
+
+    def _build_item(self, section, row, contacts):
+        builder = {
+            'overdue_tasks': self._task_item,
+            'tasks_due_soon': self._task_item,
+            'tasks_this_week': self._task_item,
+            'overdue_invoices': self._invoice_item,
+            'invoices_due_this_week': self._invoice_item,
+            'stale_opportunities': self._opportunity_item,
+            'upcoming_follow_ups': self._opportunity_item,
+            'expiring_contracts': self._contract_item,
+        }[section.key]
+        item = builder(section, row, contacts)
+        item['section'] = section.key
+        return item
+
+    def _task_item(self, section, t, contacts):
+        today = self.today
+        contact = t.related_contact or contacts.get(t.company_id)
+        if section.key == 'overdue_tasks':
+            days = (today - t.due_date.date()).days
+            time_context = f'{days} day{"s" if days != 1 else ""} overdue'
+        elif section.key == 'tasks_due_soon':
+            time_context = 'Due today' if t.due_date.date() == today else 'Due tomorrow'
+        else:
+            time_context = f'Due in {(t.due_date.date() - today).days} days'
+        return {
+            'id': str(t.id), 'type': 'task', 'urgency': section.urgency,
+            'title': t.title, 'subtitle': t.company.name if t.company else '',
+            **self._contact_dict(contact),
+            'time_context': time_context,
+            'priority': t.priority, 'amount': None, 'currency': None,
+            'link_url': '/tasks', 'link_id': str(t.id),
+            'meta': {
+                'task_type': t.task_type,
+                'assigned_to': t.assigned_to.get_full_name() if t.assigned_to else None,
+            },
+        }
+
+    def _invoice_item(self, section, inv, contacts):
+        company = inv.company
+        contact = contacts.get(inv.company_id) if company else None
+        if section.key == 'overdue_invoices':
+            days_overdue = (self.today - inv.due_date).days
+            time_context = f'{days_overdue} day{"s" if days_overdue != 1 else ""} overdue'
+            priority = 'High' if days_overdue > 30 else 'Medium'
+        else:
+            days_until = (inv.due_date - self.today).days
+            time_context = 'Due today' if days_until == 0 else f'Due in {days_until} day{"s" if days_until != 1 else ""}'
+            priority = 'Medium'
+        return {
+            'id': str(inv.id), 'type': 'invoice', 'urgency': section.urgency,
+            'title': f'Invoice {inv.invoice_number}',
+            'subtitle': company.name if company else '',
+            **self._contact_dict(contact),
+            'time_context': time_context,
+            'priority': priority,
+            'amount': float(inv.total_amount), 'currency': inv.currency,
+            'link_url': '/invoices', 'link_id': str(inv.id),
+            'meta': {'status': inv.status},
+        }
+
+    def _opportunity_item(self, section, opp, contacts):
+        contact = contacts.get(opp.company_id) if opp.company else None
+        if section.key == 'stale_opportunities':
+            ref_date = opp.follow_up_date if opp.follow_up_date else opp.updated_at.date()
+            time_context = f'No activity for {(self.today - ref_date).days} days'
+            priority = 'High'
+        else:
+            days_until = (opp.follow_up_date - self.today).days
+            time_context = 'Follow up today' if days_until == 0 else f'Follow up in {days_until} day{"s" if days_until != 1 else ""}'
+            priority = 'Medium'
+        return {
+            'id': str(opp.id), 'type': 'opportunity', 'urgency': section.urgency,
+            'title': opp.name, 'subtitle': f'{opp.company.name} — {opp.stage}' if opp.company else opp.stage,
+            **self._contact_dict(contact),
+            'time_context': time_context,
+            'priority': priority,
+            'amount': float(opp.expected_value) if opp.expected_value else None,
+            'currency': None,
+            'link_url': '/opportunities', 'link_id': str(opp.id),
+            'meta': {'stage': opp.stage, 'owner': opp.owner.get_full_name() if opp.owner else None},
+        }
+
+    def _contract_item(self, section, c, contacts):
+        contact_name = c.customer_signatory_name
+        contact = None
+        if not contact_name and c.company:
+            contact = contacts.get(c.company_id)
+        days_until = (c.end_date - self.today).days
+        return {
+            'id': str(c.id), 'type': 'contract', 'urgency': section.urgency,
+            'title': f'Contract {c.contract_number}',
+            'subtitle': c.company.name if c.company else '',
+            **(self._contact_dict(contact) if contact else {
+                'contact_name': contact_name or None,
+                'contact_email': None, 'contact_phone': None,
+            }),
+            'time_context': f'Expires in {days_until} day{"s" if days_until != 1 else ""}',
+            'priority': 'High' if days_until <= 30 else 'Medium',
+            'amount': float(c.value) if c.value else None,
+            'currency': c.currency,
+            'link_url': '/contracts', 'link_id': str(c.id),
+            'meta': {'auto_renew': c.auto_renew},
+        }
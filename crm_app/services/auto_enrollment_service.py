@@ -3,11 +3,23 @@ Auto-enrollment service for automatically enrolling contacts in email sequences
 based on triggers like contract expiry, invoice overdue, etc.
 
 This service handles the automatic enrollment logic for the Email Automations system.
-It processes different trigger types (renewal, payment, quarterly) and creates
+It processes different trigger types (renewal, payment, quarterly, seasonal) and creates
 appropriate sequence enrollments when conditions are met.
+
+Each trigger is one set-based pass per sequence: a single query selects the
+triggering contracts, invoices or companies that have no enrollment for the
+trigger yet (NOT EXISTS on trigger_entity_type / trigger_entity_id), with the
+contact to enroll picked by a correlated subquery, and the enrollments plus
+their first SequenceStepExecution rows are bulk-created in one transaction:
+
+    service = AutoEnrollmentService()
+    service.process_all_triggers()
+    # {'renewal': 3, 'payment': 1, 'quarterly': 12, 'seasonal': 0}
 """
 from datetime import date, timedelta
-from django.db.models import Q
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, CharField, Exists, F, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Concat, Substr
 from django.utils import timezone
 import logging
 
@@ -65,6 +77,55 @@ SEASONAL_TRIGGER_DATES = {
 }
 
 
+def _uuid_text(expression):
+    """
+    A UUID column as text in the form str(uuid) gives, to compare with
+    trigger_entity_id. Backends without a native UUID type (SQLite) store
+    the 32 hex digits without hyphens.
+    """
+    text = Cast(expression, output_field=CharField())
+    if connection.features.has_native_uuid_field:
+        return text
+    return Concat(
+        Substr(text, 1, 8), Value('-'), Substr(text, 9, 4), Value('-'), Substr(text, 13, 4), Value('-'),
+        Substr(text, 17, 4), Value('-'), Substr(text, 21, 12),
+        output_field=CharField(),
+    )
+
+
+def _best_contact(preference, order_by=('-is_primary', 'name', 'pk'), company='company'):
+    """
+    Subquery for the id of the contact to enroll for the outer row's company:
+    active, not opted out of emails or of this kind of email (preference
+    field), primary contact first.
+    """
+    from crm_app.models import Contact
+
+    contacts = Contact.objects.filter(
+        company=OuterRef(company),
+        is_active=True,
+        receives_notifications=True,
+        unsubscribed=False,
+        **{preference: True}
+    )
+    return Subquery(contacts.order_by(*order_by).values('pk')[:1])
+
+
+def _not_enrolled(sequence, **trigger):
+    """
+    Filter for outer rows with no enrollment in the sequence matching the
+    trigger lookups, and whose contact (annotated as enroll_contact_id) is not
+    enrolled in the sequence yet.
+    """
+    from crm_app.models import SequenceEnrollment
+
+    enrollments = SequenceEnrollment.objects.filter(sequence=sequence)
+    return (
+        ~Exists(enrollments.filter(**trigger))
+        & ~Exists(enrollments.filter(contact=OuterRef('enroll_contact_id')))
+    )
+
+
 class AutoEnrollmentService:
     """Service for processing automatic sequence enrollments."""
 
@@ -91,20 +152,19 @@ class AutoEnrollmentService:
         """
         Auto-enroll contacts when contracts reach the trigger days before expiry.
 
-        For each active auto_renewal sequence:
-        1. Find contracts expiring in X days (based on sequence steps)
-        2. Check if contact already enrolled for this contract
-        3. Create enrollment if not already enrolled
+        For each active auto_renewal sequence, one query finds the contracts
+        expiring in X days (based on the sequence's first step) that are not
+        enrolled yet, with the contact to enroll; the enrollments are then
+        created in bulk (see _bulk_enroll).
 
         Returns:
             int: Number of enrollments created
         """
-        from crm_app.models import EmailSequence, SequenceEnrollment, Contract, SequenceStep
+        from crm_app.models import EmailSequence, Contract
 
         enrolled_count = 0
 
         # Find all active auto_renewal sequences
-        # Note: Assumes EmailSequence has sequence_type field (will be added in migration)
         sequences = EmailSequence.objects.filter(
             sequence_type='auto_renewal',
             status='active'
@@ -119,66 +179,28 @@ class AutoEnrollmentService:
 
             # The delay_days on first step indicates when to enroll
             # e.g., if first step has delay_days=30, enroll 30 days before expiry
-            trigger_days = first_step.delay_days
-            target_date = date.today() + timedelta(days=trigger_days)
+            target_date = date.today() + timedelta(days=first_step.delay_days)
 
-            # Find contracts expiring on the target date
             # Note: Contract model uses 'Active' (capital A) for status
             # Only include contracts that have renewal reminders enabled
             contracts = Contract.objects.filter(
                 end_date=target_date,
                 status='Active',
                 send_renewal_reminders=True
-            ).select_related('company')
-
-            logger.info(f"Found {contracts.count()} contracts expiring on {target_date} for sequence {sequence.name}")
-
-            for contract in contracts:
-                # Check if already enrolled for this contract
-                # Note: Assumes SequenceEnrollment has trigger_entity_type and trigger_entity_id fields
-                existing = SequenceEnrollment.objects.filter(
-                    sequence=sequence,
-                    trigger_entity_type='contract',
-                    trigger_entity_id=str(contract.id)
-                ).exists()
-
-                if existing:
-                    logger.debug(f"Contract {contract.contract_number} already enrolled in {sequence.name}")
-                    continue
-
-                # Get primary contact from company
-                # Exclude contacts who have opted out of emails or renewal emails specifically
-                contact = contract.company.contacts.filter(
-                    is_active=True,
-                    receives_notifications=True,
-                    receives_renewal_emails=True,
-                    unsubscribed=False
-                ).order_by('-is_primary').first()
-
-                if not contact:
-                    logger.warning(f"No active contact for contract {contract.contract_number} (company: {contract.company.name})")
-                    continue
-
-                # Create enrollment
-                try:
-                    enrollment = SequenceEnrollment.objects.create(
-                        sequence=sequence,
-                        contact=contact,
-                        company=contract.company,
-                        status='active',
-                        enrollment_source='auto_trigger',
-                        trigger_entity_type='contract',
-                        trigger_entity_id=str(contract.id),
-                        current_step_number=1
-                    )
-                    enrolled_count += 1
-                    logger.info(f"Auto-enrolled {contact.email} in {sequence.name} for contract {contract.contract_number}")
-
-                    # Schedule first step execution
-                    self._schedule_next_step(enrollment)
+            ).annotate(
+                enroll_contact_id=_best_contact('receives_renewal_emails'),
+            ).filter(
+                _not_enrolled(sequence, trigger_entity_type='contract', trigger_entity_id=_uuid_text(OuterRef('pk')))
+            )
 
-                except Exception as e:
-                    logger.error(f"Failed to enroll contact {contact.email} in {sequence.name}: {str(e)}")
+            candidates = [
+                (str(pk), company_id, contact_id, f"contract {contract_number}")
+                for pk, contract_number, company_id, contact_id in contracts.values_list(
+                    'pk', 'contract_number', 'company_id', 'enroll_contact_id'
+                )
+            ]
+            logger.info(f"Found {len(candidates)} contracts to enroll expiring on {target_date} for sequence {sequence.name}")
+            enrolled_count += self._bulk_enroll(sequence, 'contract', candidates)
 
         return enrolled_count
 
@@ -187,12 +209,13 @@ class AutoEnrollmentService:
         Auto-enroll contacts when invoices become overdue.
 
         Looks for invoices that became overdue based on the sequence's
-        first step delay_days configuration.
+        first step delay_days configuration, and enrolls the company's billing
+        or primary contact (any eligible contact if there is neither).
 
         Returns:
             int: Number of enrollments created
         """
-        from crm_app.models import EmailSequence, SequenceEnrollment, Invoice
+        from crm_app.models import EmailSequence, Invoice
 
         enrolled_count = 0
 
@@ -201,6 +224,12 @@ class AutoEnrollmentService:
             status='active'
         )
 
+        # Billing and primary contacts first, then any eligible contact (by name)
+        billing_first = (
+            Case(When(Q(contact_type='Billing') | Q(is_primary=True), then=Value(0)), default=Value(1)),
+            'name', 'pk',
+        )
+
         for sequence in sequences:
             first_step = sequence.steps.order_by('step_number').first()
             if not first_step:
@@ -217,65 +246,20 @@ class AutoEnrollmentService:
                 status__in=['Sent', 'Overdue']
             ).exclude(
                 status='Paid'
-            ).select_related('contract__company')
-
-            logger.info(f"Found {invoices.count()} invoices overdue as of {target_date} for sequence {sequence.name}")
-
-            for invoice in invoices:
-                existing = SequenceEnrollment.objects.filter(
-                    sequence=sequence,
-                    trigger_entity_type='invoice',
-                    trigger_entity_id=str(invoice.id)
-                ).exists()
-
-                if existing:
-                    logger.debug(f"Invoice {invoice.invoice_number} already enrolled in {sequence.name}")
-                    continue
-
-                # Get billing contact or primary contact
-                # Exclude contacts who have opted out of emails or payment emails specifically
-                company = invoice.company
-                contact = company.contacts.filter(
-                    is_active=True,
-                    receives_notifications=True,
-                    receives_payment_emails=True,
-                    unsubscribed=False
-                ).filter(
-                    Q(contact_type='Billing') | Q(is_primary=True)
-                ).first()
-
-                if not contact:
-                    # Fallback to any active contact who hasn't opted out of payment emails
-                    contact = company.contacts.filter(
-                        is_active=True,
-                        receives_notifications=True,
-                        receives_payment_emails=True,
-                        unsubscribed=False
-                    ).first()
-
-                if not contact:
-                    logger.warning(f"No active contact for invoice {invoice.invoice_number} (company: {company.name})")
-                    continue
-
-                try:
-                    enrollment = SequenceEnrollment.objects.create(
-                        sequence=sequence,
-                        contact=contact,
-                        company=company,
-                        status='active',
-                        enrollment_source='auto_trigger',
-                        trigger_entity_type='invoice',
-                        trigger_entity_id=str(invoice.id),
-                        current_step_number=1
-                    )
-                    enrolled_count += 1
-                    logger.info(f"Auto-enrolled {contact.email} in {sequence.name} for invoice {invoice.invoice_number}")
-
-                    # Schedule first step execution
-                    self._schedule_next_step(enrollment)
+            ).annotate(
+                enroll_contact_id=_best_contact('receives_payment_emails', order_by=billing_first),
+            ).filter(
+                _not_enrolled(sequence, trigger_entity_type='invoice', trigger_entity_id=_uuid_text(OuterRef('pk')))
+            )
 
-                except Exception as e:
-                    logger.error(f"Failed to enroll contact {contact.email} in {sequence.name}: {str(e)}")
+            candidates = [
+                (str(pk), company_id, contact_id, f"invoice {invoice_number}")
+                for pk, invoice_number, company_id, contact_id in invoices.values_list(
+                    'pk', 'invoice_number', 'company_id', 'enroll_contact_id'
+                )
+            ]
+            logger.info(f"Found {len(candidates)} invoices to enroll overdue as of {target_date} for sequence {sequence.name}")
+            enrolled_count += self._bulk_enroll(sequence, 'invoice', candidates)
 
         return enrolled_count
 
@@ -284,94 +268,65 @@ class AutoEnrollmentService:
         Auto-enroll contacts for quarterly check-ins based on contract start date.
 
         Enrolls contacts on the 90/180/270/360 day anniversaries of their
-        contract start date (and every subsequent 90-day milestone).
+        contract start date (and every subsequent 90-day milestone). Only the
+        contracts starting on one of those dates are read, each deduplicated
+        per quarter ("<contract id>_Q<n>").
 
         Returns:
             int: Number of enrollments created
         """
-        from crm_app.models import EmailSequence, SequenceEnrollment, Contract
+        from crm_app.models import EmailSequence, Contract
 
         today = date.today()
-        enrolled_count = 0
-
-        # Get all active contracts
-        contracts = Contract.objects.filter(
-            status='Active'
-        ).select_related('company')
 
-        logger.info(f"Processing {contracts.count()} active contracts for quarterly triggers")
-
-        for contract in contracts:
-            if not contract.start_date:
-                logger.debug(f"Contract {contract.contract_number} has no start_date, skipping")
-                continue
-
-            days_since_start = (today - contract.start_date).days
-
-            # Check if today is a quarterly milestone (90, 180, 270, 360, etc.)
-            # Only process if > 0 days (not on start date itself)
-            if days_since_start > 0 and days_since_start % 90 == 0:
-                quarter_number = days_since_start // 90
-
-                logger.info(f"Contract {contract.contract_number} reached Q{quarter_number} milestone ({days_since_start} days since start)")
-
-                # Get active quarterly sequence
-                sequence = EmailSequence.objects.filter(
-                    sequence_type='auto_quarterly',
-                    status='active'
-                ).first()
-
-                if not sequence:
-                    logger.debug("No active auto_quarterly sequence found")
-                    continue
-
-                # Check if already enrolled for this specific quarter
-                # Use trigger_entity_id to track which quarters have been processed
-                already_enrolled = SequenceEnrollment.objects.filter(
-                    sequence=sequence,
-                    trigger_entity_type='contract_quarter',
-                    trigger_entity_id=f"{contract.id}_Q{quarter_number}"
-                ).exists()
-
-                if already_enrolled:
-                    logger.debug(f"Contract {contract.contract_number} Q{quarter_number} already enrolled, skipping")
-                    continue
+        # Get active quarterly sequence
+        sequence = EmailSequence.objects.filter(
+            sequence_type='auto_quarterly',
+            status='active'
+        ).first()
 
-                # Get primary contact (respecting opt-out and quarterly email preference)
-                contact = contract.company.contacts.filter(
-                    is_active=True,
-                    receives_notifications=True,
-                    receives_quarterly_emails=True,
-                    unsubscribed=False
-                ).order_by('-is_primary').first()
+        if not sequence:
+            logger.debug("No active auto_quarterly sequence found")
+            return 0
 
-                if not contact:
-                    logger.warning(f"No active contact for contract {contract.contract_number} (company: {contract.company.name})")
-                    continue
+        contracts = Contract.objects.filter(status='Active', start_date__isnull=False)
+        earliest = contracts.aggregate(earliest=Min('start_date'))['earliest']
+        if not earliest:
+            return 0
 
-                # Create enrollment
-                try:
-                    enrollment = SequenceEnrollment.objects.create(
-                        sequence=sequence,
-                        contact=contact,
-                        company=contract.company,
-                        status='active',
-                        enrollment_source='auto_trigger',
-                        trigger_entity_type='contract_quarter',
-                        trigger_entity_id=f"{contract.id}_Q{quarter_number}",
-                        current_step_number=1
-                    )
-
-                    # Schedule first step
-                    self._schedule_next_step(enrollment)
-                    enrolled_count += 1
-
-                    logger.info(f"Auto-enrolled {contact.email} in {sequence.name} for Q{quarter_number} check-in (contract: {contract.contract_number})")
+        # Start dates that reach a quarterly milestone today (not the start date itself)
+        milestones = {
+            today - timedelta(days=90 * quarter_number): quarter_number
+            for quarter_number in range(1, (today - earliest).days // 90 + 1)
+        }
+        if not milestones:
+            return 0
+
+        contracts = contracts.filter(
+            start_date__in=list(milestones)
+        ).annotate(
+            quarter_key=Concat(
+                _uuid_text(F('pk')),
+                Case(*[
+                    When(start_date=start_date, then=Value(f"_Q{quarter_number}"))
+                    for start_date, quarter_number in milestones.items()
+                ]),
+                output_field=CharField(),
+            ),
+            enroll_contact_id=_best_contact('receives_quarterly_emails'),
+        ).filter(
+            _not_enrolled(sequence, trigger_entity_type='contract_quarter', trigger_entity_id=OuterRef('quarter_key'))
+        )
 
-                except Exception as e:
-                    logger.error(f"Failed to enroll contact {contact.email} in {sequence.name}: {str(e)}")
+        candidates = [
+            (f"{pk}_Q{milestones[start_date]}", company_id, contact_id, f"contract {contract_number}")
+            for pk, contract_number, start_date, company_id, contact_id in contracts.values_list(
+                'pk', 'contract_number', 'start_date', 'company_id', 'enroll_contact_id'
+            )
+        ]
+        logger.info(f"Found {len(candidates)} contracts to enroll at a quarterly milestone")
 
-        return enrolled_count
+        return self._bulk_enroll(sequence, 'contract_quarter', candidates)
 
     def process_seasonal_triggers(self):
         """
@@ -380,7 +335,7 @@ class AutoEnrollmentService:
         - Active contract status
         - seasonal_emails_enabled flag (if False, skip)
         """
-        from crm_app.models import EmailSequence, SequenceEnrollment, Company
+        from crm_app.models import EmailSequence, Company, Contract
 
         today = date.today()
         enrolled_count = 0
@@ -423,65 +378,108 @@ class AutoEnrollmentService:
                 logger.debug(f"No active sequence for {sequence_type}")
                 continue
 
-            # Build company filter
-            company_filter = Q(
-                contracts__status='Active',
+            # Companies with an active contract
+            companies = Company.objects.filter(
+                Exists(Contract.objects.filter(company=OuterRef('pk'), status='Active')),
                 is_active=True
             )
 
             # Check seasonal opt-out if field exists
             if hasattr(Company, 'seasonal_emails_enabled'):
-                company_filter &= Q(seasonal_emails_enabled=True)
+                companies = companies.filter(seasonal_emails_enabled=True)
 
             # Filter by country (unless 'ALL')
             if 'ALL' not in countries:
-                company_filter &= Q(country__in=countries)
-
-            companies = Company.objects.filter(company_filter).distinct()
-            logger.info(f"Found {companies.count()} eligible companies for {sequence_type}")
+                companies = companies.filter(country__in=countries)
+
+            # Deduplicate: one enrollment per company and year
+            year_key = f"{sequence_type}_{today.year}"
+            companies = companies.annotate(
+                enroll_contact_id=_best_contact('receives_seasonal_emails', company='pk'),
+            ).filter(
+                _not_enrolled(sequence, company=OuterRef('pk'), trigger_entity_type='seasonal', trigger_entity_id=year_key),
+                enroll_contact_id__isnull=False
+            )
 
-            for company in companies:
-                # Get eligible contact (respecting opt-out and seasonal email preference)
-                contact = company.contacts.filter(
-                    is_active=True,
-                    receives_notifications=True,
-                    receives_seasonal_emails=True,
-                    unsubscribed=False
-                ).order_by('-is_primary').first()
+            candidates = [
+                (year_key, pk, contact_id, None)
+                for pk, contact_id in companies.values_list('pk', 'enroll_contact_id')
+            ]
+            logger.info(f"Found {len(candidates)} eligible companies for {sequence_type}")
+            enrolled_count += self._bulk_enroll(sequence, 'seasonal', candidates)
 
-                if not contact:
-                    continue
+        return enrolled_count
 
-                # Deduplicate: Check not already enrolled this year
-                year_key = f"{sequence_type}_{today.year}"
-                already_enrolled = SequenceEnrollment.objects.filter(
-                    sequence=sequence,
-                    company=company,
-                    trigger_entity_type='seasonal',
-                    trigger_entity_id=year_key
-                ).exists()
+    def _bulk_enroll(self, sequence, trigger_entity_type, candidates):
+        """
+        Enroll trigger candidates in a sequence and schedule their first step.
 
-                if already_enrolled:
-                    continue
+        The enrollments and their first SequenceStepExecution rows are created
+        in one transaction; if it fails nothing is enrolled and the next run
+        picks the candidates up again. A contact can be enrolled in a sequence
+        only once (unique_together), so of several candidates sharing a
+        contact only the first is enrolled.
 
-                try:
-                    enrollment = SequenceEnrollment.objects.create(
-                        sequence=sequence,
-                        contact=contact,
-                        company=company,
-                        status='active',
-                        enrollment_source='auto_trigger',
-                        trigger_entity_type='seasonal',
-                        trigger_entity_id=year_key,
-                        current_step_number=1
-                    )
-                    self._schedule_next_step(enrollment)
-                    enrolled_count += 1
-                    logger.info(f"Enrolled {contact.email} for {sequence_type}")
-                except Exception as e:
-                    logger.error(f"Failed to enroll {contact.email} for {sequence_type}: {e}")
+        Args:
+            sequence: EmailSequence to enroll in
+            trigger_entity_type: Stored on each enrollment for deduplication
+            candidates: (trigger_entity_id, company_id, contact_id, description)
+                tuples; a candidate without a contact is logged with its
+                description (silently skipped if the description is None)
 
-        return enrolled_count
+        Returns:
+            int: Number of enrollments created
+        """
+        from crm_app.models import SequenceEnrollment, SequenceStepExecution
+
+        enrollments = []
+        contact_ids = set()
+        for trigger_entity_id, company_id, contact_id, description in candidates:
+            if contact_id is None:
+                if description:
+                    logger.warning(f"No active contact for {description}")
+                continue
+            if contact_id in contact_ids:
+                logger.debug(f"Contact {contact_id} already enrolled in {sequence.name} in this run, skipping {description or trigger_entity_id}")
+                continue
+            contact_ids.add(contact_id)
+            enrollments.append(SequenceEnrollment(
+                sequence=sequence,
+                contact_id=contact_id,
+                company_id=company_id,
+                status='active',
+                enrollment_source='auto_trigger',
+                trigger_entity_type=trigger_entity_type,
+                trigger_entity_id=trigger_entity_id,
+                current_step_number=1
+            ))
+
+        if not enrollments:
+            return 0
+
+        first_step = sequence.steps.filter(step_number=1, is_active=True).first()
+        try:
+            with transaction.atomic():
+                # enrolled_at (auto_now_add) is set on the instances by bulk_create
+                SequenceEnrollment.objects.bulk_create(enrollments)
+                if first_step:
+                    SequenceStepExecution.objects.bulk_create([
+                        SequenceStepExecution(
+                            enrollment=enrollment,
+                            step=first_step,
+                            scheduled_for=enrollment.enrolled_at + timedelta(days=first_step.delay_days),
+                            status='scheduled'
+                        )
+                        for enrollment in enrollments
+                    ])
+        except DatabaseError as e:
+            logger.error(f"Failed to enroll {len(enrollments)} contacts in {sequence.name}: {str(e)}")
+            return 0
+
+        if not first_step:
+            logger.warning(f"No active step 1 found for {sequence.name}, {len(enrollments)} enrollments have nothing scheduled")
+        logger.info(f"Auto-enrolled {len(enrollments)} contacts in {sequence.name} ({trigger_entity_type} trigger)")
+        return len(enrollments)
 
     def _schedule_next_step(self, enrollment):
         """
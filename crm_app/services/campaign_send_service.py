@@ -0,0 +1,371 @@
+"""
+Campaign Send Pipeline for BMAsia CRM
+
+Sending a campaign used to happen inside the POST /campaigns/{id}/send/ request,
+one SMTP round trip per recipient, which timed out for large audiences. The API
+now only enqueues: it makes sure the recipients exist, marks the campaign
+'sending' and returns. The `process_campaign_queue` management command drains
+the queue.
+
+The queue is the data itself: the 'pending' recipients of every 'sending'
+campaign. The worker sends them in chunks. A chunk is claimed in a short
+transaction (rows locked with SKIP LOCKED on PostgreSQL and marked 'sending'),
+sent outside any transaction, and its statuses and email logs are written in a
+second short transaction, so:
+    - several workers can drain the same campaign without double sending
+    - no row locks are held while SMTP sends and the rate limit sleep
+    - a failure after sending leaves the chunk 'sending' rather than rolling it
+      back to 'pending'; only claims older than CAMPAIGN_SEND_CLAIM_TIMEOUT
+      minutes (a worker that died mid-chunk) go back to 'pending' and are resent.
+      A worker refreshes its claim while sending, so a slow chunk never looks
+      stale to the others
+
+The campaign status is re-read before every chunk, so the pause/cancel actions
+stop a send within one chunk and resume puts the campaign back in the queue.
+Sends from the same sender address are spaced out by a per-sender rate limit.
+The claim also writes a 'pending' EmailLog per recipient (tracking token and
+Message-ID included), so opens, clicks and replies of a sent email always find
+its row; statuses are kept in memory during the chunk and written with bulk
+statements at its end (see email_log_batch.py).
+
+Usage:
+    from crm_app.services.campaign_send_service import CampaignSendService
+
+    service = CampaignSendService()
+    service.enqueue(campaign, sender_email=request.user.email)   # API
+    service.process_queue()                                       # worker
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from crm_app.models import CampaignRecipient, Contact, EmailCampaign, EmailLog
+from crm_app.utils.email_utils import text_to_html
+
+logger = logging.getLogger(__name__)
+
+# Recipient statuses that mean the email left the building
+SENT_STATUSES = ('sent', 'delivered', 'opened', 'clicked', 'bounced', 'unsubscribed')
+
+# Recipient fields written per chunk with bulk_update
+RECIPIENT_UPDATE_FIELDS = ['status', 'sent_at', 'failed_at', 'error_message', 'email_log', 'updated_at']
+
+
+class CampaignSendError(ValueError):
+    """Raised when a campaign cannot be queued for sending."""
+
+
+class SenderRateLimiter:
+    """
+    Spaces out sends from the same sender address to at most `per_minute` per
+    minute. State is per worker process.
+    """
+
+    def __init__(self, per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = {}
+
+    def wait(self, sender):
+        if not self.interval:
+            return
+        now = self.clock()
+        slot = self._next_slot.get(sender, now)
+        if slot > now:
+            self.sleep(slot - now)
+            now = slot
+        self._next_slot[sender] = now + self.interval
+
+
+class CampaignSendService:
+    """
+    Enqueue campaigns and send their pending recipients in rate-limited chunks.
+    """
+
+    def __init__(self, email_service=None, chunk_size=None, rate_per_minute=None, rate_limiter=None):
+        from crm_app.services.email_service import EmailService
+        self.email_service = email_service or EmailService()
+        self.chunk_size = chunk_size or getattr(settings, 'CAMPAIGN_SEND_CHUNK_SIZE', 50)
+        if rate_per_minute is None:
+            rate_per_minute = getattr(settings, 'CAMPAIGN_SEND_RATE_PER_MINUTE', 60)
+        self.rate_limiter = rate_limiter or SenderRateLimiter(rate_per_minute)
+        self.claim_timeout = timedelta(minutes=getattr(settings, 'CAMPAIGN_SEND_CLAIM_TIMEOUT', 30))
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def progress(campaign):
+        """Recipient counts for a campaign: total, pending, sent, failed, percent_complete."""
+        counts = dict(
+            campaign.recipients.order_by().values_list('status').annotate(count=Count('pk'))
+        )
+        total = sum(counts.values())
+        # Claimed by a worker but not sent yet
+        pending = counts.get('pending', 0) + counts.get('sending', 0)
+        return {
+            'total': total,
+            'pending': pending,
+            'sent': sum(counts.get(name, 0) for name in SENT_STATUSES),
+            'failed': counts.get('failed', 0),
+            'percent_complete': round((total - pending) / total * 100, 1) if total else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Enqueue (API side)
+    # ------------------------------------------------------------------
+
+    def enqueue(self, campaign, contact_ids=None, sender_email=''):
+        """
+        Queue a campaign for the worker and return its progress.
+
+        Recipients are created from `contact_ids` when the campaign has none yet.
+        `sender_email` is stored as the campaign sender when none is set, because
+        the worker has no request user to fall back on.
+        """
+        if campaign.status == 'sent':
+            raise CampaignSendError('Campaign has already been sent')
+        if campaign.status == 'cancelled':
+            raise CampaignSendError('Cannot send cancelled campaign')
+        if campaign.status == 'sending':
+            raise CampaignSendError('Campaign is already being sent')
+
+        with transaction.atomic():
+            if contact_ids and not campaign.recipients.exists():
+                contacts = Contact.objects.filter(id__in=contact_ids, is_active=True).only('pk')
+                CampaignRecipient.objects.bulk_create(
+                    [CampaignRecipient(campaign=campaign, contact=contact, status='pending') for contact in contacts],
+                    ignore_conflicts=True,
+                )
+
+            if not campaign.recipients.filter(status='pending').exists():
+                raise CampaignSendError('No pending recipients to send to')
+
+            campaign.status = 'sending'
+            campaign.actual_send_date = campaign.actual_send_date or timezone.now()
+            campaign.sender_email = campaign.sender_email or sender_email or ''
+            campaign.audience_count = campaign.recipients.count()
+            campaign.save(update_fields=['status', 'actual_send_date', 'sender_email', 'audience_count', 'updated_at'])
+
+        return self.progress(campaign)
+
+    # ------------------------------------------------------------------
+    # Sending (worker side)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def render(campaign, contact):
+        """Return (subject, body_html, body_text) for one recipient."""
+        context = {
+            'company_name': contact.company.name if contact.company else '',
+            'contact_name': contact.name,
+            'contact_email': contact.email,
+        }
+        if campaign.template:
+            rendered = campaign.template.render(context)
+            return campaign.subject or rendered['subject'], rendered['body_html'], rendered['body_text']
+
+        # No template - campaigns store their custom content in target_audience.custom_body
+        if campaign.target_audience and isinstance(campaign.target_audience, dict):
+            body = campaign.target_audience.get('custom_body') or campaign.subject
+        else:
+            body = campaign.subject
+        return campaign.subject, text_to_html(body), body
+
+    def _sender(self, campaign):
+        return campaign.sender_email or settings.DEFAULT_FROM_EMAIL
+
+    def _send_recipient(self, campaign, recipient, connection):
+        contact = recipient.contact
+        try:
+            subject, body_html, body_text = self.render(campaign, contact)
+            self.rate_limiter.wait(self._sender(campaign))
+            success, message = self.email_service.send_email(
+                to_email=contact.email,
+                subject=subject,
+                body_html=body_html,
+                body_text=body_text,
+                from_email=self._sender(campaign),
+                company=contact.company,
+                contact=contact,
+                email_type='campaign',
+                template=campaign.template,
+                reply_to=campaign.reply_to_email or None,
+                smtp_connection=connection,
+                log_owner=recipient,
+            )
+        except Exception as e:
+            success, message = False, str(e)
+
+        # Saved with the rest of the chunk by _save_chunk()
+        now = timezone.now()
+        recipient.updated_at = now
+        if success:
+            recipient.status = 'sent'
+            recipient.sent_at = now
+        else:
+            recipient.status = 'failed'
+            recipient.failed_at = now
+            recipient.error_message = message
+        return success
+
+    def _save_chunk(self, batch, chunk):
+        """Write the chunk's email logs, then its recipients, in two bulk statements,
+        and move the campaign counters forward (no recount per chunk)."""
+        batch.flush()
+        CampaignRecipient.objects.bulk_update(chunk, RECIPIENT_UPDATE_FIELDS)
+        sent = sum(1 for recipient in chunk if recipient.status == 'sent')
+        if sent:
+            EmailCampaign.bump_counters(chunk[0].campaign_id, 'sending', 'sent', count=sent)
+
+    def release_stale_claims(self, campaign, now=None):
+        """Put recipients claimed by a worker that died mid-chunk back in the queue"""
+        now = now or timezone.now()
+        return campaign.recipients.filter(
+            status='sending',
+            updated_at__lt=now - self.claim_timeout,
+        ).update(status='pending', updated_at=now)
+
+    def claim_chunk(self, campaign, batch=None):
+        """
+        Mark the next chunk of pending recipients as 'sending' for this worker and
+        return them. Rows locked by another worker's claim are skipped. With an
+        EmailLogBatch, their pending email logs are written in the same transaction.
+        """
+        with transaction.atomic():
+            ids = list(
+                campaign.recipients.filter(status='pending')
+                .order_by('created_at', 'pk')
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('pk', flat=True)[:self.chunk_size]
+            )
+            self._claimed_at = timezone.now()
+            CampaignRecipient.objects.filter(pk__in=ids, status='pending').update(
+                status='sending', updated_at=self._claimed_at,
+            )
+            chunk = list(
+                CampaignRecipient.objects.filter(pk__in=ids, status='sending')
+                .select_related('contact__company', 'email_log')
+                .order_by('created_at', 'pk')
+            )
+            if batch is not None:
+                self._create_pending_logs(campaign, batch, chunk)
+        return chunk
+
+    def refresh_claim(self, chunk):
+        """
+        Stamp the chunk's claim again once a quarter of the claim timeout has
+        passed since the last stamp, so a chunk that is slow to send (rate
+        limit, slow SMTP) is not released and sent twice.
+        """
+        now = timezone.now()
+        if now - self._claimed_at < self.claim_timeout / 4:
+            return
+        self._claimed_at = now
+        CampaignRecipient.objects.filter(
+            pk__in=[recipient.pk for recipient in chunk], status='sending',
+        ).update(updated_at=now)
+
+    def _create_pending_logs(self, campaign, batch, chunk):
+        """Write the chunk's EmailLog rows as 'pending' and link them to the recipients.
+        A recipient released from a dead worker's claim keeps its pending row."""
+        owned_logs = []
+        for recipient in chunk:
+            if recipient.email_log is not None and recipient.email_log.status == 'pending':
+                owned_logs.append((recipient, recipient.email_log))
+                continue
+            contact = recipient.contact
+            try:
+                subject, body_html, body_text = self.render(campaign, contact)
+            except Exception:
+                continue  # The send fails the same way and records the error
+            if contact.company is None:
+                continue
+            owned_logs.append((recipient, EmailLog(
+                company=contact.company,
+                contact=contact,
+                email_type='campaign',
+                template_used=campaign.template,
+                from_email=self._sender(campaign),
+                to_email=contact.email,
+                subject=subject,
+                body_html=body_html,
+                body_text=body_text,
+            )))
+        batch.create_pending(owned_logs)
+        CampaignRecipient.objects.bulk_update([recipient for recipient, _ in owned_logs], ['email_log'])
+
+    def process_campaign(self, campaign, max_chunks=None):
+        """
+        Send pending recipients of a 'sending' campaign chunk by chunk.
+
+        Stops when the campaign is paused/cancelled, when `max_chunks` chunks
+        were sent, or when nothing is left - in which case the campaign is
+        marked 'sent'. Returns a summary including the campaign progress.
+        """
+        sent = failed = chunks = 0
+        self.release_stale_claims(campaign)
+
+        with self.email_service.smtp_pool(), self.email_service.batched_logging() as batch:
+            # Pooled: one open connection per sender for the whole campaign
+            connection = self.email_service._get_smtp_connection_for_sender(self._sender(campaign))
+
+            while max_chunks is None or chunks < max_chunks:
+                campaign.refresh_from_db(fields=['status'])
+                if campaign.status != 'sending':
+                    break
+                chunk = self.claim_chunk(campaign, batch)
+                if not chunk:
+                    break
+                for recipient in chunk:
+                    if self._send_recipient(campaign, recipient, connection):
+                        sent += 1
+                    else:
+                        failed += 1
+                    self.refresh_claim(chunk)
+                with transaction.atomic():
+                    self._save_chunk(batch, chunk)
+                chunks += 1
+                logger.info(f"Campaign {campaign.id}: chunk {chunks} done ({sent} sent, {failed} failed so far)")
+
+        unsent = campaign.recipients.filter(status__in=('pending', 'sending'))
+        if campaign.status == 'sending' and not unsent.exists():
+            campaign.update_analytics()
+            # Conditional, so a pause that raced the last chunk is not overwritten
+            EmailCampaign.objects.filter(pk=campaign.pk, status='sending').update(
+                status='sent', updated_at=timezone.now()
+            )
+            campaign.refresh_from_db(fields=['status'])
+
+        return {
+            'campaign_id': str(campaign.id),
+            'sent_count': sent,
+            'failed_count': failed,
+            'chunks': chunks,
+            'status': campaign.status,
+            'progress': self.progress(campaign),
+        }
+
+    def process_queue(self, max_chunks=None, campaign_ids=None):
+        """Process every campaign in 'sending' status. Returns one summary per campaign."""
+        campaigns = EmailCampaign.objects.filter(status='sending').select_related('template')
+        if campaign_ids:
+            campaigns = campaigns.filter(id__in=campaign_ids)
+
+        results = []
+        # Campaigns from the same sender share one connection for the whole run
+        with self.email_service.smtp_pool():
+            for campaign in campaigns.order_by('actual_send_date', 'created_at'):
+                try:
+                    results.append(self.process_campaign(campaign, max_chunks=max_chunks))
+                except Exception as e:
+                    logger.error(f"Error processing campaign {campaign.id}: {e}", exc_info=True)
+        return results
@@ -0,0 +1,203 @@
+"""
+Dashboard Snapshot Cache for BMAsia CRM
+
+Serves the /dashboard/stats/ payload from a cache instead of recomputing it on
+every page load. Snapshots are keyed by (billing entity, scope) where the scope
+is the role for roles that see shared data (Admin, Finance) and the user for
+roles whose numbers are personal (Sales, Tech, Music).
+
+Invalidation is generation based: every billing entity has a generation
+counter, and the "all entities" view has its own. post_save/post_delete
+receivers in crm_app/signals.py bump the counters for the entity the changed
+row belongs to (plus the "all entities" counter), so only the snapshots that
+can actually be affected go stale.
+
+Stale-while-revalidate:
+    - fresh (same generation, younger than DASHBOARD_CACHE_TTL)  -> served as a hit
+    - stale (older generation or older than the TTL), but younger than
+      DASHBOARD_CACHE_STALE_TTL -> served immediately, rebuilt in the background
+    - missing / too old -> rebuilt synchronously (miss)
+
+Hit / stale / miss counters live in the same cache so they aggregate across
+workers when Redis is configured.
+
+Usage:
+    from crm_app.services.dashboard_snapshot_service import DashboardSnapshotService
+
+    stats, cache_state = DashboardSnapshotService().get_stats(request.user, billing_entity)
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+ALL_ENTITIES = '*'
+PERSONAL_ROLES = ('Sales', 'Tech', 'Music')
+METRIC_NAMES = ('hit', 'stale', 'miss', 'refresh', 'invalidation')
+
+# Seconds a rebuild lock is held, so concurrent stale reads trigger a single rebuild
+REFRESH_LOCK_TIMEOUT = 60
+
+
+class DashboardSnapshotService:
+    """
+    Cached, incrementally invalidated dashboard stats snapshots.
+    """
+
+    KEY_PREFIX = 'dashboard'
+
+    def __init__(self, stats_service=None):
+        from crm_app.services.dashboard_stats_service import DashboardStatsService
+        self.cache = caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+        self.fresh_ttl = getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+        self.stale_ttl = max(getattr(settings, 'DASHBOARD_CACHE_STALE_TTL', 3600), self.fresh_ttl)
+        self.background_refresh = getattr(settings, 'DASHBOARD_CACHE_BACKGROUND_REFRESH', True)
+        self.stats_service = stats_service or DashboardStatsService()
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _entity_slug(billing_entity):
+        # Billing entity names contain spaces/punctuation, which are not portable cache key chars
+        return slugify(billing_entity) if billing_entity and billing_entity != ALL_ENTITIES else 'all'
+
+    def _generation_key(self, billing_entity):
+        return f'{self.KEY_PREFIX}:gen:{self._entity_slug(billing_entity)}'
+
+    def _metric_key(self, name):
+        return f'{self.KEY_PREFIX}:metrics:{name}'
+
+    @staticmethod
+    def scope_for(user):
+        """Cache scope: per user for personal roles, shared per role otherwise."""
+        role = getattr(user, 'role', '') or ''
+        if role in PERSONAL_ROLES:
+            return f'user:{user.pk}'
+        return f'role:{role}'
+
+    def snapshot_key(self, user, billing_entity=''):
+        return f'{self.KEY_PREFIX}:snapshot:{self._entity_slug(billing_entity)}:{self.scope_for(user)}'
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _incr(self, key, delta=1):
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # Key missing (first use or evicted): create it, then retry once
+            if not self.cache.add(key, delta, timeout=None):
+                self.cache.incr(key, delta)
+
+    def record(self, name):
+        try:
+            self._incr(self._metric_key(name))
+        except Exception as e:
+            logger.warning(f"Dashboard cache metric '{name}' not recorded: {e}")
+
+    def metrics(self):
+        """Return hit/stale/miss/refresh/invalidation counters and the hit ratio."""
+        values = self.cache.get_many([self._metric_key(name) for name in METRIC_NAMES])
+        counters = {name: values.get(self._metric_key(name), 0) for name in METRIC_NAMES}
+        served = counters['hit'] + counters['stale'] + counters['miss']
+        counters['hit_ratio'] = round((counters['hit'] + counters['stale']) / served, 4) if served else 0.0
+        return counters
+
+    def reset_metrics(self):
+        self.cache.delete_many([self._metric_key(name) for name in METRIC_NAMES])
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self, billing_entities=None):
+        """
+        Mark snapshots stale for the given billing entities.
+
+        The "all entities" snapshots are always invalidated. Passing None
+        (entity unknown, e.g. the company was deleted) invalidates every entity.
+        """
+        from crm_app.models import Company
+        if billing_entities is None:
+            billing_entities = [value for value, _label in Company.BILLING_ENTITY_CHOICES]
+        entities = {entity for entity in billing_entities if entity}
+        entities.add(ALL_ENTITIES)
+        for entity in entities:
+            self._incr(self._generation_key(entity))
+        self.record('invalidation')
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def _build(self, user, billing_entity, generation):
+        stats = self.stats_service.build_stats(user, billing_entity)
+        snapshot = {'generation': generation, 'built_at': time.time(), 'stats': stats}
+        self.cache.set(self.snapshot_key(user, billing_entity), snapshot, timeout=self.stale_ttl)
+        return stats
+
+    def _refresh(self, user, billing_entity, generation, lock_key):
+        try:
+            self._build(user, billing_entity, generation)
+            self.record('refresh')
+        except Exception as e:
+            logger.error(f"Dashboard snapshot refresh failed for {self.snapshot_key(user, billing_entity)}: {e}")
+        finally:
+            self.cache.delete(lock_key)
+
+    def _refresh_in_background(self, user, billing_entity, generation, lock_key):
+        def run():
+            try:
+                self._refresh(user, billing_entity, generation, lock_key)
+            finally:
+                # Background threads get their own DB connection; release it
+                connection.close()
+
+        threading.Thread(target=run, name='dashboard-snapshot-refresh', daemon=True).start()
+
+    def get_stats(self, user, billing_entity=''):
+        """
+        Return (stats, cache_state) where cache_state is 'hit', 'stale' or 'miss'.
+        """
+        generation_key = self._generation_key(billing_entity)
+        snapshot_key = self.snapshot_key(user, billing_entity)
+        cached = self.cache.get_many([generation_key, snapshot_key])
+        generation = cached.get(generation_key, 0)
+        snapshot = cached.get(snapshot_key)
+
+        if snapshot is None:
+            self.record('miss')
+            return self._build(user, billing_entity, generation), 'miss'
+
+        age = time.time() - snapshot['built_at']
+        if snapshot['generation'] == generation and age < self.fresh_ttl:
+            self.record('hit')
+            return snapshot['stats'], 'hit'
+
+        # Stale: serve what we have and rebuild once (the lock stops a stampede)
+        self.record('stale')
+        lock_key = f'{snapshot_key}:refreshing'
+        if self.cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+            if self.background_refresh:
+                self._refresh_in_background(user, billing_entity, generation, lock_key)
+            else:
+                self._refresh(user, billing_entity, generation, lock_key)
+        return snapshot['stats'], 'stale'
+
+
+def invalidate_dashboard_snapshots(billing_entities=None):
+    """Signal-friendly wrapper around DashboardSnapshotService.invalidate()."""
+    try:
+        DashboardSnapshotService().invalidate(billing_entities)
+    except Exception as e:
+        logger.error(f"Error invalidating dashboard snapshots: {e}")
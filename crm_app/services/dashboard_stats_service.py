@@ -0,0 +1,350 @@
+"""
+Dashboard Statistics Service for BMAsia CRM
+
+Builds the payload for DashboardViewSet.stats (see DashboardStatsSerializer).
+
+Every counter, sum, pipeline-stage breakdown and the 6-month new/renewal/churn
+trend is computed as a conditional database aggregate (Count/Sum with filter=,
+TruncMonth grouping), so the endpoint issues a constant number of queries no
+matter how many companies, contracts, invoices or tasks exist.
+
+Query budget (independent of row counts):
+    1. companies count
+    2. opportunities aggregate (totals, stages, monthly, previous month)
+    3. contracts aggregate (totals, renewals, monthly + previous month revenue)
+    4. tasks aggregate (overdue)
+    5. invoices aggregate (overdue count + amount)
+    6. revenue trend: contracts started per month, split new / renewal
+    7. churn: contracts ended per month without a successor
+
+Usage:
+    from crm_app.services.dashboard_stats_service import DashboardStatsService
+
+    stats = DashboardStatsService().build_stats(request.user, billing_entity='')
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum, Count, Case, When, Value, F, Exists, OuterRef, CharField
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+PIPELINE_STAGES = ['Contacted', 'Quotation Sent', 'Contract Sent', 'Won', 'Lost']
+
+# Opportunity stage -> legacy funnel counter key
+STAGE_COUNT_KEYS = {
+    'Contacted': 'contacted_count',
+    'Quotation Sent': 'quotation_count',
+    'Contract Sent': 'contract_count',
+    'Won': 'won_count',
+    'Lost': 'lost_count',
+}
+
+TREND_MONTHS = 6
+RENEWAL_WINDOW_DAYS = 60
+
+
+class DashboardStatsService:
+    """
+    Service computing dashboard statistics with set-based aggregates.
+    """
+
+    def __init__(self):
+        # Lazy imports to avoid circular dependencies
+        from crm_app.models import Company, Contract, Invoice, Opportunity, Task
+        self.Company = Company
+        self.Contract = Contract
+        self.Invoice = Invoice
+        self.Opportunity = Opportunity
+        self.Task = Task
+
+    # ------------------------------------------------------------------
+    # Scoping
+    # ------------------------------------------------------------------
+
+    def get_scoped_querysets(self, user, billing_entity=''):
+        """
+        Return the base querysets for a user, filtered by billing entity and role.
+
+        Mirrors the visibility rules of the dashboard: Sales see their own
+        opportunities, Tech/Music see their own or their department's tasks.
+        """
+        companies = self.Company.objects.filter(is_active=True)
+        opportunities = self.Opportunity.objects.filter(is_active=True)
+        contracts = self.Contract.objects.filter(is_active=True)
+        tasks = self.Task.objects.all()
+        invoices = self.Invoice.objects.all()
+
+        if billing_entity:
+            companies = companies.filter(billing_entity=billing_entity)
+            opportunities = opportunities.filter(company__billing_entity=billing_entity)
+            contracts = contracts.filter(company__billing_entity=billing_entity)
+            tasks = tasks.filter(company__billing_entity=billing_entity)
+            invoices = invoices.filter(company__billing_entity=billing_entity)
+
+        role = getattr(user, 'role', None)
+        if role == 'Sales':
+            opportunities = opportunities.filter(owner=user)
+            companies = companies.filter(opportunities__owner=user).distinct()
+        elif role in ['Tech', 'Music']:
+            tasks = tasks.filter(Q(assigned_to=user) | Q(department=user.role))
+            companies = companies.filter(tasks__in=tasks).distinct()
+
+        return {
+            'companies': companies,
+            'opportunities': opportunities,
+            'contracts': contracts,
+            'tasks': tasks,
+            'invoices': invoices,
+        }
+
+    def annotate_lifecycle(self, queryset):
+        """
+        Annotate contracts with `lifecycle` ('new', 'renewal', 'addon', 'churn').
+
+        SQL equivalent of the legacy per-contract classification: an explicit
+        lifecycle_type wins, then a renewed_from link, then any earlier contract
+        for the same company counts as a renewal; everything else is new.
+        """
+        earlier_contract = self.Contract.objects.filter(
+            company=OuterRef('company'),
+            start_date__lt=OuterRef('start_date'),
+        )
+        return queryset.annotate(
+            lifecycle=Case(
+                When(~Q(lifecycle_type='') & Q(lifecycle_type__isnull=False), then=F('lifecycle_type')),
+                When(renewed_from__isnull=False, then=Value('renewal')),
+                When(Exists(earlier_contract), then=Value('renewal')),
+                default=Value('new'),
+                output_field=CharField(),
+            )
+        )
+
+    def churned_contracts(self, billing_entity=''):
+        """Expired/cancelled contracts (any is_active) that no contract renewed."""
+        successor = self.Contract.objects.filter(renewed_from=OuterRef('pk'))
+        queryset = self.Contract.objects.filter(
+            status__in=['Expired', 'Cancelled'],
+        ).filter(~Exists(successor))
+        if billing_entity:
+            queryset = queryset.filter(company__billing_entity=billing_entity)
+        return queryset
+
+    # ------------------------------------------------------------------
+    # Date helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _month_start(dt):
+        return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _next_month(dt):
+        return (dt + timedelta(days=32)).replace(day=1)
+
+    def trend_months(self, now):
+        """
+        Month windows for the revenue trend, oldest first.
+
+        Steps back in 30-day increments from `now` exactly like the original
+        dashboard so the month labels stay identical.
+        """
+        months = []
+        for i in range(TREND_MONTHS - 1, -1, -1):
+            m_start = self._month_start((now - timedelta(days=i * 30)).replace(day=1))
+            months.append((m_start, self._next_month(m_start)))
+        return months
+
+    # ------------------------------------------------------------------
+    # Aggregates
+    # ------------------------------------------------------------------
+
+    def _opportunity_stats(self, opportunities, current_month, prev_month_start):
+        current_month_date = current_month.date()
+        prev_month_date = prev_month_start.date()
+        aggregates = {
+            'total': Count('id'),
+            'total_value': Sum('expected_value'),
+            'monthly_new': Count('id', filter=Q(created_at__gte=current_month)),
+            'monthly_closed': Count('id', filter=Q(stage='Won', actual_close_date__gte=current_month_date)),
+            'prev_won': Count('id', filter=Q(
+                stage='Won', actual_close_date__gte=prev_month_date,
+                actual_close_date__lt=current_month_date,
+            )),
+            'prev_lost': Count('id', filter=Q(
+                stage='Lost', actual_close_date__gte=prev_month_date,
+                actual_close_date__lt=current_month_date,
+            )),
+        }
+        for index, stage_name in enumerate(PIPELINE_STAGES):
+            aggregates[f'stage_{index}_count'] = Count('id', filter=Q(stage=stage_name))
+            aggregates[f'stage_{index}_value'] = Sum('expected_value', filter=Q(stage=stage_name))
+        return opportunities.order_by().aggregate(**aggregates)
+
+    def _contract_stats(self, contracts, today, current_month, prev_month_start):
+        current_month_date = current_month.date()
+        expiring = Q(end_date__gte=today, end_date__lte=today + timedelta(days=RENEWAL_WINDOW_DAYS))
+        monthly = Q(start_date__gte=current_month_date)
+        return self.annotate_lifecycle(contracts).order_by().aggregate(
+            total=Count('id'),
+            total_value=Sum('value'),
+            expiring_count=Count('id', filter=expiring),
+            expiring_value=Sum('value', filter=expiring),
+            monthly_revenue=Sum('value', filter=monthly),
+            monthly_new=Sum('value', filter=monthly & Q(lifecycle='new')),
+            monthly_renewal=Sum('value', filter=monthly & Q(lifecycle__in=['renewal', 'addon'])),
+            previous_month_revenue=Sum('value', filter=Q(
+                start_date__gte=prev_month_start.date(), start_date__lt=current_month_date,
+            )),
+        )
+
+    def _revenue_by_start_month(self, contracts, first_month, end_month):
+        """{month_date: (new, renewal)} for contracts starting in [first_month, end_month)."""
+        rows = (
+            self.annotate_lifecycle(contracts)
+            .filter(start_date__gte=first_month.date(), start_date__lt=end_month.date())
+            .annotate(month=TruncMonth('start_date'))
+            .order_by()
+            .values('month')
+            .annotate(
+                new=Sum('value', filter=Q(lifecycle='new')),
+                renewal=Sum('value', filter=~Q(lifecycle='new')),
+            )
+        )
+        return {
+            row['month']: (float(row['new'] or 0), float(row['renewal'] or 0))
+            for row in rows
+        }
+
+    def _churn_by_end_month(self, billing_entity, first_month, end_month):
+        """{month_date: (value, count)} for churned contracts ending in [first_month, end_month)."""
+        rows = (
+            self.churned_contracts(billing_entity)
+            .filter(end_date__gte=first_month.date(), end_date__lt=end_month.date())
+            .annotate(month=TruncMonth('end_date'))
+            .order_by()
+            .values('month')
+            .annotate(value=Sum('value'), count=Count('id'))
+        )
+        return {
+            row['month']: (float(row['value'] or 0), row['count'])
+            for row in rows
+        }
+
+    @staticmethod
+    def _month_key(month_start):
+        return month_start.date()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def build_stats(self, user, billing_entity=''):
+        """
+        Build the DashboardStatsSerializer payload for a user.
+
+        Args:
+            user: Requesting user (role drives visibility)
+            billing_entity: Optional billing entity filter
+
+        Returns:
+            Dict matching DashboardStatsSerializer
+        """
+        qs = self.get_scoped_querysets(user, billing_entity)
+
+        now = timezone.now()
+        today = now.date()
+        current_month = self._month_start(now)
+        prev_month_start = (current_month - timedelta(days=1)).replace(day=1)
+
+        opp = self._opportunity_stats(qs['opportunities'], current_month, prev_month_start)
+        con = self._contract_stats(qs['contracts'], today, current_month, prev_month_start)
+        task = qs['tasks'].order_by().aggregate(
+            overdue=Count('id', filter=Q(due_date__lt=now) & ~Q(status='Done')),
+        )
+        inv = qs['invoices'].order_by().aggregate(
+            overdue=Count('id', filter=Q(due_date__lt=today) & ~Q(status='Paid')),
+            overdue_amount=Sum('total_amount', filter=Q(due_date__lt=today) & ~Q(status='Paid')),
+        )
+
+        stats = {
+            'total_companies': qs['companies'].count(),
+            'active_opportunities': opp['total'],
+            'opportunities_value': opp['total_value'] or 0,
+            'active_contracts': con['total'],
+            'contracts_value': con['total_value'] or 0,
+            'overdue_tasks': task['overdue'],
+            'overdue_invoices': inv['overdue'],
+            'pending_renewals': con['expiring_count'],
+        }
+
+        # Sales funnel stats
+        for index, stage_name in enumerate(PIPELINE_STAGES):
+            stats[STAGE_COUNT_KEYS[stage_name]] = opp[f'stage_{index}_count']
+
+        # Monthly stats
+        stats.update({
+            'monthly_revenue': con['monthly_revenue'] or 0,
+            'monthly_new_opportunities': opp['monthly_new'],
+            'monthly_closed_deals': opp['monthly_closed'],
+        })
+
+        # --- Enhanced stats for Business Health Snapshot ---
+        won = stats['won_count']
+        lost = stats['lost_count']
+        stats['win_rate'] = round((won / (won + lost) * 100), 1) if (won + lost) > 0 else 0
+        stats['previous_month_revenue'] = con['previous_month_revenue'] or 0
+
+        prev_won = opp['prev_won']
+        prev_lost = opp['prev_lost']
+        stats['previous_win_rate'] = round(
+            (prev_won / (prev_won + prev_lost) * 100), 1
+        ) if (prev_won + prev_lost) > 0 else 0
+
+        stats['total_overdue_amount'] = float(inv['overdue_amount'] or 0)
+        stats['pending_renewal_value'] = float(con['expiring_value'] or 0)
+
+        stats['pipeline_stages'] = {
+            stage_name: {
+                'count': opp[f'stage_{index}_count'],
+                'value': float(opp[f'stage_{index}_value'] or 0),
+            }
+            for index, stage_name in enumerate(PIPELINE_STAGES)
+        }
+
+        # --- Revenue trend (last 6 months) with New / Renewal / Churn breakdown ---
+        months = self.trend_months(now)
+        first_month = months[0][0]
+        end_month = max(months[-1][1], self._next_month(current_month))
+        started = self._revenue_by_start_month(qs['contracts'], first_month, end_month)
+        churned = self._churn_by_end_month(billing_entity, first_month, end_month)
+
+        revenue_trend = []
+        for m_start, _m_next in months:
+            m_new, m_renewal = started.get(self._month_key(m_start), (0.0, 0.0))
+            m_churn, _count = churned.get(self._month_key(m_start), (0.0, 0))
+            revenue_trend.append({
+                'month': m_start.strftime('%b'),
+                'revenue': m_new + m_renewal,
+                'new_revenue': m_new,
+                'renewal_revenue': m_renewal,
+                'churned_revenue': m_churn,
+                'net_revenue': m_new + m_renewal - m_churn,
+            })
+        stats['revenue_trend'] = revenue_trend
+
+        # --- Revenue breakdown (current month) ---
+        new_revenue = con['monthly_new'] or Decimal('0')
+        renewal_revenue = con['monthly_renewal'] or Decimal('0')
+        churned_revenue, churned_count = churned.get(self._month_key(current_month), (0.0, 0))
+        stats.update({
+            'new_revenue': float(new_revenue),
+            'renewal_revenue': float(renewal_revenue),
+            'churned_revenue': churned_revenue,
+            'churned_count': churned_count,
+            'net_revenue': float(new_revenue + renewal_revenue) - churned_revenue,
+        })
+
+        return stats
@@ -0,0 +1,152 @@
+"""
+Batched EmailLog writes for BMAsia CRM
+
+A plain send_email() call writes its EmailLog row several times: create
+(pending), then sent/failed status, the "Email sent" Note and the attachment
+links. For batch senders that is several round trips per recipient. Inside
+EmailService.batched_logging() the log rows are built in memory instead and
+written together when the batch is flushed:
+
+    from crm_app.services.email_service import email_service
+
+    with email_service.batched_logging() as batch:
+        for contact in contacts:
+            email_service.send_email(...)   # no EmailLog writes yet
+        batch.flush()                       # or let the block exit flush
+
+A flush writes all finished logs with one bulk_create (their final status,
+sent_at and Message-ID included), the Notes with one bulk_create and the
+attachment links with one bulk_create on the through table.
+
+The id and tracking_token of a log are assigned before the message is sent, so
+the X-BMAsia-Email-ID header and the tracking pixel reference the row that the
+flush writes, and the stored Message-ID is the one the message went out with
+(ReplyDetectionService matches replies on it).
+
+Objects passed to send_email(log_owner=...) get their email_log set at flush
+time; the caller saves them afterwards. Logs are flushed automatically every
+EMAIL_LOG_BATCH_SIZE entries, so callers that do not flush per chunk still
+keep the unwritten window small.
+
+Senders that cannot afford an unwritten window (campaign chunks are sent
+outside any transaction) write the rows first, as 'pending', with their
+tracking token and Message-ID:
+
+    batch.create_pending([(recipient, EmailLog(...)) for recipient in chunk])
+
+A send whose log_owner has such a row reuses it, so opens, clicks and replies
+match a row that exists even if the worker dies before the flush; the flush
+updates those rows (status, sent_at, Message-ID, error) with one bulk_update.
+"""
+
+import logging
+import secrets
+
+from django.conf import settings
+from django.core.mail.message import make_msgid
+from django.core.mail.utils import DNS_NAME
+from django.db import transaction
+
+from crm_app.models import EmailLog, Note
+
+logger = logging.getLogger(__name__)
+
+# EmailLog fields a flush writes to rows created up front by create_pending()
+PENDING_LOG_UPDATE_FIELDS = ['status', 'sent_at', 'message_id', 'error_message']
+
+
+class EmailLogBatch:
+    """
+    EmailLog rows (plus their Notes and attachment links) waiting to be written.
+    """
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size or getattr(settings, 'EMAIL_LOG_BATCH_SIZE', 50)
+        self._entries = []
+        self._pending = {}      # log_owner -> EmailLog row written by create_pending()
+        self.stats = {'logs': 0, 'flushes': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _prepare(email_log):
+        if email_log.company_id is None:
+            # bulk_create would fail the whole batch - fail this send only, like create() does
+            raise ValueError('EmailLog requires a company')
+        if not email_log.tracking_token:
+            email_log.tracking_token = secrets.token_urlsafe(32)
+        if not email_log.normalized_subject:
+            email_log.normalized_subject = EmailLog.normalize_subject(email_log.subject)
+
+    def create_pending(self, owned_logs):
+        """
+        Write 'pending' EmailLog rows ahead of their sends with one bulk_create.
+        `owned_logs` are (log_owner, EmailLog) pairs; saved logs (a pending row
+        from an earlier, interrupted attempt) are reused as they are. Sets each
+        owner's email_log; the caller saves the owners. Returns the new rows.
+        """
+        new_logs = []
+        for log_owner, email_log in owned_logs:
+            if email_log._state.adding:
+                self._prepare(email_log)
+                email_log.status = 'pending'
+                email_log.message_id = email_log.message_id or make_msgid(domain=DNS_NAME)
+                new_logs.append(email_log)
+            log_owner.email_log = email_log
+            self._pending[log_owner] = email_log
+        return EmailLog.objects.bulk_create(new_logs)
+
+    def add(self, email_log, attachments=None, log_owner=None):
+        """
+        Register an unsaved EmailLog. Assigns its tracking token so the caller
+        can build the message before the row exists; if create_pending() wrote
+        a row for `log_owner`, the log takes over its id, tracking token and
+        Message-ID and the flush updates that row.
+        """
+        self._prepare(email_log)
+        pending = self._pending.pop(log_owner, None) if log_owner is not None else None
+        if pending is not None:
+            email_log.id = pending.id
+            email_log.tracking_token = pending.tracking_token
+            email_log.message_id = pending.message_id
+            email_log._state.adding = False
+        self._entries.append((email_log, list(attachments or []), log_owner))
+        return email_log
+
+    def flush_if_full(self):
+        if len(self._entries) >= self.flush_size:
+            self.flush()
+
+    @transaction.atomic
+    def flush(self):
+        """Write every pending log, its Note and attachment links. Returns the logs written."""
+        if not self._entries:
+            return []
+        entries, self._entries = self._entries, []
+
+        logs = [email_log for email_log, _, _ in entries]
+        pending = [email_log for email_log in logs if not email_log._state.adding]
+        EmailLog.objects.bulk_create([email_log for email_log in logs if email_log._state.adding])
+        if pending:
+            EmailLog.objects.bulk_update(pending, PENDING_LOG_UPDATE_FIELDS)
+
+        Note.objects.bulk_create([
+            email_log.build_sent_note() for email_log in logs if email_log.status == 'sent'
+        ])
+
+        through = EmailLog.attachments.through
+        through.objects.bulk_create([
+            through(emaillog_id=email_log.pk, documentattachment_id=attachment.pk)
+            for email_log, attachments, _ in entries if email_log.status == 'sent'
+            for attachment in attachments
+        ])
+
+        for email_log, _, log_owner in entries:
+            if log_owner is not None:
+                log_owner.email_log = email_log
+
+        self.stats['logs'] += len(logs)
+        self.stats['flushes'] += 1
+        logger.debug(f"Flushed {len(logs)} email logs")
+        return logs
@@ -5,11 +5,15 @@ Handles all email sending functionality including templates, campaigns, and trac
 
 import logging
 import os
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import pytz
 
 from django.core.mail import EmailMultiAlternatives
+from django.core.mail.message import make_msgid
+from django.core.mail.utils import DNS_NAME
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
@@ -21,6 +25,7 @@ from crm_app.models import (
     Contact, Company, Contract, Invoice, Quote, DocumentAttachment,
     EmailSequence, SequenceStep, SequenceEnrollment, SequenceStepExecution
 )
+from crm_app.services.click_tracking import rewrite_links
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +37,13 @@ class EmailService:
         self.timezone = pytz.timezone(settings.BUSINESS_TIMEZONE)
         self.business_hours_start = settings.BUSINESS_HOURS_START
         self.business_hours_end = settings.BUSINESS_HOURS_END
+        # The module-level email_service is shared between request threads
+        self._local = threading.local()
     
-    def is_business_hours(self, target_timezone: str = None) -> bool:
-        """Check if current time is within business hours"""
+    def is_business_hours(self, target_timezone: str = None, now: datetime = None) -> bool:
+        """Check if current time (or `now`) is within business hours"""
         tz = pytz.timezone(target_timezone) if target_timezone else self.timezone
-        now = datetime.now(tz)
+        now = now.astimezone(tz) if now else datetime.now(tz)
         
         # Skip weekends
         if now.weekday() in [5, 6]:  # Saturday, Sunday
@@ -90,19 +97,60 @@ class EmailService:
         # Quarterly check-ins and manual sequences use admin email
         return settings.ADMIN_EMAIL  # norbert@bmasiamusic.com
 
-    def _get_smtp_connection_for_sender(self, from_email: str):
-        """Get SMTP connection for a specific sender email.
+    @contextmanager
+    def smtp_pool(self):
+        """Reuse one SMTP connection per sender for every send inside the block.
 
-        Looks up User by smtp_email and creates a connection with their credentials.
-        Falls back to default SMTP if no matching user found.
+        Nested blocks share the outermost pool; connections are closed when it exits.
+        See crm_app/services/smtp_pool.py.
+        """
+        from crm_app.services.smtp_pool import SMTPConnectionPool
 
-        Args:
-            from_email: The email address to send from
+        pool = getattr(self._local, 'smtp_pool', None)
+        if pool is not None:
+            yield pool
+            return
+        pool = self._local.smtp_pool = SMTPConnectionPool()
+        try:
+            yield pool
+        finally:
+            self._local.smtp_pool = None
+            pool.close()
+            logger.info(f"SMTP pool closed: {pool.stats}")
 
-        Returns:
-            EmailBackend connection or None to use default
+    def _active_smtp_pool(self):
+        return getattr(self._local, 'smtp_pool', None)
+
+    @contextmanager
+    def batched_logging(self):
+        """Defer the EmailLog writes of every send inside the block to bulk flushes.
+
+        Nested blocks share the outermost batch; it is flushed when that exits.
+        See crm_app/services/email_log_batch.py.
+        """
+        from crm_app.services.email_log_batch import EmailLogBatch
+
+        batch = getattr(self._local, 'log_batch', None)
+        if batch is not None:
+            yield batch
+            return
+        batch = self._local.log_batch = EmailLogBatch()
+        try:
+            yield batch
+        finally:
+            self._local.log_batch = None
+            batch.flush()
+            logger.info(f"Email log batch closed: {batch.stats}")
+
+    def _active_log_batch(self):
+        return getattr(self._local, 'log_batch', None)
+
+    def _smtp_credentials_for_sender(self, from_email: str):
+        """get_connection() kwargs for a sender's own SMTP credentials, or None.
+
+        Looks up User by smtp_email. Returns None when no matching user is found,
+        so the caller falls back to the default SMTP settings.
         """
-        from django.core.mail import get_connection
         from crm_app.models import User
 
         # Extract email address if it includes display name
@@ -117,15 +165,15 @@ class EmailService:
 
             if user and user.smtp_password:
                 logger.info(f"Using SMTP credentials for {clean_email}")
-                return get_connection(
-                    backend='django.core.mail.backends.smtp.EmailBackend',
-                    host='smtp.gmail.com',
-                    port=587,
-                    username=user.smtp_email,
-                    password=user.smtp_password,
-                    use_tls=True,
-                    fail_silently=False
-                )
+                return {
+                    'backend': 'django.core.mail.backends.smtp.EmailBackend',
+                    'host': 'smtp.gmail.com',
+                    'port': 587,
+                    'username': user.smtp_email,
+                    'password': user.smtp_password,
+                    'use_tls': True,
+                    'fail_silently': False,
+                }
             else:
                 logger.info(f"No SMTP credentials found for {clean_email}, using default")
                 return None
@@ -134,6 +182,27 @@ class EmailService:
             logger.warning(f"Error getting SMTP connection for {clean_email}: {e}")
             return None
 
+    def _get_smtp_connection_for_sender(self, from_email: str):
+        """Get SMTP connection for a specific sender email.
+
+        Inside smtp_pool() the connection is pooled and stays open across sends.
+        Falls back to default SMTP (returns None) if the sender has no credentials.
+
+        Args:
+            from_email: The email address to send from
+
+        Returns:
+            EmailBackend connection or None to use default
+        """
+        from django.core.mail import get_connection
+
+        pool = self._active_smtp_pool()
+        if pool is not None:
+            return pool.sender_connection(from_email, self._smtp_credentials_for_sender)
+
+        credentials = self._smtp_credentials_for_sender(from_email)
+        return get_connection(**credentials) if credentials else None
+
     def _inject_tracking_pixel(self, body_html: str, tracking_token: str) -> str:
         """Inject a 1x1 tracking pixel at the end of the HTML email body."""
         import re
@@ -147,6 +216,46 @@ class EmailService:
 
         return body_html
 
+    def _build_message(self, email_log, body_html, reply_to=None, attachments=None, smtp_connection=None):
+        """EmailMultiAlternatives for a logged email: tracked links and pixel, tracking
+        headers and a fixed Message-ID. Does not touch the database."""
+        # Rewrite links for click tracking and inject tracking pixel into HTML body
+        if email_log.tracking_token:
+            body_html = rewrite_links(body_html, email_log.tracking_token)
+            body_html = self._inject_tracking_pixel(body_html, email_log.tracking_token)
+
+        # Create email message
+        msg = EmailMultiAlternatives(
+            subject=email_log.subject,
+            body=email_log.body_text,
+            from_email=email_log.from_email,
+            to=[email_log.to_email],
+            cc=email_log.cc_emails.split(',') if email_log.cc_emails else [],
+            reply_to=[reply_to] if reply_to else None,
+            connection=smtp_connection
+        )
+
+        # Add HTML version
+        msg.attach_alternative(body_html, "text/html")
+
+        # Add tracking headers
+        msg.extra_headers['X-BMAsia-Email-ID'] = str(email_log.id)
+        msg.extra_headers['List-Unsubscribe'] = self._get_unsubscribe_url(email_log.contact)
+        # Fixed up front: msg.message() generates a new Message-ID on every call,
+        # and reply matching needs the one the message was sent with (a log
+        # written ahead of the send already has it, see EmailLogBatch.create_pending)
+        msg.extra_headers['Message-ID'] = email_log.message_id or make_msgid(domain=DNS_NAME)
+
+        # Add attachments if provided
+        if attachments:
+            for attachment in attachments:
+                try:
+                    msg.attach_file(attachment.file.path)
+                    logger.info(f"Attached file: {attachment.name}")
+                except Exception as e:
+                    logger.warning(f"Failed to attach file {attachment.name}: {e}")
+        return msg
+
     def send_email(
         self,
         to_email: str,
@@ -163,20 +272,26 @@ class EmailService:
         invoice: Invoice = None,
         reply_to: str = None,
         attachments: List[DocumentAttachment] = None,
-        smtp_connection = None
+        smtp_connection = None,
+        log_owner = None
     ) -> Tuple[bool, str]:
         """
         Send an email and log it
         Returns: (success: bool, message: str)
 
+        Inside batched_logging() the EmailLog is written by the next batch flush.
+
         Args:
             smtp_connection: Optional custom SMTP connection (for per-user SMTP)
+            log_owner: Optional object with an email_log field (CampaignRecipient,
+                SequenceStepExecution); its email_log is set to the new log entry
+                (the caller saves it, after the flush when batched)
         """
         if not from_email:
             from_email = settings.DEFAULT_FROM_EMAIL
 
         # Create email log entry
-        email_log = EmailLog.objects.create(
+        email_log = EmailLog(
             company=company,
             contact=contact,
             email_type=email_type,
@@ -191,64 +306,52 @@ class EmailService:
             invoice=invoice,
             status='pending'
         )
+        batch = self._active_log_batch()
+        if batch is not None:
+            batch.add(email_log, attachments=attachments, log_owner=log_owner)
+        else:
+            email_log.save()
+            if log_owner is not None:
+                log_owner.email_log = email_log
 
-        try:
-            # Inject tracking pixel into HTML body
-            if email_log.tracking_token:
-                body_html = self._inject_tracking_pixel(body_html, email_log.tracking_token)
+        if smtp_connection is None and self._active_smtp_pool() is not None:
+            smtp_connection = self._active_smtp_pool().default_connection()
 
-            # Create email message
-            msg = EmailMultiAlternatives(
-                subject=subject,
-                body=body_text,
-                from_email=from_email,
-                to=[to_email],
-                cc=cc_emails or [],
-                reply_to=[reply_to] if reply_to else None,
-                connection=smtp_connection
+        try:
+            msg = self._build_message(
+                email_log, body_html, reply_to=reply_to, attachments=attachments,
+                smtp_connection=smtp_connection,
             )
 
-            # Add HTML version
-            msg.attach_alternative(body_html, "text/html")
-            
-            # Add tracking headers
-            msg.extra_headers['X-BMAsia-Email-ID'] = str(email_log.id)
-            msg.extra_headers['List-Unsubscribe'] = self._get_unsubscribe_url(contact)
-            
-            # Add attachments if provided
-            if attachments:
-                for attachment in attachments:
-                    try:
-                        msg.attach_file(attachment.file.path)
-                        logger.info(f"Attached file: {attachment.name}")
-                    except Exception as e:
-                        logger.warning(f"Failed to attach file {attachment.name}: {e}")
-            
             # Send email
             msg.send(fail_silently=False)
 
-            # Capture SMTP Message-ID for reply matching
-            try:
-                smtp_message_id = msg.message()['Message-ID']
-                if smtp_message_id:
-                    email_log.message_id = smtp_message_id
-                    email_log.save(update_fields=['message_id'])
-            except Exception:
-                pass  # Non-critical — reply matching falls back to subject line
-
-            # Mark as sent
-            email_log.mark_as_sent()
-            
-            # Associate attachments with email log
-            if attachments:
-                email_log.attachments.set(attachments)
+            # SMTP Message-ID for reply matching, saved with the sent status
+            email_log.message_id = msg.extra_headers['Message-ID']
+
+            if batch is not None:
+                email_log.status = 'sent'
+                email_log.sent_at = timezone.now()
+                batch.flush_if_full()
+            else:
+                # Mark as sent
+                email_log.mark_as_sent()
+
+                # Associate attachments with email log
+                if attachments:
+                    email_log.attachments.set(attachments)
             
             logger.info(f"Email sent successfully to {to_email} - Type: {email_type}")
             return True, "Email sent successfully"
             
         except Exception as e:
             error_msg = str(e)
-            email_log.mark_as_failed(error_msg)
+            if batch is not None:
+                email_log.status = 'failed'
+                email_log.error_message = error_msg
+                batch.flush_if_full()
+            else:
+                email_log.mark_as_failed(error_msg)
             logger.error(f"Failed to send email to {to_email}: {error_msg}")
             return False, f"Failed to send email: {error_msg}"
     
@@ -328,6 +431,11 @@ class EmailService:
             logger.info("Skipping renewal reminders - outside business hours")
             return {'skipped': 0}
         
+        # One SMTP connection per sender, email logs written in bulk
+        with self.smtp_pool(), self.batched_logging():
+            return self._send_renewal_reminders()
+
+    def _send_renewal_reminders(self) -> Dict[str, int]:
         results = {
             'sent': 0,
             'failed': 0,
@@ -425,6 +533,11 @@ class EmailService:
             logger.info("Skipping payment reminders - outside business hours")
             return {'skipped': 0}
         
+        # One SMTP connection per sender, email logs written in bulk
+        with self.smtp_pool(), self.batched_logging():
+            return self._send_payment_reminders()
+
+    def _send_payment_reminders(self) -> Dict[str, int]:
         results = {
             'sent': 0,
             'failed': 0,
@@ -1947,68 +2060,20 @@ class EmailService:
         Process pending sequence step executions.
         This method is called by the cron job.
 
+        Due steps are filtered by each contact's local business hours, claimed
+        for this worker (several may run at once) and sent on a thread pool;
+        see crm_app/services/sequence_executor.py.
+
         Args:
             max_emails: Maximum number of emails to send in this run
 
         Returns:
-            dict with stats: {'sent': X, 'failed': Y, 'skipped': Z}
+            dict with stats: {'sent': X, 'failed': Y, 'skipped': Z} plus the
+            executor's throughput report (claimed, waiting, seconds, per_second, ...)
         """
-        results = {
-            'sent': 0,
-            'failed': 0,
-            'skipped': 0
-        }
-
-        # Find pending executions
-        pending_executions = SequenceStepExecution.objects.filter(
-            status='scheduled',
-            scheduled_for__lte=timezone.now()
-        ).select_related(
-            'enrollment__contact',
-            'enrollment__sequence',
-            'enrollment__company',
-            'step__email_template'
-        ).order_by('scheduled_for')[:max_emails]
+        from crm_app.services.sequence_executor import SequenceExecutor
 
-        logger.info(f"Found {pending_executions.count()} pending sequence step executions")
-
-        for execution in pending_executions:
-            enrollment = execution.enrollment
-            contact = enrollment.contact
-
-            # Check business hours - skip if outside business hours
-            if not self.is_business_hours():
-                logger.debug(f"Outside business hours, skipping execution {execution.id}")
-                results['skipped'] += 1
-                continue
-
-            # Check enrollment status
-            if enrollment.status != 'active':
-                logger.info(f"Enrollment {enrollment.id} is not active (status: {enrollment.status}), skipping execution")
-                execution.status = 'skipped'
-                execution.save()
-                results['skipped'] += 1
-                continue
-
-            # Check contact preferences
-            if not contact.receives_notifications:
-                logger.info(f"Contact {contact.email} has unsubscribed, marking enrollment as unsubscribed")
-                enrollment.status = 'unsubscribed'
-                enrollment.save()
-                execution.status = 'skipped'
-                execution.save()
-                results['skipped'] += 1
-                continue
-
-            # Execute the step
-            success = self.execute_sequence_step(execution.id)
-            if success:
-                results['sent'] += 1
-            else:
-                results['failed'] += 1
-
-        logger.info(f"Sequence processing complete: {results}")
-        return results
+        return SequenceExecutor(self).run(max_emails=max_emails)
 
     def execute_sequence_step(self, execution_id):
         """
@@ -2079,23 +2144,16 @@ class EmailService:
                 contact=contact,
                 email_type='sequence',
                 template=template,
-                smtp_connection=smtp_connection
+                smtp_connection=smtp_connection,
+                log_owner=execution
             )
 
             if not success:
                 raise Exception(message)
 
-            # Get the email log that was just created
-            email_log = EmailLog.objects.filter(
-                contact=contact,
-                subject=subject,
-                status='sent'
-            ).order_by('-sent_at').first()
-
-            # Update execution
+            # Update execution (send_email set execution.email_log)
             execution.status = 'sent'
             execution.sent_at = timezone.now()
-            execution.email_log = email_log
             execution.save()
 
             # Update enrollment
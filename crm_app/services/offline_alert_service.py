@@ -1,8 +1,19 @@
-"""Offline Alert Service for Soundtrack zones"""
+"""Offline Alert Service for Soundtrack zones
+
+check_and_alert() runs after every sync in a fixed number of queries, whatever
+the fleet size: detection is an anti-join plus one bulk_create, resolution one
+UPDATE, notification eligibility a single filtered query, and the sends share
+one SMTP connection with batched EmailLog writes (one INSERT per
+EMAIL_LOG_BATCH_SIZE emails).
+"""
 import logging
+from collections import defaultdict
+from datetime import timedelta
+
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.html import escape
+from django.db.models import Exists, OuterRef, Q
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +25,33 @@ class OfflineAlertService:
     - First alert: After 4 hours offline
     - Subsequent alerts: Every 24 hours (to avoid spam)
     - Recipients: Contacts with receives_soundtrack_alerts=True
+    - Digest (OFFLINE_ALERT_DIGEST): several due alerts of one company in the
+      same run go out as one email listing all zones; each alert still gets its
+      own notification timestamp, so the cooldown applies per zone
     """
 
     INITIAL_THRESHOLD_HOURS = 4   # First alert after 4 hours
     COOLDOWN_HOURS = 24           # Subsequent alerts every 24 hours
 
+    # Digest text used when no zone_offline_digest EmailTemplate exists
+    DIGEST_SUBJECT = '{{zone_count}} music zones offline at {{company_name}}'
+    DIGEST_BODY_TEXT = (
+        'Hi {{contact_name}},\n\n'
+        'The following music zones at {{company_name}} are offline:\n\n'
+        '{{zone_list}}\n\n'
+        'When several zones go offline together it is usually the venue\'s internet connection. '
+        'Please check it, or reply to this email if you need help.\n\n'
+        'BMAsia Support'
+    )
+    DIGEST_BODY_HTML = (
+        '<p>Hi {{contact_name}},</p>'
+        '<p>The following music zones at {{company_name}} are offline:</p>'
+        '{{zone_list_html}}'
+        '<p>When several zones go offline together it is usually the venue\'s internet connection. '
+        'Please check it, or reply to this email if you need help.</p>'
+        '<p>BMAsia Support</p>'
+    )
+
     def check_and_alert(self):
         """Run after each sync to detect offline zones and send alerts
 
@@ -37,34 +70,27 @@ class OfflineAlertService:
         return alerts_created, notifications_sent
 
     def _update_offline_alerts(self):
-        """Create alerts for newly offline zones"""
-        from crm_app.models import Zone, ZoneOfflineAlert
+        """Create alerts for newly offline zones
 
-        alerts_created = 0
+        One anti-join finds offline zones (alerts enabled at company level) with no
+        open alert; the new alerts are written with one bulk_create.
+        """
+        from crm_app.models import Zone, ZoneOfflineAlert
 
-        # Find offline zones with alerts enabled at company level
-        offline_zones = Zone.objects.filter(
+        now = timezone.now()
+        open_alert = ZoneOfflineAlert.objects.filter(zone=OuterRef('pk'), is_resolved=False)
+        newly_offline = Zone.objects.filter(
             status='offline',
             company__soundtrack_offline_alerts_enabled=True
-        ).select_related('company')
-
-        for zone in offline_zones:
-            # Check if there's already an active (unresolved) alert
-            existing_alert = ZoneOfflineAlert.objects.filter(
-                zone=zone,
-                is_resolved=False
-            ).first()
-
-            if not existing_alert:
-                # Create new alert
-                ZoneOfflineAlert.objects.create(
-                    zone=zone,
-                    detected_at=zone.last_seen_online or timezone.now()
-                )
-                alerts_created += 1
-                logger.info(f"Created offline alert for zone: {zone.name}")
+        ).exclude(Exists(open_alert)).values_list('pk', 'name', 'last_seen_online')
 
-        return alerts_created
+        alerts = []
+        for zone_id, zone_name, last_seen_online in newly_offline:
+            alerts.append(ZoneOfflineAlert(zone_id=zone_id, detected_at=last_seen_online or now))
+            logger.info(f"Created offline alert for zone: {zone_name}")
+        ZoneOfflineAlert.objects.bulk_create(alerts)
+
+        return len(alerts)
 
     def _resolve_online_alerts(self):
         """Mark alerts as resolved for zones that came back online"""
@@ -83,56 +109,136 @@ class OfflineAlertService:
 
         return resolved_count
 
-    def _send_pending_notifications(self):
-        """Send notifications for alerts that meet threshold"""
+    def _due_alerts(self, now):
+        """Unresolved alerts due a notification, decided in SQL (same rules as
+        ZoneOfflineAlert.should_send_notification): offline for at least
+        INITIAL_THRESHOLD_HOURS, and either never notified or last notified at
+        least COOLDOWN_HOURS ago"""
         from crm_app.models import ZoneOfflineAlert
 
-        notifications_sent = 0
-
-        # Get unresolved alerts with alerts enabled
-        pending_alerts = ZoneOfflineAlert.objects.filter(
+        return ZoneOfflineAlert.objects.filter(
             is_resolved=False,
-            zone__company__soundtrack_offline_alerts_enabled=True
+            zone__company__soundtrack_offline_alerts_enabled=True,
+            detected_at__lte=now - timedelta(hours=self.INITIAL_THRESHOLD_HOURS),
+        ).filter(
+            Q(first_notification_sent=False)
+            | Q(last_notification_at__lte=now - timedelta(hours=self.COOLDOWN_HOURS))
         ).select_related('zone', 'zone__company')
 
-        for alert in pending_alerts:
-            if alert.should_send_notification():
-                sent = self._send_alert_email(alert)
-                if sent:
-                    notifications_sent += 1
-
-        return notifications_sent
-
-    def _send_alert_email(self, alert):
-        """Send email to opted-in contacts
+    def _send_pending_notifications(self):
+        """Send notifications for alerts that meet threshold
 
-        Args:
-            alert: ZoneOfflineAlert instance
+        Due alerts, their companies' opted-in contacts and the templates are loaded
+        once; EmailLogs, alert tracking and notified contacts are written in bulk.
+        With OFFLINE_ALERT_DIGEST, a company with several due alerts gets one
+        digest listing all of them instead of one email per zone.
 
         Returns:
-            bool: True if email sent successfully
+            int: Number of alerts notified (each digest counts all its alerts)
         """
-        from crm_app.models import EmailTemplate, Contact
+        from crm_app.models import Contact, EmailTemplate
 
-        # Get opted-in contacts
-        contacts = Contact.objects.filter(
-            company=alert.zone.company,
+        now = timezone.now()
+        due_alerts = list(self._due_alerts(now))
+        if not due_alerts:
+            return 0
+
+        contacts_by_company = defaultdict(list)
+        for contact in Contact.objects.filter(
+            company_id__in={alert.zone.company_id for alert in due_alerts},
             is_active=True,
             receives_notifications=True,
             receives_soundtrack_alerts=True
-        )
+        ):
+            contacts_by_company[contact.company_id].append(contact)
+
+        templates = {
+            template.template_type: template
+            for template in EmailTemplate.objects.filter(
+                template_type__in=['zone_offline_alert', 'zone_offline_digest']
+            )
+        }
+        alert_template = templates.get('zone_offline_alert')
+        if alert_template is None:
+            logger.warning("zone_offline_alert email template not found")
 
-        if not contacts.exists():
-            logger.info(f"No opted-in contacts for zone: {alert.zone.name}")
-            return False
+        from crm_app.services.email_service import email_service
 
-        # Get the email template
-        try:
-            template = EmailTemplate.objects.get(template_type='zone_offline_alert')
-        except EmailTemplate.DoesNotExist:
-            logger.warning("zone_offline_alert email template not found")
-            return False
+        notified = []
+        # One SMTP connection and batched EmailLog writes for all alerts in this run
+        with email_service.smtp_pool(), email_service.batched_logging():
+            # Send from IT/Support (Keith) using his SMTP credentials
+            smtp_connection = email_service._get_smtp_connection_for_sender(settings.SUPPORT_EMAIL)
+            for contacts, alerts in self._group_alerts(due_alerts, contacts_by_company):
+                if settings.OFFLINE_ALERT_DIGEST and len(alerts) > 1:
+                    sent_to = self._send_digest_email(
+                        alerts, contacts, templates.get('zone_offline_digest'), smtp_connection
+                    )
+                    if sent_to:
+                        notified.extend((alert, sent_to) for alert in alerts)
+                    continue
+                if alert_template is None:
+                    continue
+                for alert in alerts:
+                    sent_to = self._send_alert_email(alert, contacts, alert_template, smtp_connection)
+                    if sent_to:
+                        notified.append((alert, sent_to))
+
+        if notified:
+            self._record_notifications(notified, now)
+
+        return len(notified)
+
+    def _group_alerts(self, alerts, contacts_by_company):
+        """(contacts, alerts) per company and recipient set, in alert order"""
+        groups = {}
+        for alert in alerts:
+            contacts = contacts_by_company.get(alert.zone.company_id)
+            if not contacts:
+                logger.info(f"No opted-in contacts for zone: {alert.zone.name}")
+                continue
+            key = (alert.zone.company_id, frozenset(contact.pk for contact in contacts))
+            groups.setdefault(key, (contacts, []))[1].append(alert)
+        return list(groups.values())
+
+    def _record_notifications(self, notified, now):
+        """Update alert tracking and notified contacts for all sent alerts at once"""
+        from crm_app.models import ZoneOfflineAlert
+
+        alerts = []
+        for alert, _ in notified:
+            if not alert.first_notification_sent:
+                alert.first_notification_sent = True
+                alert.first_notification_at = now
+            alert.last_notification_at = now
+            alert.notification_count += 1
+            alert.updated_at = now
+            alerts.append(alert)
+        ZoneOfflineAlert.objects.bulk_update(alerts, [
+            'first_notification_sent', 'first_notification_at', 'last_notification_at',
+            'notification_count', 'updated_at',
+        ])
+
+        # Track which contacts were notified
+        Through = ZoneOfflineAlert.notified_contacts.through
+        Through.objects.bulk_create([
+            Through(zoneofflinealert_id=alert.pk, contact_id=contact.pk)
+            for alert, contacts in notified
+            for contact in contacts
+        ], ignore_conflicts=True)
+
+    def _send_alert_email(self, alert, contacts, template, smtp_connection):
+        """Send email to opted-in contacts
 
+        Args:
+            alert: ZoneOfflineAlert instance
+            contacts: Opted-in contacts of the zone's company
+            template: zone_offline_alert EmailTemplate
+            smtp_connection: Support sender connection (None for default SMTP)
+
+        Returns:
+            list: Contacts the alert was sent to
+        """
         # Prepare context for email
         context = {
             'zone_name': alert.zone.name,
@@ -144,14 +250,9 @@ class OfflineAlertService:
             'subsequent': alert.first_notification_sent,
         }
 
-        # Send to each opted-in contact
         from crm_app.services.email_service import email_service
 
-        # Get SMTP connection for keith@bmasiamusic.com
-        from_email = settings.SUPPORT_EMAIL
-        smtp_connection = email_service._get_smtp_connection_for_sender(from_email)
-
-        sent_count = 0
+        sent_to = []
         for contact in contacts:
             try:
                 context['contact_name'] = contact.name
@@ -161,38 +262,84 @@ class OfflineAlertService:
                 body = self._render_template(template.body_text, context)
                 html_body = self._render_template(template.body_html, context) if template.body_html else None
 
-                # Send email from IT/Support (Keith) using his SMTP credentials
                 success, _ = email_service.send_email(
                     to_email=contact.email,
                     subject=subject,
                     body_text=body,
                     body_html=html_body or body,
-                    from_email=from_email,
+                    from_email=settings.SUPPORT_EMAIL,
+                    company=alert.zone.company,
+                    contact=contact,
+                    email_type='support',
+                    template=template,
                     smtp_connection=smtp_connection
                 )
 
                 if success:
-                    sent_count += 1
+                    sent_to.append(contact)
                     logger.info(f"Sent offline alert to {contact.email} for zone {alert.zone.name}")
             except Exception as e:
                 logger.error(f"Error sending alert to {contact.email}: {str(e)}")
 
-        if sent_count > 0:
-            # Update alert tracking
-            now = timezone.now()
-            if not alert.first_notification_sent:
-                alert.first_notification_sent = True
-                alert.first_notification_at = now
-            alert.last_notification_at = now
-            alert.notification_count += 1
-            alert.save()
+        return sent_to
+
+    def _send_digest_email(self, alerts, contacts, template, smtp_connection):
+        """Send one email listing all due alerts of a company to its opted-in contacts
+
+        Rendered once per company (zone_offline_digest template, or the built-in
+        DIGEST_* text); only {{contact_name}} is filled in per contact.
+
+        Returns:
+            list: Contacts the digest was sent to
+        """
+        alerts = sorted(alerts, key=lambda alert: alert.zone.name)
+        company = alerts[0].zone.company
+        zone_lines = []
+        for alert in alerts:
+            notice = 'first notice' if not alert.first_notification_sent else 'follow-up'
+            zone_lines.append(
+                f"{alert.zone.name} ({alert.zone.device_name or 'Unknown device'}): "
+                f"offline {round(alert.hours_offline, 1)} hours, "
+                f"last seen {alert.detected_at.strftime('%Y-%m-%d %H:%M %Z')} - {notice}"
+            )
+        context = {
+            'company_name': company.name,
+            'zone_count': len(alerts),
+            'zone_names': ', '.join(alert.zone.name for alert in alerts),
+            'zone_list': '\n'.join(f'- {line}' for line in zone_lines),
+            'zone_list_html': '<ul>' + ''.join(f'<li>{escape(line)}</li>' for line in zone_lines) + '</ul>',
+        }
+        subject = self._render_template(template.subject if template else self.DIGEST_SUBJECT, context)
+        body = self._render_template(template.body_text if template else self.DIGEST_BODY_TEXT, context)
+        html_source = (template.body_html if template else self.DIGEST_BODY_HTML) or ''
+        html_body = self._render_template(html_source, context) if html_source else None
 
-            # Track which contacts were notified
-            alert.notified_contacts.add(*contacts)
+        from crm_app.services.email_service import email_service
+
+        sent_to = []
+        for contact in contacts:
+            try:
+                contact_context = {'contact_name': contact.name}
+                success, _ = email_service.send_email(
+                    to_email=contact.email,
+                    subject=self._render_template(subject, contact_context),
+                    body_text=self._render_template(body, contact_context),
+                    body_html=self._render_template(html_body or body, contact_context),
+                    from_email=settings.SUPPORT_EMAIL,
+                    company=company,
+                    contact=contact,
+                    email_type='support',
+                    template=template,
+                    smtp_connection=smtp_connection
+                )
 
-            return True
+                if success:
+                    sent_to.append(contact)
+                    logger.info(f"Sent offline digest ({len(alerts)} zones) to {contact.email} for {company.name}")
+            except Exception as e:
+                logger.error(f"Error sending offline digest to {contact.email}: {str(e)}")
 
-        return False
+        return sent_to
 
     def _render_template(self, template_text, context):
         """Simple template variable replacement
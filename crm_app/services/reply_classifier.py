@@ -0,0 +1,222 @@
+"""
+AI classification of prospect replies for BMAsia CRM
+
+ReplyDetectionService classifies replies with rule patterns first; the
+ambiguous rest goes to Claude Haiku through ReplyClassifier. Auto-replies,
+out-of-office notices and forwarded threads arrive with the same text again
+and again, so every result is stored in ReplyClassificationCache under a hash
+of the normalised subject and body (quoted history cut off, digits and
+whitespace folded) and survives restarts. Cache misses are sent several
+replies per request (PROSPECT_AI_CLASSIFY_BATCH_SIZE), with at most
+PROSPECT_AI_CLASSIFY_CONCURRENCY requests in flight:
+
+    classifier = ReplyClassifier()
+    stats = {}
+    results = classifier.classify([(subject, body_text), ...], stats)
+    # [(classification, confidence, method), ...] in input order
+    # stats: ai_cache_hits, ai_cache_misses, ai_requests, ai_failures, classify_seconds
+
+A reply the model could not classify (no API key, request failed, answer not
+parseable) comes back as ('unclassified', 0.0, 'none') and is not cached.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATIONS = [
+    'interested', 'not_interested', 'question', 'objection',
+    'meeting_request', 'referral', 'other',
+]
+
+UNCLASSIFIED = ('unclassified', 0.0, 'none')
+
+# Body text the model sees (and the cache key covers)
+BODY_LIMIT = 1500
+
+# Start of the quoted thread below a reply
+QUOTE_MARKER = re.compile(
+    r'^\s*(on .{0,200}wrote:|-+\s*original message\s*-+|-+\s*forwarded message\s*-+|'
+    r'begin forwarded message:|from:\s.*@.*)\s*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+PROMPT = """Classify each of these email replies from sales prospects.
+
+Classifications:
+- "interested": Shows interest in the product/service, wants to learn more
+- "not_interested": Declines, not interested, bad timing
+- "question": Asks a question about pricing, features, etc.
+- "objection": Raises concerns or objections
+- "meeting_request": Wants to schedule a call or meeting
+- "referral": Redirects to another person
+- "other": Doesn't fit any category
+
+{replies}
+
+Respond with ONLY a valid JSON array, one object per reply with its "id", "classification" and "confidence" (0.0-1.0), no other text. Example: [{{"id": 1, "classification": "interested", "confidence": 0.85}}]"""
+
+
+def strip_quoted(body_text):
+    """The reply's own text: quoted thread and '>' lines removed"""
+    body_text = body_text or ''
+    match = QUOTE_MARKER.search(body_text)
+    own = body_text[:match.start()] if match else body_text
+    own = '\n'.join(line for line in own.splitlines() if not line.lstrip().startswith('>')).strip()
+    # A bare forward has no text of its own; classify the forwarded thread
+    return own or body_text.strip()
+
+
+def normalize_reply(subject, body_text):
+    """Text the cache key is computed from"""
+    from crm_app.models import EmailLog
+
+    body = ' '.join(strip_quoted(body_text)[:BODY_LIMIT].lower().split())
+    # Ticket numbers, dates and phone numbers vary between copies of the same auto-reply
+    return re.sub(r'\d+', '0', f"{EmailLog.normalize_subject(subject)}\n{body}")
+
+
+class ReplyClassifier:
+    """Classifies prospect replies with Claude, cached in ReplyClassificationCache"""
+
+    def __init__(self, client=None):
+        from crm_app.services.ai_service import MODEL_SIMPLE
+
+        self._client = client
+        self.model = MODEL_SIMPLE
+        self.batch_size = max(1, getattr(settings, 'PROSPECT_AI_CLASSIFY_BATCH_SIZE', 10))
+        self.concurrency = max(1, getattr(settings, 'PROSPECT_AI_CLASSIFY_CONCURRENCY', 4))
+
+    @property
+    def client(self):
+        """Anthropic client, or None when the package or API key is missing"""
+        if self._client is None:
+            from crm_app.services.ai_service import HAS_ANTHROPIC
+
+            api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
+            if HAS_ANTHROPIC and api_key:
+                import anthropic
+                self._client = anthropic.Anthropic(api_key=api_key)
+        return self._client
+
+    def cache_key(self, subject, body_text):
+        text = f"{self.model}\n{normalize_reply(subject, body_text)}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def classify(self, items, stats=None):
+        """
+        Classify (subject, body_text) pairs.
+
+        Cached keys are read in one query; the distinct misses are sent to the
+        model in batches and stored. Returns (classification, confidence,
+        method) per item, in input order.
+        """
+        from crm_app.models import ReplyClassificationCache
+
+        stats = stats if stats is not None else {}
+        for name in ('ai_cache_hits', 'ai_cache_misses', 'ai_requests', 'ai_failures', 'classify_seconds'):
+            stats.setdefault(name, 0)
+        if not items:
+            return []
+        started = time.perf_counter()
+
+        keys = [self.cache_key(subject, body_text) for subject, body_text in items]
+        results = {
+            entry.key: (entry.classification, entry.confidence, 'ai')
+            for entry in ReplyClassificationCache.objects.filter(key__in=set(keys))
+        }
+        hit_keys = {key for key in keys if key in results}
+        hits = sum(1 for key in keys if key in hit_keys)
+        stats['ai_cache_hits'] += hits
+        stats['ai_cache_misses'] += len(keys) - hits
+
+        misses = {}
+        for key, (subject, body_text) in zip(keys, items):
+            if key not in results:
+                misses.setdefault(key, (subject, body_text))
+
+        if misses:
+            fresh = self._classify_misses(misses, stats)
+            ReplyClassificationCache.objects.bulk_create([
+                ReplyClassificationCache(
+                    key=key, model=self.model, classification=classification,
+                    confidence=confidence, subject=misses[key][0][:200],
+                )
+                for key, (classification, confidence) in fresh.items()
+            ], ignore_conflicts=True)
+            results.update({key: (classification, confidence, 'ai') for key, (classification, confidence) in fresh.items()})
+
+        if hit_keys:
+            ReplyClassificationCache.objects.filter(key__in=hit_keys).update(
+                hits=F('hits') + 1, last_hit_at=timezone.now(),
+            )
+
+        stats['classify_seconds'] += time.perf_counter() - started
+        return [results.get(key, UNCLASSIFIED) for key in keys]
+
+    def _classify_misses(self, misses, stats):
+        """{key: (classification, confidence)} for the misses the model answered"""
+        client = self.client
+        if client is None:
+            logger.warning("AI reply classification unavailable — anthropic not installed or ANTHROPIC_API_KEY unset")
+            return {}
+
+        pending = list(misses.items())
+        batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+
+        # Threads only do HTTP; the cache is read and written on the calling thread
+        fresh = {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches)), thread_name_prefix='reply-classify') as executor:
+            for batch, answer in zip(batches, executor.map(lambda batch: self._request(client, batch), batches)):
+                stats['ai_requests'] += 1
+                if answer is None:
+                    stats['ai_failures'] += 1
+                    continue
+                for index, (key, _) in enumerate(batch, start=1):
+                    if index in answer:
+                        fresh[key] = answer[index]
+        return fresh
+
+    def _request(self, client, batch):
+        """One request for a batch of (key, (subject, body_text)); {id: (classification, confidence)} or None"""
+        replies = '\n\n'.join(
+            f'<reply id="{index}">\nSubject: {subject}\n\n{strip_quoted(body_text)[:BODY_LIMIT]}\n</reply>'
+            for index, (_, (subject, body_text)) in enumerate(batch, start=1)
+        )
+        try:
+            response = client.messages.create(
+                model=self.model,
+                max_tokens=50 + 40 * len(batch),
+                messages=[{"role": "user", "content": PROMPT.format(replies=replies)}],
+            )
+            return self._parse_answer(response.content[0].text, len(batch))
+        except Exception as e:
+            logger.error(f"AI classification failed for a batch of {len(batch)} replies: {e}")
+            return None
+
+    @staticmethod
+    def _parse_answer(text, count):
+        """{id: (classification, confidence)} from the model's JSON array; ids outside 1..count are ignored"""
+        match = re.search(r'\[.*\]', text, re.DOTALL)
+        results = json.loads(match.group(0) if match else text)
+
+        answer = {}
+        for result in results:
+            try:
+                index = int(result['id'])
+                confidence = min(1.0, max(0.0, float(result.get('confidence', 0.5))))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 1 <= index <= count:
+                classification = result.get('classification')
+                answer[index] = (classification if classification in CLASSIFICATIONS else 'other', confidence)
+        return answer
@@ -2,6 +2,16 @@
 Reply Detection Service for BMAsia CRM
 Polls IMAP inbox for prospect replies, classifies them, and triggers auto-actions.
 Uses Python stdlib imaplib + email — no additional packages needed.
+
+Polling is incremental: the mailbox UIDVALIDITY and last polled UID are kept in
+ImapMailboxState, each run fetches only the headers of newer messages (in
+batches of PROSPECT_IMAP_FETCH_BATCH_SIZE) and downloads full messages only
+for replies that match a prospect enrollment. A batch is matched to outbound
+sequence emails with a fixed number of queries (_match_batch).
+
+Replies are classified per batch: rule patterns first, then the ambiguous rest
+in one go through ReplyClassifier (services/reply_classifier.py), which caches
+results by normalised content and sends several replies per AI request.
 """
 
 import email
@@ -42,52 +52,57 @@ class ReplyDetectionService:
         r'mail delivery subsystem', r'mailer-daemon',
     ]
 
-    def __init__(self):
+    # Headers fetched for every new message; the body is fetched only for matched replies
+    HEADER_FIELDS = ('MESSAGE-ID', 'IN-REPLY-TO', 'REFERENCES', 'FROM', 'SUBJECT', 'DATE')
+
+    def __init__(self, ai_client=None):
+        from crm_app.services.reply_classifier import ReplyClassifier
+
         self.imap_host = getattr(settings, 'PROSPECT_IMAP_HOST', 'imap.gmail.com')
+        self.imap_port = getattr(settings, 'PROSPECT_IMAP_PORT', 993)
+        self.imap_ssl = getattr(settings, 'PROSPECT_IMAP_SSL', True)
+        self.mailbox = 'INBOX'
+        self.fetch_batch_size = getattr(settings, 'PROSPECT_IMAP_FETCH_BATCH_SIZE', 200)
         self.reply_email = getattr(settings, 'PROSPECT_REPLY_EMAIL', '')
         self.imap_password = getattr(settings, 'PROSPECT_REPLY_IMAP_PASSWORD', '')
+        self.classifier = ReplyClassifier(client=ai_client)
 
     @property
     def is_configured(self):
         return bool(self.reply_email and self.imap_password)
 
-    def check_for_replies(self, dry_run=False, lookback_hours=24):
+    def check_for_replies(self, dry_run=False, lookback_hours=24, reset=False):
         """
         Main entry point — poll IMAP for replies to prospect sequence emails.
 
+        Only messages with a UID above the stored cursor (ImapMailboxState) are
+        looked at; the first run, a changed UIDVALIDITY or reset=True catch up
+        over the last `lookback_hours` instead. Headers are fetched in batches,
+        deduplicated and matched in bulk, and full messages are downloaded
+        only for replies that match an enrollment. A dry run leaves the
+        cursor where it was.
+
         Returns:
-            dict with counts: {detected, matched, classified, actions_taken}
+            dict with counts: {detected, matched, classified, actions_taken,
+            headers_fetched, bodies_fetched, bytes_received, ai_cache_hits,
+            ai_cache_misses, ai_requests, ai_failures, classify_seconds}
         """
+        stats = {
+            'detected': 0, 'matched': 0, 'classified': 0, 'actions_taken': 0,
+            'headers_fetched': 0, 'bodies_fetched': 0, 'bytes_received': 0,
+            'ai_cache_hits': 0, 'ai_cache_misses': 0, 'ai_requests': 0, 'ai_failures': 0,
+            'classify_seconds': 0.0,
+        }
         if not self.is_configured:
             logger.error("Reply detection not configured — missing PROSPECT_REPLY_EMAIL or PROSPECT_REPLY_IMAP_PASSWORD")
-            return {'detected': 0, 'matched': 0, 'classified': 0, 'actions_taken': 0}
-
-        stats = {'detected': 0, 'matched': 0, 'classified': 0, 'actions_taken': 0}
+            return stats
 
         try:
-            conn = imaplib.IMAP4_SSL(self.imap_host, 993)
-            conn.login(self.reply_email, self.imap_password)
-            conn.select('INBOX')
-
-            # Search for recent emails (last N hours)
-            since_date = (timezone.now() - timedelta(hours=lookback_hours)).strftime('%d-%b-%Y')
-            _, message_ids = conn.search(None, f'(SINCE {since_date})')
-
-            if not message_ids[0]:
-                logger.info("No recent emails found in IMAP inbox")
+            conn = self._connect(stats)
+            try:
+                self._poll(conn, stats, dry_run, lookback_hours, reset)
+            finally:
                 conn.logout()
-                return stats
-
-            email_ids = message_ids[0].split()
-            logger.info(f"Found {len(email_ids)} emails in last {lookback_hours}h")
-
-            for email_id in email_ids:
-                try:
-                    self._process_email(conn, email_id, stats, dry_run)
-                except Exception as e:
-                    logger.error(f"Error processing IMAP email {email_id}: {e}")
-
-            conn.logout()
 
         except imaplib.IMAP4.error as e:
             logger.error(f"IMAP connection error: {e}")
@@ -96,63 +111,285 @@ class ReplyDetectionService:
 
         return stats
 
-    def _process_email(self, conn, email_id, stats, dry_run):
-        """Process a single email from IMAP"""
-        from crm_app.models import ProspectReply
+    def _connect(self, stats):
+        """Log in and select the mailbox; bytes read from the server are counted in stats"""
+        conn_class = imaplib.IMAP4_SSL if self.imap_ssl else imaplib.IMAP4
+        conn = conn_class(self.imap_host, self.imap_port)
 
-        _, msg_data = conn.fetch(email_id, '(RFC822)')
-        raw_email = msg_data[0][1]
-        msg = email.message_from_bytes(raw_email)
+        read, readline = conn.read, conn.readline
 
-        # Extract headers
-        message_id = msg.get('Message-ID', '').strip()
-        in_reply_to = msg.get('In-Reply-To', '').strip()
-        references = msg.get('References', '').strip()
-        from_header = msg.get('From', '')
-        subject = self._decode_header(msg.get('Subject', ''))
-        date_header = msg.get('Date', '')
+        def counting_read(size):
+            data = read(size)
+            stats['bytes_received'] += len(data)
+            return data
 
-        _, from_email = parseaddr(from_header)
-        if not from_email:
-            return
+        def counting_readline():
+            line = readline()
+            stats['bytes_received'] += len(line)
+            return line
 
-        # Skip our own emails
-        if from_email.lower() == self.reply_email.lower():
-            return
+        conn.read, conn.readline = counting_read, counting_readline
+        conn.login(self.reply_email, self.imap_password)
+        conn.select(self.mailbox)
+        return conn
 
-        # Dedup — skip if already processed
-        if not message_id:
-            return
-        if ProspectReply.objects.filter(imap_message_id=message_id).exists():
+    def _poll(self, conn, stats, dry_run, lookback_hours, reset):
+        from crm_app.models import ImapMailboxState
+
+        state, _ = ImapMailboxState.objects.get_or_create(
+            host=self.imap_host, account=self.reply_email, mailbox=self.mailbox,
+        )
+        uidvalidity = self._response_int(conn, 'UIDVALIDITY')
+        uid_next = self._response_int(conn, 'UIDNEXT')
+
+        if reset or state.uidvalidity is None or state.uidvalidity != uidvalidity:
+            # No usable cursor: catch up over the lookback window
+            since_date = (timezone.now() - timedelta(hours=lookback_hours)).strftime('%d-%b-%Y')
+            _, data = conn.uid('SEARCH', None, f'(SINCE {since_date})')
+            cursor = 0
+            logger.info(f"Polling {self.mailbox} from the last {lookback_hours}h (UIDVALIDITY {uidvalidity})")
+        else:
+            _, data = conn.uid('SEARCH', None, f'UID {state.last_uid + 1}:*')
+            cursor = state.last_uid
+
+        # "n:*" always includes the highest UID, even when it is below n
+        uids = sorted(uid for uid in map(int, data[0].split()) if uid > cursor) if data and data[0] else []
+        logger.info(f"Found {len(uids)} new emails in {self.mailbox}")
+
+        failed_uids = []
+        for start in range(0, len(uids), self.fetch_batch_size):
+            failed_uids += self._process_batch(conn, uids[start:start + self.fetch_batch_size], stats, dry_run)
+
+        if dry_run:
             return
+        if failed_uids:
+            # Retry from the first failure next run; processed replies are deduplicated
+            new_cursor = min(failed_uids) - 1
+        else:
+            new_cursor = max(uids[-1] if uids else cursor, (uid_next or 1) - 1)
+        state.uidvalidity = uidvalidity
+        state.last_uid = max(new_cursor, cursor)
+        state.last_polled_at = timezone.now()
+        state.save(update_fields=['uidvalidity', 'last_uid', 'last_polled_at'])
+
+    def _process_batch(self, conn, uids, stats, dry_run):
+        """Headers for a batch of UIDs, bodies only for matched replies. Returns the UIDs that failed."""
+        headers = self._fetch_headers(conn, uids)
+        stats['headers_fetched'] += len(headers)
+
+        candidates = self._new_replies(headers)
+        stats['detected'] += len(candidates)
+
+        matches = self._match_batch(candidates)
+        messages = self._fetch_messages(conn, [header['uid'] for header, _, _ in matches])
+        stats['bodies_fetched'] += len(messages)
+
+        failed = []
+        replies = []
+        for header, outbound_log, enrollment in matches:
+            if header['uid'] not in messages:
+                logger.error(f"IMAP email UID {header['uid']} could not be fetched")
+                failed.append(header['uid'])
+                continue
+            replies.append((header, self._extract_body(messages[header['uid']]), outbound_log, enrollment))
+
+        classifications = self._classify_replies([(header['subject'], body_text) for header, body_text, _, _ in replies], stats)
+
+        for (header, body_text, outbound_log, enrollment), classification in zip(replies, classifications):
+            try:
+                self._process_reply(header, body_text, classification, outbound_log, enrollment, stats, dry_run)
+            except Exception as e:
+                logger.error(f"Error processing IMAP email UID {header['uid']}: {e}")
+                failed.append(header['uid'])
+        return failed
+
+    def _fetch_headers(self, conn, uids):
+        """Matching headers of a batch of messages, one UID FETCH for the whole batch"""
+        if not uids:
+            return []
+        fields = ' '.join(self.HEADER_FIELDS)
+        _, data = conn.uid('FETCH', ','.join(map(str, uids)), f'(UID BODY.PEEK[HEADER.FIELDS ({fields})])')
+
+        headers = []
+        for uid, raw in self._parse_fetch(data):
+            msg = email.message_from_bytes(raw)
+            _, from_email = parseaddr(msg.get('From', ''))
+            headers.append({
+                'uid': uid,
+                'message_id': (msg.get('Message-ID') or '').strip(),
+                'in_reply_to': (msg.get('In-Reply-To') or '').strip(),
+                'references': (msg.get('References') or '').strip(),
+                'from_email': from_email,
+                'subject': self._decode_header(msg.get('Subject', '')),
+                'date': msg.get('Date', ''),
+            })
+        return headers
+
+    def _fetch_messages(self, conn, uids):
+        """Full messages by UID, one UID FETCH for all of them (without setting \\Seen)"""
+        if not uids:
+            return {}
+        _, data = conn.uid('FETCH', ','.join(map(str, uids)), '(UID BODY.PEEK[])')
+        return {uid: email.message_from_bytes(raw) for uid, raw in self._parse_fetch(data)}
+
+    @staticmethod
+    def _parse_fetch(data):
+        """(uid, literal) pairs of a UID FETCH response; the UID may come before or after the literal"""
+        results = []
+        for index, item in enumerate(data or []):
+            if not isinstance(item, tuple):
+                continue
+            match = re.search(rb'\bUID (\d+)', item[0])
+            if not match and index + 1 < len(data) and isinstance(data[index + 1], bytes):
+                match = re.search(rb'\bUID (\d+)', data[index + 1])
+            if match:
+                results.append((int(match.group(1)), item[1]))
+        return results
+
+    @staticmethod
+    def _response_int(conn, code):
+        _, data = conn.response(code)
+        try:
+            return int(data[-1])
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def _new_replies(self, headers):
+        """Headers of messages not sent by us and not already processed (one dedup query)"""
+        from crm_app.models import ProspectReply
+
+        own_address = self.reply_email.lower()
+        headers = [
+            header for header in headers
+            if header['from_email'] and header['message_id'] and header['from_email'].lower() != own_address
+        ]
+        seen = set(ProspectReply.objects.filter(
+            imap_message_id__in=[header['message_id'] for header in headers]
+        ).values_list('imap_message_id', flat=True))
+
+        new = []
+        for header in headers:
+            if header['message_id'] not in seen:
+                seen.add(header['message_id'])
+                new.append(header)
+        return new
+
+    def _match_batch(self, headers):
+        """
+        Match a batch of inbound replies to outbound sequence EmailLogs.
 
-        stats['detected'] += 1
+        Tier 1/2: every In-Reply-To and References Message-ID of the batch is
+        resolved with one message_id__in query; a header takes the first of its
+        ids (In-Reply-To first) whose log has an enrollment. Tier 3, for the
+        leftovers only: the most recent sequence email of the last 30 days to
+        the sender with the same normalised subject.
+
+        Returns:
+            [(header, EmailLog, ProspectEnrollment)] for the matched headers
+        """
+        from django.db.models.functions import Lower
+        from crm_app.models import EmailLog
+
+        matches = {}
+
+        # Tier 1 + 2: In-Reply-To, then the References chain
+        ref_ids = [
+            [ref_id for ref_id in [header['in_reply_to'], *header['references'].split()] if ref_id]
+            for header in headers
+        ]
+        all_ids = {ref_id for ids in ref_ids for ref_id in ids}
+        logs_by_message_id = {}
+        if all_ids:
+            for log in EmailLog.objects.filter(message_id__in=all_ids, email_type='sequence').only('id', 'message_id', 'contact_id'):
+                logs_by_message_id.setdefault(log.message_id, log)
+        enrollments = self._enrollments_for_logs(logs_by_message_id.values())
+
+        for index, ids in enumerate(ref_ids):
+            for ref_id in ids:
+                log = logs_by_message_id.get(ref_id)
+                if log is not None and log.pk in enrollments:
+                    matches[index] = (log, enrollments[log.pk])
+                    break
+
+        # Tier 3: normalised subject + sender for the leftovers
+        leftovers = {}
+        for index, header in enumerate(headers):
+            subject = EmailLog.normalize_subject(header['subject'])
+            if index not in matches and subject and header['from_email']:
+                leftovers[index] = (header['from_email'].lower(), subject)
+        if leftovers:
+            recent_logs = EmailLog.objects.annotate(to_email_lower=Lower('to_email')).filter(
+                email_type='sequence',
+                status='sent',
+                normalized_subject__in={subject for _, subject in leftovers.values()},
+                to_email_lower__in={sender for sender, _ in leftovers.values()},
+                created_at__gte=timezone.now() - timedelta(days=30),
+            ).order_by('-created_at').only('id', 'to_email', 'normalized_subject', 'contact_id')
+            latest = {}
+            for log in recent_logs:
+                latest.setdefault((log.to_email_lower, log.normalized_subject), log)
+            enrollments = self._enrollments_for_logs(latest.values())
+
+            for index, key in leftovers.items():
+                log = latest.get(key)
+                if log is not None and log.pk in enrollments:
+                    matches[index] = (log, enrollments[log.pk])
+
+        for index, header in enumerate(headers):
+            if index not in matches:
+                logger.debug(f"No matching enrollment for reply from {header['from_email']}: {header['subject']}")
+        return [(headers[index], *matches[index]) for index in sorted(matches)]
+
+    def _enrollments_for_logs(self, email_logs):
+        """
+        {EmailLog id: ProspectEnrollment} in at most two queries: the enrollment
+        of the log's ProspectStepExecution, else the contact's most recent
+        active or paused enrollment.
+        """
+        from crm_app.models import ProspectEnrollment, ProspectStepExecution
+
+        email_logs = list(email_logs)
+        if not email_logs:
+            return {}
+
+        enrollments = {}
+        executions = ProspectStepExecution.objects.filter(
+            email_log_id__in=[log.pk for log in email_logs]
+        ).select_related('enrollment').order_by('scheduled_for')
+        for execution in executions:
+            enrollments.setdefault(execution.email_log_id, execution.enrollment)
+
+        # Fallback: find enrollment by contact
+        contact_ids = {log.contact_id for log in email_logs if log.pk not in enrollments and log.contact_id}
+        if contact_ids:
+            by_contact = {}
+            for enrollment in ProspectEnrollment.objects.filter(
+                contact_id__in=contact_ids,
+                status__in=['active', 'paused'],
+            ).order_by('-enrolled_at'):
+                by_contact.setdefault(enrollment.contact_id, enrollment)
+            for log in email_logs:
+                if log.pk not in enrollments and log.contact_id in by_contact:
+                    enrollments[log.pk] = by_contact[log.contact_id]
+        return enrollments
+
+    def _process_reply(self, header, body_text, classification, outbound_log, enrollment, stats, dry_run):
+        """Record a matched, classified reply and run its auto-actions"""
+        from crm_app.models import ProspectReply
 
-        # Extract body text
-        body_text = self._extract_body(msg)
+        from_email = header['from_email']
+        stats['matched'] += 1
+        logger.info(f"Matched reply from {from_email} to enrollment {enrollment.id}")
 
         # Parse received date
         try:
-            received_at = parsedate_to_datetime(date_header)
+            received_at = parsedate_to_datetime(header['date'])
             if timezone.is_naive(received_at):
                 received_at = timezone.make_aware(received_at)
         except Exception:
             received_at = timezone.now()
 
-        # Match to outbound email
-        outbound_log, enrollment = self._match_to_outbound(
-            in_reply_to, references, from_email, subject
-        )
-
-        if not enrollment:
-            logger.debug(f"No matching enrollment for reply from {from_email}: {subject}")
-            return
-
-        stats['matched'] += 1
-        logger.info(f"Matched reply from {from_email} to enrollment {enrollment.id}")
-
-        # Classify
-        classification, confidence, method = self._classify_reply(subject, body_text)
+        classification, confidence, method = classification
         stats['classified'] += 1
 
         if dry_run:
@@ -167,9 +404,9 @@ class ReplyDetectionService:
         reply = ProspectReply.objects.create(
             enrollment=enrollment,
             email_log=outbound_log,
-            imap_message_id=message_id,
+            imap_message_id=header['message_id'],
             from_email=from_email,
-            subject=subject[:500],
+            subject=header['subject'][:500],
             body_text=body_text[:5000],
             received_at=received_at,
             classification=classification,
@@ -183,82 +420,33 @@ class ReplyDetectionService:
         if actions:
             stats['actions_taken'] += 1
 
-    def _match_to_outbound(self, in_reply_to, references, from_email, subject):
+    def _classify_reply(self, subject, body_text):
         """
-        Match an inbound reply to an outbound EmailLog using 3-tier strategy.
+        Classify a reply using rule-based patterns first, then AI fallback.
 
         Returns:
-            (EmailLog or None, ProspectEnrollment or None)
+            (classification, confidence, method)
         """
-        from crm_app.models import EmailLog, ProspectEnrollment
+        return self._classify_replies([(subject, body_text)])[0]
 
-        # Tier 1: In-Reply-To header → direct match
-        if in_reply_to:
-            log = EmailLog.objects.filter(
-                message_id=in_reply_to,
-                email_type='sequence',
-            ).select_related('contact').first()
-            if log:
-                enrollment = self._get_enrollment_from_log(log)
-                if enrollment:
-                    return log, enrollment
-
-        # Tier 2: References header chain
-        if references:
-            ref_ids = references.split()
-            for ref_id in ref_ids:
-                ref_id = ref_id.strip()
-                if not ref_id:
-                    continue
-                log = EmailLog.objects.filter(
-                    message_id=ref_id,
-                    email_type='sequence',
-                ).select_related('contact').first()
-                if log:
-                    enrollment = self._get_enrollment_from_log(log)
-                    if enrollment:
-                        return log, enrollment
-
-        # Tier 3: Subject-line fallback — strip Re:/Fwd: and match recent emails
-        clean_subject = re.sub(r'^(Re|Fwd|FW):\s*', '', subject, flags=re.IGNORECASE).strip()
-        if clean_subject and from_email:
-            # Look for recent sequence emails to this contact
-            recent_log = EmailLog.objects.filter(
-                email_type='sequence',
-                status='sent',
-                to_email__iexact=from_email,
-                subject__icontains=clean_subject[:100],
-                created_at__gte=timezone.now() - timedelta(days=30),
-            ).order_by('-created_at').first()
-            if recent_log:
-                enrollment = self._get_enrollment_from_log(recent_log)
-                if enrollment:
-                    return recent_log, enrollment
-
-        return None, None
-
-    def _get_enrollment_from_log(self, email_log):
-        """Get the ProspectEnrollment linked to an EmailLog via ProspectStepExecution"""
-        execution = email_log.prospect_executions.select_related('enrollment').first()
-        if execution:
-            return execution.enrollment
-
-        # Fallback: find enrollment by contact + company
-        from crm_app.models import ProspectEnrollment
-        if email_log.contact:
-            return ProspectEnrollment.objects.filter(
-                contact=email_log.contact,
-                status__in=['active', 'paused'],
-            ).order_by('-enrolled_at').first()
-        return None
-
-    def _classify_reply(self, subject, body_text):
+    def _classify_replies(self, items, stats=None):
         """
-        Classify a reply using rule-based patterns first, then AI fallback.
+        Classify (subject, body_text) pairs: rule patterns first, then the
+        ambiguous rest in one call to the cached, batched AI classifier.
 
         Returns:
-            (classification, confidence, method)
+            [(classification, confidence, method)] in input order
         """
+        results = [self._classify_with_rules(subject, body_text) for subject, body_text in items]
+        ambiguous = [index for index, result in enumerate(results) if result is None]
+        if ambiguous:
+            ai_results = self.classifier.classify([items[index] for index in ambiguous], stats)
+            for index, result in zip(ambiguous, ai_results):
+                results[index] = result
+        return results
+
+    def _classify_with_rules(self, subject, body_text):
+        """(classification, confidence, 'rule') or None when no pattern matches"""
         text = f"{subject}\n{body_text}".lower()
 
         # Rule-based classification (fast, high confidence)
@@ -274,8 +462,7 @@ class ReplyDetectionService:
         if self._matches_patterns(text, self.MEETING_PATTERNS):
             return 'meeting_request', 0.90, 'rule'
 
-        # AI classification for ambiguous replies
-        return self._classify_with_ai(subject, body_text)
+        return None
 
     def _matches_patterns(self, text, patterns):
         """Check if text matches any of the given regex patterns"""
@@ -284,63 +471,6 @@ class ReplyDetectionService:
                 return True
         return False
 
-    def _classify_with_ai(self, subject, body_text):
-        """Use Claude Haiku to classify ambiguous replies"""
-        try:
-            from crm_app.services.ai_service import MODEL_SIMPLE, HAS_ANTHROPIC
-            if not HAS_ANTHROPIC:
-                return 'unclassified', 0.0, 'none'
-
-            import anthropic
-            api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
-            if not api_key:
-                return 'unclassified', 0.0, 'none'
-
-            client = anthropic.Anthropic(api_key=api_key)
-            prompt = f"""Classify this email reply from a sales prospect. Return ONLY a JSON object with "classification" and "confidence" (0.0-1.0).
-
-Classifications:
-- "interested": Shows interest in the product/service, wants to learn more
-- "not_interested": Declines, not interested, bad timing
-- "question": Asks a question about pricing, features, etc.
-- "objection": Raises concerns or objections
-- "meeting_request": Wants to schedule a call or meeting
-- "referral": Redirects to another person
-- "other": Doesn't fit any category
-
-Email Subject: {subject}
-Email Body:
-{body_text[:1500]}
-
-Respond with ONLY valid JSON, no other text. Example: {{"classification": "interested", "confidence": 0.85}}"""
-
-            response = client.messages.create(
-                model=MODEL_SIMPLE,
-                max_tokens=100,
-                messages=[{"role": "user", "content": prompt}],
-            )
-
-            result_text = response.content[0].text.strip()
-            # Parse JSON response
-            import json
-            result = json.loads(result_text)
-            classification = result.get('classification', 'unclassified')
-            confidence = float(result.get('confidence', 0.5))
-
-            # Validate classification
-            valid = [
-                'interested', 'not_interested', 'question', 'objection',
-                'meeting_request', 'referral', 'other',
-            ]
-            if classification not in valid:
-                classification = 'other'
-
-            return classification, confidence, 'ai'
-
-        except Exception as e:
-            logger.error(f"AI classification failed: {e}")
-            return 'unclassified', 0.0, 'none'
-
     def _execute_auto_actions(self, reply, enrollment):
         """Execute automatic actions based on reply classification"""
         from crm_app.models import Task, ProspectEnrollment
@@ -0,0 +1,380 @@
+"""
+Sequence step executor for BMAsia CRM
+
+EmailService.process_sequence_steps() (the send_emails cron) hands the due
+SequenceStepExecutions to SequenceExecutor:
+
+    from crm_app.services.sequence_executor import SequenceExecutor
+
+    report = SequenceExecutor(email_service).run(max_emails=100)
+    # {'sent', 'failed', 'skipped', 'claimed', 'waiting', 'seconds', 'per_second', ...}
+
+Business hours are those of the contact: the country of the enrollment's
+company (else the contact's company) maps to a timezone in COUNTRY_TIMEZONES,
+unknown countries use BUSINESS_TIMEZONE. The countries currently inside
+BUSINESS_HOURS_START..END on a weekday are worked out once per run and the due
+executions are filtered on them in SQL.
+
+Work is claimed in a short transaction with select_for_update(skip_locked=True)
+and marked 'pending', so several cron workers can run at once without sending
+a step twice. Claims left 'pending' by a worker that died are released after
+SEQUENCE_CLAIM_TIMEOUT minutes.
+
+Templates are rendered and EmailLogs built on the calling thread; a pool of
+SEQUENCE_SEND_CONCURRENCY threads does only the SMTP sends, each thread with
+its own SMTPConnectionPool (one connection per sender). The logs are then
+written with one EmailLogBatch flush and the executions with one bulk_update.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Company.country -> timezone; countries not listed use BUSINESS_TIMEZONE
+COUNTRY_TIMEZONES = {
+    'Thailand': 'Asia/Bangkok',
+    'Cambodia': 'Asia/Phnom_Penh',
+    'Laos': 'Asia/Vientiane',
+    'Vietnam': 'Asia/Ho_Chi_Minh',
+    'Myanmar': 'Asia/Yangon',
+    'Singapore': 'Asia/Singapore',
+    'Malaysia': 'Asia/Kuala_Lumpur',
+    'Indonesia': 'Asia/Jakarta',
+    'Philippines': 'Asia/Manila',
+    'Brunei': 'Asia/Brunei',
+    'Hong Kong': 'Asia/Hong_Kong',
+    'Macau': 'Asia/Macau',
+    'China': 'Asia/Shanghai',
+    'Taiwan': 'Asia/Taipei',
+    'Japan': 'Asia/Tokyo',
+    'South Korea': 'Asia/Seoul',
+    'Mongolia': 'Asia/Ulaanbaatar',
+    'India': 'Asia/Kolkata',
+    'Nepal': 'Asia/Kathmandu',
+    'Sri Lanka': 'Asia/Colombo',
+    'Bangladesh': 'Asia/Dhaka',
+    'Pakistan': 'Asia/Karachi',
+    'Maldives': 'Indian/Maldives',
+    'UAE': 'Asia/Dubai',
+    'Oman': 'Asia/Muscat',
+    'Qatar': 'Asia/Qatar',
+    'Bahrain': 'Asia/Bahrain',
+    'Kuwait': 'Asia/Kuwait',
+    'Saudi Arabia': 'Asia/Riyadh',
+    'Jordan': 'Asia/Amman',
+    'Lebanon': 'Asia/Beirut',
+    'Iraq': 'Asia/Baghdad',
+    'Iran': 'Asia/Tehran',
+    'Turkey': 'Europe/Istanbul',
+    'Egypt': 'Africa/Cairo',
+    'Kenya': 'Africa/Nairobi',
+    'South Africa': 'Africa/Johannesburg',
+    'Mauritius': 'Indian/Mauritius',
+    'Australia': 'Australia/Sydney',
+    'New Zealand': 'Pacific/Auckland',
+    'Fiji': 'Pacific/Fiji',
+    'UK': 'Europe/London',
+    'United Kingdom': 'Europe/London',
+    'France': 'Europe/Paris',
+    'Germany': 'Europe/Berlin',
+    'Netherlands': 'Europe/Amsterdam',
+    'Spain': 'Europe/Madrid',
+    'Italy': 'Europe/Rome',
+    'Sweden': 'Europe/Stockholm',
+    'Switzerland': 'Europe/Zurich',
+    'USA': 'America/New_York',
+    'United States': 'America/New_York',
+}
+
+
+class SequenceExecutor:
+    """Claims due sequence steps for this worker and sends them in parallel"""
+
+    def __init__(self, email_service=None, concurrency=None):
+        if email_service is None:
+            from crm_app.services.email_service import email_service
+        self.email_service = email_service
+        self.concurrency = max(1, concurrency or getattr(settings, 'SEQUENCE_SEND_CONCURRENCY', 4))
+        self.claim_timeout = timedelta(minutes=getattr(settings, 'SEQUENCE_CLAIM_TIMEOUT', 30))
+        self.last_run_report = None
+
+    # ------------------------------------------------------------------
+    # Selecting and claiming work
+    # ------------------------------------------------------------------
+
+    def open_countries(self, now):
+        """(countries inside business hours at `now`, whether BUSINESS_TIMEZONE is)"""
+        open_by_timezone = {}
+
+        def is_open(tz):
+            if tz not in open_by_timezone:
+                open_by_timezone[tz] = self.email_service.is_business_hours(tz, now=now)
+            return open_by_timezone[tz]
+
+        countries = [country for country, tz in COUNTRY_TIMEZONES.items() if is_open(tz)]
+        return countries, is_open(settings.BUSINESS_TIMEZONE)
+
+    def due(self, now):
+        """Scheduled executions due at `now`, annotated with the contact's country"""
+        from crm_app.models import SequenceStepExecution
+
+        return SequenceStepExecution.objects.filter(
+            status='scheduled',
+            scheduled_for__lte=now,
+        ).annotate(
+            local_country=Coalesce('enrollment__company__country', 'enrollment__contact__company__country'),
+        )
+
+    def in_business_hours(self, now):
+        """Q on due(): the contact's local time is inside business hours"""
+        countries, default_open = self.open_countries(now)
+        condition = Q(local_country__in=countries)
+        if default_open:
+            condition |= Q(local_country__isnull=True) | ~Q(local_country__in=list(COUNTRY_TIMEZONES))
+        return condition
+
+    def release_stale_claims(self, now):
+        """Put claims of workers that died mid-run back in the queue"""
+        from crm_app.models import SequenceStepExecution
+
+        return SequenceStepExecution.objects.filter(
+            status='pending',
+            updated_at__lt=now - self.claim_timeout,
+        ).update(status='scheduled', updated_at=now)
+
+    def claim(self, max_emails, now):
+        """
+        Mark up to `max_emails` due executions in business hours as 'pending' for
+        this worker. Rows locked by another worker's claim are skipped.
+        """
+        from crm_app.models import SequenceStepExecution
+
+        with transaction.atomic():
+            ids = list(
+                self.due(now).filter(self.in_business_hours(now))
+                .order_by('scheduled_for')
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('id', flat=True)[:max_emails]
+            )
+            SequenceStepExecution.objects.filter(id__in=ids, status='scheduled').update(
+                status='pending', attempt_count=F('attempt_count') + 1, updated_at=now,
+            )
+        return ids
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+
+    def run(self, max_emails=100, now=None):
+        """
+        Claim, render, send and record one batch of due sequence steps
+        (due and in business hours at `now`, default the current time).
+
+        Returns:
+            dict: sent, failed, skipped, claimed, released (stale claims),
+            waiting (due steps left scheduled: outside business hours or over
+            max_emails), concurrency, smtp_connections, seconds, per_second
+        """
+        from crm_app.models import SequenceStepExecution
+
+        started = time.perf_counter()
+        now = now or timezone.now()
+        report = {
+            'sent': 0, 'failed': 0, 'skipped': 0, 'claimed': 0, 'released': 0,
+            'waiting': 0, 'concurrency': self.concurrency, 'smtp_connections': 0,
+        }
+
+        report['released'] = self.release_stale_claims(now)
+        ids = self.claim(max_emails, now)
+        report['claimed'] = len(ids)
+
+        if ids:
+            executions = list(SequenceStepExecution.objects.filter(id__in=ids).select_related(
+                'enrollment__contact',
+                'enrollment__company',
+                'enrollment__sequence',
+                'step__email_template',
+            ).order_by('scheduled_for'))
+            executions = self._skip_inactive(executions, report)
+            self._send_executions(executions, report)
+
+        report['waiting'] = self.due(now).count()
+        report['seconds'] = round(time.perf_counter() - started, 2)
+        report['per_second'] = round(report['sent'] / report['seconds'], 1) if report['seconds'] else 0.0
+        self.last_run_report = report
+        logger.info(f"Sequence executor run: {report}")
+        return report
+
+    def _skip_inactive(self, executions, report):
+        """Skip steps of inactive enrollments and unsubscribed contacts; returns the rest"""
+        from crm_app.models import SequenceEnrollment, SequenceStepExecution
+
+        now = timezone.now()
+        sendable, skipped, unsubscribed = [], [], []
+        for execution in executions:
+            enrollment = execution.enrollment
+            if enrollment.status != 'active':
+                logger.info(f"Enrollment {enrollment.id} is not active (status: {enrollment.status}), skipping execution")
+                skipped.append(execution.id)
+            elif not enrollment.contact.receives_notifications:
+                logger.info(f"Contact {enrollment.contact.email} has unsubscribed, marking enrollment as unsubscribed")
+                unsubscribed.append(enrollment.id)
+                skipped.append(execution.id)
+            else:
+                sendable.append(execution)
+
+        if unsubscribed:
+            SequenceEnrollment.objects.filter(id__in=unsubscribed).update(status='unsubscribed', updated_at=now)
+        if skipped:
+            SequenceStepExecution.objects.filter(id__in=skipped).update(status='skipped', updated_at=now)
+        report['skipped'] += len(skipped)
+        return sendable
+
+    def _send_executions(self, executions, report):
+        from crm_app.models import EmailLog, SequenceStepExecution
+        from crm_app.services.email_log_batch import EmailLogBatch
+
+        service = self.email_service
+        batch = EmailLogBatch(flush_size=len(executions) + 1)
+        jobs = []
+        credentials = {}
+
+        # Render and build every message here; the send threads do no database work
+        for execution in executions:
+            enrollment = execution.enrollment
+            template = execution.step.email_template
+            try:
+                rendered = template.render({
+                    'contact': enrollment.contact,
+                    'company': enrollment.company,
+                    'sequence': enrollment.sequence,
+                })
+            except Exception as e:
+                logger.error(f"Failed to render template for execution {execution.id}: {e}")
+                execution.status = 'failed'
+                execution.error_message = f"Template rendering error: {str(e)}"
+                report['failed'] += 1
+                continue
+
+            from_email = service._get_sequence_sender(enrollment.sequence.sequence_type)
+            if from_email not in credentials:
+                credentials[from_email] = service._smtp_credentials_for_sender(from_email)
+
+            email_log = EmailLog(
+                company=enrollment.company,
+                contact=enrollment.contact,
+                email_type='sequence',
+                template_used=template,
+                from_email=from_email,
+                to_email=enrollment.contact.email,
+                subject=rendered['subject'],
+                body_html=rendered['body_html'],
+                body_text=rendered['body_text'],
+                status='pending',
+            )
+            try:
+                batch.add(email_log, log_owner=execution)
+                message = service._build_message(email_log, rendered['body_html'])
+            except Exception as e:
+                self._mark_failed(execution, str(e), report)
+                continue
+            jobs.append((execution, email_log, message))
+
+        errors = self._deliver(jobs, credentials, report)
+
+        sent_at = timezone.now()
+        for execution, email_log, message in jobs:
+            error = errors.get(execution.id)
+            if error is None:
+                email_log.status = 'sent'
+                email_log.sent_at = sent_at
+                email_log.message_id = message.extra_headers['Message-ID']
+                execution.status = 'sent'
+                execution.sent_at = sent_at
+                report['sent'] += 1
+            else:
+                email_log.status = 'failed'
+                email_log.error_message = error
+                self._mark_failed(execution, error, report)
+
+        batch.flush()
+        for execution in executions:
+            execution.updated_at = sent_at
+        SequenceStepExecution.objects.bulk_update(
+            executions, ['status', 'sent_at', 'email_log', 'error_message', 'updated_at'],
+        )
+
+        for execution in executions:
+            if execution.status == 'sent':
+                self._advance_enrollment(execution)
+
+    def _mark_failed(self, execution, error, report):
+        """Failed send: back in the queue, or failed for good after 3 attempts"""
+        logger.error(f"Failed to execute sequence step {execution.id}: {error}")
+        execution.error_message = error
+        if execution.attempt_count < 3:
+            execution.status = 'scheduled'
+            logger.info(f"Execution {execution.id} will be retried (attempt {execution.attempt_count}/3)")
+        else:
+            execution.status = 'failed'
+            logger.warning(f"Execution {execution.id} failed after 3 attempts, giving up")
+        report['failed'] += 1
+
+    def _deliver(self, jobs, credentials, report):
+        """Send the built messages on the thread pool; returns {execution id: error}"""
+        if not jobs:
+            return {}
+        workers = min(self.concurrency, len(jobs))
+        chunks = [jobs[index::workers] for index in range(workers)]
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sequence-send') as executor:
+            for chunk_errors, opened in executor.map(lambda chunk: self._send_chunk(chunk, credentials), chunks):
+                errors.update(chunk_errors)
+                report['smtp_connections'] += opened
+        return errors
+
+    @staticmethod
+    def _send_chunk(chunk, credentials):
+        """One worker thread: SMTP only, one pooled connection per sender"""
+        from crm_app.services.smtp_pool import SMTPConnectionPool
+
+        pool = SMTPConnectionPool()
+        errors = {}
+        try:
+            for execution, email_log, message in chunk:
+                try:
+                    message.connection = (
+                        pool.sender_connection(email_log.from_email, credentials.get) or pool.default_connection()
+                    )
+                    message.send(fail_silently=False)
+                except Exception as e:
+                    errors[execution.id] = str(e)
+        finally:
+            pool.close()
+        return errors, pool.stats['opened']
+
+    def _advance_enrollment(self, execution):
+        """Schedule the next step after a sent one, or complete the enrollment"""
+        enrollment = execution.enrollment
+        if not enrollment.started_at:
+            enrollment.started_at = execution.sent_at
+
+        next_step_number = execution.step.step_number + 1
+        if self.email_service.schedule_step_execution(enrollment, next_step_number):
+            enrollment.current_step_number = next_step_number
+            logger.info(f"Scheduled next step {next_step_number} for enrollment {enrollment.id}")
+        else:
+            enrollment.status = 'completed'
+            enrollment.completed_at = timezone.now()
+            logger.info(f"Enrollment {enrollment.id} completed - no more steps")
+        enrollment.save()
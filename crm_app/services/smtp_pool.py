@@ -0,0 +1,128 @@
+"""
+SMTP Connection Pool for BMAsia CRM
+
+Batch senders (campaigns, sequence runs, reminder batches, offline alerts) used
+to open a new SMTP connection - TLS handshake plus login - for every email.
+The pool keeps one authenticated connection per set of sender credentials open
+for the duration of a batch:
+
+    from crm_app.services.email_service import email_service
+
+    with email_service.smtp_pool():
+        for contact in contacts:
+            email_service.send_email(...)   # reuses the pooled connections
+
+Inside the block, EmailService._get_smtp_connection_for_sender() returns pooled
+per-user connections (the User credential lookup runs once per sender) and
+send_email() without an explicit connection uses the pooled default one.
+
+Connections idle for longer than SMTP_POOL_MAX_IDLE seconds are closed before
+reuse (servers drop idle sessions), and a send that fails with
+SMTPServerDisconnected is retried once on a fresh connection.
+"""
+
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY = ('default',)
+
+
+class PooledConnection:
+    """
+    Wraps an email backend, keeping it open between sends and reconnecting once
+    if the server dropped the session. Usable anywhere a Django email
+    connection is expected (EmailMessage(connection=...)).
+    """
+
+    def __init__(self, backend, pool):
+        self.backend = backend
+        self.pool = pool
+        self.is_open = False
+        self.last_used = None
+
+    def open(self):
+        if not self.is_open:
+            self.backend.open()
+            self.is_open = True
+            self.pool.stats['opened'] += 1
+        return True
+
+    def close(self):
+        if self.is_open:
+            try:
+                self.backend.close()
+            except Exception as e:
+                logger.debug(f"Error closing pooled SMTP connection: {e}")
+            self.is_open = False
+
+    def send_messages(self, email_messages):
+        reused = self.is_open
+        self.open()
+        try:
+            sent = self.backend.send_messages(email_messages)
+        except smtplib.SMTPServerDisconnected:
+            logger.info("Pooled SMTP connection was dropped by the server, reconnecting")
+            self.close()
+            self.pool.stats['reconnected'] += 1
+            self.open()
+            sent = self.backend.send_messages(email_messages)
+        if reused:
+            self.pool.stats['reused'] += 1
+        self.last_used = self.pool.clock()
+        return sent
+
+
+class SMTPConnectionPool:
+    """
+    Connections keyed by sender credentials, kept open until close() or until
+    idle for longer than `max_idle` seconds.
+    """
+
+    def __init__(self, max_idle=None, clock=time.monotonic):
+        self.max_idle = max_idle if max_idle is not None else getattr(settings, 'SMTP_POOL_MAX_IDLE', 60)
+        self.clock = clock
+        self._connections = {}
+        self._sender_keys = {}
+        self.stats = {'opened': 0, 'reused': 0, 'reconnected': 0, 'expired': 0}
+
+    def _checkout(self, key, factory):
+        connection = self._connections.get(key)
+        if connection is None:
+            connection = PooledConnection(factory(), self)
+            self._connections[key] = connection
+        elif connection.is_open and connection.last_used is not None \
+                and self.clock() - connection.last_used > self.max_idle:
+            connection.close()
+            self.stats['expired'] += 1
+        return connection
+
+    def default_connection(self):
+        """Pooled connection for the default EMAIL_BACKEND settings."""
+        return self._checkout(DEFAULT_KEY, lambda: get_connection(fail_silently=False))
+
+    def sender_connection(self, sender_email, lookup_credentials):
+        """
+        Pooled connection for a sender's own SMTP credentials, or None when the
+        sender has none. `lookup_credentials(sender_email)` returns a
+        get_connection() kwargs dict (or None) and runs once per sender.
+        """
+        if sender_email not in self._sender_keys:
+            credentials = lookup_credentials(sender_email)
+            self._sender_keys[sender_email] = (
+                tuple(sorted(credentials.items())) if credentials else None
+            )
+        key = self._sender_keys[sender_email]
+        if key is None:
+            return None
+        return self._checkout(key, lambda: get_connection(**dict(key)))
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
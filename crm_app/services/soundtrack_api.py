@@ -1,8 +1,14 @@
 """Soundtrack Your Brand API integration service"""
+import itertools
 import os
+import time
 import requests
 import base64
-from typing import Dict, List, Optional
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 from django.utils import timezone
 import logging
@@ -10,6 +16,109 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class SoundtrackAPIError(Exception):
+    """A page of a paginated Soundtrack API fetch could not be loaded."""
+
+
+ZONE_FIELDS_FRAGMENT = """
+fragment ZoneFields on SoundZone {
+    id
+    name
+    isPaired
+    device {
+        id
+        name
+    }
+    schedule {
+        id
+        name
+    }
+    playFrom {
+        __typename
+        ... on Playlist {
+            id
+            name
+        }
+        ... on Schedule {
+            id
+            name
+        }
+    }
+}
+"""
+
+ACCOUNT_LOCATIONS_QUERY = """
+query($accountId: ID!, $first: Int!, $after: String) {
+    account(id: $accountId) {
+        id
+        businessName
+        locations(first: $first, after: $after) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            edges {
+                node {
+                    id
+                    name
+                    soundZones(first: $first) {
+                        pageInfo {
+                            hasNextPage
+                            endCursor
+                        }
+                        edges {
+                            node {
+                                ...ZoneFields
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+""" + ZONE_FIELDS_FRAGMENT
+
+LOCATION_ZONES_QUERY = """
+query($locationId: ID!, $first: Int!, $after: String) {
+    location(id: $locationId) {
+        soundZones(first: $first, after: $after) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            edges {
+                node {
+                    ...ZoneFields
+                }
+            }
+        }
+    }
+}
+""" + ZONE_FIELDS_FRAGMENT
+
+ACCOUNTS_QUERY = """
+query($first: Int!, $after: String) {
+    me {
+        ... on PublicAPIClient {
+            accounts(first: $first, after: $after) {
+                pageInfo {
+                    hasNextPage
+                    endCursor
+                }
+                edges {
+                    node {
+                        id
+                        businessName
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
 class SoundtrackAPIService:
     """Service to interact with Soundtrack Your Brand API"""
     
@@ -18,10 +127,41 @@ class SoundtrackAPIService:
         self.api_token = os.environ.get('SOUNDTRACK_API_TOKEN', '')
         self.client_id = os.environ.get('SOUNDTRACK_CLIENT_ID', '')
         self.client_secret = os.environ.get('SOUNDTRACK_CLIENT_SECRET', '')
-        self.base_url = 'https://api.soundtrackyourbrand.com/v2'
+        self.base_url = os.environ.get('SOUNDTRACK_API_URL', 'https://api.soundtrackyourbrand.com/v2')
+        self._session = None
+        self.last_sync_report = None
         
         if not all([self.api_token]):
             logger.warning("Soundtrack API token not configured")
+
+    @property
+    def session(self) -> requests.Session:
+        """Shared keep-alive session; retries 429/5xx responses and read errors with backoff.
+
+        Connection failures (DNS, refused) are not retried, so company saves that
+        auto-sync zones still fail fast while the API is unreachable.
+
+        Thread-safe for the concurrent fetches in sync_all_zones (its pool is sized
+        for SOUNDTRACK_SYNC_CONCURRENCY connections).
+        """
+        if self._session is None:
+            retry = Retry(
+                total=getattr(settings, 'SOUNDTRACK_API_RETRIES', 3),
+                connect=0,
+                backoff_factor=getattr(settings, 'SOUNDTRACK_API_BACKOFF', 0.5),
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,  # GraphQL queries are POSTs but read-only
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                max_retries=retry,
+                pool_maxsize=max(getattr(settings, 'SOUNDTRACK_SYNC_CONCURRENCY', 8), 10),
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
     
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests"""
@@ -39,7 +179,7 @@ class SoundtrackAPIService:
                 'variables': variables or {}
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
                 json=payload,
                 headers=self._get_headers(),
@@ -62,62 +202,20 @@ class SoundtrackAPIService:
             return None
     
     def get_account_info(self) -> Optional[Dict]:
-        """Get current account information"""
-        query = """
-        query {
-            me {
-                ... on PublicAPIClient {
-                    accounts(first: 10) {
-                        edges {
-                            node {
-                                id
-                                businessName
-                                locations(first: 100) {
-                                    edges {
-                                        node {
-                                            id
-                                            name
-                                            soundZones(first: 100) {
-                                                edges {
-                                                    node {
-                                                        id
-                                                        name
-                                                        isPaired
-                                                        device {
-                                                            id
-                                                            name
-                                                        }
-                                                        schedule {
-                                                            id
-                                                            name
-                                                        }
-                                                        playFrom {
-                                                            __typename
-                                                            ... on Playlist {
-                                                                id
-                                                                name
-                                                            }
-                                                            ... on Schedule {
-                                                                id
-                                                                name
-                                                            }
-                                                        }
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
-        return self._make_graphql_query(query)
-    
+        """Accounts of the API client with all their zones (every page), or None if the accounts query fails"""
+        accounts = []
+        try:
+            for account in self._iter_accounts():
+                accounts.append({
+                    'id': account['id'],
+                    'businessName': account.get('businessName', 'Unknown Business'),
+                    'zones': self._get_specific_account_zones(account['id']),
+                })
+        except SoundtrackAPIError as e:
+            logger.error(str(e))
+            return None
+        return {'accounts': accounts}
+
     def get_account_zones(self, account_id: str = None) -> List[Dict]:
         """Get zones for a specific account or all accounts if no account_id provided"""
         if account_id:
@@ -128,171 +226,134 @@ class SoundtrackAPIService:
             return self._get_all_account_zones()
     
     def _get_specific_account_zones(self, account_id: str) -> List[Dict]:
-        """Get zones for a specific account ID using direct account query"""
-        query = """
-        query($accountId: ID!) {
-            account(id: $accountId) {
-                id
-                businessName
-                locations(first: 100) {
-                    edges {
-                        node {
-                            id
-                            name
-                            soundZones(first: 100) {
-                                edges {
-                                    node {
-                                        id
-                                        name
-                                        isPaired
-                                        device {
-                                            id
-                                            name
-                                        }
-                                        schedule {
-                                            id
-                                            name
-                                        }
-                                        playFrom {
-                                            __typename
-                                            ... on Playlist {
-                                                id
-                                                name
-                                            }
-                                            ... on Schedule {
-                                                id
-                                                name
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        """
-        
-        variables = {"accountId": account_id}
-        result = self._make_graphql_query(query, variables)
-        
-        if not result or 'account' not in result:
-            logger.error(f"Failed to get account info for ID: {account_id}")
-            return []
-        
-        zones = []
-        account = result['account']
-        business_name = account.get('businessName', 'Unknown Business')
-        
-        # Iterate through all locations in this account
-        for location_edge in account.get('locations', {}).get('edges', []):
-            location = location_edge['node']
-            location_name = location.get('name', 'Unknown Location')
-            
-            # Iterate through all sound zones in this location
-            for zone_edge in location.get('soundZones', {}).get('edges', []):
-                zone = zone_edge['node']
-                
-                # Determine zone status based on isPaired and device presence
-                if zone.get('isPaired', False) and zone.get('device'):
-                    status = 'online'
-                    is_online = True
-                elif zone.get('device'):
-                    status = 'offline'  # Has device but not paired
-                    is_online = False
-                else:
-                    status = 'no_device'
-                    is_online = False
-                
-                # Get schedule and playFrom information
-                schedule_name = zone.get('schedule', {}).get('name', '') if zone.get('schedule') else ''
-                play_from = zone.get('playFrom', {})
-                play_from_type = play_from.get('__typename', '') if play_from else ''
-                play_from_name = play_from.get('name', '') if play_from else ''
-                
-                zones.append({
-                    'id': zone['id'],
-                    'name': f"{location_name} - {zone['name']}",
-                    'zone_name': zone['name'],
-                    'location_name': location_name,
-                    'account_name': business_name,
-                    'account_id': account_id,
-                    'is_online': is_online,
-                    'is_paired': zone.get('isPaired', False),
-                    'device_name': zone.get('device', {}).get('name', '') if zone.get('device') else '',
-                    'device_id': zone.get('device', {}).get('id', '') if zone.get('device') else '',
-                    'status': status,
-                    'schedule_name': schedule_name,
-                    'play_from_type': play_from_type,
-                    'play_from_name': play_from_name,
-                    'currently_playing': f"{play_from_type}: {play_from_name}" if play_from_name else 'No active playlist/schedule',
-                })
-        
-        return zones
-    
-    def _get_all_account_zones(self) -> List[Dict]:
-        """Get zones for all accounts using me query"""
-        account_info = self.get_account_info()
-        
-        if not account_info or 'me' not in account_info:
-            logger.error("Failed to get account info")
+        """Get zones for a specific account ID (all pages), or [] if the account query fails"""
+        try:
+            return list(self.iter_account_zones(account_id))
+        except SoundtrackAPIError as e:
+            logger.error(str(e))
             return []
-        
-        zones = []
-        me = account_info['me']
-        
-        # Iterate through all accounts
-        for account_edge in me.get('accounts', {}).get('edges', []):
-            account = account_edge['node']
-            current_account_id = account['id']
+
+    def iter_account_zones(self, account_id: str, page_size: int = None) -> Iterator[Dict]:
+        """Yield the zones of an account, following pageInfo.endCursor for locations and sound zones.
+
+        Yields nothing if the first request fails (as the unpaginated query did).
+        Raises SoundtrackAPIError if a later page fails, so callers never act on a
+        silently truncated zone list (e.g. orphaning the zones of missing pages).
+        """
+        page_size = page_size or getattr(settings, 'SOUNDTRACK_API_PAGE_SIZE', 100)
+        after = None
+        first_page = True
+
+        while True:
+            result = self._make_graphql_query(
+                ACCOUNT_LOCATIONS_QUERY, {'accountId': account_id, 'first': page_size, 'after': after}
+            )
+            if not result or not result.get('account'):
+                if first_page:
+                    logger.error(f"Failed to get account info for ID: {account_id}")
+                    return
+                raise SoundtrackAPIError(f"Failed to get locations page after {after} for account {account_id}")
+            first_page = False
+
+            account = result['account']
             business_name = account.get('businessName', 'Unknown Business')
-            
-            # Iterate through all locations in this account
-            for location_edge in account.get('locations', {}).get('edges', []):
+            locations = account.get('locations') or {}
+
+            for location_edge in locations.get('edges', []):
                 location = location_edge['node']
                 location_name = location.get('name', 'Unknown Location')
-                
-                # Iterate through all sound zones in this location
-                for zone_edge in location.get('soundZones', {}).get('edges', []):
-                    zone = zone_edge['node']
-                    
-                    # Determine zone status based on isPaired and device presence
-                    if zone.get('isPaired', False) and zone.get('device'):
-                        status = 'online'
-                        is_online = True
-                    elif zone.get('device'):
-                        status = 'offline'  # Has device but not paired
-                        is_online = False
-                    else:
-                        status = 'no_device'
-                        is_online = False
-                    
-                    # Get schedule and playFrom information
-                    schedule_name = zone.get('schedule', {}).get('name', '') if zone.get('schedule') else ''
-                    play_from = zone.get('playFrom', {})
-                    play_from_type = play_from.get('__typename', '') if play_from else ''
-                    play_from_name = play_from.get('name', '') if play_from else ''
-                    
-                    zones.append({
-                        'id': zone['id'],
-                        'name': f"{location_name} - {zone['name']}",
-                        'zone_name': zone['name'],
-                        'location_name': location_name,
-                        'account_name': business_name,
-                        'account_id': current_account_id,
-                        'is_online': is_online,
-                        'is_paired': zone.get('isPaired', False),
-                        'device_name': zone.get('device', {}).get('name', '') if zone.get('device') else '',
-                        'device_id': zone.get('device', {}).get('id', '') if zone.get('device') else '',
-                        'status': status,
-                        'schedule_name': schedule_name,
-                        'play_from_type': play_from_type,
-                        'play_from_name': play_from_name,
-                        'currently_playing': f"{play_from_type}: {play_from_name}" if play_from_name else 'No active playlist/schedule',
-                    })
-        
+                for zone in self._iter_location_zones(location, page_size):
+                    yield self._zone_dict(zone, location_name, business_name, account_id)
+
+            page_info = locations.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return
+            after = page_info.get('endCursor')
+
+    def _iter_location_zones(self, location: Dict, page_size: int) -> Iterator[Dict]:
+        """Sound zones of a location: the first page comes with the location, the rest are fetched."""
+        sound_zones = location.get('soundZones') or {}
+        while True:
+            for zone_edge in sound_zones.get('edges', []):
+                yield zone_edge['node']
+
+            page_info = sound_zones.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return
+            after = page_info.get('endCursor')
+            result = self._make_graphql_query(
+                LOCATION_ZONES_QUERY, {'locationId': location['id'], 'first': page_size, 'after': after}
+            )
+            if not result or not result.get('location'):
+                raise SoundtrackAPIError(f"Failed to get sound zones page after {after} for location {location['id']}")
+            sound_zones = result['location'].get('soundZones') or {}
+
+    @staticmethod
+    def _zone_dict(zone: Dict, location_name: str, business_name: str, account_id: str) -> Dict:
+        """Normalise an API sound zone into the dict stored as Zone.api_raw_data"""
+        # Determine zone status based on isPaired and device presence
+        if zone.get('isPaired', False) and zone.get('device'):
+            status = 'online'
+            is_online = True
+        elif zone.get('device'):
+            status = 'offline'  # Has device but not paired
+            is_online = False
+        else:
+            status = 'no_device'
+            is_online = False
+
+        # Get schedule and playFrom information
+        schedule_name = zone.get('schedule', {}).get('name', '') if zone.get('schedule') else ''
+        play_from = zone.get('playFrom', {})
+        play_from_type = play_from.get('__typename', '') if play_from else ''
+        play_from_name = play_from.get('name', '') if play_from else ''
+
+        return {
+            'id': zone['id'],
+            'name': f"{location_name} - {zone['name']}",
+            'zone_name': zone['name'],
+            'location_name': location_name,
+            'account_name': business_name,
+            'account_id': account_id,
+            'is_online': is_online,
+            'is_paired': zone.get('isPaired', False),
+            'device_name': zone.get('device', {}).get('name', '') if zone.get('device') else '',
+            'device_id': zone.get('device', {}).get('id', '') if zone.get('device') else '',
+            'status': status,
+            'schedule_name': schedule_name,
+            'play_from_type': play_from_type,
+            'play_from_name': play_from_name,
+            'currently_playing': f"{play_from_type}: {play_from_name}" if play_from_name else 'No active playlist/schedule',
+        }
+    
+    def _get_all_account_zones(self) -> List[Dict]:
+        """Get zones for all accounts of the API client (all pages of accounts, locations and zones)"""
+        zones = []
+        try:
+            for account in self._iter_accounts():
+                zones.extend(self._get_specific_account_zones(account['id']))
+        except SoundtrackAPIError as e:
+            logger.error(str(e))
         return zones
+
+    def _iter_accounts(self) -> Iterator[Dict]:
+        """Yield the accounts (id, businessName) of the API client, following pageInfo.endCursor"""
+        page_size = getattr(settings, 'SOUNDTRACK_API_PAGE_SIZE', 100)
+        after = None
+
+        while True:
+            result = self._make_graphql_query(ACCOUNTS_QUERY, {'first': page_size, 'after': after})
+            if not result or 'me' not in result:
+                raise SoundtrackAPIError("Failed to get account info")
+
+            accounts = (result['me'] or {}).get('accounts') or {}
+            for account_edge in accounts.get('edges', []):
+                yield account_edge['node']
+
+            page_info = accounts.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return
+            after = page_info.get('endCursor')
     
     def parse_zone_status(self, zone_data: Dict) -> Dict:
         """Parse zone data from API into our status format"""
@@ -326,101 +387,117 @@ class SoundtrackAPIService:
         3. CREATE: Only if no match found
         4. ORPHAN DETECTION: Mark zones not in API as orphaned
         """
-        from crm_app.models import Zone
-
         if not company.soundtrack_account_id:
             return 0, 0
 
-        # Get all zones from the API
-        api_zones = self.get_account_zones(company.soundtrack_account_id)
+        # Stream zones from the API page by page
+        api_zones = self.iter_account_zones(company.soundtrack_account_id)
+        try:
+            return self.apply_company_zones(company, api_zones)
+        except SoundtrackAPIError as e:
+            logger.error(f"Zone sync for {company.name} aborted, nothing written: {e}")
+            return 0, 1
+
+    def apply_company_zones(self, company, api_zones: Iterable[Dict], stats=None):
+        """Write zones fetched for a company to the database (see sync_company_zones)
+
+        `api_zones` may be a list or the iter_account_zones() generator, which is
+        consumed once. Matching and orphan detection run in memory; the writes are
+        one bulk_create and bulk_update per company, and zones whose API payload
+        did not change only get a heartbeat (see zone_sync.py). Created / changed /
+        unchanged / orphaned counts are added to the `stats` Counter if given.
+        """
+        from crm_app.services.zone_sync import ZoneReconciler
 
-        if not api_zones:
+        api_zones = iter(api_zones)
+        first_zone = next(api_zones, None)
+        if first_zone is None:
             logger.warning(f"No zones found for company {company.name}")
             return 0, 0
+        api_zones = itertools.chain([first_zone], api_zones)
 
-        # Track API zone IDs for orphan detection
-        api_zone_ids = set()
-
-        # Create or update zones based on API data
-        synced_count = 0
-        for api_zone in api_zones:
-            zone_name = api_zone.get('name', 'Unknown Zone')
-            zone_id = api_zone.get('id', '')
-
-            if zone_id:
-                api_zone_ids.add(zone_id)
-
-            # PRIMARY: Match by soundtrack_zone_id (most reliable)
-            zone = company.zones.filter(soundtrack_zone_id=zone_id).first() if zone_id else None
-
-            if not zone:
-                # FALLBACK: Match by name + platform (catches manually created zones)
-                zone = company.zones.filter(
-                    name=zone_name,
-                    platform='soundtrack'
-                ).first()
-
-            if not zone:
-                # CREATE: Only if no match found
-                zone = Zone.objects.create(
-                    company=company,
-                    name=zone_name,
-                    platform='soundtrack',
-                    soundtrack_zone_id=zone_id,
-                    status='pending'
-                )
-                logger.info(f"Created new zone: {zone_name} for {company.name}")
-
-            # Update zone with latest data from API
-            zone.soundtrack_zone_id = zone_id  # Ensure ID is set (links manual zones)
-            zone.name = zone_name  # Update name in case it changed in Soundtrack
-            zone.status = api_zone.get('status', 'offline')
-            zone.device_name = api_zone.get('device_name', '')
-            if api_zone.get('is_online'):
-                zone.last_seen_online = timezone.now()
-            zone.api_raw_data = api_zone
-            zone.last_api_sync = timezone.now()
-
-            # Unmark as orphaned if it was previously orphaned
-            if zone.is_orphaned:
-                zone.is_orphaned = False
-                zone.orphaned_at = None
-                logger.info(f"Zone {zone_name} found in API again - unmarking as orphaned")
-
-            zone.save()
-
-            synced_count += 1
-
-        # Detect orphaned zones (zones in DB but not in API)
-        db_zones = company.zones.filter(platform='soundtrack').exclude(soundtrack_zone_id='')
-        for db_zone in db_zones:
-            if db_zone.soundtrack_zone_id and db_zone.soundtrack_zone_id not in api_zone_ids:
-                if not db_zone.is_orphaned:
-                    db_zone.is_orphaned = True
-                    db_zone.orphaned_at = timezone.now()
-                    db_zone.save(update_fields=['is_orphaned', 'orphaned_at'])
-                    logger.warning(f"Zone {db_zone.name} not found in API - marked as orphaned")
-
-        logger.info(f"Synced {synced_count} zones for {company.name}")
+        reconciler = ZoneReconciler(company)
+        synced_count = reconciler.sync(api_zones)
+        if stats is not None:
+            stats.update(reconciler.stats)
+
+        counts = reconciler.stats
+        logger.info(
+            f"Synced {synced_count} zones for {company.name} "
+            f"({counts['created']} created, {counts['changed']} changed, {counts['unchanged']} unchanged)"
+        )
         return synced_count, 0
     
-    def sync_all_zones(self):
-        """Sync all zones for companies with Soundtrack account IDs"""
+    def _fetch_account_zones(self, account_id: str) -> List[Dict]:
+        """All zones of an account, for the fetch threads (a failed page raises)"""
+        return list(self.iter_account_zones(account_id))
+
+    def sync_all_zones(self, concurrency: int = None):
+        """Sync all zones for companies with Soundtrack account IDs
+
+        Accounts are fetched from the API by a pool of `concurrency` threads
+        (default SOUNDTRACK_SYNC_CONCURRENCY), with a new fetch submitted as each
+        one completes; zones are written to the database on the calling thread. Timings are kept in
+        self.last_sync_report.
+        """
         from crm_app.models import Company
         
-        companies = Company.objects.filter(
+        companies = list(Company.objects.filter(
             soundtrack_account_id__isnull=False
-        ).exclude(soundtrack_account_id='')
+        ).exclude(soundtrack_account_id=''))
+        if concurrency is None:
+            concurrency = getattr(settings, 'SOUNDTRACK_SYNC_CONCURRENCY', 8)
+        concurrency = max(1, concurrency)
         
         total_synced = 0
         total_errors = 0
-        
-        for company in companies:
-            synced, errors = self.sync_company_zones(company)
-            total_synced += synced
-            total_errors += errors
-        
-        logger.info(f"Total sync complete: {total_synced} synced, {total_errors} errors")
+        zone_stats = Counter()
+        write_seconds = 0.0
+        started = time.perf_counter()
+
+        # Threads only do HTTP; DB connections are per thread, so writes stay here
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='soundtrack-sync') as executor:
+            pending = iter(companies)
+            futures = {}
+
+            def submit_next():
+                company = next(pending, None)
+                if company is not None:
+                    futures[executor.submit(self._fetch_account_zones, company.soundtrack_account_id)] = company
+
+            # At most `concurrency` fetches in flight, so fetched zone lists
+            # never pile up faster than they are written
+            for _ in range(concurrency):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                company = futures.pop(future)
+                submit_next()
+                write_started = time.perf_counter()
+                try:
+                    synced, errors = self.apply_company_zones(company, future.result(), stats=zone_stats)
+                except Exception as e:
+                    logger.error(f"Error syncing zones for {company.name}: {e}", exc_info=True)
+                    synced, errors = 0, 1
+                write_seconds += time.perf_counter() - write_started
+                total_synced += synced
+                total_errors += errors
+
+        total_seconds = time.perf_counter() - started
+        self.last_sync_report = {
+            'companies': len(companies),
+            'concurrency': concurrency,
+            'synced': total_synced,
+            'errors': total_errors,
+            'created': zone_stats['created'],
+            'changed': zone_stats['changed'],
+            'unchanged': zone_stats['unchanged'],
+            'orphaned': zone_stats['orphaned'],
+            'total_seconds': round(total_seconds, 2),
+            'db_write_seconds': round(write_seconds, 2),
+        }
+        logger.info(f"Total sync complete: {total_synced} synced, {total_errors} errors ({self.last_sync_report})")
         return total_synced, total_errors
 
 
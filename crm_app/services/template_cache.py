@@ -0,0 +1,116 @@
+"""
+Compiled EmailTemplate cache for BMAsia CRM
+
+EmailTemplate.render() used to build three django.template.Template objects
+(subject, body_text, body_html) on every call, so a campaign or reminder run
+re-parsed the same template once per recipient. The compiled templates are now
+kept in a process-level LRU cache keyed by (template id, updated_at):
+
+    compiled = template_cache.get(email_template)
+    rendered = compiled.render({'contact_name': 'Khun Ann'})
+
+    # or, through the model
+    email_template.render(context)
+    email_template.render(contexts, many=True)   # one lookup for the whole batch
+
+EmailTemplate.save() and delete() invalidate the template's entries in this
+process. Other processes pick up an edit because saving moves updated_at and
+therefore the key; their stale entry ages out of the LRU. Writes that bypass
+save() (QuerySet.update) must call template_cache.invalidate() themselves.
+
+Unsaved templates (previews) are compiled without being cached. The cache
+holds EMAIL_TEMPLATE_CACHE_SIZE templates; 0 disables it.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Template
+
+from crm_app.utils.email_utils import text_to_html
+
+
+class CompiledEmailTemplate:
+    """Subject, text and HTML bodies of one EmailTemplate, parsed once"""
+
+    __slots__ = ('subject', 'body_text', 'body_html')
+
+    def __init__(self, email_template):
+        self.subject = Template(email_template.subject)
+        self.body_text = Template(email_template.body_text)
+        has_html = email_template.body_html and email_template.body_html.strip() != ''
+        self.body_html = Template(email_template.body_html) if has_html else None
+
+    def render(self, context):
+        """Same output as EmailTemplate.render(context)"""
+        context = Context(context)
+        rendered_subject = self.subject.render(context)
+        rendered_text = self.body_text.render(context)
+        if self.body_html is None:
+            # Generate HTML from text if HTML is empty
+            rendered_html = text_to_html(rendered_text)
+        else:
+            rendered_html = self.body_html.render(context)
+        return {
+            'subject': rendered_subject,
+            'body_html': rendered_html,
+            'body_text': rendered_text,
+        }
+
+
+class CompiledTemplateCache:
+    """Thread-safe LRU of CompiledEmailTemplate keyed by (template id, updated_at)"""
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return getattr(settings, 'EMAIL_TEMPLATE_CACHE_SIZE', 128)
+
+    def get(self, email_template):
+        if email_template._state.adding or email_template.pk is None or not self.maxsize:
+            return CompiledEmailTemplate(email_template)
+
+        key = (email_template.pk, email_template.updated_at)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        # Compiled outside the lock; a concurrent miss for the same key just compiles twice
+        compiled = CompiledEmailTemplate(email_template)
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, template_id):
+        """Drop every cached version of one template"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == template_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-level instance used by EmailTemplate.render()
+template_cache = CompiledTemplateCache()
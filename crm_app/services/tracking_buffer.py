@@ -0,0 +1,395 @@
+"""
+Write-behind buffers for email open and click tracking in BMAsia CRM
+
+The tracking pixel (/t/<token>/) used to SELECT and UPDATE the EmailLog on
+every image load, and a campaign landing in thousands of inboxes turned into
+thousands of synchronous writes. Pixel loads and link clicks (/c/<token>/) are
+now queued in the shared cache and applied to the database in batches:
+
+    # tracking views: cache operations only, no database access
+    open_tracking_buffer.record(tracking_token)
+    click_tracking_buffer.record(tracking_token, url)
+
+    # flush_email_tracking command (cron or --loop worker)
+    opened = open_tracking_buffer.flush()
+    clicks = click_tracking_buffer.flush()
+
+Events are queued into time buckets of EMAIL_TRACKING_BUCKET_SECONDS and
+flush() only drains closed buckets, so it never races a request that is still
+writing into one. Opens are deduplicated per token for OPEN_TRACKING_DEDUP_TTL
+seconds; every click is kept (EmailClick rows).
+
+Applying a batch updates EmailLog, moves the matching CampaignRecipient rows
+forward ('opened' / 'clicked') and bumps the campaign counters with one F()
+update per campaign and previous status (EmailCampaign.bump_counters).
+Each batch's events are removed from the cache as soon as the batch is applied,
+so a flush that fails part way is retried from the first batch it did not
+apply and no EmailClick is inserted twice. An event whose tracking token has no EmailLog yet is queued again until it
+is EMAIL_TRACKING_REQUEUE_SECONDS old, then dropped.
+
+Buffering needs a cache shared by the web and worker processes (Redis), so it
+is enabled by EMAIL_TRACKING_BUFFERED, which defaults to on when REDIS_URL is
+set. Without it record() applies the event immediately.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Seconds a closed bucket is left alone for requests still writing into it
+BUCKET_GRACE_SECONDS = 5
+
+# Campaign recipient statuses an open / a click moves forward
+# (see CampaignRecipient.mark_as_opened and mark_as_clicked)
+OPENABLE_RECIPIENT_STATUSES = ('sent', 'delivered')
+CLICKABLE_RECIPIENT_STATUSES = ('sent', 'delivered', 'opened')
+
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+def _bump_recipients(recipients, to_status):
+    """Bulk-save recipients moved to `to_status` and bump their campaign counters"""
+    from crm_app.models import CampaignRecipient, EmailCampaign
+
+    transitions = Counter()
+    for recipient in recipients:
+        transitions[(recipient.campaign_id, recipient.status)] += 1
+        recipient.status = to_status
+    if recipients:
+        CampaignRecipient.objects.bulk_update(recipients, ['status', 'opened_at', 'clicked_at'])
+
+    for (campaign_id, from_status), count in transitions.items():
+        EmailCampaign.bump_counters(campaign_id, from_status, to_status, count=count)
+
+
+def apply_opens(opens, unknown=None):
+    """
+    Record a batch of opens. `opens` maps tracking token -> first open time.
+    Returns the number of EmailLogs marked as opened; tokens with no EmailLog
+    are added to the `unknown` set if given.
+    """
+    from crm_app.models import CampaignRecipient, EmailLog
+
+    if not opens:
+        return 0
+
+    logs = list(
+        EmailLog.objects.filter(tracking_token__in=list(opens))
+        .only('id', 'tracking_token', 'status', 'opened_at')
+    )
+    if unknown is not None:
+        unknown.update(set(opens) - {log.tracking_token for log in logs})
+    logs = [log for log in logs if log.opened_at is None]
+    if not logs:
+        return 0
+
+    opened_at_by_log = {}
+    for log in logs:
+        log.opened_at = opens[log.tracking_token]
+        if log.status in ('sent', 'pending'):
+            log.status = 'opened'
+        opened_at_by_log[log.pk] = log.opened_at
+
+    with transaction.atomic():
+        EmailLog.objects.bulk_update(logs, ['opened_at', 'status'])
+
+        recipients = list(
+            CampaignRecipient.objects.filter(
+                email_log_id__in=list(opened_at_by_log),
+                status__in=OPENABLE_RECIPIENT_STATUSES,
+            ).only('id', 'campaign_id', 'email_log_id', 'status', 'opened_at', 'clicked_at')
+        )
+        for recipient in recipients:
+            recipient.opened_at = recipient.opened_at or opened_at_by_log[recipient.email_log_id]
+        _bump_recipients(recipients, 'opened')
+
+    return len(logs)
+
+
+def apply_clicks(clicks, unknown=None):
+    """
+    Record a batch of clicks: (tracking token, url, clicked_at) tuples.
+    Inserts one EmailClick per click on a known EmailLog and returns their number;
+    clicks on a token with no EmailLog are appended to the `unknown` list if given.
+    """
+    from crm_app.models import CampaignRecipient, EmailClick, EmailLog
+
+    if not clicks:
+        return 0
+
+    logs = {
+        log.tracking_token: log
+        for log in EmailLog.objects.filter(tracking_token__in={token for token, _, _ in clicks})
+        .only('id', 'tracking_token', 'status', 'opened_at', 'clicked_at')
+    }
+    if unknown is not None:
+        unknown.extend(click for click in clicks if click[0] not in logs)
+    events = [
+        EmailClick(email_log=logs[token], url=url, clicked_at=clicked_at)
+        for token, url, clicked_at in sorted(clicks, key=lambda click: click[2])
+        if token in logs
+    ]
+    if not events:
+        return 0
+
+    first_click = {}
+    for event in events:
+        first_click.setdefault(event.email_log_id, event.clicked_at)
+    first_clicked = []
+    for log in logs.values():
+        if log.pk not in first_click or log.clicked_at:
+            continue
+        log.clicked_at = first_click[log.pk]
+        log.opened_at = log.opened_at or log.clicked_at
+        if log.status in ('sent', 'pending', 'opened'):
+            log.status = 'clicked'
+        first_clicked.append(log)
+
+    with transaction.atomic():
+        EmailClick.objects.bulk_create(events)
+        if first_clicked:
+            EmailLog.objects.bulk_update(first_clicked, ['clicked_at', 'opened_at', 'status'])
+
+        recipients = list(
+            CampaignRecipient.objects.filter(
+                email_log_id__in=list(first_click),
+                status__in=CLICKABLE_RECIPIENT_STATUSES,
+            ).only('id', 'campaign_id', 'email_log_id', 'status', 'opened_at', 'clicked_at')
+        )
+        for recipient in recipients:
+            recipient.clicked_at = recipient.clicked_at or first_click[recipient.email_log_id]
+            recipient.opened_at = recipient.opened_at or recipient.clicked_at
+        _bump_recipients(recipients, 'clicked')
+
+    return len(events)
+
+
+class CacheEventBuffer:
+    """
+    Queue of tracking events in time buckets of the shared cache. Subclasses
+    set `name`, turn events into cache values in record() and apply a batch
+    of drained values in apply_batch().
+    """
+
+    name = None
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias or getattr(settings, 'EMAIL_TRACKING_CACHE_ALIAS', 'default')]
+
+    @property
+    def buffered(self):
+        return getattr(settings, 'EMAIL_TRACKING_BUFFERED', False)
+
+    @property
+    def bucket_seconds(self):
+        return getattr(settings, 'EMAIL_TRACKING_BUCKET_SECONDS', 60)
+
+    @property
+    def retention(self):
+        return getattr(settings, 'EMAIL_TRACKING_RETENTION', 7 * 86400)
+
+    @property
+    def requeue_seconds(self):
+        return getattr(settings, 'EMAIL_TRACKING_REQUEUE_SECONDS', 900)
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def _key(self, *parts):
+        return ':'.join([f'{self.name}-tracking', *map(str, parts)])
+
+    def _count_key(self, bucket):
+        return self._key('count', bucket)
+
+    def _slot_key(self, bucket, slot):
+        return self._key('slot', bucket, slot)
+
+    def _incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Key missing (first event in this bucket): create it, then retry once
+            if self.cache.add(key, 1, timeout=self.retention):
+                return 1
+            return self.cache.incr(key)
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def push(self, value, now):
+        bucket = int(now // self.bucket_seconds)
+        slot = self._incr(self._count_key(bucket))
+        self.cache.set(self._slot_key(bucket, slot), value, timeout=self.retention)
+
+    def _closed_buckets(self, now):
+        """Buckets not flushed yet whose time window ended at least the grace period ago"""
+        end = int((now - BUCKET_GRACE_SECONDS) // self.bucket_seconds)
+        oldest = int((now - self.retention) // self.bucket_seconds)
+        flushed_through = self.cache.get(self._key('flushed-through'))
+        start = oldest if flushed_through is None else max(flushed_through + 1, oldest)
+        return range(start, end)
+
+    def pending(self, now=None):
+        """Number of queued events waiting in closed buckets"""
+        now = time.time() if now is None else now
+        buckets = self._closed_buckets(now)
+        counts = self.cache.get_many([self._count_key(bucket) for bucket in buckets])
+        return sum(counts.values())
+
+    def requeue(self, values, now):
+        """
+        Queue events again whose EmailLog does not exist (yet), until they are
+        requeue_seconds old. Values end with the event time. Returns the
+        events dropped as too old.
+        """
+        dropped = []
+        for value in values:
+            if now - value[-1] > self.requeue_seconds:
+                dropped.append(value)
+            else:
+                self.push(value, now)
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} {self.name} events for unknown tracking tokens")
+        return dropped
+
+    def apply_batch(self, values, now):
+        raise NotImplementedError
+
+    def flush(self, now=None):
+        """
+        Apply every closed bucket to the database in batches of
+        EMAIL_TRACKING_FLUSH_BATCH_SIZE. Returns the sum of apply_batch()
+        results; 0 if another flush holds the lock.
+        """
+        now = time.time() if now is None else now
+        lock_key = self._key('flush-lock')
+        if not self.cache.add(lock_key, 1, timeout=300):
+            logger.info(f"{self.name.capitalize()} tracking flush already running, skipping")
+            return 0
+
+        try:
+            buckets = self._closed_buckets(now)
+            if not buckets:
+                return 0
+
+            count_keys = {self._count_key(bucket): bucket for bucket in buckets}
+            counts = self.cache.get_many(list(count_keys))
+            slot_keys = [
+                self._slot_key(count_keys[key], slot)
+                for key, count in counts.items()
+                for slot in range(1, count + 1)
+            ]
+
+            batch_size = getattr(settings, 'EMAIL_TRACKING_FLUSH_BATCH_SIZE', 500)
+            applied = 0
+            for start in range(0, len(slot_keys), batch_size):
+                batch_keys = slot_keys[start:start + batch_size]
+                values = self.cache.get_many(batch_keys).values()
+                applied += self.apply_batch(list(values), now)
+                self.cache.delete_many(batch_keys)
+
+            self.cache.set(self._key('flushed-through'), buckets[-1], timeout=None)
+            self.cache.delete_many(list(counts))
+            if slot_keys:
+                logger.info(f"Flushed {len(slot_keys)} queued {self.name} events, {applied} applied")
+            return applied
+        finally:
+            self.cache.delete(lock_key)
+
+
+class OpenTrackingBuffer(CacheEventBuffer):
+    """Tracking pixel loads, deduplicated per token"""
+
+    name = 'open'
+
+    def record(self, token, now=None):
+        """
+        Record one pixel load. Returns False for malformed tokens and for
+        repeat loads of a token already recorded within the dedup window.
+        """
+        if not TOKEN_PATTERN.match(token or ''):
+            return False
+
+        now = time.time() if now is None else now
+        seen_key = self._key('seen', token)
+        dedup_ttl = getattr(settings, 'OPEN_TRACKING_DEDUP_TTL', 86400)
+        if not self.cache.add(seen_key, 1, timeout=dedup_ttl):
+            return False
+
+        if not self.buffered:
+            unknown = set()
+            try:
+                apply_opens({token: _from_timestamp(now)}, unknown=unknown)
+            except Exception:
+                # Let the next load of this pixel try again
+                self.cache.delete(seen_key)
+                raise
+            if unknown:
+                # No EmailLog with this token (yet): don't swallow the next load
+                self.cache.delete(seen_key)
+            return True
+
+        self.push((token, now), now)
+        return True
+
+    def apply_batch(self, values, now):
+        opens = {}
+        for token, loaded_at in values:
+            if token not in opens or loaded_at < opens[token]:
+                opens[token] = loaded_at
+        unknown = set()
+        applied = apply_opens(
+            {token: _from_timestamp(loaded_at) for token, loaded_at in opens.items()}, unknown=unknown
+        )
+        dropped = self.requeue([(token, opens[token]) for token in unknown], now)
+        self.cache.delete_many([self._key('seen', token) for token, _ in dropped])
+        return applied
+
+
+class ClickTrackingBuffer(CacheEventBuffer):
+    """Tracked link clicks, one EmailClick row each"""
+
+    name = 'click'
+
+    def record(self, token, url, now=None):
+        """Record one click on `url` in the email with tracking token `token`"""
+        if not TOKEN_PATTERN.match(token or ''):
+            return False
+
+        now = time.time() if now is None else now
+        if not self.buffered:
+            apply_clicks([(token, url, _from_timestamp(now))])
+        else:
+            self.push((token, url, now), now)
+        return True
+
+    def apply_batch(self, values, now):
+        unknown = []
+        applied = apply_clicks(
+            [(token, url, _from_timestamp(clicked_at)) for token, url, clicked_at in values], unknown=unknown
+        )
+        self.requeue([(token, url, clicked_at.timestamp()) for token, url, clicked_at in unknown], now)
+        return applied
+
+
+# Process-level instances used by the tracking views and flush_email_tracking
+open_tracking_buffer = OpenTrackingBuffer()
+click_tracking_buffer = ClickTrackingBuffer()
@@ -0,0 +1,267 @@
+"""
+Zone reconciliation for the Soundtrack sync
+
+SoundtrackAPIService.apply_company_zones() used to run up to two
+company.zones.filter(...).first() lookups and a full save() per API zone, then
+one save() per newly orphaned zone. ZoneReconciler loads the company's zones
+once, matches API zones against in-memory indexes and writes the result with
+one bulk_create and one bulk_update inside a transaction:
+
+    reconciler = ZoneReconciler(company)
+    synced_count = reconciler.sync(api_zones)
+
+Matching is the same as the per-zone version, applied in API order:
+    1. PRIMARY: zone of the company with the same soundtrack_zone_id
+    2. FALLBACK: zone of the company with the same name and platform 'soundtrack'
+       (links manually created zones)
+    3. CREATE: only if no match found
+    4. ORPHAN DETECTION: soundtrack zones with an id the API did not return are
+       flagged is_orphaned; matched zones are unflagged
+
+Like the per-zone version, a match updates the zone's id/name before the next
+API zone is matched, and a lookup returning several zones picks the first by
+Zone.Meta.ordering (name).
+
+Change detection: each zone stores a fingerprint of its normalised API payload
+(Zone.api_fingerprint). A matched zone whose fingerprint, id, name, status and
+device are unchanged and that is not orphaned is not rewritten; its heartbeat
+(last_api_sync, and last_seen_online when online) is moved forward for all such
+zones with a single UPDATE ... WHERE id IN (...), which leaves updated_at alone.
+
+Status history: every created zone and every zone whose status changed gets one
+ZoneStatusChange row (bulk-created with the zone writes), so the history grows
+with transitions, not with polls. A matched zone without any history (created
+before history was recorded) gets a starting row with its current status. The uptime rollup reads it
+(services/zone_uptime_service.py).
+"""
+
+import hashlib
+import json
+import logging
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+
+from crm_app.models import Zone, ZoneStatusChange
+
+logger = logging.getLogger(__name__)
+
+# Fields written for every changed zone returned by the API
+SYNC_FIELDS = [
+    'soundtrack_zone_id', 'name', 'status', 'device_name', 'last_seen_online',
+    'api_raw_data', 'api_fingerprint', 'last_api_sync', 'is_orphaned', 'orphaned_at', 'updated_at',
+]
+
+
+def zone_fingerprint(api_zone):
+    """Stable SHA-256 of an API zone payload (key order does not matter)"""
+    payload = json.dumps(api_zone, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ZoneReconciler:
+    """
+    Diff the API zones of one company against its DB zones and apply the
+    creates, updates and orphan flips in bulk.
+    """
+
+    def __init__(self, company):
+        self.company = company
+        self.zones = list(Zone.objects.filter(company=company).annotate(
+            has_history=Exists(ZoneStatusChange.objects.filter(zone=OuterRef('pk'))),
+        ))
+        self._order = {zone.pk: position for position, zone in enumerate(self.zones)}
+        self._by_zone_id = defaultdict(list)
+        self._by_name = defaultdict(list)
+        for zone in self.zones:
+            self._index(zone)
+        self.created = []
+        self.updated = {}
+        self.unchanged = {}
+        self.orphaned = []
+        self.transitions = []       # (zone, previous_status)
+
+    # ------------------------------------------------------------------
+    # In-memory indexes
+    # ------------------------------------------------------------------
+
+    def _index(self, zone):
+        self._by_zone_id[zone.soundtrack_zone_id].append(zone)
+        if zone.platform == 'soundtrack':
+            self._by_name[zone.name].append(zone)
+
+    def _unindex(self, zone):
+        self._by_zone_id[zone.soundtrack_zone_id].remove(zone)
+        if zone.platform == 'soundtrack':
+            self._by_name[zone.name].remove(zone)
+
+    def _first(self, zones):
+        """First zone by Zone.Meta.ordering (name), as QuerySet.first() would return"""
+        if not zones:
+            return None
+        return min(zones, key=lambda zone: (zone.name, self._order.get(zone.pk, len(self._order))))
+
+    def match(self, zone_id, zone_name):
+        zone = self._first(self._by_zone_id.get(zone_id)) if zone_id else None
+        if not zone:
+            zone = self._first(self._by_name.get(zone_name))
+        return zone
+
+    # ------------------------------------------------------------------
+    # Diff
+    # ------------------------------------------------------------------
+
+    def diff(self, api_zones):
+        """Compute creates, updates and orphan flips without writing anything.
+
+        `api_zones` can be any iterable (e.g. a paginated generator); it is read
+        once, and only the payloads of changed zones are kept.
+        """
+        now = timezone.now()
+        api_zone_ids = set()
+        self.synced_count = 0
+
+        for api_zone in api_zones:
+            self.synced_count += 1
+            zone_name = api_zone.get('name', 'Unknown Zone')
+            zone_id = api_zone.get('id', '')
+
+            if zone_id:
+                api_zone_ids.add(zone_id)
+
+            zone = self.match(zone_id, zone_name)
+            fingerprint = zone_fingerprint(api_zone)
+            if zone and self._is_unchanged(zone, api_zone, fingerprint):
+                self.unchanged[zone.pk] = zone
+                continue
+            if not zone:
+                zone = Zone(
+                    company=self.company,
+                    name=zone_name,
+                    platform='soundtrack',
+                    soundtrack_zone_id=zone_id,
+                    status='pending',
+                )
+                self.zones.append(zone)
+                self._index(zone)
+                self.created.append(zone)
+                logger.info(f"Created new zone: {zone_name} for {self.company.name}")
+
+            previous_status = '' if zone._state.adding else zone.status
+
+            # Update zone with latest data from API (re-indexed: later API zones match on the new values)
+            self._unindex(zone)
+            zone.soundtrack_zone_id = zone_id  # Ensure ID is set (links manual zones)
+            zone.name = zone_name  # Update name in case it changed in Soundtrack
+            self._index(zone)
+            zone.status = api_zone.get('status', 'offline')
+            if zone.status != previous_status:
+                self.transitions.append((zone, previous_status))
+            zone.device_name = api_zone.get('device_name', '')
+            if api_zone.get('is_online'):
+                zone.last_seen_online = now
+            zone.api_raw_data = api_zone
+            zone.api_fingerprint = fingerprint
+            zone.last_api_sync = now
+            zone.updated_at = now
+
+            # Unmark as orphaned if it was previously orphaned
+            if zone.is_orphaned:
+                zone.is_orphaned = False
+                zone.orphaned_at = None
+                logger.info(f"Zone {zone_name} found in API again - unmarking as orphaned")
+
+            if zone._state.adding is False:
+                self.unchanged.pop(zone.pk, None)
+                self.updated[zone.pk] = zone
+
+        # Detect orphaned zones (zones in DB but not in API)
+        for zone in self.zones:
+            if zone.platform != 'soundtrack' or not zone.soundtrack_zone_id:
+                continue
+            if zone.soundtrack_zone_id not in api_zone_ids and not zone.is_orphaned:
+                zone.is_orphaned = True
+                zone.orphaned_at = now
+                self.orphaned.append(zone)
+                logger.warning(f"Zone {zone.name} not found in API - marked as orphaned")
+
+        self.heartbeat_at = now
+        return self
+
+    @staticmethod
+    def _is_unchanged(zone, api_zone, fingerprint):
+        return (
+            zone.api_fingerprint == fingerprint
+            and zone.soundtrack_zone_id == api_zone.get('id', '')
+            and zone.name == api_zone.get('name', 'Unknown Zone')
+            and zone.status == api_zone.get('status', 'offline')
+            and zone.device_name == api_zone.get('device_name', '')
+            and not zone.is_orphaned
+        )
+
+    @property
+    def stats(self):
+        return Counter(
+            created=len(self.created),
+            changed=len(self.updated),
+            unchanged=len(self.unchanged),
+            orphaned=len(self.orphaned),
+        )
+
+    # ------------------------------------------------------------------
+    # Apply
+    # ------------------------------------------------------------------
+
+    @transaction.atomic
+    def apply(self):
+        if self.created:
+            Zone.objects.bulk_create(self.created)
+        if self.updated:
+            Zone.objects.bulk_update(list(self.updated.values()), SYNC_FIELDS)
+        orphaned = [zone for zone in self.orphaned if zone.pk not in self.updated and zone not in self.created]
+        if orphaned:
+            Zone.objects.bulk_update(orphaned, ['is_orphaned', 'orphaned_at'])
+        if self.transitions or self._without_history():
+            self._record_transitions()
+        if self.unchanged:
+            now = self.heartbeat_at
+            online = [pk for pk, zone in self.unchanged.items() if zone.status == 'online']
+            Zone.objects.filter(pk__in=list(self.unchanged)).update(
+                last_api_sync=now,
+                last_seen_online=Case(When(pk__in=online, then=Value(now)), default=F('last_seen_online')),
+            )
+
+    def _without_history(self):
+        """Matched zones that have no ZoneStatusChange yet"""
+        matched = list(self.unchanged.values()) + list(self.updated.values())
+        return [zone for zone in matched if not zone.has_history]
+
+    def _record_transitions(self):
+        """One history row per zone whose status changed (first to last API status when a
+        manual zone was matched by several API zones in one run), and a starting row
+        for matched zones without history"""
+        first_previous = {}
+        for zone, previous_status in self.transitions:
+            first_previous.setdefault(zone, previous_status)
+        rows = [
+            ZoneStatusChange(zone=zone, status=zone.status, previous_status=previous_status,
+                             changed_at=self.heartbeat_at)
+            for zone, previous_status in first_previous.items()
+            if zone.status != previous_status
+        ]
+        recorded = {row.zone for row in rows}
+        rows += [
+            ZoneStatusChange(zone=zone, status=zone.status, previous_status='', changed_at=self.heartbeat_at)
+            for zone in self._without_history()
+            if zone not in recorded
+        ]
+        ZoneStatusChange.objects.bulk_create(rows)
+        for row in rows:
+            row.zone.has_history = True
+
+    def sync(self, api_zones):
+        """Diff and apply; returns the number of API zones synced."""
+        self.diff(api_zones).apply()
+        return self.synced_count
@@ -0,0 +1,200 @@
+"""
+Zone uptime rollups
+
+The Soundtrack sync appends one ZoneStatusChange row per status transition
+(services/zone_sync.py). rollup_day() turns those transitions into one
+ZoneUptimeDaily row per zone and BUSINESS_TIMEZONE calendar day, and the uptime
+endpoints on ZoneViewSet only read the rollups, so a year of uptime for every
+zone of a company is one grouped query over ~365 rows per zone:
+
+    rollup_day(date(2026, 10, 15))              # nightly: rollup_zone_uptime
+    rollup_range(date(2026, 1, 1), date(2026, 10, 15))
+    zone_uptime(zone, start, end)               # daily series + totals
+    uptime_by_zone(Q(zone__company=company), start, end)
+
+A zone's status at the start of a day is the status of its latest transition
+before midnight; zones with no transition before or during a day get no row.
+Every zone has a starting row (the sync writes one for zones it creates or finds
+without history), so a zone whose status never changes is still rolled up.
+Time spent pending, expired or cancelled is not monitored, so
+uptime = online_minutes / monitored_minutes.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from crm_app.models import Zone, ZoneStatusChange, ZoneUptimeDaily
+
+logger = logging.getLogger(__name__)
+
+# Statuses that do not count towards monitored time (zone not in service)
+UNMONITORED_STATUSES = frozenset({'pending', 'expired', 'cancelled'})
+
+DEFAULT_RANGE_DAYS = 30
+
+
+def business_today():
+    return timezone.now().astimezone(ZoneInfo(settings.BUSINESS_TIMEZONE)).date()
+
+
+def day_bounds(day):
+    """Aware [start, end) datetimes of a BUSINESS_TIMEZONE calendar day"""
+    tz = ZoneInfo(settings.BUSINESS_TIMEZONE)
+    return (
+        datetime.combine(day, time.min, tzinfo=tz),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def _day_seconds(opening_status, changes, start, end):
+    """(online, monitored) seconds in [start, end) given the status at `start`
+    (None if unknown) and the day's (status, changed_at) transitions in order"""
+    online = monitored = 0.0
+    status, since = opening_status, start
+    for next_status, changed_at in changes + [(None, end)]:
+        seconds = (changed_at - since).total_seconds()
+        if status is not None and status not in UNMONITORED_STATUSES:
+            monitored += seconds
+            if status == 'online':
+                online += seconds
+        status, since = next_status, changed_at
+    return online, monitored
+
+
+def rollup_day(day, now=None):
+    """Recompute ZoneUptimeDaily for every zone with history on `day`.
+
+    Idempotent (upsert on zone/date); a day that is still running is rolled up
+    until `now`. Returns the number of rows written.
+    """
+    start, end = day_bounds(day)
+    end = min(end, now or timezone.now())
+    if end <= start:
+        return 0
+
+    status_before = ZoneStatusChange.objects.filter(
+        zone=OuterRef('pk'), changed_at__lt=start,
+    ).order_by('-changed_at', '-pk').values('status')[:1]
+    opening = dict(
+        Zone.objects.annotate(opening_status=Subquery(status_before))
+        .filter(opening_status__isnull=False)
+        .values_list('pk', 'opening_status')
+    )
+    changes = defaultdict(list)
+    for zone_id, status, changed_at in (
+        ZoneStatusChange.objects.filter(changed_at__gte=start, changed_at__lt=end)
+        .order_by('zone_id', 'changed_at', 'pk')
+        .values_list('zone_id', 'status', 'changed_at')
+    ):
+        changes[zone_id].append((status, changed_at))
+
+    rows = []
+    for zone_id in opening.keys() | changes.keys():
+        online, monitored = _day_seconds(opening.get(zone_id), changes[zone_id], start, end)
+        rows.append(ZoneUptimeDaily(
+            zone_id=zone_id,
+            date=day,
+            online_minutes=round(online / 60),
+            monitored_minutes=round(monitored / 60),
+            transitions=len(changes[zone_id]),
+        ))
+
+    with transaction.atomic():
+        ZoneUptimeDaily.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['zone', 'date'],
+            update_fields=['online_minutes', 'monitored_minutes', 'transitions', 'updated_at'],
+        )
+    logger.info(f"Zone uptime rollup for {day}: {len(rows)} zones")
+    return len(rows)
+
+
+def rollup_range(start, end, now=None):
+    """Roll up every day from `start` to `end` inclusive; returns rows written"""
+    written = 0
+    day = start
+    while day <= end:
+        written += rollup_day(day, now=now)
+        day += timedelta(days=1)
+    return written
+
+
+# ----------------------------------------------------------------------
+# Reads (served from ZoneUptimeDaily only)
+# ----------------------------------------------------------------------
+
+def parse_range(start_param=None, end_param=None):
+    """(start, end) dates from YYYY-MM-DD query params; defaults to the last
+    DEFAULT_RANGE_DAYS complete days. Raises ValueError on bad input."""
+    end = date.fromisoformat(end_param) if end_param else business_today() - timedelta(days=1)
+    start = date.fromisoformat(start_param) if start_param else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise ValueError('start must be on or before end')
+    return start, end
+
+
+def uptime_percent(online_minutes, monitored_minutes):
+    if not monitored_minutes:
+        return None
+    return round(100 * online_minutes / monitored_minutes, 2)
+
+
+def _totals(online_minutes, monitored_minutes):
+    return {
+        'online_minutes': online_minutes or 0,
+        'monitored_minutes': monitored_minutes or 0,
+        'uptime_percent': uptime_percent(online_minutes, monitored_minutes),
+    }
+
+
+def zone_uptime(zone, start, end):
+    """Daily uptime series and totals for one zone"""
+    days = [
+        {'date': row['date'].isoformat(), **_totals(row['online_minutes'], row['monitored_minutes'])}
+        for row in ZoneUptimeDaily.objects.filter(zone=zone, date__range=(start, end))
+        .order_by('date').values('date', 'online_minutes', 'monitored_minutes')
+    ]
+    return {
+        **_totals(sum(day['online_minutes'] for day in days), sum(day['monitored_minutes'] for day in days)),
+        'days': days,
+    }
+
+
+def contract_filter(contract):
+    """Rollup filter for the zones of a contract, limited to the dates each zone was on it"""
+    condition = Q(pk__in=[])
+    for contract_zone in contract.contract_zones.all():
+        zone_condition = Q(zone_id=contract_zone.zone_id, date__gte=contract_zone.start_date)
+        if contract_zone.end_date:
+            zone_condition &= Q(date__lte=contract_zone.end_date)
+        condition |= zone_condition
+    return condition
+
+
+def uptime_by_zone(condition, start, end):
+    """Per-zone totals and overall totals for the rollups matching `condition`"""
+    zones = [
+        {
+            'zone_id': str(row['zone_id']),
+            'zone_name': row['zone__name'],
+            'company_name': row['zone__company__name'],
+            **_totals(row['online'], row['monitored']),
+        }
+        for row in ZoneUptimeDaily.objects.filter(condition, date__range=(start, end))
+        .values('zone_id', 'zone__name', 'zone__company__name')
+        .annotate(online=Sum('online_minutes'), monitored=Sum('monitored_minutes'))
+        .order_by('zone__company__name', 'zone__name')
+    ]
+    return {
+        **_totals(sum(zone['online_minutes'] for zone in zones), sum(zone['monitored_minutes'] for zone in zones)),
+        'zones': zones,
+    }
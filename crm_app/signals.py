@@ -1,8 +1,9 @@
 """Signals for CRM app"""
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Company, Contract, QuoteLineItem
+from .models import Company, Contract, Invoice, Opportunity, QuoteLineItem, Task
 import logging
 
 logger = logging.getLogger(__name__)
@@ -68,4 +69,33 @@ def resync_quote_total_on_delete(sender, instance, **kwargs):
     always matches its remaining lines on every write path (self-audit 2026-07-02)."""
     from .models import Quote
     if instance.quote_id and Quote.objects.filter(pk=instance.quote_id).exists():
-        instance.resync_quote_total()
\ No newline at end of file
+        instance.resync_quote_total()
+
+
+def _dashboard_billing_entities(instance):
+    """Billing entities whose dashboard snapshots a changed row can affect (None = all)."""
+    if isinstance(instance, Company):
+        # The company may have moved between entities; invalidate every entity
+        return None
+    try:
+        company = instance.company
+    except Company.DoesNotExist:
+        return None
+    return [company.billing_entity] if company else None
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Opportunity)
+@receiver(post_delete, sender=Opportunity)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_dashboard_snapshots_on_change(sender, instance, **kwargs):
+    """Mark cached dashboard stats stale once the change is committed."""
+    from .services.dashboard_snapshot_service import invalidate_dashboard_snapshots
+    billing_entities = _dashboard_billing_entities(instance)
+    transaction.on_commit(lambda: invalidate_dashboard_snapshots(billing_entities))
@@ -21,3 +21,12 @@ def django_db_setup():
 def enable_db_access_for_all_tests(db):
     """Enable database access for all tests"""
     pass
+
+
+@pytest.fixture(autouse=True)
+def clear_dashboard_cache():
+    """Dashboard snapshots live in a local-memory cache; start every test empty"""
+    from django.core.cache import caches
+    caches[settings.DASHBOARD_CACHE_ALIAS].clear()
+    yield
+    caches[settings.DASHBOARD_CACHE_ALIAS].clear()
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the Anthropic client, as ReplyClassifier uses it:
+client.messages.create(model=..., max_tokens=..., messages=[...]).content[0].text
+
+Answers the batch classification prompt: every <reply id="N"> block is
+classified by keyword and returned in the JSON array the prompt asks for.
+Records each prompt and the highest number of requests in flight at once, and
+can add latency, fail, or answer with arbitrary text.
+
+    client = FakeAnthropic(latency=0.05)
+    ReplyDetectionService(ai_client=client).check_for_replies()
+    len(client.requests), client.max_in_flight
+"""
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+KEYWORDS = [
+    ('not interested', 'not_interested'),
+    ('colleague', 'referral'),
+    ('too expensive', 'objection'),
+    ('?', 'question'),
+    ('interested', 'interested'),
+]
+
+
+def classify(text):
+    text = text.lower()
+    for keyword, classification in KEYWORDS:
+        if keyword in text:
+            return classification
+    return 'other'
+
+
+class FakeAnthropic:
+    """Thread-safe fake of anthropic.Anthropic for the messages API"""
+
+    def __init__(self, latency=0.0, fail=False, answer=None):
+        self.latency = latency
+        self.fail = fail
+        self.answer = answer            # fixed response text instead of the keyword answer
+        self.requests = []              # prompts received
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def replies_sent(self):
+        """Total number of replies across all requests"""
+        return sum(len(re.findall(r'<reply id="\d+">', prompt)) for prompt in self.requests)
+
+    def _create(self, model, max_tokens, messages):
+        prompt = messages[-1]['content']
+        with self._lock:
+            self.requests.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError('overloaded_error')
+            text = self.answer if self.answer is not None else json.dumps([
+                {'id': int(reply_id), 'classification': classify(body), 'confidence': 0.85}
+                for reply_id, body in re.findall(r'<reply id="(\d+)">(.*?)</reply>', prompt, re.DOTALL)
+            ])
+            return SimpleNamespace(content=[SimpleNamespace(text=text)])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
@@ -0,0 +1,199 @@
+"""
+Local stand-in for an IMAP4rev1 server.
+
+Serves one mailbox from an in-memory list of RFC 822 messages with the
+subset of IMAP that ReplyDetectionService uses: LOGIN, SELECT (with
+UIDVALIDITY / UIDNEXT), UID SEARCH (`SINCE <date>` and `UID n:*`), UID FETCH
+of `BODY.PEEK[HEADER.FIELDS (...)]` and `BODY.PEEK[]`, plain FETCH RFC822 and
+LOGOUT. Records every command and the number of bytes sent, so tests can
+assert on what was downloaded.
+
+    server = FakeImapServer().start()
+    server.add_message(make_message('ann@example.com', 'Re: Music for your lobby'))
+    settings.PROSPECT_IMAP_HOST, settings.PROSPECT_IMAP_PORT = server.host, server.port
+"""
+import re
+import socketserver
+import threading
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser
+from email.utils import format_datetime, make_msgid
+
+
+def make_message(from_email, subject, body='Thanks, sounds good.', in_reply_to='', date=None,
+                 attachment_size=0, to_email='norbert@bmasiamusic.com'):
+    """RFC 822 bytes of a reply; `attachment_size` pads it like a quoted thread or signature image"""
+    msg = EmailMessage()
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg['Date'] = format_datetime(date or datetime.now(timezone.utc))
+    msg['Message-ID'] = make_msgid(domain='example.com')
+    if in_reply_to:
+        msg['In-Reply-To'] = in_reply_to
+        msg['References'] = in_reply_to
+    msg.set_content(body)
+    if attachment_size:
+        msg.add_attachment(b'\0' * attachment_size, maintype='image', subtype='png', filename='logo.png')
+    return msg.as_bytes()
+
+
+class FakeImapServer:
+    """Threaded TCP server speaking enough IMAP4rev1 for one INBOX"""
+
+    def __init__(self, uidvalidity=1):
+        self.uidvalidity = uidvalidity
+        self.messages = []          # (uid, internal date, raw bytes)
+        self.commands = []          # command lines received, without tag
+        self.bytes_sent = 0
+        self._next_uid = 1
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def add_message(self, raw, received_at=None):
+        with self._lock:
+            uid = self._next_uid
+            self._next_uid += 1
+            self.messages.append((uid, received_at or datetime.now(timezone.utc), raw))
+        return uid
+
+    def renumber(self):
+        """Simulate a mailbox rebuild: new UIDVALIDITY, UIDs restart at 1"""
+        with self._lock:
+            self.uidvalidity += 1
+            self._next_uid = 1
+            renumbered = []
+            for _, received_at, raw in self.messages:
+                renumbered.append((self._next_uid, received_at, raw))
+                self._next_uid += 1
+            self.messages = renumbered
+
+    def reset_stats(self):
+        self.commands = []
+        self.bytes_sent = 0
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ------------------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------------------
+
+    def _uids(self, uid_set):
+        """UIDs of existing messages in an IMAP sequence set (`1,4,7:9`, `12:*`)"""
+        existing = [uid for uid, _, _ in self.messages]
+        highest = existing[-1] if existing else 0
+        selected = set()
+        for part in uid_set.split(','):
+            low, _, high = part.partition(':')
+            low = highest if low == '*' else int(low)
+            high = low if not high else (highest if high == '*' else int(high))
+            low, high = min(low, high), max(low, high)
+            selected.update(uid for uid in existing if low <= uid <= high)
+        return sorted(selected)
+
+    def _search(self, criteria):
+        match = re.search(r'SINCE (\d{1,2}-\w{3}-\d{4})', criteria)
+        if match:
+            since = datetime.strptime(match.group(1), '%d-%b-%Y').replace(tzinfo=timezone.utc)
+            return [uid for uid, received_at, _ in self.messages if received_at >= since - timedelta(days=1)]
+        match = re.search(r'UID (\S+)', criteria)
+        if match:
+            return self._uids(match.group(1))
+        return [uid for uid, _, _ in self.messages]
+
+    def _fetch(self, uids, items, by_uid=True):
+        """Untagged FETCH responses (bytes) for `uids`"""
+        by_uid_messages = {uid: (index + 1, raw) for index, (uid, _, raw) in enumerate(self.messages)}
+        header_fields = re.search(r'HEADER\.FIELDS \(([^)]*)\)', items)
+        responses = []
+        for uid in uids:
+            sequence, raw = by_uid_messages[uid]
+            if header_fields:
+                names = header_fields.group(1).upper().split()
+                headers = BytesHeaderParser().parsebytes(raw)
+                literal = ''.join(
+                    f'{name}: {value}\r\n' for name, value in headers.items() if name.upper() in names
+                ).encode() + b'\r\n'
+                section = f'BODY[HEADER.FIELDS ({header_fields.group(1)})]'
+            else:
+                literal = raw.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+                section = 'RFC822' if 'RFC822' in items else 'BODY[]'
+            prefix = f'UID {uid} ' if by_uid else ''
+            responses.append(
+                f'* {sequence} FETCH ({prefix}{section} {{{len(literal)}}}\r\n'.encode() + literal + b')\r\n'
+            )
+        return responses
+
+    def _respond(self, tag, command, args):
+        """Response lines for one command; None closes the connection"""
+        if command == 'CAPABILITY':
+            return [b'* CAPABILITY IMAP4rev1\r\n', f'{tag} OK CAPABILITY completed\r\n'.encode()]
+        if command == 'LOGIN':
+            return [f'{tag} OK LOGIN completed\r\n'.encode()]
+        if command in ('SELECT', 'EXAMINE'):
+            return [
+                f'* {len(self.messages)} EXISTS\r\n'.encode(),
+                f'* OK [UIDVALIDITY {self.uidvalidity}] UIDs valid\r\n'.encode(),
+                f'* OK [UIDNEXT {self._next_uid}] Predicted next UID\r\n'.encode(),
+                f'{tag} OK [READ-WRITE] SELECT completed\r\n'.encode(),
+            ]
+        if command == 'UID':
+            subcommand, _, rest = args.partition(' ')
+            subcommand = subcommand.upper()
+            if subcommand == 'SEARCH':
+                uids = ' '.join(map(str, self._search(rest)))
+                return [f'* SEARCH {uids}\r\n'.encode(), f'{tag} OK SEARCH completed\r\n'.encode()]
+            if subcommand == 'FETCH':
+                uid_set, _, items = rest.partition(' ')
+                return self._fetch(self._uids(uid_set), items) + [f'{tag} OK FETCH completed\r\n'.encode()]
+        if command == 'FETCH':
+            sequence, _, items = args.partition(' ')
+            uids = [self.messages[int(index) - 1][0] for index in sequence.split(',')]
+            return self._fetch(uids, items, by_uid=False) + [f'{tag} OK FETCH completed\r\n'.encode()]
+        if command == 'LOGOUT':
+            return [b'* BYE Logging out\r\n', f'{tag} OK LOGOUT completed\r\n'.encode()]
+        return [f'{tag} BAD Unknown command\r\n'.encode()]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, lines):
+                data = b''.join(lines)
+                with fake._lock:
+                    fake.bytes_sent += len(data)
+                self.wfile.write(data)
+
+            def handle(self):
+                self.send([b'* OK IMAP4rev1 stand-in ready\r\n'])
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    tag, _, rest = line.decode().rstrip('\r\n').partition(' ')
+                    command, _, args = rest.partition(' ')
+                    command = command.upper()
+                    with fake._lock:
+                        fake.commands.append(rest if command != 'LOGIN' else 'LOGIN')
+                        lines = fake._respond(tag, command, args)
+                    self.send(lines)
+                    if command == 'LOGOUT':
+                        return
+
+        return Handler
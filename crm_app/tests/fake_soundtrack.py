@@ -0,0 +1,169 @@
+"""
+Local stand-in for the Soundtrack Your Brand GraphQL API.
+
+Serves the `account(id:)`, `location(id:)` and `me { accounts }` queries used by
+SoundtrackAPIService from an in-memory dict of accounts, with cursor pagination
+(`first` / `after`, pageInfo.endCursor) for accounts, locations and sound
+zones. Runs over HTTP/1.1 keep-alive, with optional per-request latency and
+injected 503 failures, and records every request so tests can assert on
+connection reuse, retries and paging.
+
+    server = FakeSoundtrackServer(latency=0.05)
+    server.add_account('SA-1', zones=2)
+    server.start()
+    service.base_url = server.url
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_zone(account_id, index, online=True, location_index=0):
+    zone_id = f'{account_id}-Z{index}' if not location_index else f'{account_id}-L{location_index}-Z{index}'
+    return {
+        'id': zone_id,
+        'name': f'Zone {index}',
+        'isPaired': online,
+        'device': {'id': f'{zone_id}-D', 'name': f'Player {index}'},
+        'schedule': None,
+        'playFrom': {'__typename': 'Playlist', 'id': f'PL{index}', 'name': 'Lobby Jazz'},
+    }
+
+
+def _page(items, first, after):
+    """Connection-style page of `items` after cursor `after` (cursors are list offsets)"""
+    start = int(after) + 1 if after is not None else 0
+    end = start + (first or len(items))
+    chunk = items[start:end]
+    return {
+        'pageInfo': {
+            'hasNextPage': end < len(items),
+            'endCursor': str(start + len(chunk) - 1) if chunk else after,
+        },
+        'edges': [{'node': node} for node in chunk],
+    }
+
+
+class FakeSoundtrackServer:
+    """Threaded HTTP server answering Soundtrack GraphQL account/location queries"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.accounts = {}
+        self.locations = {}         # location_id -> location
+        self.failures = {}          # account_id / location_id -> number of 503s still to return
+        self.requests = []          # (account_id or location_id, client_address)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/v2'
+
+    @property
+    def connections(self):
+        return {client for _, client in self.requests}
+
+    def add_account(self, account_id, zones=1, business_name=None, location='Main', locations=1):
+        """Account with `locations` locations of `zones` zones each"""
+        account_locations = []
+        for location_index in range(locations):
+            location_id = f'{account_id}-L{location_index}'
+            account_location = {
+                'id': location_id,
+                'name': location if locations == 1 else f'{location} {location_index}',
+                'zones': [make_zone(account_id, i, location_index=location_index) for i in range(zones)],
+            }
+            self.locations[location_id] = account_location
+            account_locations.append(account_location)
+        self.accounts[account_id] = {
+            'id': account_id,
+            'businessName': business_name or f'Business {account_id}',
+            'locations': account_locations,
+        }
+
+    def fail(self, key, times=1):
+        self.failures[key] = times
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ------------------------------------------------------------------
+    # GraphQL
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _location_node(location, first, after=None):
+        return {
+            'id': location['id'],
+            'name': location['name'],
+            'soundZones': _page(location['zones'], first, after),
+        }
+
+    def _resolve(self, query, variables):
+        first = variables.get('first')
+        after = variables.get('after')
+        if 'location(id:' in query:
+            location = self.locations.get(variables.get('locationId'))
+            if location is None:
+                return {'location': None}
+            return {'location': {'soundZones': _page(location['zones'], first, after)}}
+        if 'account(id:' in query:
+            account = self.accounts.get(variables.get('accountId'))
+            if account is None:
+                return {'account': None}
+            locations = _page(account['locations'], first, after)
+            locations['edges'] = [
+                {'node': self._location_node(edge['node'], first)} for edge in locations['edges']
+            ]
+            return {'account': {'id': account['id'], 'businessName': account['businessName'],
+                                'locations': locations}}
+        if 'me {' in query:
+            accounts = [{'id': account['id'], 'businessName': account['businessName']}
+                        for account in self.accounts.values()]
+            return {'me': {'accounts': _page(accounts, first, after)}}
+        return None
+
+    def _respond(self, payload, client_address):
+        variables = payload.get('variables') or {}
+        key = variables.get('accountId') or variables.get('locationId')
+        with self._lock:
+            self.requests.append((key, client_address))
+            if self.failures.get(key):
+                self.failures[key] -= 1
+                return 503, {'errors': [{'message': 'Service Unavailable'}]}
+        if self.latency:
+            time.sleep(self.latency)
+        return 200, {'data': self._resolve(payload.get('query', ''), variables)}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                status, body = fake._respond(payload, self.client_address)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,199 @@
+"""
+Test suite for the Action Center (Today page) feed.
+Checks primary-contact resolution, cursor pagination, section filtering and
+that the feed runs a fixed number of queries.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm_app.models import Task
+from crm_app.tests.factories import (
+    CompanyFactory, ContactFactory, ContractFactory, InvoiceFactory, OpportunityFactory, UserFactory
+)
+
+FEED_URL = '/api/v1/action-center/'
+
+
+@pytest.fixture
+def admin_user():
+    return UserFactory(role='Admin', is_staff=True)
+
+
+@pytest.fixture
+def api_client(admin_user):
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    return client
+
+
+def _populate(count):
+    """One company per item type (task, invoice, opportunity, contract), each with contacts"""
+    today = date.today()
+    for i in range(count):
+        company = CompanyFactory(soundtrack_account_id='')
+        ContactFactory(company=company, name=f'A {i}', is_primary=False)
+        ContactFactory(company=company, name=f'Z {i}', is_primary=True)
+        Task.objects.create(company=company, title=f'Overdue {i}', status='To Do',
+                            due_date=timezone.now() - timedelta(days=2))
+        contract = ContractFactory(company=company, opportunity=None,
+                                   end_date=today + timedelta(days=20))
+        InvoiceFactory(contract=contract, company=company, status='Sent',
+                       due_date=today - timedelta(days=3), amount=Decimal('100.00'),
+                       tax_amount=Decimal('7.00'))
+        OpportunityFactory(company=company, stage='Contacted', follow_up_date=today - timedelta(days=3))
+
+
+@pytest.mark.django_db
+class TestActionCenterContacts:
+    """Test suite for ActionCenterViewSet.list() contact resolution"""
+
+    def test_prefers_primary_contact(self, api_client):
+        """The primary contact wins over alphabetically earlier contacts"""
+        _populate(1)
+
+        response = api_client.get(FEED_URL)
+
+        assert response.status_code == 200
+        names = {item['contact_name'] for item in response.data['items']}
+        assert names == {'Z 0'}
+
+    def test_falls_back_to_first_active_contact(self, api_client):
+        """Without a primary contact the first active contact by name is used"""
+        company = CompanyFactory(soundtrack_account_id='')
+        ContactFactory(company=company, name='Bravo')
+        ContactFactory(company=company, name='Alpha', is_active=False)
+        ContactFactory(company=company, name='Charlie')
+        Task.objects.create(company=company, title='Call back', status='To Do',
+                            due_date=timezone.now() - timedelta(days=1))
+
+        response = api_client.get(FEED_URL)
+
+        assert [item['contact_name'] for item in response.data['items']] == ['Bravo']
+
+    def test_related_contact_takes_precedence(self, api_client):
+        """A task's related_contact is used as-is"""
+        company = CompanyFactory(soundtrack_account_id='')
+        ContactFactory(company=company, name='Primary', is_primary=True)
+        related = ContactFactory(company=company, name='Related')
+        Task.objects.create(company=company, title='Call back', status='To Do',
+                            related_contact=related, due_date=timezone.now() - timedelta(days=1))
+
+        response = api_client.get(FEED_URL)
+
+        assert response.data['items'][0]['contact_name'] == 'Related'
+
+    def test_no_contact(self, api_client):
+        """Companies without active contacts yield empty contact fields"""
+        company = CompanyFactory(soundtrack_account_id='')
+        Task.objects.create(company=company, title='Call back', status='To Do',
+                            due_date=timezone.now() - timedelta(days=1))
+
+        response = api_client.get(FEED_URL)
+
+        item = response.data['items'][0]
+        assert (item['contact_name'], item['contact_email'], item['contact_phone']) == (None, None, None)
+
+    def test_fixed_query_count(self, api_client):
+        """The feed issues the same number of queries for 2 or 15 companies per section"""
+        _populate(2)
+        with CaptureQueriesContext(connection) as small:
+            small_response = api_client.get(FEED_URL)
+        _populate(13)
+        with CaptureQueriesContext(connection) as large:
+            large_response = api_client.get(FEED_URL)
+
+        assert len(large_response.data['items']) > len(small_response.data['items'])
+        assert len(small.captured_queries) == len(large.captured_queries)
+        # 8 section queries + 1 primary-contact query + 4 summary aggregates
+        assert len(large.captured_queries) == 13
+
+
+@pytest.mark.django_db
+class TestActionCenterPagination:
+    """Test suite for cursor pagination, sections= and the summary endpoint"""
+
+    def _walk(self, api_client, **params):
+        items, cursor, pages = [], None, 0
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = api_client.get(FEED_URL, query)
+            assert response.status_code == 200
+            items.extend(response.data['items'])
+            pages += 1
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return items, pages
+
+    def test_cursor_walk_returns_every_item_once(self, api_client):
+        """Following next_cursor yields the same items as one big page, in the same order"""
+        _populate(7)
+
+        everything = api_client.get(FEED_URL, {'limit': 500}).data['items']
+        walked, pages = self._walk(api_client, limit=4)
+
+        assert pages == -(-len(everything) // 4)
+        assert [(i['type'], i['id']) for i in walked] == [(i['type'], i['id']) for i in everything]
+
+    def test_ordered_by_urgency_then_age(self, api_client):
+        """Overdue before today before upcoming; the most overdue first"""
+        company = CompanyFactory(soundtrack_account_id='')
+        now = timezone.now()
+        for days in (1, 5, 3):
+            Task.objects.create(company=company, title=f'{days} days late', status='To Do',
+                                due_date=now - timedelta(days=days))
+        Task.objects.create(company=company, title='Later this week', status='To Do',
+                            due_date=now + timedelta(days=4))
+        ContractFactory(company=company, opportunity=None, end_date=date.today() + timedelta(days=3))
+
+        items = api_client.get(FEED_URL).data['items']
+
+        assert [i['urgency'] for i in items] == ['overdue'] * 3 + ['upcoming'] * 2
+        assert [i['title'] for i in items[:3]] == ['5 days late', '3 days late', '1 days late']
+        assert items[3]['type'] == 'contract'
+
+    def test_sections_filter(self, api_client):
+        """sections= limits both the feed and the summary"""
+        _populate(3)
+
+        response = api_client.get(FEED_URL, {'sections': 'overdue_invoices,expiring_contracts'})
+
+        assert {i['section'] for i in response.data['items']} == {'overdue_invoices', 'expiring_contracts'}
+        assert response.data['summary'] == {
+            'overdue_count': 3, 'today_count': 0, 'upcoming_count': 3, 'expiring_count': 3,
+        }
+
+    def test_summary_endpoint(self, api_client):
+        """/action-center/summary/ only runs count aggregates"""
+        _populate(3)
+        feed_items = api_client.get(FEED_URL, {'limit': 500}).data['items']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get(f'{FEED_URL}summary/')
+
+        assert len(ctx.captured_queries) == 4
+        assert response.data['summary']['overdue_count'] == sum(
+            1 for i in feed_items if i['urgency'] == 'overdue'
+        )
+        assert response.data['sections']['stale_opportunities'] == 3
+
+    def test_later_pages_skip_the_summary(self, api_client):
+        """Only the first page pays for the summary aggregates"""
+        _populate(3)
+        cursor = api_client.get(FEED_URL, {'limit': 2}).data['next_cursor']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get(FEED_URL, {'limit': 2, 'cursor': cursor})
+
+        assert 'summary' not in response.data
+        assert len(ctx.captured_queries) == 9
+
+    def test_invalid_parameters(self, api_client):
+        """Unknown sections and garbage cursors are rejected with a 400"""
+        assert api_client.get(FEED_URL, {'sections': 'bogus'}).status_code == 400
+        assert api_client.get(FEED_URL, {'cursor': 'not-a-cursor'}).status_code == 400
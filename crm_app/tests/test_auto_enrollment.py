@@ -0,0 +1,314 @@
+"""
+Test suite for the auto-enrollment triggers (services/auto_enrollment_service.py):
+one set-based pass per sequence, with deduplication on the trigger entity
+(trigger_entity_type / trigger_entity_id) and on the contact, the contact
+choice per company, and bulk-created enrollments with their first step.
+
+Benchmark against the per-row loop it replaced (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_auto_enrollment.py -m slow -s
+"""
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import (
+    Company, Contact, Contract, EmailSequence, EmailTemplate, SeasonalTriggerDate, SequenceEnrollment, SequenceStep,
+    SequenceStepExecution,
+)
+from crm_app.services.auto_enrollment_service import AutoEnrollmentService
+from crm_app.tests.factories import CompanyFactory, ContactFactory, ContractFactory, InvoiceFactory, UserFactory
+
+
+def _sequence(sequence_type, delay_days=30):
+    template, _ = EmailTemplate.objects.get_or_create(
+        template_type='renewal_30_days',
+        defaults={'name': 'Renewal', 'subject': 'Your contract', 'body_text': 'Hi {{contact_name}}'},
+    )
+    sequence = EmailSequence.objects.create(
+        name=sequence_type, created_by=UserFactory(), sequence_type=sequence_type, status='active',
+    )
+    SequenceStep.objects.create(
+        sequence=sequence, step_number=1, name='First', email_template=template, delay_days=delay_days,
+    )
+    return sequence
+
+
+def _contract(company=None, **fields):
+    company = company or CompanyFactory()
+    return ContractFactory(company=company, opportunity=None, **fields)
+
+
+def _enrollments(sequence):
+    return list(SequenceEnrollment.objects.filter(sequence=sequence).select_related('contact'))
+
+
+@pytest.mark.django_db
+class TestRenewalTriggers:
+    """Test suite for AutoEnrollmentService.process_renewal_triggers"""
+
+    @pytest.fixture
+    def sequence(self):
+        return _sequence('auto_renewal', delay_days=30)
+
+    def _expiring(self, company=None, **fields):
+        return _contract(company, end_date=date.today() + timedelta(days=30), **fields)
+
+    def test_primary_contact_is_enrolled_with_first_step_scheduled(self, sequence):
+        contract = self._expiring()
+        ContactFactory(company=contract.company, name='Alice')
+        primary = ContactFactory(company=contract.company, name='Zed', is_primary=True)
+        _contract(contract.company, end_date=date.today() + timedelta(days=31))
+
+        assert AutoEnrollmentService().process_renewal_triggers() == 1
+
+        [enrollment] = _enrollments(sequence)
+        assert enrollment.contact == primary and enrollment.company == contract.company
+        assert (enrollment.trigger_entity_type, enrollment.trigger_entity_id) == ('contract', str(contract.id))
+        assert (enrollment.status, enrollment.enrollment_source, enrollment.current_step_number) == ('active', 'auto_trigger', 1)
+        execution = SequenceStepExecution.objects.get(enrollment=enrollment)
+        assert execution.step.step_number == 1 and execution.status == 'scheduled'
+        assert execution.scheduled_for == enrollment.enrolled_at + timedelta(days=30)
+
+    def test_enrolled_contract_is_not_enrolled_again(self, sequence):
+        contract = self._expiring()
+        contact = ContactFactory(company=contract.company, is_primary=True)
+        assert AutoEnrollmentService().process_renewal_triggers() == 1
+        # A new primary contact must not get a second enrollment for the same contract
+        ContactFactory(company=contract.company, is_primary=True)
+        SequenceEnrollment.objects.filter(contact=contact).update(contact=ContactFactory(company=contract.company))
+
+        assert AutoEnrollmentService().process_renewal_triggers() == 0
+        assert len(_enrollments(sequence)) == 1
+
+    def test_opted_out_contacts_are_not_enrolled(self, sequence):
+        contract = self._expiring()
+        ContactFactory(company=contract.company, is_primary=True, receives_renewal_emails=False)
+        ContactFactory(company=contract.company, unsubscribed=True)
+        ContactFactory(company=contract.company, is_active=False)
+        self._expiring(send_renewal_reminders=False)
+        ContactFactory(company=self._expiring(status='Draft').company)
+
+        assert AutoEnrollmentService().process_renewal_triggers() == 0
+        assert not SequenceStepExecution.objects.exists()
+
+    def test_contact_is_enrolled_once_per_sequence(self, sequence):
+        company = CompanyFactory()
+        contact = ContactFactory(company=company, is_primary=True)
+        self._expiring(company)
+        self._expiring(company)
+        other = ContactFactory(company=self._expiring().company)
+        SequenceEnrollment.objects.create(sequence=sequence, contact=other, company=other.company)
+
+        assert AutoEnrollmentService().process_renewal_triggers() == 1
+        assert SequenceEnrollment.objects.get(sequence=sequence, enrollment_source='auto_trigger').contact == contact
+
+    def test_step_one_inactive_enrolls_without_execution(self, sequence):
+        sequence.steps.update(is_active=False)
+        ContactFactory(company=self._expiring().company)
+
+        assert AutoEnrollmentService().process_renewal_triggers() == 1
+        assert not SequenceStepExecution.objects.exists()
+
+    def test_queries_do_not_grow_with_contracts(self, sequence):
+        def queries_for(count):
+            SequenceEnrollment.objects.all().delete()
+            for i in range(count):
+                # Distinct names: CompanyFactory gets or creates by name
+                company = CompanyFactory(name=f'Expiring {count}-{i}')
+                ContactFactory(company=self._expiring(company).company)
+            with CaptureQueriesContext(connection) as ctx:
+                enrolled = AutoEnrollmentService().process_renewal_triggers()
+            return enrolled, len(ctx.captured_queries)
+
+        (few, few_queries), (many, many_queries) = queries_for(2), queries_for(20)
+
+        assert (few, many) == (2, 22)
+        assert few_queries == many_queries
+
+
+@pytest.mark.django_db
+class TestPaymentTriggers:
+    """Test suite for AutoEnrollmentService.process_payment_triggers"""
+
+    @pytest.fixture
+    def sequence(self):
+        return _sequence('auto_payment', delay_days=7)
+
+    def _overdue(self, company, **fields):
+        fields.setdefault('status', 'Overdue')
+        contract = _contract(company)
+        return InvoiceFactory(contract=contract, company=company, due_date=date.today() - timedelta(days=7), **fields)
+
+    def test_billing_contact_is_preferred(self, sequence):
+        company = CompanyFactory()
+        ContactFactory(company=company, name='Aaron')
+        billing = ContactFactory(company=company, name='Zoe', contact_type='Billing')
+        invoice = self._overdue(company)
+
+        assert AutoEnrollmentService().process_payment_triggers() == 1
+        [enrollment] = _enrollments(sequence)
+        assert enrollment.contact == billing
+        assert (enrollment.trigger_entity_type, enrollment.trigger_entity_id) == ('invoice', str(invoice.id))
+        assert AutoEnrollmentService().process_payment_triggers() == 0
+
+    def test_falls_back_to_any_contact_by_name(self, sequence):
+        company = CompanyFactory()
+        ContactFactory(company=company, name='Zoe')
+        first = ContactFactory(company=company, name='Aaron')
+        ContactFactory(company=company, name='Billy', contact_type='Billing', receives_payment_emails=False)
+        self._overdue(company)
+        self._overdue(CompanyFactory(), status='Paid')
+
+        assert AutoEnrollmentService().process_payment_triggers() == 1
+        assert _enrollments(sequence)[0].contact == first
+
+
+@pytest.mark.django_db
+class TestQuarterlyTriggers:
+    """Test suite for AutoEnrollmentService.process_quarterly_triggers"""
+
+    def test_contracts_at_a_quarterly_milestone_are_enrolled_per_quarter(self):
+        sequence = _sequence('auto_quarterly', delay_days=0)
+        today = date.today()
+        second_quarter = _contract(start_date=today - timedelta(days=180))
+        first_quarter = _contract(start_date=today - timedelta(days=90))
+        for contract in (second_quarter, first_quarter, _contract(start_date=today - timedelta(days=100)), _contract(start_date=today)):
+            ContactFactory(company=contract.company, is_primary=True)
+
+        assert AutoEnrollmentService().process_quarterly_triggers() == 2
+        assert sorted(enrollment.trigger_entity_id for enrollment in _enrollments(sequence)) == sorted(
+            [f'{second_quarter.id}_Q2', f'{first_quarter.id}_Q1']
+        )
+        assert AutoEnrollmentService().process_quarterly_triggers() == 0
+
+    def test_no_quarterly_sequence(self):
+        ContactFactory(company=_contract(start_date=date.today() - timedelta(days=90)).company)
+
+        assert AutoEnrollmentService().process_quarterly_triggers() == 0
+
+
+@pytest.mark.django_db
+class TestSeasonalTriggers:
+    """Test suite for AutoEnrollmentService.process_seasonal_triggers"""
+
+    def test_companies_in_the_holiday_countries_are_enrolled_once_a_year(self):
+        sequence = _sequence('auto_seasonal_cny', delay_days=0)
+        SeasonalTriggerDate.objects.create(holiday_type='auto_seasonal_cny', trigger_date=date.today(), year=date.today().year)
+        thai = CompanyFactory(country='Thailand')
+        _contract(thai)
+        _contract(thai)
+        contact = ContactFactory(company=thai)
+        for company in (CompanyFactory(country='UK'), CompanyFactory(country='Singapore', seasonal_emails_enabled=False)):
+            _contract(company)
+            ContactFactory(company=company)
+        ContactFactory(company=CompanyFactory(country='Singapore'))
+
+        assert AutoEnrollmentService().process_seasonal_triggers() == 1
+        [enrollment] = _enrollments(sequence)
+        assert (enrollment.contact, enrollment.company) == (contact, thai)
+        assert enrollment.trigger_entity_id == f'auto_seasonal_cny_{date.today().year}'
+        assert AutoEnrollmentService().process_seasonal_triggers() == 0
+
+
+def _legacy_renewal_and_quarterly(service):
+    """The per-row loop of process_renewal_triggers / process_quarterly_triggers before the set-based rewrite"""
+    today = date.today()
+    enrolled = 0
+    for sequence in EmailSequence.objects.filter(sequence_type='auto_renewal', status='active'):
+        first_step = sequence.steps.order_by('step_number').first()
+        contracts = Contract.objects.filter(
+            end_date=today + timedelta(days=first_step.delay_days), status='Active', send_renewal_reminders=True,
+        ).select_related('company')
+        for contract in contracts:
+            if SequenceEnrollment.objects.filter(
+                sequence=sequence, trigger_entity_type='contract', trigger_entity_id=str(contract.id),
+            ).exists():
+                continue
+            contact = contract.company.contacts.filter(
+                is_active=True, receives_notifications=True, receives_renewal_emails=True, unsubscribed=False,
+            ).order_by('-is_primary').first()
+            if contact:
+                try:
+                    enrollment = SequenceEnrollment.objects.create(
+                        sequence=sequence, contact=contact, company=contract.company, status='active',
+                        enrollment_source='auto_trigger', trigger_entity_type='contract',
+                        trigger_entity_id=str(contract.id), current_step_number=1,
+                    )
+                    service._schedule_next_step(enrollment)
+                    enrolled += 1
+                except Exception:
+                    pass
+    for contract in Contract.objects.filter(status='Active').select_related('company'):
+        days_since_start = (today - contract.start_date).days
+        if days_since_start > 0 and days_since_start % 90 == 0:
+            sequence = EmailSequence.objects.filter(sequence_type='auto_quarterly', status='active').first()
+            key = f"{contract.id}_Q{days_since_start // 90}"
+            if SequenceEnrollment.objects.filter(
+                sequence=sequence, trigger_entity_type='contract_quarter', trigger_entity_id=key,
+            ).exists():
+                continue
+            contact = contract.company.contacts.filter(
+                is_active=True, receives_notifications=True, receives_quarterly_emails=True, unsubscribed=False,
+            ).order_by('-is_primary').first()
+            if contact:
+                try:
+                    enrollment = SequenceEnrollment.objects.create(
+                        sequence=sequence, contact=contact, company=contract.company, status='active',
+                        enrollment_source='auto_trigger', trigger_entity_type='contract_quarter',
+                        trigger_entity_id=key, current_step_number=1,
+                    )
+                    service._schedule_next_step(enrollment)
+                    enrolled += 1
+                except Exception:
+                    pass
+    return enrolled
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_report_enrollment_pass():
+    """Renewal and quarterly triggers over 50,000 active contracts of 10,000 companies"""
+    _sequence('auto_renewal', delay_days=30)
+    _sequence('auto_quarterly', delay_days=0)
+    today = date.today()
+    companies = Company.objects.bulk_create([
+        Company(name=f'Benchmark company {index:05d}', country='Thailand') for index in range(10000)
+    ])
+    Contact.objects.bulk_create([
+        Contact(company=company, name=f'Contact {index:05d}', email=f'contact{index}@example.com', is_primary=True)
+        for index, company in enumerate(companies)
+    ])
+    Contract.objects.bulk_create([
+        Contract(
+            company=companies[index % len(companies)], contract_number=f'BENCH-{index:06d}', status='Active',
+            start_date=today - timedelta(days=1 + index % 1095), end_date=today + timedelta(days=index % 365),
+            value=1000,
+        )
+        for index in range(50000)
+    ], batch_size=2000)
+
+    service = AutoEnrollmentService()
+    with CaptureQueriesContext(connection) as legacy_queries:
+        started = time.perf_counter()
+        legacy = _legacy_renewal_and_quarterly(service)
+        legacy_seconds = time.perf_counter() - started
+    legacy_rows = sorted(SequenceEnrollment.objects.values_list('sequence_id', 'contact_id', 'trigger_entity_id'))
+    SequenceEnrollment.objects.all().delete()
+
+    with CaptureQueriesContext(connection) as set_queries:
+        started = time.perf_counter()
+        enrolled = service.process_renewal_triggers() + service.process_quarterly_triggers()
+        set_seconds = time.perf_counter() - started
+    set_rows = sorted(SequenceEnrollment.objects.values_list('sequence_id', 'contact_id', 'trigger_entity_id'))
+
+    print(f"\nAuto-enrollment, 50,000 active contracts: per-row loop {legacy_seconds:.2f}s "
+          f"({len(legacy_queries.captured_queries)} queries); set-based {set_seconds:.2f}s "
+          f"({len(set_queries.captured_queries)} queries); {enrolled} enrollments")
+    assert enrolled == legacy and set_rows == legacy_rows
+    assert SequenceStepExecution.objects.count() == enrolled
+    assert set_seconds < legacy_seconds / 5
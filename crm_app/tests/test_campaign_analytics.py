@@ -0,0 +1,122 @@
+"""
+Test suite for campaign analytics: the single-aggregate
+EmailCampaign.update_analytics, the F() counter bumps on recipient status
+transitions, and the SQL-annotated recipient counters of the campaign list.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from crm_app.models import CampaignRecipient, EmailCampaign
+from crm_app.tests.factories import CompanyFactory, ContactFactory, UserFactory
+
+STATUSES = ['pending', 'sent', 'delivered', 'opened', 'clicked', 'bounced', 'unsubscribed', 'failed']
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(role='Admin', is_staff=True))
+    return client
+
+
+def _campaign(statuses=STATUSES):
+    campaign = EmailCampaign.objects.create(name='Promo', campaign_type='custom', subject='News')
+    company = CompanyFactory(soundtrack_account_id='')
+    for status in statuses:
+        CampaignRecipient.objects.create(campaign=campaign, contact=ContactFactory(company=company), status=status)
+    return campaign
+
+
+def _counters(campaign):
+    campaign.refresh_from_db()
+    return {field: getattr(campaign, field) for field in [*EmailCampaign.COUNTER_STATUSES, 'emails_sent']}
+
+
+@pytest.mark.django_db
+class TestUpdateAnalytics:
+    """Test suite for EmailCampaign.update_analytics"""
+
+    def test_counts_in_one_aggregate(self):
+        campaign = _campaign()
+        CampaignRecipient.objects.filter(campaign=campaign, status='clicked').update(sent_at='2026-03-01T10:00Z')
+
+        with CaptureQueriesContext(connection) as ctx:
+            campaign.update_analytics()
+
+        assert len(ctx.captured_queries) == 2  # aggregate + update
+        assert _counters(campaign) == {
+            'total_sent': 5, 'total_delivered': 3, 'total_bounced': 1, 'total_opened': 2,
+            'total_clicked': 1, 'total_unsubscribed': 1, 'emails_sent': 5,
+        }
+        assert campaign.last_email_sent.isoformat().startswith('2026-03-01T10:00')
+
+
+@pytest.mark.django_db
+class TestCounterBumps:
+    """Test suite for EmailCampaign.bump_counters via CampaignRecipient.mark_as_*"""
+
+    def test_transitions_match_recount(self):
+        campaign = _campaign(['pending'] * 4)
+        first, second, third, fourth = campaign.recipients.order_by('pk')
+
+        for recipient in (first, second, third, fourth):
+            recipient.mark_as_sent()
+        first.mark_as_opened()
+        first.mark_as_opened()
+        first.mark_as_clicked()
+        second.mark_as_clicked()
+        third.mark_as_bounced('550 mailbox unavailable')
+        fourth.mark_as_delivered()
+        bumped = _counters(campaign)
+
+        campaign.update_analytics()
+
+        assert bumped == _counters(campaign)
+        assert bumped['total_clicked'] == 2 and bumped['total_sent'] == 4
+
+    def test_bump_is_a_single_update(self):
+        campaign = _campaign([])
+
+        with CaptureQueriesContext(connection) as ctx:
+            EmailCampaign.bump_counters(campaign.pk, 'sent', 'opened')
+
+        assert len(ctx.captured_queries) == 1
+        assert _counters(campaign)['total_opened'] == 1
+
+    def test_failed_send_changes_nothing(self):
+        campaign = _campaign([])
+
+        assert EmailCampaign.bump_counters(campaign.pk, 'pending', 'failed') == 0
+
+
+@pytest.mark.django_db
+class TestCampaignListCounters:
+    """Test suite for the annotated recipient counters on /api/v1/campaigns/"""
+
+    def test_counters(self, api_client):
+        campaign = _campaign()
+
+        response = api_client.get('/api/v1/campaigns/')
+
+        row = next(row for row in response.json()['results'] if row['id'] == str(campaign.id))
+        assert (row['recipients_count'], row['pending_count'], row['sent_count'], row['failed_count']) == (8, 1, 4, 2)
+
+    def test_detail_counters(self, api_client):
+        campaign = _campaign()
+
+        row = api_client.get(f'/api/v1/campaigns/{campaign.id}/').json()
+
+        assert (row['recipients_count'], row['sent_count']) == (8, 4)
+
+    def test_queries_do_not_grow_with_campaigns(self, api_client):
+        def queries_for(count):
+            EmailCampaign.objects.all().delete()
+            for _ in range(count):
+                _campaign(['pending', 'sent'])
+            with CaptureQueriesContext(connection) as ctx:
+                assert api_client.get('/api/v1/campaigns/').status_code == 200
+            return len(ctx.captured_queries)
+
+        assert queries_for(2) == queries_for(12)
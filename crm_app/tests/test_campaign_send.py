@@ -0,0 +1,297 @@
+"""
+Test suite for the queued campaign send pipeline.
+Covers enqueueing via the API, chunked draining by the process_campaign_queue
+worker (locmem email backend), claiming chunks outside the send,
+crash/partial-run resumability, pause/resume and the per-sender rate limit.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm_app.models import CampaignRecipient, EmailCampaign, EmailLog
+from crm_app.services.campaign_send_service import CampaignSendService, SenderRateLimiter
+from crm_app.tests.factories import CompanyFactory, ContactFactory, UserFactory
+
+
+class FailingBackend:
+    """Email backend whose SMTP server is always down"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP down')
+
+
+class ClaimCheckingBackend(EmailBackend):
+    """locmem backend recording each recipient's status at the time its email is sent"""
+    statuses = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            ClaimCheckingBackend.statuses.append(
+                CampaignRecipient.objects.get(contact__email=message.to[0]).status
+            )
+        return super().send_messages(messages)
+
+
+class LogCheckingBackend(EmailBackend):
+    """locmem backend recording, for each message, whether its EmailLog row exists with its Message-ID"""
+    logged = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            LogCheckingBackend.logged.append(EmailLog.objects.filter(
+                pk=message.extra_headers['X-BMAsia-Email-ID'],
+                message_id=message.extra_headers['Message-ID'],
+            ).exists())
+        return super().send_messages(messages)
+
+
+class ClaimAgeBackend(EmailBackend):
+    """locmem backend recording the claim time of the last recipient in the chunk at each send"""
+    claimed_at = []
+
+    def send_messages(self, messages):
+        ClaimAgeBackend.claimed_at.append(
+            CampaignRecipient.objects.order_by('created_at', 'pk').last().updated_at
+        )
+        return super().send_messages(messages)
+
+
+@pytest.fixture
+def user():
+    return UserFactory(role='Admin', is_staff=True, email='sender@bmasiamusic.com')
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def campaign():
+    """A custom campaign with five pending recipients"""
+    campaign = EmailCampaign.objects.create(
+        name='Spring promo', campaign_type='custom', subject='Spring news',
+        target_audience={'custom_body': 'Hello from BMAsia'},
+    )
+    company = CompanyFactory(soundtrack_account_id='')
+    for i in range(5):
+        contact = ContactFactory(company=company, email=f'person{i}@example.com')
+        CampaignRecipient.objects.create(campaign=campaign, contact=contact)
+    return campaign
+
+
+def _drain(**options):
+    call_command('process_campaign_queue', rate=0, **options)
+
+
+@pytest.mark.django_db
+class TestCampaignSendPipeline:
+    """Test suite for CampaignViewSet.send/pause/resume and the queue worker"""
+
+    def test_send_only_enqueues(self, api_client, campaign):
+        """The API marks the campaign sending and sends nothing itself"""
+        response = api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        assert response.status_code == 202
+        assert response.data['queued_count'] == 5
+        assert response.data['progress']['pending'] == 5
+        campaign.refresh_from_db()
+        assert campaign.status == 'sending'
+        assert campaign.sender_email == 'sender@bmasiamusic.com'
+        assert mail.outbox == []
+
+    def test_send_rejects_campaign_already_sending(self, api_client, campaign):
+        api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        response = api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        assert response.status_code == 400
+
+    def test_worker_drains_queue_in_chunks(self, api_client, campaign):
+        """The worker sends every pending recipient and finalizes the campaign"""
+        api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        _drain(chunk_size=2)
+
+        assert len(mail.outbox) == 5
+        assert mail.outbox[0].from_email == 'sender@bmasiamusic.com'
+        assert not campaign.recipients.exclude(status='sent').exists()
+        campaign.refresh_from_db()
+        assert campaign.status == 'sent'
+        assert campaign.total_sent == 5
+        recipient = campaign.recipients.select_related('email_log').first()
+        assert recipient.email_log is not None
+        assert recipient.email_log.email_type == 'campaign'
+        assert EmailLog.objects.filter(email_type='campaign').count() == 5
+
+    def test_partial_run_resumes_from_recipient_status(self, api_client, campaign):
+        """A worker stopped after one chunk leaves the rest pending; the next run finishes"""
+        api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        _drain(chunk_size=2, max_chunks=1)
+
+        assert len(mail.outbox) == 2
+        assert campaign.recipients.filter(status='pending').count() == 3
+        campaign.refresh_from_db()
+        assert campaign.status == 'sending'
+
+        _drain(chunk_size=2)
+
+        assert len(mail.outbox) == 5
+        assert len({message.to[0] for message in mail.outbox}) == 5
+        campaign.refresh_from_db()
+        assert campaign.status == 'sent'
+
+    def test_pause_and_resume(self, api_client, campaign):
+        """Paused campaigns are skipped by the worker; resume puts them back in the queue"""
+        api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+        _drain(chunk_size=2, max_chunks=1)
+
+        response = api_client.post(f'/api/v1/campaigns/{campaign.id}/pause/')
+        assert response.status_code == 200
+        assert response.data['progress'] == {
+            'total': 5, 'pending': 3, 'sent': 2, 'failed': 0, 'percent_complete': 40.0,
+        }
+
+        _drain(chunk_size=2)
+        assert len(mail.outbox) == 2
+
+        response = api_client.post(f'/api/v1/campaigns/{campaign.id}/resume/')
+        assert response.data['status'] == 'sending'
+
+        _drain(chunk_size=2)
+        assert len(mail.outbox) == 5
+
+    def test_smtp_failure_marks_recipient_failed(self, campaign, settings):
+        """Send errors are recorded per recipient and do not stop the campaign"""
+        settings.EMAIL_BACKEND = f'{__name__}.FailingBackend'
+        service = CampaignSendService(rate_per_minute=0)
+        service.enqueue(campaign)
+
+        result = service.process_campaign(campaign)
+
+        assert result['failed_count'] == 5
+        assert result['status'] == 'sent'
+        assert campaign.recipients.filter(status='failed').count() == 5
+
+    def test_chunk_is_claimed_before_sending(self, campaign, settings):
+        """Recipients are committed as 'sending' before their email goes out"""
+        settings.EMAIL_BACKEND = f'{__name__}.ClaimCheckingBackend'
+        ClaimCheckingBackend.statuses = []
+        service = CampaignSendService(chunk_size=2, rate_per_minute=0)
+        service.enqueue(campaign)
+
+        service.process_campaign(campaign)
+
+        assert ClaimCheckingBackend.statuses == ['sending'] * 5
+        assert not campaign.recipients.exclude(status='sent').exists()
+
+    def test_failed_save_does_not_resend_until_claim_times_out(self, campaign, monkeypatch):
+        """A chunk whose results could not be written stays claimed; only a stale claim is queued again"""
+        service = CampaignSendService(chunk_size=2, rate_per_minute=0)
+        service.enqueue(campaign)
+
+        def fail(batch, chunk):
+            raise RuntimeError('database went away')
+
+        monkeypatch.setattr(service, '_save_chunk', fail)
+        with pytest.raises(RuntimeError):
+            service.process_campaign(campaign)
+        assert len(mail.outbox) == 2
+        assert campaign.recipients.filter(status='sending').count() == 2
+
+        result = CampaignSendService(chunk_size=2, rate_per_minute=0).process_campaign(campaign)
+
+        assert len(mail.outbox) == 5
+        assert len({message.to[0] for message in mail.outbox}) == 5
+        assert result['status'] == 'sending' and result['progress']['pending'] == 2
+
+        released = service.release_stale_claims(campaign, now=timezone.now() + timedelta(minutes=31))
+        assert released == 2
+        assert campaign.recipients.filter(status='pending').count() == 2
+
+    def test_claim_is_refreshed_while_chunk_is_sent(self, campaign, settings):
+        """A chunk that takes longer than the claim timeout keeps its claim fresh"""
+        settings.EMAIL_BACKEND = f'{__name__}.ClaimAgeBackend'
+        ClaimAgeBackend.claimed_at = []
+        service = CampaignSendService(chunk_size=5, rate_per_minute=0)
+        service.claim_timeout = timedelta(0)
+        service.enqueue(campaign)
+
+        service.process_campaign(campaign)
+
+        assert len(ClaimAgeBackend.claimed_at) == 5
+        assert ClaimAgeBackend.claimed_at == sorted(set(ClaimAgeBackend.claimed_at))
+        assert not campaign.recipients.exclude(status='sent').exists()
+
+    def test_email_logs_exist_before_sending(self, campaign, settings):
+        """Tracking tokens and Message-IDs of sent emails point at rows written by the claim"""
+        settings.EMAIL_BACKEND = f'{__name__}.LogCheckingBackend'
+        LogCheckingBackend.logged = []
+        service = CampaignSendService(chunk_size=2, rate_per_minute=0)
+        service.enqueue(campaign)
+
+        service.process_campaign(campaign)
+
+        assert LogCheckingBackend.logged == [True] * 5
+        assert EmailLog.objects.filter(email_type='campaign', status='sent').count() == 5
+
+    def test_crash_before_log_flush_keeps_pending_logs(self, campaign, monkeypatch):
+        """Logs of a chunk whose worker died are kept and reused when the chunk is sent again"""
+        service = CampaignSendService(chunk_size=5, rate_per_minute=0)
+        service.enqueue(campaign)
+
+        def crash(batch, chunk):
+            raise RuntimeError('worker killed')
+
+        monkeypatch.setattr(service, '_save_chunk', crash)
+        monkeypatch.setattr('crm_app.services.email_log_batch.EmailLogBatch.flush', lambda batch: [])
+        with pytest.raises(RuntimeError):
+            service.process_campaign(campaign)
+        monkeypatch.undo()
+        first_ids = {message.extra_headers['Message-ID'] for message in mail.outbox}
+        assert set(EmailLog.objects.filter(status='pending').values_list('message_id', flat=True)) == first_ids
+
+        service.release_stale_claims(campaign, now=timezone.now() + timedelta(minutes=31))
+        CampaignSendService(chunk_size=5, rate_per_minute=0).process_campaign(campaign)
+
+        assert EmailLog.objects.count() == 5
+        assert set(EmailLog.objects.filter(status='sent').values_list('message_id', flat=True)) == first_ids
+
+    def test_sync_mode_sends_in_request(self, api_client, campaign, settings):
+        settings.CAMPAIGN_SEND_MODE = 'sync'
+        settings.CAMPAIGN_SEND_RATE_PER_MINUTE = 0
+
+        response = api_client.post(f'/api/v1/campaigns/{campaign.id}/send/')
+
+        assert response.status_code == 200
+        assert response.data['sent_count'] == 5
+        assert response.data['status'] == 'sent'
+        assert len(mail.outbox) == 5
+
+
+def test_rate_limiter_spaces_sends_per_sender():
+    """Sends from one sender are spaced 60/rate seconds apart; senders are independent"""
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = SenderRateLimiter(per_minute=30, clock=lambda: now[0], sleep=sleep)
+    limiter.wait('a@example.com')
+    limiter.wait('a@example.com')
+    limiter.wait('b@example.com')
+    limiter.wait('a@example.com')
+
+    assert sleeps == [2.0, 2.0]
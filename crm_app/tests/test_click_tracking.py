@@ -0,0 +1,240 @@
+"""
+Test suite for email click tracking: link rewriting in EmailService.send_email
+(services/click_tracking.py), the /c/<token>/ redirect and the batched click
+ingestion into EmailClick, CampaignRecipient and the campaign counters
+(services/tracking_buffer.py).
+"""
+import time
+
+import pytest
+from django.core import mail, signing
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import CampaignRecipient, EmailCampaign, EmailClick, EmailLog
+from crm_app.services.click_tracking import click_url, decode_click_token, make_click_token, rewrite_links
+from crm_app.services.email_service import EmailService
+from crm_app.services.tracking_buffer import click_tracking_buffer
+from crm_app.tests.factories import CompanyFactory, ContactFactory
+
+LATER = 600  # seconds: every bucket written "now" is closed by then
+TOKEN = 'tracking-token-1'
+
+
+@pytest.fixture(autouse=True)
+def buffered(settings):
+    settings.SITE_URL = 'https://crm.example.com'
+    settings.EMAIL_TRACKING_BUFFERED = True
+    click_tracking_buffer.cache.clear()
+    yield
+    click_tracking_buffer.cache.clear()
+
+
+@pytest.fixture
+def campaign():
+    return EmailCampaign.objects.create(name='Promo', campaign_type='custom', subject='News')
+
+
+def _sent_email(campaign=None, status='sent'):
+    """EmailLog (and CampaignRecipient when a campaign is given) for a sent email"""
+    company = CompanyFactory(soundtrack_account_id='')
+    contact = ContactFactory(company=company)
+    email_log = EmailLog.objects.create(
+        company=company, contact=contact, email_type='campaign', status='sent',
+        from_email='news@bmasiamusic.com', to_email=contact.email, subject='News',
+        body_html='<p>News</p>', body_text='News',
+    )
+    if campaign:
+        CampaignRecipient.objects.create(campaign=campaign, contact=contact, email_log=email_log, status=status)
+    return email_log
+
+
+def _click(email_log, url='https://bmasiamusic.com/offer', now=None):
+    click_tracking_buffer.record(email_log.tracking_token, url, now=now)
+
+
+def _flush(now=None):
+    return click_tracking_buffer.flush(now=(now or time.time()) + LATER)
+
+
+class TestLinkRewriting:
+    """Test suite for click_tracking.rewrite_links and the click tokens"""
+
+    def test_rewrites_web_links(self):
+        html = '<p><a href="https://bmasiamusic.com/offer?a=1&amp;b=2" class="btn">Offer</a></p>'
+
+        rewritten = rewrite_links(html, TOKEN)
+
+        href = rewritten.split('href="')[1].split('"')[0]
+        assert href.startswith('https://crm.example.com/c/') and 'class="btn"' in rewritten
+        token = href.removeprefix('https://crm.example.com/c/').rstrip('/')
+        assert decode_click_token(token) == (TOKEN, 'https://bmasiamusic.com/offer?a=1&b=2')
+
+    @pytest.mark.parametrize('href', [
+        'mailto:sales@bmasiamusic.com', 'tel:+6621234567', '#top',
+        'https://crm.example.com/unsubscribe/abc/', '{{quote_url}}',
+    ])
+    def test_leaves_other_links_alone(self, href):
+        html = f"<a href='{href}'>link</a>"
+
+        assert rewrite_links(html, TOKEN) == html
+
+    def test_disabled(self, settings):
+        settings.EMAIL_CLICK_TRACKING = False
+        html = '<a href="https://bmasiamusic.com">Home</a>'
+
+        assert rewrite_links(html, TOKEN) == html
+
+    def test_tampered_token_is_rejected(self):
+        token = make_click_token(TOKEN, 'https://bmasiamusic.com')
+
+        with pytest.raises(signing.BadSignature):
+            decode_click_token(token[:-2] + 'xx')
+
+    def test_decoded_tokens_are_cached_per_process(self):
+        token = make_click_token(TOKEN, 'https://bmasiamusic.com/cached')
+        decode_click_token(token)
+        hits = decode_click_token.cache_info().hits
+
+        decode_click_token(token)
+
+        assert decode_click_token.cache_info().hits == hits + 1
+
+
+@pytest.mark.django_db
+class TestSendEmailRewritesLinks:
+    """Test suite for the link rewriting stage of EmailService.send_email"""
+
+    def test_outgoing_html_has_tracked_links(self):
+        company = CompanyFactory(soundtrack_account_id='')
+
+        EmailService().send_email(
+            to_email='ann@example.com', subject='News', company=company,
+            body_html='<p><a href="https://bmasiamusic.com/offer">Offer</a></p>', body_text='Offer',
+        )
+
+        html = mail.outbox[0].alternatives[0][0]
+        assert 'href="https://bmasiamusic.com/offer"' not in html
+        assert 'href="https://crm.example.com/c/' in html
+        assert EmailLog.objects.get().body_html == '<p><a href="https://bmasiamusic.com/offer">Offer</a></p>'
+
+
+@pytest.mark.django_db
+class TestClickRedirect:
+    """Test suite for the /c/<token>/ endpoint"""
+
+    def test_redirects_without_touching_database(self):
+        url = click_url(TOKEN, 'https://bmasiamusic.com/offer')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = Client().get(url.removeprefix('https://crm.example.com'))
+
+        assert response.status_code == 302
+        assert response['Location'] == 'https://bmasiamusic.com/offer'
+        assert len(ctx.captured_queries) == 0
+        assert click_tracking_buffer.pending(now=time.time() + LATER) == 1
+
+    def test_forged_token_is_404(self):
+        assert Client().get('/c/not-a-signed-token/').status_code == 404
+
+    def test_unbuffered_click_writes_immediately(self, settings):
+        settings.EMAIL_TRACKING_BUFFERED = False
+        email_log = _sent_email()
+        url = click_url(email_log.tracking_token, 'https://bmasiamusic.com/offer')
+
+        Client().get(url.removeprefix('https://crm.example.com'))
+
+        assert EmailClick.objects.get().email_log == email_log
+
+
+@pytest.mark.django_db
+class TestClickIngestion:
+    """Test suite for ClickTrackingBuffer.flush"""
+
+    def test_every_click_is_stored(self):
+        email_log = _sent_email()
+        now = time.time()
+        _click(email_log, now=now)
+        _click(email_log, 'https://bmasiamusic.com/contact', now=now + 1)
+
+        assert _flush(now) == 2
+
+        assert sorted(email_log.clicks.values_list('url', flat=True)) == [
+            'https://bmasiamusic.com/contact', 'https://bmasiamusic.com/offer',
+        ]
+        email_log.refresh_from_db()
+        assert email_log.status == 'clicked'
+        assert abs(email_log.clicked_at.timestamp() - now) < 1
+        assert email_log.opened_at == email_log.clicked_at
+
+    def test_unique_clicks_roll_up_into_campaign(self, campaign):
+        sent, opened = _sent_email(campaign, 'sent'), _sent_email(campaign, 'opened')
+        campaign.update_analytics()
+        now = time.time()
+        for email_log in (sent, opened, opened):
+            _click(email_log, now=now)
+
+        _flush(now)
+        _click(sent, now=now + LATER)
+        _flush(now + LATER)
+
+        assert list(campaign.recipients.values_list('status', flat=True)) == ['clicked', 'clicked']
+        assert EmailClick.objects.count() == 4
+        campaign.refresh_from_db()
+        bumped = (campaign.total_clicked, campaign.total_opened)
+        campaign.update_analytics()
+        assert bumped == (campaign.total_clicked, campaign.total_opened) == (2, 2)
+        assert campaign.click_rate == 100.0
+
+    def test_unknown_tokens_are_dropped(self):
+        click_tracking_buffer.record('no-such-token', 'https://bmasiamusic.com')
+
+        assert _flush() == 0
+
+    def test_click_before_log_is_written_is_queued_again(self):
+        now = time.time()
+        click_tracking_buffer.record('written-later', 'https://bmasiamusic.com', now=now)
+
+        assert _flush(now) == 0
+        email_log = _sent_email()
+        EmailLog.objects.filter(pk=email_log.pk).update(tracking_token='written-later')
+
+        assert _flush(now + LATER) == 1
+        assert email_log.clicks.count() == 1
+
+    def test_failed_flush_does_not_store_applied_clicks_twice(self, settings, monkeypatch):
+        settings.EMAIL_TRACKING_FLUSH_BATCH_SIZE = 1
+        email_log = _sent_email()
+        now = time.time()
+        for i in range(3):
+            _click(email_log, f'https://bmasiamusic.com/{i}', now=now + i)
+        apply_batch = click_tracking_buffer.apply_batch
+        calls = []
+
+        def fail_second_batch(values, flushed_at):
+            calls.append(values)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return apply_batch(values, flushed_at)
+
+        monkeypatch.setattr(click_tracking_buffer, 'apply_batch', fail_second_batch)
+        with pytest.raises(RuntimeError):
+            _flush(now)
+        monkeypatch.undo()
+
+        assert _flush(now) == 2
+        assert sorted(email_log.clicks.values_list('url', flat=True)) == [
+            f'https://bmasiamusic.com/{i}' for i in range(3)
+        ]
+
+    def test_queries_do_not_grow_with_clicks(self, campaign):
+        def queries_for(count, clicked_at):
+            for _ in range(count):
+                _click(_sent_email(campaign), now=clicked_at)
+            with CaptureQueriesContext(connection) as ctx:
+                assert click_tracking_buffer.flush(now=clicked_at + LATER) == count
+            return len(ctx.captured_queries)
+
+        now = time.time()
+        assert queries_for(3, now) == queries_for(30, now + LATER)
@@ -0,0 +1,122 @@
+"""
+Test suite for the companies list endpoint.
+Checks that the annotated/prefetched list representation matches the per-object
+CompanySerializer output, that ?fields= trims the payload and the queries, and
+that the number of queries does not grow with the page size.
+"""
+import json
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from crm_app.models import Company
+from crm_app.serializers import CompanySerializer
+from crm_app.tests.factories import (
+    CompanyFactory, ContactFactory, ContractFactory, ContractZoneFactory,
+    OpportunityFactory, UserFactory, ZoneFactory
+)
+
+LIST_URL = '/api/v1/companies/'
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(role='Admin', is_staff=True))
+    return client
+
+
+def _populate(count):
+    """Companies with contacts, zones (linked to contracts), opportunities and subsidiaries"""
+    for i in range(count):
+        company = CompanyFactory(name=f'Company {i:03d}', is_corporate_parent=(i % 2 == 0),
+                                 soundtrack_account_id='')
+        ContactFactory(company=company, name=f'B {i}', is_primary=True)
+        ContactFactory(company=company, name=f'A {i}', is_primary=False)
+        contract = ContractFactory(company=company, opportunity=None, contract_type='Annual',
+                                   value=Decimal('1000.00'))
+        ContractFactory(company=company, opportunity=None, contract_type='Annual', value=Decimal('250.50'))
+        ContractFactory(company=company, opportunity=None, is_active=False, value=Decimal('99.00'))
+        ContractZoneFactory(contract=contract, zone=ZoneFactory(company=company, status='online'))
+        ZoneFactory(company=company, status='offline')
+        OpportunityFactory(company=company)
+        if company.is_corporate_parent:
+            CompanyFactory(name=f'Company {i:03d} subsidiary', parent_company=company,
+                           soundtrack_account_id='')
+
+
+def _normalise(data):
+    return json.loads(json.dumps(data, default=str))
+
+
+@pytest.mark.django_db
+class TestCompanyList:
+    """Test suite for CompanyViewSet.list() and CompanySerializer.setup_eager_loading()"""
+
+    def test_list_matches_detail_serializer(self, api_client):
+        """Annotated list rows are identical to the unoptimised serializer output"""
+        _populate(3)
+
+        response = api_client.get(LIST_URL, {'page_size': 100})
+
+        assert response.status_code == 200
+        rows = response.data['results']
+        assert len(rows) == Company.objects.count()
+        for row in rows:
+            expected = CompanySerializer(Company.objects.get(pk=row['id'])).data
+            assert _normalise(row) == _normalise(expected)
+
+    def test_list_values(self, api_client):
+        """Counts, totals and summaries come out right from the annotations"""
+        _populate(1)
+
+        response = api_client.get(LIST_URL, {'search': 'Company 000'})
+
+        row = next(r for r in response.data['results'] if r['name'] == 'Company 000')
+        assert row['opportunities_count'] == 1
+        assert row['active_contracts_count'] == 2
+        assert Decimal(str(row['total_contract_value'])) == Decimal('1250.50')
+        assert row['child_companies_count'] == 1
+        assert row['primary_contact']['name'] == 'B 0'
+        assert row['subscription_summary'] == '2 Annual'
+        assert row['zones_summary'] == '1 Online, 1 Offline'
+        linked = next(zone for zone in row['zones'] if zone['status'] == 'online')
+        assert linked['contract_count'] == 1
+        assert linked['current_contract'] is not None
+
+    def test_query_count_is_bounded(self, api_client):
+        """A page costs the same number of queries for 2 or 20 companies"""
+        _populate(1)
+        with CaptureQueriesContext(connection) as small:
+            api_client.get(LIST_URL, {'page_size': 100})
+        _populate(10)
+        with CaptureQueriesContext(connection) as large:
+            api_client.get(LIST_URL, {'page_size': 100})
+
+        assert len(small.captured_queries) == len(large.captured_queries)
+        assert len(large.captured_queries) <= 10
+
+    def test_sparse_fieldset(self, api_client):
+        """?fields= returns only those fields and skips the nested prefetches"""
+        _populate(5)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get(LIST_URL, {'fields': 'id,name,active_contracts_count'})
+
+        assert response.status_code == 200
+        for row in response.data['results']:
+            assert set(row) == {'id', 'name', 'active_contracts_count'}
+        # Session/user lookups aside, only the count and the page itself
+        assert len(ctx.captured_queries) <= 3
+
+    def test_sparse_fieldset_on_retrieve(self, api_client):
+        """?fields= also applies to the detail endpoint"""
+        company = CompanyFactory()
+
+        response = api_client.get(f'{LIST_URL}{company.pk}/', {'fields': 'id,name'})
+
+        assert response.status_code == 200
+        assert set(response.data) == {'id', 'name'}
@@ -0,0 +1,152 @@
+"""
+Test suite for the contracts list endpoint.
+Checks that the annotated ContractSerializer output matches the per-object
+fallbacks and that listing contracts costs a fixed number of queries.
+
+Benchmark (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_contract_list.py -m slow -s
+"""
+import json
+import os
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from crm_app.models import (
+    Company, Contract, ContractServiceLocation, ContractZone, Invoice, Zone
+)
+from crm_app.serializers import ContractSerializer
+from crm_app.tests.factories import UserFactory
+
+LIST_URL = '/api/v1/contracts/'
+
+# Page query, count query and the fixed set of prefetches
+MAX_LIST_QUERIES = 12
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(role='Admin', is_staff=True))
+    return client
+
+
+def _seed(size):
+    """Bulk-insert `size` contracts with invoices, zones, service locations and renewals"""
+    today = date.today()
+    companies = [
+        Company(id=uuid.uuid4(), name=f'Contract Co {uuid.uuid4().hex}',
+                soundtrack_account_id=f'SA-{i}' if i % 2 else '')
+        for i in range(max(size // 5, 1))
+    ]
+    Company.objects.bulk_create(companies)
+    contracts, invoices, zones, links, locations = [], [], [], [], []
+    for i in range(size):
+        company = companies[i % len(companies)]
+        contract = Contract(
+            id=uuid.uuid4(), company=company, contract_number=f'LIST-{uuid.uuid4().hex[:16]}',
+            start_date=today - timedelta(days=i % 300), end_date=today + timedelta(days=i % 400),
+            value=Decimal('1200.00'), soundtrack_account_id='SA-OVERRIDE' if i % 3 == 0 else '',
+            contract_category='corporate_master' if i % 7 == 0 else 'standard',
+            renewed_from=contracts[-1] if i % 4 == 1 else None,
+            master_contract=contracts[-1] if i % 7 == 1 and contracts[-1].contract_category == 'corporate_master' else None,
+        )
+        contracts.append(contract)
+        for status in ('Paid', 'Sent'):
+            invoices.append(Invoice(
+                id=uuid.uuid4(), company=company, contract=contract, status=status,
+                invoice_number=f'LINV-{uuid.uuid4().hex[:16]}', issue_date=today,
+                due_date=today + timedelta(days=30), amount=Decimal('100.00'),
+                tax_amount=Decimal('7.00'), total_amount=Decimal('107.00'),
+            ))
+        if i % 2:
+            locations.append(ContractServiceLocation(contract=contract, location_name=f'Lobby {i}'))
+        else:
+            zone = Zone(id=uuid.uuid4(), company=company, name=f'Zone {i}', status='online')
+            zones.append(zone)
+            links.append(ContractZone(contract=contract, zone=zone, start_date=today, is_active=i % 4 == 0))
+    Contract.objects.bulk_create(contracts)
+    Invoice.objects.bulk_create(invoices)
+    Zone.objects.bulk_create(zones)
+    ContractZone.objects.bulk_create(links)
+    ContractServiceLocation.objects.bulk_create(locations)
+
+
+def _normalise(data):
+    return json.loads(json.dumps(data, default=str))
+
+
+@pytest.mark.django_db
+class TestContractList:
+    """Test suite for ContractViewSet list/retrieve and ContractSerializer.setup_eager_loading()"""
+
+    def test_annotations_match_fallbacks(self):
+        """Annotated values equal the per-contract queries they replace"""
+        _seed(30)
+
+        annotated = ContractSerializer.setup_eager_loading(Contract.objects.all())
+        for contract in annotated:
+            plain = Contract.objects.get(pk=contract.pk)
+            assert _normalise(ContractSerializer(contract).data) == _normalise(ContractSerializer(plain).data)
+
+    def test_list_values(self, api_client):
+        """Spot-check the annotated fields on the list endpoint"""
+        _seed(8)
+
+        response = api_client.get(LIST_URL, {'page_size': 100})
+
+        assert response.status_code == 200
+        rows = {row['id']: row for row in response.data['results']}
+        for contract in Contract.objects.all():
+            row = rows[str(contract.pk)]
+            assert row['paid_invoices_count'] == 1
+            assert Decimal(str(row['outstanding_amount'])) == Decimal('107.00')
+            assert row['renewal_count'] == contract.renewals.count()
+            assert row['effective_soundtrack_account_id'] == (
+                contract.soundtrack_account_id or contract.company.soundtrack_account_id
+            )
+
+    def test_retrieve(self, api_client):
+        """Retrieve uses the same annotations"""
+        _seed(2)
+        contract = Contract.objects.first()
+
+        response = api_client.get(f'{LIST_URL}{contract.pk}/')
+
+        assert response.status_code == 200
+        assert response.data['paid_invoices_count'] == 1
+        assert len(response.data['invoices']) == 2
+
+    def test_query_count_is_constant(self, api_client):
+        """The number of queries does not depend on the page size"""
+        _seed(5)
+        with CaptureQueriesContext(connection) as small:
+            api_client.get(LIST_URL, {'page_size': 100})
+        _seed(40)
+        with CaptureQueriesContext(connection) as large:
+            api_client.get(LIST_URL, {'page_size': 100})
+
+        assert len(small.captured_queries) == len(large.captured_queries)
+        assert len(large.captured_queries) <= MAX_LIST_QUERIES
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_benchmark_list_500_contracts(api_client):
+    """Report query count and latency of listing 500 contracts in one page"""
+    _seed(500)
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        response = api_client.get(LIST_URL, {'page_size': 500})
+        elapsed = time.perf_counter() - started
+    print(f'\ncontract list @ 500 contracts: {len(ctx.captured_queries)} queries, {elapsed * 1000:.1f} ms')
+    assert response.status_code == 200
+    assert len(response.data['results']) == 500
+    assert len(ctx.captured_queries) <= MAX_LIST_QUERIES
@@ -0,0 +1,111 @@
+"""
+Test suite for the dashboard snapshot cache.
+Covers hit/stale/miss behaviour, scoping and signal-driven invalidation.
+"""
+from decimal import Decimal
+
+import pytest
+from rest_framework.test import APIClient
+
+from crm_app.services.dashboard_snapshot_service import DashboardSnapshotService
+from crm_app.tests.factories import CompanyFactory, ContractFactory, UserFactory
+
+
+HK = 'BMAsia Limited'
+TH = 'BMAsia (Thailand) Co., Ltd.'
+
+
+@pytest.fixture(autouse=True)
+def inline_refresh(settings):
+    """Rebuild stale snapshots inline so tests stay inside the test transaction"""
+    settings.DASHBOARD_CACHE_BACKGROUND_REFRESH = False
+
+
+@pytest.fixture
+def admin_user():
+    return UserFactory(role='Admin', is_staff=True)
+
+
+@pytest.mark.django_db
+class TestDashboardSnapshotService:
+    """Test suite for DashboardSnapshotService"""
+
+    def test_miss_then_hit(self, admin_user):
+        """First read builds the snapshot, the second is served from cache"""
+        service = DashboardSnapshotService()
+
+        _stats, first = service.get_stats(admin_user)
+        _stats, second = service.get_stats(admin_user)
+
+        assert (first, second) == ('miss', 'hit')
+        metrics = service.metrics()
+        assert metrics['miss'] == 1
+        assert metrics['hit'] == 1
+        assert metrics['hit_ratio'] == 0.5
+
+    def test_hit_issues_no_queries(self, admin_user, django_assert_num_queries):
+        """A fresh snapshot is served without touching the database"""
+        service = DashboardSnapshotService()
+        service.get_stats(admin_user)
+
+        with django_assert_num_queries(0):
+            service.get_stats(admin_user)
+
+    def test_stale_while_revalidate(self, admin_user, django_capture_on_commit_callbacks):
+        """After a change the old snapshot is served once, then the rebuilt one"""
+        service = DashboardSnapshotService()
+        service.get_stats(admin_user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ContractFactory(value=Decimal('500.00'))
+
+        stats, state = service.get_stats(admin_user)
+        assert state == 'stale'
+        assert stats['active_contracts'] == 0
+
+        stats, state = service.get_stats(admin_user)
+        assert state == 'hit'
+        assert stats['active_contracts'] == 1
+
+    def test_invalidation_is_scoped_to_billing_entity(self, admin_user, django_capture_on_commit_callbacks):
+        """A Thai contract leaves Hong Kong snapshots fresh"""
+        service = DashboardSnapshotService()
+        service.get_stats(admin_user, HK)
+        service.get_stats(admin_user, TH)
+        service.get_stats(admin_user)
+
+        company = CompanyFactory(billing_entity=TH)
+        with django_capture_on_commit_callbacks(execute=True):
+            ContractFactory(company=company, opportunity=None)
+
+        assert service.get_stats(admin_user, HK)[1] == 'hit'
+        assert service.get_stats(admin_user, TH)[1] == 'stale'
+        assert service.get_stats(admin_user)[1] == 'stale'
+
+    def test_sales_users_get_personal_snapshots(self, admin_user):
+        """Sales snapshots are keyed per user, Admin/Finance per role"""
+        service = DashboardSnapshotService()
+        alice = UserFactory(role='Sales')
+        bob = UserFactory(role='Sales')
+        finance = UserFactory(role='Finance')
+
+        assert service.snapshot_key(alice) != service.snapshot_key(bob)
+        assert service.snapshot_key(admin_user) == service.snapshot_key(UserFactory(role='Admin'))
+        assert service.snapshot_key(finance) != service.snapshot_key(admin_user)
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_reports_cache_state(admin_user):
+    """GET /api/v1/dashboard/stats/ sets X-Dashboard-Cache"""
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+
+    first = client.get('/api/v1/dashboard/stats/')
+    second = client.get('/api/v1/dashboard/stats/')
+    metrics = client.get('/api/v1/dashboard/cache-metrics/')
+
+    assert first['X-Dashboard-Cache'] == 'miss'
+    assert second['X-Dashboard-Cache'] == 'hit'
+    assert first.data == second.data
+    assert metrics.status_code == 200
+    assert metrics.data['hit'] == 1
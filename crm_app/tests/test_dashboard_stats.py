@@ -0,0 +1,198 @@
+"""
+Test suite for the dashboard statistics engine.
+Checks DashboardStatsService against the per-row model properties it replaced,
+and that the number of queries does not grow with the dataset.
+
+Benchmark (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_dashboard_stats.py -m slow -s
+"""
+import os
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm_app.models import Company, Contract, Invoice, Opportunity, Task
+from crm_app.services.dashboard_stats_service import DashboardStatsService
+from crm_app.tests.factories import (
+    CompanyFactory, ContractFactory, InvoiceFactory, OpportunityFactory, UserFactory
+)
+
+
+def _seed(size, owner):
+    """Bulk-insert `size` companies, each with one contract, invoice, opportunity and task."""
+    today = date.today()
+    now = timezone.now()
+    companies = [
+        Company(id=uuid.uuid4(), name=f'Bench Co {uuid.uuid4().hex}', billing_entity='BMAsia Limited')
+        for _ in range(size)
+    ]
+    Company.objects.bulk_create(companies, batch_size=2000)
+    contracts, invoices, opportunities, tasks = [], [], [], []
+    for i, company in enumerate(companies):
+        start = today - timedelta(days=(i % 400))
+        contract = Contract(
+            id=uuid.uuid4(), company=company, contract_number=f'BENCH-{uuid.uuid4().hex[:16]}',
+            status=['Active', 'Expired', 'Cancelled'][i % 3], start_date=start,
+            end_date=start + timedelta(days=365), value=Decimal('1000.00') + i % 50,
+            lifecycle_type=['', 'new', 'renewal'][i % 3],
+        )
+        contracts.append(contract)
+        invoices.append(Invoice(
+            id=uuid.uuid4(), company=company, contract=contract,
+            invoice_number=f'BINV-{uuid.uuid4().hex[:16]}', status=['Sent', 'Paid'][i % 2],
+            issue_date=start, due_date=start + timedelta(days=30),
+            amount=Decimal('100.00'), total_amount=Decimal('107.00'),
+        ))
+        opportunities.append(Opportunity(
+            id=uuid.uuid4(), company=company, name=f'Opp {i}', owner=owner,
+            stage=['Contacted', 'Quotation Sent', 'Contract Sent', 'Won', 'Lost'][i % 5],
+            expected_value=Decimal('500.00'), actual_close_date=start,
+        ))
+        tasks.append(Task(
+            id=uuid.uuid4(), company=company, title=f'Task {i}',
+            status=['To Do', 'Done'][i % 2], due_date=now - timedelta(days=(i % 10) - 5),
+        ))
+    Contract.objects.bulk_create(contracts, batch_size=2000)
+    Invoice.objects.bulk_create(invoices, batch_size=2000)
+    Opportunity.objects.bulk_create(opportunities, batch_size=2000)
+    Task.objects.bulk_create(tasks, batch_size=2000)
+
+
+@pytest.fixture
+def admin_user():
+    return UserFactory(role='Admin', is_staff=True)
+
+
+@pytest.mark.django_db
+class TestDashboardStatsService:
+    """Test suite for DashboardStatsService.build_stats()"""
+
+    def test_counters_match_model_properties(self, admin_user):
+        """Aggregates agree with the Task/Invoice/Contract properties they replace"""
+        today = date.today()
+        ContractFactory(end_date=today + timedelta(days=10), value=Decimal('1000.00'))
+        ContractFactory(end_date=today + timedelta(days=90), value=Decimal('2000.00'))
+        billed = ContractFactory()
+        InvoiceFactory(contract=billed, company=billed.company, status='Sent',
+                       due_date=today - timedelta(days=5), amount=Decimal('100.00'),
+                       tax_amount=Decimal('7.00'))
+        InvoiceFactory(contract=billed, company=billed.company, status='Paid',
+                       due_date=today - timedelta(days=5), amount=Decimal('100.00'),
+                       tax_amount=Decimal('7.00'))
+        company = CompanyFactory()
+        Task.objects.create(company=company, title='Late', status='To Do',
+                            due_date=timezone.now() - timedelta(days=1))
+        Task.objects.create(company=company, title='Done', status='Done',
+                            due_date=timezone.now() - timedelta(days=1))
+
+        stats = DashboardStatsService().build_stats(admin_user)
+
+        contracts = Contract.objects.filter(is_active=True)
+        assert stats['pending_renewals'] == sum(1 for c in contracts if c.is_expiring_soon)
+        assert stats['pending_renewal_value'] == sum(
+            float(c.value) for c in contracts if c.is_expiring_soon and c.value
+        )
+        assert stats['overdue_invoices'] == sum(1 for i in Invoice.objects.all() if i.is_overdue)
+        assert stats['total_overdue_amount'] == sum(
+            float(i.total_amount) for i in Invoice.objects.all() if i.is_overdue
+        )
+        assert stats['overdue_tasks'] == sum(1 for t in Task.objects.all() if t.is_overdue)
+        assert stats['active_contracts'] == contracts.count()
+
+    def test_pipeline_stages(self, admin_user):
+        """Stage counts and values come from a single conditional aggregate"""
+        OpportunityFactory(stage='Won', expected_value=Decimal('100.00'))
+        OpportunityFactory(stage='Won', expected_value=Decimal('50.00'))
+        OpportunityFactory(stage='Lost', expected_value=Decimal('10.00'))
+
+        stats = DashboardStatsService().build_stats(admin_user)
+
+        assert stats['won_count'] == 2
+        assert stats['lost_count'] == 1
+        assert stats['pipeline_stages']['Won'] == {'count': 2, 'value': 150.0}
+        assert stats['pipeline_stages']['Contacted'] == {'count': 0, 'value': 0.0}
+        assert stats['win_rate'] == round(2 / 3 * 100, 1)
+
+    def test_lifecycle_classification(self, admin_user):
+        """New vs renewal revenue follows lifecycle_type, renewed_from, then earlier contracts"""
+        first_of_month = timezone.now().date().replace(day=1)
+        company = CompanyFactory()
+        ContractFactory(company=company, start_date=first_of_month - timedelta(days=400),
+                        end_date=first_of_month - timedelta(days=35), value=Decimal('1.00'))
+        # Inferred renewal (earlier contract for the same company)
+        ContractFactory(company=company, start_date=first_of_month, value=Decimal('300.00'))
+        # Inferred new
+        ContractFactory(start_date=first_of_month, value=Decimal('200.00'))
+        # Explicit churn lifecycle counts towards neither bucket
+        ContractFactory(start_date=first_of_month, value=Decimal('50.00'), lifecycle_type='churn')
+
+        stats = DashboardStatsService().build_stats(admin_user)
+
+        assert stats['new_revenue'] == 200.0
+        assert stats['renewal_revenue'] == 300.0
+        assert stats['revenue_trend'][-1]['new_revenue'] == 200.0
+        # Trend buckets everything that is not 'new' as renewal
+        assert stats['revenue_trend'][-1]['renewal_revenue'] == 350.0
+
+    def test_churn_excludes_renewed_contracts(self, admin_user):
+        """Expired contracts with a successor are not churn"""
+        this_month = timezone.now().date().replace(day=1)
+        end = this_month + timedelta(days=1)
+        renewed = ContractFactory(status='Expired', end_date=end, value=Decimal('400.00'))
+        ContractFactory(company=renewed.company, renewed_from=renewed, value=Decimal('1.00'),
+                        start_date=this_month - timedelta(days=60))
+        ContractFactory(status='Cancelled', end_date=end, value=Decimal('250.00'))
+
+        stats = DashboardStatsService().build_stats(admin_user)
+
+        assert stats['churned_count'] == 1
+        assert stats['churned_revenue'] == 250.0
+        assert stats['revenue_trend'][-1]['churned_revenue'] == 250.0
+
+    def test_query_count_is_constant(self, admin_user):
+        """The number of queries does not depend on how many rows exist"""
+        service = DashboardStatsService()
+        _seed(5, admin_user)
+        with CaptureQueriesContext(connection) as small:
+            service.build_stats(admin_user)
+        _seed(60, admin_user)
+        with CaptureQueriesContext(connection) as large:
+            service.build_stats(admin_user)
+
+        assert len(small.captured_queries) == len(large.captured_queries)
+        assert len(large.captured_queries) <= 7
+
+    def test_stats_endpoint(self, admin_user):
+        """GET /api/v1/dashboard/stats/ serializes the service payload"""
+        ContractFactory(value=Decimal('1234.00'))
+        client = APIClient()
+        client.force_authenticate(user=admin_user)
+
+        response = client.get('/api/v1/dashboard/stats/')
+
+        assert response.status_code == 200
+        assert response.data['active_contracts'] == 1
+        assert len(response.data['revenue_trend']) == 6
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+@pytest.mark.parametrize('size', [10_000, 100_000])
+def test_benchmark_dashboard_stats(size, admin_user):
+    """Report query count and latency of build_stats() at 10k / 100k contracts"""
+    _seed(size, admin_user)
+    service = DashboardStatsService()
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        service.build_stats(admin_user)
+        elapsed = time.perf_counter() - started
+    print(f'\ndashboard stats @ {size} contracts: {len(ctx.captured_queries)} queries, {elapsed * 1000:.1f} ms')
+    assert len(ctx.captured_queries) <= 7
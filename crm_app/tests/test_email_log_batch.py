@@ -0,0 +1,162 @@
+"""
+Test suite for batched EmailLog writes (EmailService.batched_logging).
+Uses the locmem email backend; checks that logs, Notes and log owners are
+written by the flush, and that the stored Message-ID / tracking token / log id
+are the ones the message went out with.
+"""
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import CampaignRecipient, EmailCampaign, EmailLog, Note
+from crm_app.services.campaign_send_service import CampaignSendService
+from crm_app.services.email_service import EmailService
+from crm_app.tests.factories import CompanyFactory, ContactFactory
+
+
+@pytest.fixture
+def company():
+    return CompanyFactory(soundtrack_account_id='')
+
+
+def _send(service, company, i, **kwargs):
+    return service.send_email(
+        to_email=f'to{i}@example.com', subject=f'Hello {i}', body_html='<p>Hi</p>',
+        body_text='Hi', from_email='sender@example.com', company=company, **kwargs
+    )
+
+
+@pytest.mark.django_db
+class TestEmailLogBatch:
+    """Test suite for EmailLogBatch / EmailService.batched_logging"""
+
+    def test_logs_written_on_flush(self, company):
+        service = EmailService()
+
+        with service.batched_logging() as batch:
+            for i in range(3):
+                success, _ = _send(service, company, i)
+                assert success
+            assert EmailLog.objects.count() == 0
+            assert len(batch) == 3
+
+        assert EmailLog.objects.filter(status='sent', sent_at__isnull=False).count() == 3
+        assert Note.objects.filter(note_type='Email', company=company).count() == 3
+        assert service._active_log_batch() is None
+
+    def test_logged_ids_match_sent_message(self, company):
+        """Message-ID, log id and tracking token stored are the ones in the sent message"""
+        service = EmailService()
+
+        with service.batched_logging():
+            _send(service, company, 1)
+
+        message = mail.outbox[0]
+        email_log = EmailLog.objects.get()
+        assert email_log.message_id == message.message()['Message-ID']
+        assert message.extra_headers['X-BMAsia-Email-ID'] == str(email_log.id)
+        assert email_log.tracking_token in message.alternatives[0][0]
+
+    def test_unbatched_send_stores_sent_message_id(self, company):
+        service = EmailService()
+
+        _send(service, company, 1)
+
+        assert EmailLog.objects.get().message_id == mail.outbox[0].message()['Message-ID']
+
+    def test_log_owner_set_on_flush(self, company):
+        service = EmailService()
+        campaign = EmailCampaign.objects.create(name='Promo', campaign_type='custom', subject='Hi')
+        recipient = CampaignRecipient.objects.create(
+            campaign=campaign, contact=ContactFactory(company=company)
+        )
+
+        with service.batched_logging() as batch:
+            _send(service, company, 1, log_owner=recipient)
+            assert recipient.email_log is None
+            batch.flush()
+
+        assert recipient.email_log == EmailLog.objects.get()
+
+    def test_pending_log_is_reused_by_the_send(self, company):
+        """A row written by create_pending() is the one the message references and the flush updates"""
+        service = EmailService()
+        campaign = EmailCampaign.objects.create(name='Promo', campaign_type='custom', subject='Hi')
+        recipient = CampaignRecipient.objects.create(
+            campaign=campaign, contact=ContactFactory(company=company)
+        )
+
+        with service.batched_logging() as batch:
+            [pending] = batch.create_pending([(recipient, EmailLog(
+                company=company, email_type='campaign', from_email='sender@example.com',
+                to_email='to1@example.com', subject='Hello 1', body_html='<p>Hi</p>', body_text='Hi',
+            ))])
+            assert EmailLog.objects.get().status == 'pending'
+            _send(service, company, 1, log_owner=recipient)
+
+        message = mail.outbox[0]
+        email_log = EmailLog.objects.get()
+        assert email_log.pk == pending.pk and email_log.status == 'sent'
+        assert message.extra_headers['X-BMAsia-Email-ID'] == str(pending.pk)
+        assert email_log.message_id == pending.message_id == message.message()['Message-ID']
+        assert pending.tracking_token in message.alternatives[0][0]
+
+    def test_failed_send_logged_as_failed(self, company, settings):
+        settings.EMAIL_BACKEND = 'crm_app.tests.test_campaign_send.FailingBackend'
+        service = EmailService()
+
+        with service.batched_logging():
+            success, _ = _send(service, company, 1)
+
+        assert not success
+        email_log = EmailLog.objects.get()
+        assert email_log.status == 'failed'
+        assert email_log.error_message == 'SMTP down'
+        assert not Note.objects.filter(note_type='Email').exists()
+
+    def test_log_without_company_fails_only_that_send(self, company):
+        service = EmailService()
+
+        with service.batched_logging():
+            with pytest.raises(ValueError):
+                _send(service, None, 1)
+            _send(service, company, 2)
+
+        assert len(mail.outbox) == 1
+        assert EmailLog.objects.count() == 1
+
+    def test_flushes_when_full(self, company, settings):
+        settings.EMAIL_LOG_BATCH_SIZE = 2
+        service = EmailService()
+
+        with service.batched_logging() as batch:
+            for i in range(5):
+                _send(service, company, i)
+            assert EmailLog.objects.count() == 4
+            assert batch.stats['flushes'] == 2
+
+        assert EmailLog.objects.count() == 5
+
+    def test_campaign_chunk_writes_are_constant(self, company):
+        """Per-recipient writes no longer grow with the chunk size"""
+        def queries_for(recipients):
+            campaign = EmailCampaign.objects.create(
+                name='Promo', campaign_type='custom', subject='Hi',
+                target_audience={'custom_body': 'Hello'},
+            )
+            for i in range(recipients):
+                contact = ContactFactory(company=company, email=f'c{recipients}-{i}@example.com')
+                CampaignRecipient.objects.create(campaign=campaign, contact=contact)
+            service = CampaignSendService(rate_per_minute=0, chunk_size=recipients)
+            service.enqueue(campaign)
+            with CaptureQueriesContext(connection) as ctx:
+                service.process_campaign(campaign, max_chunks=1)
+            return len(ctx.captured_queries)
+
+        small = queries_for(2)
+        large = queries_for(10)
+
+        assert large == small
+        assert EmailLog.objects.filter(email_type='campaign').count() == 12
+        assert not CampaignRecipient.objects.filter(email_log__isnull=True).exists()
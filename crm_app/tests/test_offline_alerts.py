@@ -0,0 +1,206 @@
+"""
+Test suite for OfflineAlertService: set-based offline detection, SQL
+notification eligibility (4h threshold, 24h cooldown), per-company digests and
+the fixed number of queries per check_and_alert() pass.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from crm_app.models import EmailLog, EmailTemplate, ZoneOfflineAlert
+from crm_app.services.offline_alert_service import OfflineAlertService
+from crm_app.tests.factories import CompanyFactory, ContactFactory, ZoneFactory
+
+
+@pytest.fixture
+def template():
+    template, _ = EmailTemplate.objects.update_or_create(
+        template_type='zone_offline_alert',
+        defaults={
+            'name': 'Zone offline alert',
+            'subject': '{{zone_name}} is offline',
+            'body_text': 'Hi {{contact_name}}, {{zone_name}} at {{company_name}} has been offline '
+                         'for {{hours_offline}} hours ({{notification_type}} notice).',
+        },
+    )
+    return template
+
+
+def _offline_zone(hours=5, company=None, contacts=1):
+    """Offline zone last seen `hours` ago, with opted-in contacts on its company"""
+    company = company or CompanyFactory(soundtrack_account_id='')
+    for _ in range(contacts):
+        ContactFactory(company=company, receives_soundtrack_alerts=True, receives_notifications=True)
+    return ZoneFactory(company=company, platform='soundtrack', status='offline',
+                       last_seen_online=timezone.now() - timedelta(hours=hours))
+
+
+@pytest.mark.django_db
+class TestOfflineDetection:
+    """Test suite for OfflineAlertService._update_offline_alerts"""
+
+    def test_creates_one_alert_per_newly_offline_zone(self):
+        zone = _offline_zone(hours=2)
+        already = _offline_zone()
+        ZoneOfflineAlert.objects.create(zone=already, detected_at=timezone.now())
+        disabled = _offline_zone(company=CompanyFactory(soundtrack_account_id='',
+                                                        soundtrack_offline_alerts_enabled=False))
+        ZoneFactory(status='online')
+
+        assert OfflineAlertService()._update_offline_alerts() == 1
+
+        alert = ZoneOfflineAlert.objects.get(zone=zone)
+        assert alert.detected_at == zone.last_seen_online
+        assert ZoneOfflineAlert.objects.filter(zone=already).count() == 1
+        assert not ZoneOfflineAlert.objects.filter(zone=disabled).exists()
+
+    def test_resolved_alert_does_not_block_new_one(self):
+        zone = _offline_zone()
+        ZoneOfflineAlert.objects.create(zone=zone, detected_at=timezone.now(), is_resolved=True)
+
+        assert OfflineAlertService()._update_offline_alerts() == 1
+
+    def test_resolves_alerts_for_online_zones(self):
+        zone = _offline_zone()
+        OfflineAlertService()._update_offline_alerts()
+        zone.status = 'online'
+        zone.save()
+
+        assert OfflineAlertService()._resolve_online_alerts() == 1
+        assert ZoneOfflineAlert.objects.get(zone=zone).is_resolved
+
+
+@pytest.mark.django_db
+class TestNotificationEligibility:
+    """Test suite for the SQL version of ZoneOfflineAlert.should_send_notification"""
+
+    @pytest.mark.parametrize('hours_offline, first_sent, hours_since_last, due', [
+        (3, False, None, False),
+        (5, False, None, True),
+        (30, True, 10, False),
+        (30, True, 25, True),
+        (30, True, None, False),
+    ])
+    def test_matches_model_rules(self, hours_offline, first_sent, hours_since_last, due):
+        now = timezone.now()
+        alert = ZoneOfflineAlert.objects.create(
+            zone=_offline_zone(),
+            detected_at=now - timedelta(hours=hours_offline),
+            first_notification_sent=first_sent,
+            last_notification_at=now - timedelta(hours=hours_since_last) if hours_since_last else None,
+        )
+
+        assert alert.should_send_notification() is due
+        assert OfflineAlertService()._due_alerts(now).filter(pk=alert.pk).exists() is due
+
+
+@pytest.mark.django_db
+class TestCheckAndAlert:
+    """Test suite for OfflineAlertService.check_and_alert"""
+
+    def test_sends_and_records_notifications(self, template):
+        zone = _offline_zone(hours=6, contacts=2)
+        _offline_zone(hours=1)
+
+        assert OfflineAlertService().check_and_alert() == (2, 1)
+
+        assert len(mail.outbox) == 2
+        assert mail.outbox[0].subject == f'{zone.name} is offline'
+        alert = ZoneOfflineAlert.objects.get(zone=zone)
+        assert alert.first_notification_sent and alert.notification_count == 1
+        assert alert.notified_contacts.count() == 2
+        assert EmailLog.objects.filter(company=zone.company, status='sent').count() == 2
+
+    def test_cooldown_after_first_notification(self, template):
+        _offline_zone(hours=6)
+        OfflineAlertService().check_and_alert()
+
+        assert OfflineAlertService().check_and_alert() == (0, 0)
+        assert len(mail.outbox) == 1
+
+    def test_zone_without_contacts_is_skipped(self, template):
+        zone = _offline_zone(hours=6, contacts=0)
+
+        assert OfflineAlertService().check_and_alert() == (1, 0)
+        assert not ZoneOfflineAlert.objects.get(zone=zone).first_notification_sent
+
+    def test_queries_do_not_grow_with_fleet_size(self, template, settings):
+        settings.EMAIL_LOG_BATCH_SIZE = 1000
+
+        def queries_for(count):
+            ZoneOfflineAlert.objects.update(is_resolved=True)
+            zones = [_offline_zone(hours=6, contacts=2) for _ in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                assert OfflineAlertService().check_and_alert() == (count, count)
+            for zone in zones:
+                zone.status = 'cancelled'
+                zone.save()
+            return len(ctx.captured_queries)
+
+        # 12 zones x 2 contacts keeps the EmailLog bulk insert under SQLite's 999-parameter batch split
+        assert queries_for(3) == queries_for(12)
+
+
+@pytest.mark.django_db
+class TestCompanyDigest:
+    """Test suite for the per-company offline digest (OFFLINE_ALERT_DIGEST)"""
+
+    @pytest.fixture
+    def venue(self):
+        """Company whose three zones went offline together, with two opted-in contacts"""
+        company = CompanyFactory(soundtrack_account_id='')
+        zones = [_offline_zone(hours=6, company=company, contacts=0) for _ in range(3)]
+        for _ in range(2):
+            ContactFactory(company=company, receives_soundtrack_alerts=True, receives_notifications=True)
+        return company, zones
+
+    def test_one_digest_per_contact(self, template, venue, settings):
+        settings.OFFLINE_ALERT_DIGEST = True
+        company, zones = venue
+
+        assert OfflineAlertService().check_and_alert() == (3, 3)
+
+        assert len(mail.outbox) == 2
+        message = mail.outbox[0]
+        assert message.subject == f'3 music zones offline at {company.name}'
+        assert all(zone.name in message.body for zone in zones)
+        assert '{{' not in message.body and '{{' not in message.alternatives[0][0]
+        assert EmailLog.objects.filter(company=company).count() == 2
+
+    def test_each_alert_gets_its_own_timestamp(self, template, venue, settings):
+        settings.OFFLINE_ALERT_DIGEST = True
+        OfflineAlertService().check_and_alert()
+
+        alerts = ZoneOfflineAlert.objects.filter(zone__company=venue[0])
+        assert {alert.notification_count for alert in alerts} == {1}
+        assert all(alert.last_notification_at and alert.notified_contacts.count() == 2 for alert in alerts)
+        assert OfflineAlertService().check_and_alert() == (0, 0)
+
+    def test_custom_digest_template(self, template, venue, settings):
+        settings.OFFLINE_ALERT_DIGEST = True
+        EmailTemplate.objects.create(
+            name='Zone offline digest', template_type='zone_offline_digest',
+            subject='Offline: {{zone_names}}', body_text='{{contact_name}}: {{zone_count}} zones\n{{zone_list}}',
+        )
+
+        OfflineAlertService().check_and_alert()
+
+        assert mail.outbox[0].subject == 'Offline: ' + ', '.join(sorted(zone.name for zone in venue[1]))
+
+    def test_single_alert_uses_alert_template(self, template, settings):
+        settings.OFFLINE_ALERT_DIGEST = True
+        zone = _offline_zone(hours=6)
+
+        OfflineAlertService().check_and_alert()
+
+        assert mail.outbox[0].subject == f'{zone.name} is offline'
+
+    def test_disabled_sends_one_email_per_zone(self, template, venue, settings):
+        settings.OFFLINE_ALERT_DIGEST = False
+
+        assert OfflineAlertService().check_and_alert() == (3, 3)
+        assert len(mail.outbox) == 6
@@ -0,0 +1,192 @@
+"""
+Test suite for the write-behind open tracking buffer
+(services/tracking_buffer.py): the pixel endpoint queueing opens without
+touching the database, per-token dedup, and batched flushes that update
+EmailLog, CampaignRecipient and the campaign counters.
+"""
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import CampaignRecipient, EmailCampaign, EmailLog
+from crm_app.services.tracking_buffer import open_tracking_buffer
+from crm_app.tests.factories import CompanyFactory, ContactFactory
+
+LATER = 600  # seconds: every bucket written "now" is closed by then
+
+
+@pytest.fixture(autouse=True)
+def buffered(settings):
+    settings.EMAIL_TRACKING_BUFFERED = True
+    open_tracking_buffer.cache.clear()
+    yield
+    open_tracking_buffer.cache.clear()
+
+
+@pytest.fixture
+def campaign():
+    return EmailCampaign.objects.create(name='Promo', campaign_type='custom', subject='News')
+
+
+def _sent_email(campaign=None, status='sent'):
+    """EmailLog (and CampaignRecipient when a campaign is given) for a sent email"""
+    company = CompanyFactory(soundtrack_account_id='')
+    contact = ContactFactory(company=company)
+    email_log = EmailLog.objects.create(
+        company=company, contact=contact, email_type='campaign', status='sent',
+        from_email='news@bmasiamusic.com', to_email=contact.email, subject='News',
+        body_html='<p>News</p>', body_text='News',
+    )
+    if campaign:
+        CampaignRecipient.objects.create(campaign=campaign, contact=contact, email_log=email_log, status=status)
+    return email_log
+
+
+def _flush():
+    return open_tracking_buffer.flush(now=time.time() + LATER)
+
+
+@pytest.mark.django_db
+class TestTrackingPixel:
+    """Test suite for the /t/<token>/ endpoint"""
+
+    def test_pixel_does_not_touch_database(self):
+        email_log = _sent_email()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = Client().get(f'/t/{email_log.tracking_token}/')
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'image/gif'
+        assert len(ctx.captured_queries) == 0
+        email_log.refresh_from_db()
+        assert email_log.opened_at is None
+
+    def test_unbuffered_pixel_writes_immediately(self, settings):
+        settings.EMAIL_TRACKING_BUFFERED = False
+        email_log = _sent_email()
+
+        Client().get(f'/t/{email_log.tracking_token}/')
+
+        email_log.refresh_from_db()
+        assert email_log.opened_at is not None and email_log.status == 'opened'
+
+
+@pytest.mark.django_db
+class TestOpenTrackingBuffer:
+    """Test suite for OpenTrackingBuffer.record and flush"""
+
+    def test_repeat_loads_are_deduplicated(self):
+        email_log = _sent_email()
+
+        assert open_tracking_buffer.record(email_log.tracking_token)
+        assert not open_tracking_buffer.record(email_log.tracking_token)
+        assert open_tracking_buffer.pending(now=time.time() + LATER) == 1
+
+    def test_malformed_tokens_are_not_queued(self):
+        assert not open_tracking_buffer.record('x' * 65)
+        assert not open_tracking_buffer.record('../etc')
+
+    def test_flush_records_opens(self):
+        email_log = _sent_email()
+        loaded_at = time.time()
+        open_tracking_buffer.record(email_log.tracking_token, now=loaded_at)
+
+        assert _flush() == 1
+
+        email_log.refresh_from_db()
+        assert email_log.status == 'opened'
+        assert abs(email_log.opened_at.timestamp() - loaded_at) < 1
+
+    def test_flush_updates_recipient_and_counters(self, campaign):
+        sent, delivered, clicked = (_sent_email(campaign, status) for status in ('sent', 'delivered', 'clicked'))
+        campaign.update_analytics()
+        for email_log in (sent, delivered, clicked):
+            open_tracking_buffer.record(email_log.tracking_token)
+
+        _flush()
+
+        assert sorted(campaign.recipients.values_list('status', flat=True)) == ['clicked', 'opened', 'opened']
+        campaign.refresh_from_db()
+        bumped = (campaign.total_opened, campaign.total_delivered, campaign.total_sent)
+        campaign.update_analytics()
+        assert bumped == (campaign.total_opened, campaign.total_delivered, campaign.total_sent) == (3, 3, 3)
+
+    def test_open_bucket_waits_for_next_flush(self):
+        email_log = _sent_email()
+        now = time.time()
+        open_tracking_buffer.record(email_log.tracking_token, now=now)
+
+        assert open_tracking_buffer.flush(now=now) == 0
+        assert _flush() == 1
+
+    def test_flushed_buckets_are_not_replayed(self):
+        open_tracking_buffer.record(_sent_email().tracking_token)
+        _flush()
+
+        assert open_tracking_buffer.pending(now=time.time() + LATER) == 0
+        assert _flush() == 0
+
+    def test_unknown_and_already_opened_tokens_are_ignored(self):
+        email_log = _sent_email()
+        EmailLog.objects.filter(pk=email_log.pk).update(status='opened', opened_at='2026-03-01T10:00Z')
+        open_tracking_buffer.record(email_log.tracking_token)
+        open_tracking_buffer.record('no-such-token')
+
+        assert _flush() == 0
+
+        email_log.refresh_from_db()
+        assert email_log.opened_at.isoformat().startswith('2026-03-01T10:00')
+
+    def test_open_before_log_is_written_is_queued_again(self):
+        loaded_at = time.time()
+        open_tracking_buffer.record('written-later', now=loaded_at)
+
+        assert open_tracking_buffer.flush(now=loaded_at + LATER) == 0
+        email_log = _sent_email()
+        EmailLog.objects.filter(pk=email_log.pk).update(tracking_token='written-later')
+
+        assert open_tracking_buffer.flush(now=loaded_at + 2 * LATER) == 1
+        email_log.refresh_from_db()
+        assert abs(email_log.opened_at.timestamp() - loaded_at) < 1
+
+    def test_unknown_token_is_dropped_after_requeue_window(self):
+        loaded_at = time.time()
+        open_tracking_buffer.record('no-such-token', now=loaded_at)
+
+        open_tracking_buffer.flush(now=loaded_at + LATER)
+        open_tracking_buffer.flush(now=loaded_at + 2 * LATER)
+
+        assert open_tracking_buffer.pending(now=loaded_at + 3 * LATER) == 0
+        # The dedup key is released with it
+        assert open_tracking_buffer.record('no-such-token')
+
+    def test_unbuffered_unknown_token_is_not_deduplicated(self, settings):
+        settings.EMAIL_TRACKING_BUFFERED = False
+
+        assert open_tracking_buffer.record('no-such-token')
+        assert open_tracking_buffer.record('no-such-token')
+
+    def test_queries_do_not_grow_with_opens(self, campaign):
+        def queries_for(count, loaded_at):
+            for _ in range(count):
+                open_tracking_buffer.record(_sent_email(campaign).tracking_token, now=loaded_at)
+            with CaptureQueriesContext(connection) as ctx:
+                assert open_tracking_buffer.flush(now=loaded_at + LATER) == count
+            return len(ctx.captured_queries)
+
+        now = time.time()
+        assert queries_for(3, now) == queries_for(30, now + LATER)
+
+    def test_command(self):
+        open_tracking_buffer.record(_sent_email().tracking_token, now=time.time() - LATER)
+        out = StringIO()
+
+        call_command('flush_email_tracking', stdout=out)
+
+        assert ': 1 new opens, 0 clicks' in out.getvalue()
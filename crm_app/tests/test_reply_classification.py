@@ -0,0 +1,193 @@
+"""
+Test suite for the AI reply classifier (services/reply_classifier.py), run
+against the Anthropic client stand-in (fake_anthropic.py): the persistent
+cache keyed on normalised content, batched requests with a concurrency cap,
+and how ReplyDetectionService hands it the ambiguous replies of a batch.
+
+Latency report (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_reply_classification.py -m slow -s
+"""
+import os
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import ReplyClassificationCache
+from crm_app.services.reply_classifier import ReplyClassifier, normalize_reply, strip_quoted
+from crm_app.services.reply_detection_service import ReplyDetectionService
+from crm_app.tests.fake_anthropic import FakeAnthropic
+
+QUOTED = """Thanks, we are interested. Can you send the brochure?
+
+On Mon, 3 Mar 2025 at 10:12, Norbert <norbert@bmasiamusic.com> wrote:
+> Hi Ann,
+> Music for your lobby...
+"""
+
+
+def _replies(count, body='We might be interested, please send more details.'):
+    """Distinct replies; digits are folded in the cache key, so the subjects differ by letters"""
+    return [(f'Re: Music for your lobby {chr(97 + index // 26)}{chr(97 + index % 26)}', body) for index in range(count)]
+
+
+class TestNormalisation:
+    """Test suite for the cache key text"""
+
+    def test_quoted_thread_is_cut(self):
+        assert strip_quoted(QUOTED) == 'Thanks, we are interested. Can you send the brochure?'
+
+    def test_bare_forward_keeps_the_thread(self):
+        body = '---------- Forwarded message ---------\nFrom: Norbert <norbert@bmasiamusic.com>\nHi Ann'
+
+        assert strip_quoted(body) == body
+
+    def test_reply_prefixes_digits_and_whitespace_are_folded(self):
+        first = normalize_reply('Re: Music for your lobby', 'Back on 12 May.\n\nThanks')
+        second = normalize_reply('RE: FWD: music for your  lobby', 'back on 3   June.\nThanks\n> quoted')
+
+        assert first.replace('may', 'june') == second
+
+    def test_different_replies_have_different_keys(self):
+        classifier = ReplyClassifier(client=FakeAnthropic())
+
+        assert classifier.cache_key('Re: x', 'Yes please') != classifier.cache_key('Re: x', 'No thanks')
+
+
+@pytest.mark.django_db
+class TestReplyClassifier:
+    """Test suite for ReplyClassifier.classify"""
+
+    def test_results_are_cached_across_instances(self):
+        first_client, second_client = FakeAnthropic(), FakeAnthropic()
+        first_stats, second_stats = {}, {}
+
+        first = ReplyClassifier(client=first_client).classify([('Re: Music', QUOTED)], first_stats)
+        second = ReplyClassifier(client=second_client).classify([('RE: music', QUOTED + '\n> more')], second_stats)
+
+        assert first == second == [('question', 0.85, 'ai')]
+        assert (len(first_client.requests), len(second_client.requests)) == (1, 0)
+        assert (first_stats['ai_cache_misses'], second_stats['ai_cache_hits']) == (1, 1)
+        entry = ReplyClassificationCache.objects.get()
+        assert (entry.classification, entry.hits) == ('question', 1)
+        assert entry.last_hit_at is not None
+
+    def test_repeated_replies_are_sent_once(self):
+        client = FakeAnthropic()
+        auto_reply = ('Re: Music for your lobby', 'Your message has been received by our front desk.')
+
+        results = ReplyClassifier(client=client).classify([auto_reply] * 5 + [('Re: x', 'Not interested.')])
+
+        assert client.replies_sent() == 2
+        assert [classification for classification, _, _ in results] == ['other'] * 5 + ['not_interested']
+
+    def test_misses_are_batched(self, settings):
+        settings.PROSPECT_AI_CLASSIFY_BATCH_SIZE = 10
+        client = FakeAnthropic()
+        stats = {}
+
+        ReplyClassifier(client=client).classify(_replies(25), stats)
+
+        assert len(client.requests) == stats['ai_requests'] == 3
+        assert client.replies_sent() == 25
+        assert ReplyClassificationCache.objects.count() == 25
+
+    def test_concurrency_is_capped(self, settings):
+        settings.PROSPECT_AI_CLASSIFY_BATCH_SIZE = 1
+        settings.PROSPECT_AI_CLASSIFY_CONCURRENCY = 3
+        client = FakeAnthropic(latency=0.05)
+
+        ReplyClassifier(client=client).classify(_replies(9))
+
+        assert len(client.requests) == 9
+        assert 1 < client.max_in_flight <= 3
+
+    def test_failed_requests_are_not_cached(self):
+        stats = {}
+
+        results = ReplyClassifier(client=FakeAnthropic(fail=True)).classify(_replies(2), stats)
+
+        assert results == [('unclassified', 0.0, 'none')] * 2
+        assert stats['ai_failures'] == 1
+        assert not ReplyClassificationCache.objects.exists()
+
+    def test_unknown_classifications_and_missing_ids(self):
+        answer = 'Sure: [{"id": 1, "classification": "spam", "confidence": 3}, {"id": 7, "classification": "interested"}]'
+
+        results = ReplyClassifier(client=FakeAnthropic(answer=answer)).classify(_replies(2))
+
+        assert results == [('other', 1.0, 'ai'), ('unclassified', 0.0, 'none')]
+        assert ReplyClassificationCache.objects.count() == 1
+
+    def test_no_api_key(self, settings):
+        settings.ANTHROPIC_API_KEY = ''
+
+        assert ReplyClassifier().classify(_replies(1)) == [('unclassified', 0.0, 'none')]
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def queries_for(count, offset):
+            items = _replies(count)
+            items = [(subject, f'{body} {offset}') for subject, body in items]
+            with CaptureQueriesContext(connection) as ctx:
+                ReplyClassifier(client=FakeAnthropic()).classify(items + items[:1])
+            return len(ctx.captured_queries)
+
+        assert queries_for(3, 'first') == queries_for(30, 'second')
+
+
+@pytest.mark.django_db
+class TestRulesBeforeAI:
+    """Test suite for ReplyDetectionService._classify_replies"""
+
+    def test_only_ambiguous_replies_reach_the_model(self):
+        client = FakeAnthropic()
+        stats = {}
+
+        results = ReplyDetectionService(ai_client=client)._classify_replies([
+            ('Automatic reply: Music for your lobby', 'I am out of office until Monday.'),
+            ('Re: Music for your lobby', 'Is the licence included in the price?'),
+            ('Re: Music for your lobby', "Let's meet on Tuesday."),
+        ], stats)
+
+        assert [method for _, _, method in results] == ['rule', 'ai', 'rule']
+        assert results[1][0] == 'question'
+        assert client.replies_sent() == 1 and stats['ai_cache_misses'] == 1
+
+    def test_single_reply(self):
+        result = ReplyDetectionService(ai_client=FakeAnthropic())._classify_reply('Re: x', 'Please talk to my colleague Bob.')
+
+        assert result == ('referral', 0.85, 'ai')
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_report_classification_latency(settings):
+    """200 ambiguous replies, 60% of them repeats of 5 auto-replies, at 50 ms per request"""
+    settings.PROSPECT_AI_CLASSIFY_BATCH_SIZE = 10
+    settings.PROSPECT_AI_CLASSIFY_CONCURRENCY = 4
+    latency = 0.05
+    teams = ['front desk', 'reservations', 'events', 'sales', 'finance']
+    templates = [f'Thank you for your email. A ticket has been created for our {team} team.' for team in teams]
+    items = [('Re: Music for your lobby', templates[index % 5]) for index in range(120)]
+    items += [('Re: Music for your lobby', f'Hmm, we could look at this for the {name} branch next quarter.')
+              for name in (f'{first}{second}' for first in 'abcdefghij' for second in 'klmnopqr')]
+    per_message = len(items) * latency
+
+    first_client, second_client = FakeAnthropic(latency=latency), FakeAnthropic(latency=latency)
+    first_classifier, second_classifier = ReplyClassifier(client=first_client), ReplyClassifier(client=second_client)
+    first, second = {}, {}
+    started = time.perf_counter()
+    first_classifier.classify(items, first)
+    first_seconds = time.perf_counter() - started
+    second_classifier.classify(items, second)
+
+    print(f"\nReply classification, {len(items)} replies: one request per reply ~{per_message:.1f}s; "
+          f"cold cache {first_seconds:.2f}s ({len(first_client.requests)} requests, "
+          f"{len(items) - first_client.replies_sent()} repeats folded); "
+          f"warm cache {second['classify_seconds']:.3f}s ({second['ai_cache_hits'] / len(items):.0%} hit rate, "
+          f"{len(second_client.requests)} requests)")
+    assert first_client.replies_sent() == 85
+    assert second_client.requests == []
+    assert first_seconds < per_message / 10
@@ -0,0 +1,264 @@
+"""
+Test suite for incremental IMAP polling in ReplyDetectionService, run against
+the local IMAP stand-in (fake_imap.py): UID cursor per mailbox, header-only
+batch fetches, bulk dedup, bodies downloaded only for matched replies, and the
+batched outbound matcher (_match_batch).
+
+Transfer report (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_reply_detection.py -m slow -s
+"""
+import os
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from crm_app.models import (
+    EmailLog, ImapMailboxState, ProspectEnrollment, ProspectReply, ProspectSequence,
+    ProspectSequenceStep, ProspectStepExecution,
+)
+from crm_app.services.reply_detection_service import ReplyDetectionService
+from crm_app.tests.factories import ContactFactory, OpportunityFactory
+from crm_app.tests.fake_anthropic import FakeAnthropic
+from crm_app.tests.fake_imap import FakeImapServer, make_message
+
+INBOX_ADDRESS = 'norbert@bmasiamusic.com'
+
+
+@pytest.fixture
+def imap(settings):
+    server = FakeImapServer().start()
+    settings.PROSPECT_IMAP_HOST = server.host
+    settings.PROSPECT_IMAP_PORT = server.port
+    settings.PROSPECT_IMAP_SSL = False
+    settings.PROSPECT_REPLY_EMAIL = INBOX_ADDRESS
+    settings.PROSPECT_REPLY_IMAP_PASSWORD = 'app-password'
+    yield server
+    server.stop()
+
+
+def _sequence_email(index=0):
+    """Active enrollment with one sent sequence email; returns (contact, outbound EmailLog)"""
+    opportunity = OpportunityFactory(stage='Contacted')
+    contact = ContactFactory(company=opportunity.company)
+    sequence, _ = ProspectSequence.objects.get_or_create(name='New lead follow-up')
+    step, _ = ProspectSequenceStep.objects.get_or_create(sequence=sequence, step_number=1)
+    enrollment = ProspectEnrollment.objects.create(sequence=sequence, opportunity=opportunity, contact=contact)
+    outbound = EmailLog.objects.create(
+        company=opportunity.company, contact=contact, email_type='sequence', status='sent',
+        from_email=INBOX_ADDRESS, to_email=contact.email, subject=f'Music for your lobby {index}',
+        body_html='<p>Hi</p>', body_text='Hi', message_id=f'<outbound-{index}@bmasiamusic.com>',
+    )
+    ProspectStepExecution.objects.create(
+        enrollment=enrollment, step=step, scheduled_for=timezone.now(), status='sent', email_log=outbound,
+    )
+    return contact, outbound
+
+
+def _reply(contact, outbound, body="Sounds great, let's meet next week.", **kwargs):
+    return make_message(contact.email, f'Re: {outbound.subject}', body, in_reply_to=outbound.message_id, **kwargs)
+
+
+def _newsletter(index, attachment_size=0):
+    return make_message(f'news{index}@vendor.example.com', f'Weekly digest {index}',
+                        attachment_size=attachment_size)
+
+
+def _header(from_email, subject, in_reply_to='', references=''):
+    return {'uid': 1, 'message_id': '<in@example.com>', 'in_reply_to': in_reply_to,
+            'references': references, 'from_email': from_email, 'subject': subject, 'date': ''}
+
+
+def _fetches(server):
+    return [command for command in server.commands if command.startswith('UID FETCH')]
+
+
+@pytest.mark.django_db
+class TestIncrementalPolling:
+    """Test suite for ReplyDetectionService.check_for_replies"""
+
+    def test_first_run_fetches_bodies_only_for_matches(self, imap):
+        contact, outbound = _sequence_email()
+        imap.add_message(_newsletter(1))
+        reply_uid = imap.add_message(_reply(contact, outbound))
+        imap.add_message(_newsletter(2))
+
+        stats = ReplyDetectionService().check_for_replies()
+
+        assert (stats['headers_fetched'], stats['detected'], stats['matched'], stats['bodies_fetched']) == (3, 3, 1, 1)
+        reply = ProspectReply.objects.get()
+        assert (reply.email_log, reply.classification) == (outbound, 'meeting_request')
+        assert "let's meet" in reply.body_text
+        header_fetch, body_fetch = _fetches(imap)
+        assert 'BODY.PEEK[HEADER.FIELDS' in header_fetch
+        assert body_fetch == f'UID FETCH {reply_uid} (UID BODY.PEEK[])'
+        assert stats['bytes_received'] > 0
+
+    def test_cursor_is_persisted(self, imap):
+        imap.add_message(_newsletter(1))
+        imap.add_message(_newsletter(2))
+
+        ReplyDetectionService().check_for_replies()
+
+        state = ImapMailboxState.objects.get(host=imap.host, account=INBOX_ADDRESS, mailbox='INBOX')
+        assert (state.uidvalidity, state.last_uid) == (1, 2)
+
+    def test_next_run_only_fetches_new_messages(self, imap):
+        contact, outbound = _sequence_email()
+        imap.add_message(_newsletter(1))
+        ReplyDetectionService().check_for_replies()
+        imap.reset_stats()
+
+        idle = ReplyDetectionService().check_for_replies()
+        assert idle['headers_fetched'] == 0 and not _fetches(imap)
+
+        new_uid = imap.add_message(_reply(contact, outbound))
+        stats = ReplyDetectionService().check_for_replies()
+
+        assert 'UID SEARCH UID 2:*' in imap.commands
+        assert (stats['headers_fetched'], stats['matched']) == (1, 1)
+        assert _fetches(imap)[-1] == f'UID FETCH {new_uid} (UID BODY.PEEK[])'
+
+    def test_empty_mailbox_starts_cursor_at_uidnext(self, imap):
+        ReplyDetectionService().check_for_replies()
+        imap.add_message(_newsletter(1))
+        imap.reset_stats()
+
+        assert ReplyDetectionService().check_for_replies()['headers_fetched'] == 1
+        assert 'UID SEARCH UID 1:*' in imap.commands
+
+    def test_uidvalidity_change_catches_up_without_duplicates(self, imap):
+        contact, outbound = _sequence_email()
+        imap.add_message(_reply(contact, outbound))
+        ReplyDetectionService().check_for_replies()
+        imap.renumber()
+        imap.reset_stats()
+
+        stats = ReplyDetectionService().check_for_replies()
+
+        assert any(command.startswith('UID SEARCH (SINCE') for command in imap.commands)
+        assert (stats['headers_fetched'], stats['detected'], stats['bodies_fetched']) == (1, 0, 0)
+        assert ProspectReply.objects.count() == 1
+        assert ImapMailboxState.objects.get().uidvalidity == 2
+
+    def test_dry_run_leaves_cursor(self, imap):
+        contact, outbound = _sequence_email()
+        imap.add_message(_reply(contact, outbound))
+
+        stats = ReplyDetectionService().check_for_replies(dry_run=True)
+
+        assert stats['classified'] == 1
+        assert not ProspectReply.objects.exists()
+        assert ImapMailboxState.objects.get().last_uid == 0
+
+    def test_headers_are_fetched_in_batches(self, imap, settings):
+        settings.PROSPECT_IMAP_FETCH_BATCH_SIZE = 2
+        for index in range(5):
+            imap.add_message(_newsletter(index))
+
+        assert ReplyDetectionService().check_for_replies()['headers_fetched'] == 5
+        assert len(_fetches(imap)) == 3
+
+    def test_ambiguous_replies_are_classified_together(self, imap):
+        client = FakeAnthropic()
+        for index in range(3):
+            contact, outbound = _sequence_email(index)
+            imap.add_message(_reply(contact, outbound, body='Thanks for this, we are interested.'))
+
+        stats = ReplyDetectionService(ai_client=client).check_for_replies()
+
+        assert (stats['classified'], stats['ai_cache_misses'], stats['ai_requests']) == (3, 3, 1)
+        assert client.replies_sent() == 1
+        assert set(ProspectReply.objects.values_list('classification', 'classification_method')) == {('interested', 'ai')}
+
+    def test_own_messages_are_skipped(self, imap):
+        imap.add_message(make_message(INBOX_ADDRESS, 'Music for your lobby', to_email='ann@example.com'))
+
+        assert ReplyDetectionService().check_for_replies()['detected'] == 0
+
+
+@pytest.mark.django_db
+class TestBatchMatching:
+    """Test suite for ReplyDetectionService._match_batch"""
+
+    def test_references_chain(self):
+        contact, outbound = _sequence_email()
+        header = _header(contact.email, 'Re: something else', in_reply_to='<unknown@example.com>',
+                         references=f'<older@example.com> {outbound.message_id}')
+
+        [(_, log, enrollment)] = ReplyDetectionService()._match_batch([header])
+
+        assert log == outbound and enrollment.contact == contact
+
+    def test_subject_fallback(self):
+        contact, outbound = _sequence_email()
+        header = _header(contact.email.upper(), f'RE: Fwd:  {outbound.subject.upper()}')
+
+        [(_, log, _)] = ReplyDetectionService()._match_batch([header])
+
+        assert log == outbound
+
+    def test_subject_fallback_needs_same_sender(self):
+        _, outbound = _sequence_email()
+
+        assert ReplyDetectionService()._match_batch([_header('someone@else.com', f'Re: {outbound.subject}')]) == []
+
+    def test_enrollment_from_contact_without_execution(self):
+        contact, outbound = _sequence_email()
+        outbound.prospect_executions.all().delete()
+
+        [(_, _, enrollment)] = ReplyDetectionService()._match_batch(
+            [_header(contact.email, 'Re: x', in_reply_to=outbound.message_id)]
+        )
+
+        assert enrollment.contact == contact
+
+    def test_normalized_subject_is_stored(self):
+        _, outbound = _sequence_email(7)
+
+        assert outbound.normalized_subject == 'music for your lobby 7'
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def queries_for(count, offset):
+            headers = []
+            for index in range(offset, offset + count):
+                contact, outbound = _sequence_email(index)
+                if index % 2:
+                    headers.append(_header(contact.email, 'Re: x', in_reply_to=outbound.message_id))
+                else:
+                    headers.append(_header(contact.email, f'Re: {outbound.subject}'))
+            with CaptureQueriesContext(connection) as ctx:
+                assert len(ReplyDetectionService()._match_batch(headers)) == count
+            return len(ctx.captured_queries)
+
+        assert queries_for(4, 0) == queries_for(40, 100)
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_report_bytes_per_run(imap):
+    """Bytes received per run: a day of mail (200 messages, 5 matched replies), then a poll with 3 new"""
+    sent = [_sequence_email(index) for index in range(8)]
+    received_at = timezone.now() - timedelta(hours=2)
+    for index in range(195):
+        imap.add_message(_newsletter(index, attachment_size=20_000), received_at=received_at)
+    for contact, outbound in sent[:5]:
+        imap.add_message(_reply(contact, outbound, attachment_size=20_000), received_at=received_at)
+    full_download = sum(len(raw) for _, _, raw in imap.messages)
+
+    first = ReplyDetectionService().check_for_replies()
+    steady = []
+    for contact, outbound in sent[5:]:
+        imap.add_message(_newsletter(contact.pk, attachment_size=20_000))
+        imap.add_message(_reply(contact, outbound, attachment_size=20_000))
+        steady.append(ReplyDetectionService().check_for_replies()['bytes_received'])
+    idle = ReplyDetectionService().check_for_replies()
+
+    print(f"\nIMAP bytes per run: 24h window as RFC822 {full_download:,}; "
+          f"first incremental run {first['bytes_received']:,} ({first['bodies_fetched']} bodies); "
+          f"2 new messages {max(steady):,}; no new mail {idle['bytes_received']:,}")
+    assert first['bytes_received'] < full_download / 10
+    assert ProspectReply.objects.count() == 8
@@ -0,0 +1,261 @@
+"""
+Test suite for the sequence step executor (services/sequence_executor.py):
+business hours per contact country filtered in SQL, claiming with
+select_for_update(skip_locked=True), parallel SMTP sends with one pooled
+connection per sender and thread, and the retry / skip rules of
+EmailService.process_sequence_steps.
+
+Throughput report (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_sequence_executor.py -m slow -s
+"""
+import asyncio
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+from crm_app.models import (
+    EmailLog, EmailSequence, EmailTemplate, SequenceEnrollment, SequenceStep, SequenceStepExecution,
+)
+from crm_app.services.sequence_executor import SequenceExecutor
+from crm_app.tests.factories import CompanyFactory, ContactFactory, UserFactory
+
+# Wednesday 03:00 UTC: 10:00 in Bangkok, 14:00 in Sydney, 03:00 in London, 23:00 (Tue) in New York
+WEDNESDAY = datetime(2026, 3, 4, 3, 0, tzinfo=dt_timezone.utc)
+# Wednesday 12:00 UTC: 19:00 in Bangkok, 12:00 in London
+WEDNESDAY_NOON = datetime(2026, 3, 4, 12, 0, tzinfo=dt_timezone.utc)
+SATURDAY = datetime(2026, 3, 7, 3, 0, tzinfo=dt_timezone.utc)
+
+
+class RecordingBackend(EmailBackend):
+    """locmem backend recording which thread sent, how many connections were opened, and failing on request"""
+    threads = set()
+    opened = 0
+    fail_for = set()
+    lock = threading.Lock()
+
+    def open(self):
+        with self.lock:
+            RecordingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        with self.lock:
+            RecordingBackend.threads.add(threading.current_thread().name)
+        for message in messages:
+            if set(message.to) & self.fail_for:
+                raise ConnectionError('421 Service not available')
+        return super().send_messages(messages)
+
+
+@pytest.fixture(autouse=True)
+def backend(settings):
+    settings.EMAIL_BACKEND = 'crm_app.tests.test_sequence_executor.RecordingBackend'
+    settings.SEQUENCE_SEND_CONCURRENCY = 3
+    RecordingBackend.threads, RecordingBackend.opened, RecordingBackend.fail_for = set(), 0, set()
+    yield RecordingBackend
+
+
+@pytest.fixture
+def sequence():
+    template = EmailTemplate.objects.create(
+        name='Quarterly check-in', template_type='quarterly_checkin',
+        subject='How is the music at {{company_name}}?', body_text='Hi {{contact_name}}, checking in.',
+    )
+    sequence = EmailSequence.objects.create(name='Check-in', created_by=UserFactory(), sequence_type='manual')
+    SequenceStep.objects.create(sequence=sequence, step_number=1, name='First', email_template=template)
+    SequenceStep.objects.create(sequence=sequence, step_number=2, name='Second', email_template=template, delay_days=3)
+    return sequence
+
+
+def _enroll(sequence, country, scheduled_for=WEDNESDAY - timedelta(hours=1), **contact_fields):
+    """Active enrollment of a new contact with step 1 due at `scheduled_for`"""
+    company = CompanyFactory(country=country, soundtrack_account_id='')
+    contact = ContactFactory(company=company, **contact_fields)
+    enrollment = SequenceEnrollment.objects.create(sequence=sequence, contact=contact, company=company)
+    return SequenceStepExecution.objects.create(
+        enrollment=enrollment, step=sequence.steps.get(step_number=1), scheduled_for=scheduled_for,
+    )
+
+
+def _status(execution):
+    execution.refresh_from_db()
+    return execution.status
+
+
+@pytest.mark.django_db
+class TestBusinessHours:
+    """Test suite for the per-country business hours filter"""
+
+    def test_only_contacts_in_business_hours_are_sent(self, sequence):
+        bangkok, sydney = _enroll(sequence, 'Thailand'), _enroll(sequence, 'Australia')
+        london, new_york = _enroll(sequence, 'UK'), _enroll(sequence, 'USA')
+
+        report = SequenceExecutor().run(now=WEDNESDAY)
+
+        assert (report['sent'], report['waiting']) == (2, 2)
+        assert [_status(e) for e in (bangkok, sydney, london, new_york)] == ['sent', 'sent', 'scheduled', 'scheduled']
+        assert sorted(message.to[0] for message in mail.outbox) == sorted(
+            [bangkok.enrollment.contact.email, sydney.enrollment.contact.email]
+        )
+
+    def test_later_in_the_day_other_countries_open(self, sequence):
+        bangkok, london = _enroll(sequence, 'Thailand'), _enroll(sequence, 'UK')
+
+        SequenceExecutor().run(now=WEDNESDAY_NOON)
+
+        assert (_status(bangkok), _status(london)) == ('scheduled', 'sent')
+
+    def test_unknown_country_uses_business_timezone(self, sequence):
+        unknown = _enroll(sequence, 'Atlantis')
+        blank = _enroll(sequence, '')
+
+        assert SequenceExecutor().run(now=WEDNESDAY_NOON)['sent'] == 0
+        assert SequenceExecutor().run(now=WEDNESDAY)['sent'] == 2
+        assert (_status(unknown), _status(blank)) == ('sent', 'sent')
+
+    def test_weekend(self, sequence):
+        _enroll(sequence, 'Thailand', scheduled_for=SATURDAY - timedelta(hours=1))
+
+        assert SequenceExecutor().run(now=SATURDAY)['sent'] == 0
+
+
+@pytest.mark.django_db
+class TestClaiming:
+    """Test suite for SequenceExecutor.claim and stale claims"""
+
+    def test_claimed_steps_are_not_claimed_again(self, sequence):
+        executions = [_enroll(sequence, 'Thailand') for _ in range(3)]
+        executor = SequenceExecutor()
+
+        first = executor.claim(2, WEDNESDAY)
+        second = executor.claim(5, WEDNESDAY)
+
+        assert len(first) == 2 and len(second) == 1 and not set(first) & set(second)
+        assert executor.claim(5, WEDNESDAY) == []
+        assert {(_status(e), e.attempt_count) for e in executions} == {('pending', 1)}
+
+    def test_stale_claims_are_released(self, sequence, settings):
+        settings.SEQUENCE_CLAIM_TIMEOUT = 30
+        execution = _enroll(sequence, 'Thailand')
+        SequenceExecutor().claim(1, WEDNESDAY - timedelta(minutes=31))
+
+        assert SequenceExecutor().claim(1, WEDNESDAY - timedelta(minutes=5)) == []
+        report = SequenceExecutor().run(now=WEDNESDAY)
+
+        assert (report['released'], report['sent']) == (1, 1)
+        assert _status(execution) == 'sent'
+
+
+@pytest.mark.django_db
+class TestSending:
+    """Test suite for SequenceExecutor.run"""
+
+    def test_sent_step_is_logged_and_next_step_scheduled(self, sequence):
+        execution = _enroll(sequence, 'Thailand')
+
+        SequenceExecutor().run(now=WEDNESDAY)
+
+        execution.refresh_from_db()
+        email_log = execution.email_log
+        assert (execution.status, email_log.status, email_log.email_type) == ('sent', 'sent', 'sequence')
+        assert email_log.message_id == mail.outbox[0].extra_headers['Message-ID']
+        assert str(email_log.id) == mail.outbox[0].extra_headers['X-BMAsia-Email-ID']
+        enrollment = execution.enrollment
+        enrollment.refresh_from_db()
+        assert enrollment.current_step_number == 2 and enrollment.started_at is not None
+        assert enrollment.step_executions.get(step__step_number=2).status == 'scheduled'
+
+    def test_last_step_completes_enrollment(self, sequence):
+        sequence.steps.filter(step_number=2).delete()
+        execution = _enroll(sequence, 'Thailand')
+
+        SequenceExecutor().run(now=WEDNESDAY)
+
+        execution.enrollment.refresh_from_db()
+        assert execution.enrollment.status == 'completed'
+
+    def test_failed_send_is_retried_then_given_up(self, sequence, backend):
+        execution = _enroll(sequence, 'Thailand')
+        backend.fail_for = {execution.enrollment.contact.email}
+
+        for attempt in range(3):
+            assert SequenceExecutor().run(now=WEDNESDAY)['failed'] == 1
+
+        execution.refresh_from_db()
+        assert (execution.status, execution.attempt_count) == ('failed', 3)
+        assert '421' in execution.error_message
+        assert set(EmailLog.objects.values_list('status', flat=True)) == {'failed'}
+
+    def test_inactive_and_unsubscribed_are_skipped(self, sequence):
+        paused = _enroll(sequence, 'Thailand')
+        SequenceEnrollment.objects.filter(pk=paused.enrollment_id).update(status='paused')
+        unsubscribed = _enroll(sequence, 'Thailand', receives_notifications=False)
+
+        report = SequenceExecutor().run(now=WEDNESDAY)
+
+        assert (report['skipped'], report['sent']) == (2, 0)
+        assert (_status(paused), _status(unsubscribed)) == ('skipped', 'skipped')
+        unsubscribed.enrollment.refresh_from_db()
+        assert unsubscribed.enrollment.status == 'unsubscribed'
+        assert not mail.outbox
+
+    def test_sends_run_on_the_thread_pool_with_pooled_connections(self, sequence, backend):
+        for _ in range(9):
+            _enroll(sequence, 'Thailand')
+
+        report = SequenceExecutor().run(now=WEDNESDAY)
+
+        assert report['sent'] == 9 and len(mail.outbox) == 9
+        assert 1 <= len(backend.threads) <= 3 and all(name.startswith('sequence-send') for name in backend.threads)
+        # One sender for this sequence type: one connection per worker, reused for its 3 messages
+        assert backend.opened == report['smtp_connections'] == 3
+
+    def test_max_emails(self, sequence):
+        for _ in range(3):
+            _enroll(sequence, 'Thailand')
+
+        report = SequenceExecutor().run(max_emails=2, now=WEDNESDAY)
+
+        assert (report['claimed'], report['sent'], report['waiting']) == (2, 2, 1)
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_report_throughput(sequence, settings):
+    """Steps sent per second against a local SMTP server taking 20 ms per message"""
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+
+    class SlowHandler:
+        async def handle_DATA(self, server, session, envelope):
+            await asyncio.sleep(0.02)
+            return '250 Message accepted for delivery'
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    controller = controller_module.Controller(SlowHandler(), hostname='127.0.0.1', port=port)
+    controller.start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST, settings.EMAIL_PORT, settings.EMAIL_USE_TLS = '127.0.0.1', port, False
+    try:
+        reports = {}
+        for concurrency in (1, 4):
+            for _ in range(100):
+                _enroll(sequence, 'Thailand')
+            reports[concurrency] = SequenceExecutor(concurrency=concurrency).run(max_emails=100, now=WEDNESDAY)
+    finally:
+        controller.stop()
+
+    print('\nSequence executor, 100 due steps at 20 ms/message: ' + '; '.join(
+        f"{concurrency} thread(s) {report['seconds']}s = {report['per_second']}/s "
+        f"({report['smtp_connections']} SMTP connections)"
+        for concurrency, report in reports.items()
+    ))
+    assert reports[1]['sent'] == reports[4]['sent'] == 100
+    assert reports[4]['per_second'] > reports[1]['per_second']
@@ -0,0 +1,177 @@
+"""
+Test suite for the pooled SMTP connections used by batch senders.
+Runs against a local aiosmtpd server standing in for Gmail SMTP.
+
+Benchmark (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_smtp_pool.py -m slow -s
+"""
+import os
+import socket
+import time
+
+import pytest
+from django.core.mail import EmailMessage
+
+from crm_app.services.email_service import EmailService
+from crm_app.services.smtp_pool import SMTPConnectionPool
+from crm_app.tests.factories import CompanyFactory
+
+controller_module = pytest.importorskip('aiosmtpd.controller')
+
+
+class CountingHandler:
+    """aiosmtpd handler counting sessions (EHLO/HELO) and delivered messages"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_HELO(self, server, session, envelope, hostname):
+        self.sessions += 1
+        session.host_name = hostname
+        return '250 {}'.format(server.hostname)
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 Message accepted for delivery'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(settings):
+    """Local SMTP server wired in as the default email backend"""
+    handler = CountingHandler()
+    port = _free_port()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = port
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = ''
+    settings.EMAIL_HOST_PASSWORD = ''
+    yield handler
+    controller.stop()
+
+
+def _message(i, connection):
+    return EmailMessage(f'Hello {i}', 'Body', 'sender@example.com', [f'to{i}@example.com'],
+                        connection=connection)
+
+
+class TestSMTPConnectionPool:
+    """Test suite for SMTPConnectionPool / PooledConnection"""
+
+    def test_one_session_per_batch(self, smtp_server):
+        """All messages of a batch go over one SMTP session"""
+        pool = SMTPConnectionPool()
+        for i in range(5):
+            _message(i, pool.default_connection()).send()
+        pool.close()
+
+        assert smtp_server.messages == 5
+        assert smtp_server.sessions == 1
+        assert pool.stats['opened'] == 1
+        assert pool.stats['reused'] == 4
+
+    def test_reconnects_when_server_drops_session(self, smtp_server):
+        """SMTPServerDisconnected is retried once on a fresh connection"""
+        pool = SMTPConnectionPool()
+        connection = pool.default_connection()
+        _message(1, connection).send()
+        # Simulate the server closing the idle session
+        connection.backend.connection.close()
+
+        _message(2, pool.default_connection()).send()
+        pool.close()
+
+        assert smtp_server.messages == 2
+        assert pool.stats['reconnected'] == 1
+        assert smtp_server.sessions == 2
+
+    def test_idle_connections_are_recycled(self, smtp_server):
+        """Connections idle past max_idle are closed before reuse"""
+        now = [0.0]
+        pool = SMTPConnectionPool(max_idle=60, clock=lambda: now[0])
+        _message(1, pool.default_connection()).send()
+        now[0] = 61.0
+        _message(2, pool.default_connection()).send()
+        pool.close()
+
+        assert pool.stats['expired'] == 1
+        assert smtp_server.sessions == 2
+
+    def test_sender_credentials_looked_up_once(self):
+        """Per-sender credential lookup runs once per pool, senders without credentials get None"""
+        lookups = []
+
+        def lookup(sender):
+            lookups.append(sender)
+            if sender == 'norbert@bmasiamusic.com':
+                return {'backend': 'django.core.mail.backends.locmem.EmailBackend'}
+            return None
+
+        pool = SMTPConnectionPool()
+        first = pool.sender_connection('norbert@bmasiamusic.com', lookup)
+        second = pool.sender_connection('norbert@bmasiamusic.com', lookup)
+
+        assert first is second
+        assert pool.sender_connection('nobody@bmasiamusic.com', lookup) is None
+        assert lookups == ['norbert@bmasiamusic.com', 'nobody@bmasiamusic.com']
+
+
+@pytest.mark.django_db
+def test_email_service_smtp_pool(smtp_server):
+    """send_email() inside EmailService.smtp_pool() shares one default connection"""
+    service = EmailService()
+    company = CompanyFactory(soundtrack_account_id='')
+
+    with service.smtp_pool() as pool:
+        with service.smtp_pool() as nested:
+            assert nested is pool
+        for i in range(3):
+            success, _ = service.send_email(
+                to_email=f'to{i}@example.com', subject='Hi', body_html='<p>Hi</p>',
+                body_text='Hi', from_email='sender@example.com', company=company,
+            )
+            assert success
+
+    assert smtp_server.messages == 3
+    assert smtp_server.sessions == 1
+    assert service._active_smtp_pool() is None
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_benchmark_pooled_vs_per_message(smtp_server):
+    """Report time for 200 messages with a connection per message vs one pooled connection"""
+    from django.core.mail import get_connection
+    count = 200
+
+    started = time.perf_counter()
+    for i in range(count):
+        _message(i, get_connection()).send()
+    per_message = time.perf_counter() - started
+    per_message_sessions = smtp_server.sessions
+
+    pool = SMTPConnectionPool()
+    started = time.perf_counter()
+    for i in range(count):
+        _message(i, pool.default_connection()).send()
+    pool.close()
+    pooled = time.perf_counter() - started
+
+    print(f'\nSMTP @ {count} messages: per-message {per_message * 1000:.0f} ms '
+          f'({per_message_sessions} sessions), pooled {pooled * 1000:.0f} ms '
+          f'({smtp_server.sessions - per_message_sessions} session)')
+    assert smtp_server.sessions - per_message_sessions == 1
@@ -0,0 +1,121 @@
+"""
+Test suite for the cursor-paginated Soundtrack zone fetch (iter_account_zones).
+Runs against the local fake GraphQL server in fake_soundtrack.py, serving
+accounts with thousands of zones across many location and zone pages.
+"""
+import pytest
+
+from crm_app.models import Company, Zone
+from crm_app.services.soundtrack_api import SoundtrackAPIError, SoundtrackAPIService
+from crm_app.tests.factories import CompanyFactory, ZoneFactory
+from crm_app.tests.fake_soundtrack import FakeSoundtrackServer
+
+
+@pytest.fixture
+def fake_api(settings):
+    settings.SOUNDTRACK_API_BACKOFF = 0
+    settings.SOUNDTRACK_API_RETRIES = 0
+    settings.SOUNDTRACK_API_PAGE_SIZE = 50
+    server = FakeSoundtrackServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(fake_api):
+    service = SoundtrackAPIService()
+    service.base_url = fake_api.url
+    return service
+
+
+@pytest.fixture
+def big_company(fake_api):
+    """60 locations x 60 zones = 3600 zones: 2 location pages, 2 zone pages per location"""
+    fake_api.add_account('SA-BIG', zones=60, locations=60)
+    company = CompanyFactory(soundtrack_account_id='')
+    Company.objects.filter(pk=company.pk).update(soundtrack_account_id='SA-BIG')
+    company.refresh_from_db()
+    return company
+
+
+@pytest.mark.django_db
+class TestPaginatedZoneFetch:
+    """Test suite for SoundtrackAPIService.iter_account_zones"""
+
+    def test_follows_location_and_zone_cursors(self, fake_api, service, big_company):
+        zones = list(service.iter_account_zones('SA-BIG'))
+
+        assert len(zones) == 3600
+        assert len({zone['id'] for zone in zones}) == 3600
+        assert zones[-1]['name'] == 'Main 59 - Zone 59'
+        assert zones[0]['account_name'] == 'Business SA-BIG'
+        # 2 location pages + 1 extra zone page for each of the 60 locations
+        assert len(fake_api.requests) == 62
+
+    def test_single_keep_alive_connection(self, fake_api, service, big_company):
+        list(service.iter_account_zones('SA-BIG'))
+
+        assert len(fake_api.connections) == 1
+
+    def test_is_lazy(self, fake_api, service, big_company):
+        zones = service.iter_account_zones('SA-BIG')
+
+        next(zones)
+
+        assert len(fake_api.requests) == 1
+
+    def test_first_page_failure_yields_nothing(self, fake_api, service, big_company):
+        fake_api.fail('SA-BIG')
+
+        assert service.get_account_zones('SA-BIG') == []
+
+    def test_later_page_failure_raises(self, fake_api, service, big_company):
+        fake_api.fail('SA-BIG-L7')
+
+        with pytest.raises(SoundtrackAPIError):
+            list(service.iter_account_zones('SA-BIG'))
+
+    def test_sync_streams_all_pages(self, service, big_company):
+        assert service.sync_company_zones(big_company) == (3600, 0)
+
+        assert Zone.objects.filter(company=big_company).count() == 3600
+
+    def test_failed_page_aborts_sync_without_orphaning(self, fake_api, service, big_company):
+        existing = ZoneFactory(company=big_company, platform='soundtrack',
+                               soundtrack_zone_id='SA-BIG-L59-Z0', name='Main 59 - Zone 0')
+        fake_api.fail('SA-BIG-L30')
+
+        assert service.sync_company_zones(big_company) == (0, 1)
+
+        assert Zone.objects.filter(company=big_company).count() == 1
+        existing.refresh_from_db()
+        assert not existing.is_orphaned
+
+    def test_all_accounts_paginated(self, fake_api, service, settings):
+        settings.SOUNDTRACK_API_PAGE_SIZE = 20
+        for i in range(30):
+            fake_api.add_account(f'SA-{i}', zones=25, locations=2)
+
+        zones = service.get_account_zones()
+
+        assert len(zones) == 30 * 50
+        assert len({zone['account_id'] for zone in zones}) == 30
+        # Two pages of accounts from the `me` query
+        assert [key for key, _ in fake_api.requests].count(None) == 2
+
+    def test_account_info_paginated(self, fake_api, service, big_company, settings):
+        settings.SOUNDTRACK_API_PAGE_SIZE = 20
+        for i in range(25):
+            fake_api.add_account(f'SA-{i}', zones=2)
+
+        info = service.get_account_info()
+
+        assert len(info['accounts']) == 26
+        big = next(account for account in info['accounts'] if account['id'] == 'SA-BIG')
+        assert big['businessName'] == 'Business SA-BIG'
+        assert len(big['zones']) == 3600
+
+    def test_account_info_failure_returns_none(self, fake_api, service, monkeypatch):
+        monkeypatch.setattr(service, '_make_graphql_query', lambda query, variables=None: None)
+
+        assert service.get_account_info() is None
@@ -0,0 +1,154 @@
+"""
+Test suite for the concurrent Soundtrack zone sync (sync_all_zones / sync_soundtrack).
+Runs against the local fake GraphQL server in fake_soundtrack.py.
+
+Benchmark (skipped unless RUN_BENCHMARKS is set):
+    RUN_BENCHMARKS=1 pytest crm_app/tests/test_soundtrack_sync.py -m slow -s
+"""
+import os
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from crm_app.models import Company, Zone
+from crm_app.services.soundtrack_api import SoundtrackAPIService, soundtrack_api
+from crm_app.tests.factories import CompanyFactory
+from crm_app.tests.fake_soundtrack import FakeSoundtrackServer
+
+
+@pytest.fixture
+def fake_api(settings):
+    settings.SOUNDTRACK_API_BACKOFF = 0
+    server = FakeSoundtrackServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(fake_api):
+    service = SoundtrackAPIService()
+    service.base_url = fake_api.url
+    return service
+
+
+def _companies(fake_api, count, zones=2):
+    """Companies linked to fake accounts (queryset update skips the auto-sync signal)"""
+    companies = []
+    for i in range(count):
+        account_id = f'SA-{i}'
+        fake_api.add_account(account_id, zones=zones)
+        company = CompanyFactory(soundtrack_account_id='')
+        Company.objects.filter(pk=company.pk).update(soundtrack_account_id=account_id)
+        companies.append(company)
+    return companies
+
+
+@pytest.mark.django_db
+class TestConcurrentZoneSync:
+    """Test suite for SoundtrackAPIService.sync_all_zones"""
+
+    def test_syncs_every_account(self, fake_api, service):
+        _companies(fake_api, 6, zones=2)
+
+        synced, errors = service.sync_all_zones(concurrency=4)
+
+        assert (synced, errors) == (12, 0)
+        assert Zone.objects.filter(platform='soundtrack', status='online').count() == 12
+        assert Zone.objects.get(soundtrack_zone_id='SA-3-Z1').company.soundtrack_account_id == 'SA-3'
+        assert service.last_sync_report['companies'] == 6
+
+    def test_concurrent_matches_serial(self, fake_api, service):
+        _companies(fake_api, 4)
+
+        service.sync_all_zones(concurrency=1)
+        serial = sorted(Zone.objects.values_list('soundtrack_zone_id', 'company_id', 'name', 'status'))
+        service.sync_all_zones(concurrency=4)
+        concurrent = sorted(Zone.objects.values_list('soundtrack_zone_id', 'company_id', 'name', 'status'))
+
+        assert concurrent == serial
+
+    def test_keep_alive_session_reused(self, fake_api, service):
+        _companies(fake_api, 8)
+
+        service.sync_all_zones(concurrency=2)
+
+        assert len(fake_api.requests) == 8
+        assert len(fake_api.connections) <= 2
+
+    def test_retries_transient_errors(self, fake_api, service):
+        _companies(fake_api, 2)
+        fake_api.fail('SA-1', times=2)
+
+        synced, errors = service.sync_all_zones(concurrency=2)
+
+        assert synced == 4
+        assert [account for account, _ in fake_api.requests].count('SA-1') == 3
+
+    def test_write_error_counted_per_company(self, fake_api, service, monkeypatch):
+        _companies(fake_api, 3)
+        original = service.apply_company_zones
+
+        def apply(company, api_zones, **kwargs):
+            if company.soundtrack_account_id == 'SA-0':
+                raise RuntimeError('boom')
+            return original(company, api_zones, **kwargs)
+
+        monkeypatch.setattr(service, 'apply_company_zones', apply)
+
+        synced, errors = service.sync_all_zones(concurrency=3)
+
+        assert (synced, errors) == (4, 1)
+
+    def test_fetched_zones_do_not_pile_up_behind_writes(self, fake_api, service, monkeypatch):
+        _companies(fake_api, 10)
+        fetch, apply = service._fetch_account_zones, service.apply_company_zones
+        fetched, backlog = [], []
+
+        def fetch_zones(account_id):
+            zones = fetch(account_id)
+            fetched.append(account_id)
+            return zones
+
+        def slow_apply(company, api_zones, **kwargs):
+            time.sleep(0.02)
+            backlog.append(len(fetched) - len(backlog))
+            return apply(company, api_zones, **kwargs)
+
+        monkeypatch.setattr(service, '_fetch_account_zones', fetch_zones)
+        monkeypatch.setattr(service, 'apply_company_zones', slow_apply)
+
+        assert service.sync_all_zones(concurrency=2) == (20, 0)
+        # The account being written plus at most `concurrency` fetches
+        assert max(backlog) <= 3
+
+    def test_command_concurrency_flag(self, fake_api, monkeypatch):
+        _companies(fake_api, 3)
+        monkeypatch.setattr(soundtrack_api, 'base_url', fake_api.url)
+        out = StringIO()
+
+        call_command('sync_soundtrack', '--concurrency', '3', '--skip-alerts', stdout=out)
+
+        assert 'Synced 6 zones across all companies, 0 errors' in out.getvalue()
+        assert '3 companies, concurrency 3' in out.getvalue()
+        assert 'Zones: 6 created, 0 changed, 0 unchanged, 0 orphaned' in out.getvalue()
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+def test_benchmark_concurrent_sync(fake_api, service):
+    """Report sync time for 100 accounts at 50ms API latency, serial vs 8 threads"""
+    fake_api.latency = 0.05
+    _companies(fake_api, 100, zones=3)
+
+    service.sync_all_zones(concurrency=1)
+    serial = service.last_sync_report
+    service.sync_all_zones(concurrency=8)
+    concurrent = service.last_sync_report
+
+    print(f"\nSoundtrack sync @ 100 accounts: serial {serial['total_seconds']}s, "
+          f"8 threads {concurrent['total_seconds']}s "
+          f"(db writes {concurrent['db_write_seconds']}s)")
+    assert concurrent['total_seconds'] < serial['total_seconds']
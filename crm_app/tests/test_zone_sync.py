@@ -0,0 +1,197 @@
+"""
+Test suite for ZoneReconciler, the set-based zone upsert behind
+SoundtrackAPIService.apply_company_zones. Pins the matching, manual-zone
+linking and orphan semantics of the per-zone implementation it replaced, and
+the fingerprint change detection that skips no-op zone writes.
+"""
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from crm_app.models import Zone
+from crm_app.services.soundtrack_api import SoundtrackAPIService
+from crm_app.services.zone_sync import ZoneReconciler, zone_fingerprint
+from crm_app.tests.factories import CompanyFactory, ZoneFactory
+
+
+def api_zone(zone_id, name, status='online'):
+    return {
+        'id': zone_id, 'name': name, 'status': status, 'is_online': status == 'online',
+        'device_name': f'Player {name}',
+    }
+
+
+@pytest.fixture
+def company():
+    return CompanyFactory(soundtrack_account_id='')
+
+
+@pytest.fixture
+def apply(company):
+    service = SoundtrackAPIService()
+    return lambda api_zones: service.apply_company_zones(company, api_zones)
+
+
+@pytest.mark.django_db
+class TestZoneReconciler:
+    """Test suite for ZoneReconciler via apply_company_zones"""
+
+    def test_creates_new_zones(self, company, apply):
+        assert apply([api_zone('Z1', 'Lobby'), api_zone('Z2', 'Bar', status='offline')]) == (2, 0)
+
+        zone = company.zones.get(soundtrack_zone_id='Z1')
+        assert (zone.name, zone.platform, zone.status) == ('Lobby', 'soundtrack', 'online')
+        assert zone.device_name == 'Player Lobby'
+        assert zone.last_seen_online is not None and zone.last_api_sync is not None
+        assert zone.api_raw_data['id'] == 'Z1'
+        assert company.zones.get(soundtrack_zone_id='Z2').last_seen_online is None
+
+    def test_updates_by_zone_id_and_follows_renames(self, company, apply):
+        zone = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='Z1', name='Old name')
+
+        apply([api_zone('Z1', 'New name')])
+
+        zone.refresh_from_db()
+        assert zone.name == 'New name'
+        assert company.zones.count() == 1
+
+    def test_id_match_ignores_platform(self, company, apply):
+        zone = ZoneFactory(company=company, platform='beatbreeze', soundtrack_zone_id='Z1', name='Lobby')
+
+        apply([api_zone('Z1', 'Lobby')])
+
+        assert company.zones.get().pk == zone.pk
+
+    def test_links_manual_zone_by_name(self, company, apply):
+        manual = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='', name='Lobby')
+
+        apply([api_zone('Z1', 'Lobby')])
+
+        manual.refresh_from_db()
+        assert manual.soundtrack_zone_id == 'Z1'
+        assert company.zones.count() == 1
+
+    def test_name_fallback_only_for_soundtrack_platform(self, company, apply):
+        ZoneFactory(company=company, platform='beatbreeze', soundtrack_zone_id='', name='Lobby')
+
+        apply([api_zone('Z1', 'Lobby')])
+
+        assert company.zones.count() == 2
+        assert company.zones.get(soundtrack_zone_id='Z1').platform == 'soundtrack'
+
+    def test_name_match_sees_earlier_updates(self, company, apply):
+        """Two API zones with one manual zone's name: the second links to the same zone, as before"""
+        manual = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='', name='Lobby')
+
+        apply([api_zone('Z1', 'Lobby'), api_zone('Z2', 'Lobby')])
+
+        manual.refresh_from_db()
+        assert manual.soundtrack_zone_id == 'Z2'
+        assert company.zones.count() == 1
+
+    def test_orphans_flagged_and_unflagged(self, company, apply):
+        gone = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='GONE', name='Gone')
+        earlier = timezone.now() - timedelta(days=3)
+        still_gone = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='OLD',
+                                 name='Old', is_orphaned=True, orphaned_at=earlier)
+        back = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='Z1',
+                           name='Back', is_orphaned=True, orphaned_at=earlier)
+        other_platform = ZoneFactory(company=company, platform='beatbreeze', soundtrack_zone_id='BB', name='BB')
+        manual = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='', name='Manual')
+
+        apply([api_zone('Z1', 'Back')])
+
+        for zone in (gone, still_gone, back, other_platform, manual):
+            zone.refresh_from_db()
+        assert gone.is_orphaned and gone.orphaned_at is not None
+        assert still_gone.is_orphaned and still_gone.orphaned_at == earlier
+        assert not back.is_orphaned and back.orphaned_at is None
+        assert not other_platform.is_orphaned
+        assert not manual.is_orphaned
+
+    def test_other_companies_untouched(self, company, apply):
+        other = ZoneFactory(platform='soundtrack', soundtrack_zone_id='Z1', name='Lobby')
+
+        apply([api_zone('Z1', 'Lobby')])
+
+        assert Zone.objects.filter(soundtrack_zone_id='Z1').count() == 2
+        other.refresh_from_db()
+        assert other.last_api_sync is None
+
+    def test_queries_do_not_grow_with_zone_count(self):
+        service = SoundtrackAPIService()
+
+        def queries_for(count):
+            company = CompanyFactory(soundtrack_account_id='')
+            for i in range(count):
+                ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id=f'Z{i}', name=f'Zone {i}')
+            ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='GONE', name='Gone')
+            api_zones = [api_zone(f'Z{i}', f'Zone {i}') for i in range(count)]
+            api_zones += [api_zone(f'NEW{i}', f'New {i}') for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                service.apply_company_zones(company, api_zones)
+            return len(ctx.captured_queries)
+
+        assert queries_for(3) == queries_for(30)
+
+
+@pytest.mark.django_db
+class TestZoneChangeDetection:
+    """Test suite for fingerprint-based change detection in ZoneReconciler"""
+
+    def test_fingerprint_ignores_key_order(self):
+        zone = api_zone('Z1', 'Lobby')
+        assert zone_fingerprint(zone) == zone_fingerprint(dict(reversed(list(zone.items()))))
+        assert zone_fingerprint(zone) != zone_fingerprint({**zone, 'status': 'offline'})
+
+    def test_unchanged_zones_only_get_a_heartbeat(self, company):
+        api_zones = [api_zone('Z1', 'Lobby'), api_zone('Z2', 'Bar', status='offline')]
+        ZoneReconciler(company).sync(api_zones)
+        before = {zone.soundtrack_zone_id: zone for zone in company.zones.all()}
+
+        reconciler = ZoneReconciler(company)
+        with CaptureQueriesContext(connection) as ctx:
+            reconciler.sync(api_zones)
+
+        assert reconciler.stats['unchanged'] == 2 and reconciler.stats['changed'] == 0
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        assert len(updates) == 1
+        after = {zone.soundtrack_zone_id: zone for zone in company.zones.all()}
+        assert after['Z1'].updated_at == before['Z1'].updated_at
+        assert after['Z1'].last_api_sync > before['Z1'].last_api_sync
+        assert after['Z1'].last_seen_online > before['Z1'].last_seen_online
+        assert after['Z2'].last_seen_online is None
+
+    def test_changed_zones_are_rewritten(self, company):
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby'), api_zone('Z2', 'Bar')])
+
+        reconciler = ZoneReconciler(company)
+        reconciler.sync([api_zone('Z1', 'Lobby', status='offline'), api_zone('Z2', 'Bar'),
+                         api_zone('Z3', 'Pool')])
+
+        assert dict(reconciler.stats) == {'created': 1, 'changed': 1, 'unchanged': 1, 'orphaned': 0}
+        zone = company.zones.get(soundtrack_zone_id='Z1')
+        assert zone.status == 'offline'
+        assert zone.api_fingerprint == zone_fingerprint(api_zone('Z1', 'Lobby', status='offline'))
+
+    def test_local_edits_are_still_overwritten(self, company):
+        """Same payload, but the zone was edited in the CRM: the sync restores the API values"""
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby')])
+        company.zones.update(device_name='Edited by hand')
+
+        reconciler = ZoneReconciler(company)
+        reconciler.sync([api_zone('Z1', 'Lobby')])
+
+        assert reconciler.stats['changed'] == 1
+        assert company.zones.get().device_name == 'Player Lobby'
+
+    def test_orphaned_zone_returning_is_rewritten(self, company):
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby')])
+        company.zones.update(is_orphaned=True)
+
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby')])
+
+        assert not company.zones.get().is_orphaned
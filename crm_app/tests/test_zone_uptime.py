@@ -0,0 +1,236 @@
+"""
+Test suite for zone status history and uptime rollups: transitions recorded by
+the Soundtrack sync, the nightly per-day rollup (zone_uptime_service) and the
+uptime endpoints on ZoneViewSet that read the rollups.
+"""
+from datetime import date, datetime, timedelta
+from io import StringIO
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from crm_app.models import ZoneStatusChange, ZoneUptimeDaily
+from crm_app.services.zone_sync import ZoneReconciler
+from crm_app.services.zone_uptime_service import business_today, rollup_day, rollup_range, zone_uptime
+from crm_app.tests.factories import (
+    CompanyFactory, ContractFactory, ContractZoneFactory, UserFactory, ZoneFactory
+)
+
+BANGKOK = ZoneInfo('Asia/Bangkok')
+DAY = date(2026, 3, 10)
+
+
+def at(day, hour=0, minute=0):
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=BANGKOK)
+
+
+def change(zone, status, changed_at, previous_status=''):
+    return ZoneStatusChange.objects.create(
+        zone=zone, status=status, previous_status=previous_status, changed_at=changed_at
+    )
+
+
+def api_zone(zone_id, name, status='online'):
+    return {'id': zone_id, 'name': name, 'status': status, 'is_online': status == 'online'}
+
+
+@pytest.fixture
+def company():
+    return CompanyFactory(soundtrack_account_id='')
+
+
+@pytest.fixture
+def zone(company):
+    return ZoneFactory(company=company, platform='soundtrack', name='Lobby')
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(user=UserFactory(role='Admin', is_staff=True))
+    return client
+
+
+@pytest.mark.django_db
+class TestStatusHistory:
+    """Test suite for ZoneStatusChange recording"""
+
+    def test_sync_records_transitions_not_polls(self, company):
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby'), api_zone('Z2', 'Bar', status='offline')])
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby'), api_zone('Z2', 'Bar', status='offline')])
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby', status='offline'), api_zone('Z2', 'Bar', status='offline')])
+
+        history = list(ZoneStatusChange.objects.filter(zone__company=company)
+                       .order_by('changed_at', 'zone__name')
+                       .values_list('zone__soundtrack_zone_id', 'previous_status', 'status'))
+        assert history == [('Z2', '', 'offline'), ('Z1', '', 'online'), ('Z1', 'online', 'offline')]
+
+    def test_zone_that_never_changes_gets_a_starting_row(self, company):
+        zone = ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='Z1', name='Lobby', status='online')
+
+        for _ in range(3):
+            ZoneReconciler(company).sync([api_zone('Z1', 'Lobby')])
+
+        assert list(zone.status_changes.values_list('previous_status', 'status')) == [('', 'online')]
+        day = business_today() + timedelta(days=1)
+        assert rollup_day(day, now=at(day + timedelta(days=1))) == 1
+        assert zone_uptime(zone, day, day)['uptime_percent'] == 100.0
+
+    def test_manual_zone_link_records_change(self, company):
+        ZoneFactory(company=company, platform='soundtrack', soundtrack_zone_id='', name='Lobby', status='pending')
+
+        ZoneReconciler(company).sync([api_zone('Z1', 'Lobby')])
+
+        assert ZoneStatusChange.objects.get(zone__company=company).previous_status == 'pending'
+
+    def test_mark_as_cancelled_records_change(self, zone):
+        zone.status = 'online'
+        zone.save()
+
+        zone.mark_as_cancelled()
+        zone.mark_as_cancelled()
+
+        assert list(zone.status_changes.values_list('previous_status', 'status')) == [('online', 'cancelled')]
+
+
+@pytest.mark.django_db
+class TestDailyRollup:
+    """Test suite for zone_uptime_service.rollup_day"""
+
+    def test_outage_during_day(self, zone):
+        change(zone, 'online', at(DAY - timedelta(days=3), 9))
+        change(zone, 'offline', at(DAY, 10), 'online')
+        change(zone, 'online', at(DAY, 12), 'offline')
+
+        assert rollup_day(DAY) == 1
+
+        row = ZoneUptimeDaily.objects.get(zone=zone, date=DAY)
+        assert (row.online_minutes, row.monitored_minutes, row.transitions) == (1320, 1440, 2)
+
+    def test_history_starting_mid_day(self, zone):
+        change(zone, 'online', at(DAY, 18))
+
+        rollup_day(DAY)
+
+        row = ZoneUptimeDaily.objects.get(zone=zone, date=DAY)
+        assert (row.online_minutes, row.monitored_minutes) == (360, 360)
+
+    def test_unmonitored_statuses(self, zone):
+        change(zone, 'pending', at(DAY - timedelta(days=1)))
+        change(zone, 'online', at(DAY, 6), 'pending')
+        change(zone, 'cancelled', at(DAY, 18), 'online')
+
+        rollup_day(DAY)
+
+        row = ZoneUptimeDaily.objects.get(zone=zone, date=DAY)
+        assert (row.online_minutes, row.monitored_minutes) == (720, 720)
+
+    def test_days_without_history_have_no_row(self, zone):
+        change(zone, 'online', at(DAY + timedelta(days=1)))
+
+        assert rollup_day(DAY) == 0
+
+    def test_rerun_updates_in_place(self, zone):
+        change(zone, 'online', at(DAY - timedelta(days=1)))
+        rollup_day(DAY)
+        change(zone, 'offline', at(DAY, 23), 'online')
+
+        rollup_day(DAY)
+
+        row = ZoneUptimeDaily.objects.get(zone=zone, date=DAY)
+        assert ZoneUptimeDaily.objects.filter(zone=zone).count() == 1
+        assert row.online_minutes == 1380
+
+    def test_running_day_stops_at_now(self, zone):
+        change(zone, 'online', at(DAY - timedelta(days=1)))
+
+        rollup_day(DAY, now=at(DAY, 6))
+
+        assert ZoneUptimeDaily.objects.get(zone=zone, date=DAY).monitored_minutes == 360
+
+    def test_queries_do_not_grow_with_zone_count(self):
+        def queries_for(count, day):
+            for i in range(count):
+                zone = ZoneFactory(platform='soundtrack')
+                change(zone, 'online', at(day - timedelta(days=1)))
+                change(zone, 'offline', at(day, 10), 'online')
+            with CaptureQueriesContext(connection) as ctx:
+                rollup_day(day)
+            return len(ctx.captured_queries)
+
+        assert queries_for(3, DAY) == queries_for(30, DAY + timedelta(days=10))
+
+    def test_command_rolls_up_range(self, zone):
+        change(zone, 'online', at(DAY - timedelta(days=5)))
+        out = StringIO()
+
+        call_command('rollup_zone_uptime', '--date', DAY.isoformat(), '--days', '3', stdout=out)
+
+        assert ZoneUptimeDaily.objects.filter(zone=zone).count() == 3
+        assert 'Rolled up 3 zone-days for 2026-03-08 to 2026-03-10' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestUptimeEndpoints:
+    """Test suite for the ZoneViewSet uptime actions"""
+
+    @pytest.fixture
+    def history(self, zone):
+        """Online from the start; offline for 6 hours on DAY+1"""
+        change(zone, 'online', at(DAY - timedelta(days=1)))
+        change(zone, 'offline', at(DAY + timedelta(days=1), 6), 'online')
+        change(zone, 'online', at(DAY + timedelta(days=1), 12), 'offline')
+        rollup_range(DAY, DAY + timedelta(days=2))
+        return zone
+
+    def test_zone_uptime(self, api_client, history):
+        response = api_client.get(f'/api/v1/zones/{history.id}/uptime/',
+                                  {'start': '2026-03-10', 'end': '2026-03-12'})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data['online_minutes'], data['monitored_minutes']) == (3960, 4320)
+        assert data['uptime_percent'] == 91.67
+        assert [day['uptime_percent'] for day in data['days']] == [100.0, 75.0, 100.0]
+
+    def test_company_uptime(self, api_client, company, history):
+        other = ZoneFactory(company=company, platform='soundtrack', name='Bar')
+        change(other, 'offline', at(DAY - timedelta(days=1)))
+        rollup_day(DAY)
+
+        response = api_client.get('/api/v1/zones/uptime/',
+                                  {'company': str(company.id), 'start': '2026-03-10', 'end': '2026-03-10'})
+
+        data = response.json()
+        assert [(z['zone_name'], z['uptime_percent']) for z in data['zones']] == [('Bar', 0.0), ('Lobby', 100.0)]
+        assert data['uptime_percent'] == 50.0
+
+    def test_contract_uptime_limited_to_contract_dates(self, api_client, company, history):
+        contract = ContractFactory(company=company, opportunity=None)
+        ContractZoneFactory(contract=contract, zone=history,
+                            start_date=DAY + timedelta(days=1), end_date=DAY + timedelta(days=1))
+
+        response = api_client.get('/api/v1/zones/uptime/',
+                                  {'contract': str(contract.id), 'start': '2026-03-01', 'end': '2026-03-31'})
+
+        data = response.json()
+        assert (data['online_minutes'], data['monitored_minutes']) == (1080, 1440)
+        assert len(data['zones']) == 1
+
+    def test_requires_scope(self, api_client):
+        assert api_client.get('/api/v1/zones/uptime/').status_code == 400
+
+    def test_rejects_bad_range(self, api_client, zone):
+        url = f'/api/v1/zones/{zone.id}/uptime/'
+        assert api_client.get(url, {'start': '2026-13-01'}).status_code == 400
+        assert api_client.get(url, {'start': '2026-03-10', 'end': '2026-03-01'}).status_code == 400
+
+    def test_rejects_malformed_contract_id(self, api_client):
+        assert api_client.get('/api/v1/zones/uptime/', {'contract': 'not-a-uuid'}).status_code == 400
+
+    def test_rejects_malformed_company_id(self, api_client):
+        assert api_client.get('/api/v1/zones/uptime/', {'company': 'not-a-uuid'}).status_code == 400
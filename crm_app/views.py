@@ -86,7 +86,8 @@ from .serializers import (
     VendorSerializer, ExpenseCategorySerializer, RecurringExpenseSerializer, ExpenseEntrySerializer, ExpenseEntryCreateSerializer,
     EmailLogSerializer,
     ProspectSequenceSerializer, ProspectSequenceStepSerializer, ProspectEnrollmentSerializer,
-    ProspectStepExecutionSerializer, ProspectReplySerializer, AIEmailDraftSerializer
+    ProspectStepExecutionSerializer, ProspectReplySerializer, AIEmailDraftSerializer,
+    parse_sparse_fields,
 )
 from .permissions import (
     RoleBasedPermission, DepartmentPermission, CompanyAccessPermission,
@@ -619,16 +620,9 @@ class CompanyViewSet(BaseModelViewSet):
         """Override to dynamically optimize queryset based on action"""
         queryset = super().get_queryset()
 
-        # For list action, optimize for serialization
+        # For list action, load only what the requested fields need
         if self.action == 'list':
-            # Prefetch related objects that are used in the serializer
-            queryset = queryset.select_related('parent_company').prefetch_related(
-                'contacts',
-                'zones',
-                'opportunities',
-                'contracts',
-                'child_companies'
-            )
+            queryset = CompanySerializer.setup_eager_loading(queryset, self.get_sparse_fields())
         elif self.action == 'retrieve':
             # For detail view, include even more related data
             queryset = queryset.select_related('parent_company').prefetch_related(
@@ -644,6 +638,15 @@ class CompanyViewSet(BaseModelViewSet):
 
         return queryset
 
+    def get_sparse_fields(self):
+        """Field names from the optional ?fields=a,b,c parameter (None = all fields)"""
+        return parse_sparse_fields(self.request.query_params.get('fields'))
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET' and self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
     def list(self, request, *args, **kwargs):
         """Override list method to add error handling"""
         try:
@@ -1236,7 +1239,14 @@ class ContractViewSet(BaseModelViewSet):
     ordering_fields = ['created_at', 'start_date', 'end_date', 'value', 'updated_at', 'company__name', 'contract_number']
     ordering = ['-start_date']
     filterset_fields = ['company', 'contract_type', 'status', 'auto_renew', 'is_active', 'contract_category', 'opportunity']
-    
+
+    def get_queryset(self):
+        """Annotate per-contract aggregates for read actions (see ContractSerializer.setup_eager_loading)"""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve', 'expiring_soon'):
+            queryset = ContractSerializer.setup_eager_loading(queryset)
+        return queryset
+
     @action(detail=False, methods=['get'])
     def expiring_soon(self, request):
         """Get contracts expiring within 30 days"""
@@ -6466,441 +6476,69 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
 class DashboardViewSet(viewsets.ViewSet):
     """ViewSet for dashboard statistics"""
     permission_classes = [IsAuthenticated]
-    
-    def _classify_lifecycle(self, contract):
-        """Classify contract lifecycle type with inference when lifecycle_type is blank."""
-        if contract.lifecycle_type:
-            return contract.lifecycle_type
-        if contract.renewed_from_id:
-            return 'renewal'
-        if Contract.objects.filter(
-            company=contract.company, start_date__lt=contract.start_date
-        ).exists():
-            return 'renewal'
-        return 'new'
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get dashboard statistics"""
-        user = request.user
-
-        # Base querysets
-        companies = Company.objects.filter(is_active=True)
-        opportunities = Opportunity.objects.filter(is_active=True)
-        contracts = Contract.objects.filter(is_active=True)
-        tasks = Task.objects.all()
-        invoices = Invoice.objects.all()
+        """Get dashboard statistics (served from the snapshot cache when fresh)"""
+        from .services.dashboard_snapshot_service import DashboardSnapshotService
 
-        # Entity filter (optional — filters all data by billing entity)
         billing_entity = request.query_params.get('billing_entity', '')
-        if billing_entity:
-            companies = companies.filter(billing_entity=billing_entity)
-            opportunities = opportunities.filter(company__billing_entity=billing_entity)
-            contracts = contracts.filter(company__billing_entity=billing_entity)
-            tasks = tasks.filter(company__billing_entity=billing_entity)
-            invoices = invoices.filter(company__billing_entity=billing_entity)
-
-        # Apply role-based filtering
-        if user.role == 'Sales':
-            opportunities = opportunities.filter(owner=user)
-            companies = companies.filter(opportunities__owner=user).distinct()
-        elif user.role == 'Finance':
-            pass  # Finance sees all financial data
-        elif user.role in ['Tech', 'Music']:
-            tasks = tasks.filter(Q(assigned_to=user) | Q(department=user.role))
-            companies = companies.filter(tasks__in=tasks).distinct()
-
-        # Calculate statistics
-        stats = {
-            'total_companies': companies.count(),
-            'active_opportunities': opportunities.count(),
-            'opportunities_value': opportunities.aggregate(Sum('expected_value'))['expected_value__sum'] or 0,
-            'active_contracts': contracts.count(),
-            'contracts_value': contracts.aggregate(Sum('value'))['value__sum'] or 0,
-            'overdue_tasks': sum(1 for task in tasks if task.is_overdue),
-            'overdue_invoices': sum(1 for invoice in invoices if invoice.is_overdue),
-            'pending_renewals': sum(1 for contract in contracts if contract.is_expiring_soon),
-        }
+        stats, cache_state = DashboardSnapshotService().get_stats(request.user, billing_entity)
 
-        # Sales funnel stats
-        stats.update({
-            'contacted_count': opportunities.filter(stage='Contacted').count(),
-            'quotation_count': opportunities.filter(stage='Quotation Sent').count(),
-            'contract_count': opportunities.filter(stage='Contract Sent').count(),
-            'won_count': opportunities.filter(stage='Won').count(),
-            'lost_count': opportunities.filter(stage='Lost').count(),
-        })
-
-        # Monthly stats
-        now = timezone.now()
-        current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_contracts = contracts.filter(start_date__gte=current_month)
-        monthly_opportunities = opportunities.filter(created_at__gte=current_month)
-        monthly_closed = opportunities.filter(
-            actual_close_date__gte=current_month,
-            stage='Won'
-        )
-
-        stats.update({
-            'monthly_revenue': monthly_contracts.aggregate(Sum('value'))['value__sum'] or 0,
-            'monthly_new_opportunities': monthly_opportunities.count(),
-            'monthly_closed_deals': monthly_closed.count(),
-        })
-
-        # --- Enhanced stats for Business Health Snapshot ---
-
-        # Win rate
-        won = stats['won_count']
-        lost = stats['lost_count']
-        stats['win_rate'] = round((won / (won + lost) * 100), 1) if (won + lost) > 0 else 0
-
-        # Previous month comparison
-        prev_month_start = (current_month - timedelta(days=1)).replace(day=1)
-        prev_month_contracts = contracts.filter(
-            start_date__gte=prev_month_start, start_date__lt=current_month
-        )
-        stats['previous_month_revenue'] = prev_month_contracts.aggregate(
-            Sum('value')
-        )['value__sum'] or 0
-
-        # Previous month win rate
-        prev_won = opportunities.filter(
-            stage='Won', actual_close_date__gte=prev_month_start,
-            actual_close_date__lt=current_month
-        ).count()
-        prev_lost = opportunities.filter(
-            stage='Lost', actual_close_date__gte=prev_month_start,
-            actual_close_date__lt=current_month
-        ).count()
-        stats['previous_win_rate'] = round(
-            (prev_won / (prev_won + prev_lost) * 100), 1
-        ) if (prev_won + prev_lost) > 0 else 0
-
-        # Overdue invoice total amount
-        stats['total_overdue_amount'] = sum(
-            float(inv.total_amount) for inv in invoices if inv.is_overdue
-        )
-
-        # Pending renewal total value
-        stats['pending_renewal_value'] = sum(
-            float(c.value) for c in contracts if c.is_expiring_soon and c.value
-        )
-
-        # Pipeline stages with values
-        pipeline_stages = {}
-        for stage_name in ['Contacted', 'Quotation Sent', 'Contract Sent', 'Won', 'Lost']:
-            stage_opps = opportunities.filter(stage=stage_name)
-            pipeline_stages[stage_name] = {
-                'count': stage_opps.count(),
-                'value': float(stage_opps.aggregate(
-                    Sum('expected_value')
-                )['expected_value__sum'] or 0),
-            }
-        stats['pipeline_stages'] = pipeline_stages
-
-        # --- Revenue breakdown (New / Renewal / Churn) ---
-        from decimal import Decimal
-        new_revenue = Decimal('0')
-        renewal_revenue = Decimal('0')
-        for c in monthly_contracts:
-            ltype = self._classify_lifecycle(c)
-            val = c.value or Decimal('0')
-            if ltype == 'new':
-                new_revenue += val
-            elif ltype in ('renewal', 'addon'):
-                renewal_revenue += val
-
-        # Churn: contracts ending this month with no successor
-        next_month = (current_month + timedelta(days=32)).replace(day=1)
-        renewed_contract_ids = set(
-            Contract.objects.filter(renewed_from__isnull=False)
-            .values_list('renewed_from_id', flat=True)
-        )
-        churned_qs = Contract.objects.filter(
-            end_date__gte=current_month.date(),
-            end_date__lt=next_month.date(),
-            status__in=['Expired', 'Cancelled']
-        ).exclude(id__in=renewed_contract_ids)
-        if billing_entity:
-            churned_qs = churned_qs.filter(company__billing_entity=billing_entity)
-        churned_revenue = sum(float(c.value or 0) for c in churned_qs)
-        churned_count = churned_qs.count()
-
-        stats.update({
-            'new_revenue': float(new_revenue),
-            'renewal_revenue': float(renewal_revenue),
-            'churned_revenue': churned_revenue,
-            'churned_count': churned_count,
-            'net_revenue': float(new_revenue + renewal_revenue) - churned_revenue,
-        })
+        serializer = DashboardStatsSerializer(stats)
+        response = Response(serializer.data)
+        response['X-Dashboard-Cache'] = cache_state
+        return response
 
-        # --- Revenue trend (last 6 months) with breakdown ---
-        revenue_trend = []
-        for i in range(5, -1, -1):
-            month_date = (now - timedelta(days=i * 30)).replace(day=1)
-            m_start = month_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            m_next = (m_start + timedelta(days=32)).replace(day=1)
-
-            # Contracts starting this month (new + renewal revenue)
-            started_qs = contracts.filter(
-                start_date__gte=m_start.date(),
-                start_date__lt=m_next.date()
-            )
-            m_new = 0.0
-            m_renewal = 0.0
-            for c in started_qs:
-                ltype = self._classify_lifecycle(c)
-                val = float(c.value or 0)
-                if ltype == 'new':
-                    m_new += val
-                else:
-                    m_renewal += val
-
-            # Contracts ending this month without renewal (churn)
-            ended_qs = Contract.objects.filter(
-                end_date__gte=m_start.date(),
-                end_date__lt=m_next.date(),
-                status__in=['Expired', 'Cancelled']
-            ).exclude(id__in=renewed_contract_ids)
-            if billing_entity:
-                ended_qs = ended_qs.filter(company__billing_entity=billing_entity)
-            m_churn = sum(float(c.value or 0) for c in ended_qs)
-
-            revenue_trend.append({
-                'month': m_start.strftime('%b'),
-                'revenue': m_new + m_renewal,
-                'new_revenue': m_new,
-                'renewal_revenue': m_renewal,
-                'churned_revenue': m_churn,
-                'net_revenue': m_new + m_renewal - m_churn,
-            })
-        stats['revenue_trend'] = revenue_trend
+    @action(detail=False, methods=['get'], url_path='cache-metrics')
+    def cache_metrics(self, request):
+        """Admin: dashboard snapshot cache hit/stale/miss counters"""
+        if request.user.role != 'Admin':
+            return Response({'error': 'Admin only'}, status=status.HTTP_403_FORBIDDEN)
 
-        serializer = DashboardStatsSerializer(stats)
-        return Response(serializer.data)
+        from .services.dashboard_snapshot_service import DashboardSnapshotService
+        return Response(DashboardSnapshotService().metrics())
 
 
 class ActionCenterViewSet(viewsets.ViewSet):
-    """Today page: prioritized feed of items needing attention."""
+    """
+    Today page: prioritized feed of items needing attention.
+
+    GET /action-center/?limit=50&sections=overdue_tasks,overdue_invoices&cursor=...
+        One page of the feed, ordered by urgency then age. The first page (no cursor)
+        also carries the summary counts; follow next_cursor for the rest.
+    GET /action-center/summary/?sections=...
+        Count aggregates only (no rows are loaded).
+    """
     permission_classes = [IsAuthenticated]
 
-    def _get_primary_contact(self, company):
-        """Get primary contact for a company, fallback to first active."""
-        contact = Contact.objects.filter(
-            company=company, is_primary=True, is_active=True
-        ).first()
-        if not contact:
-            contact = Contact.objects.filter(
-                company=company, is_active=True
-            ).first()
-        return contact
-
-    def _contact_dict(self, contact):
-        if not contact:
-            return {'contact_name': None, 'contact_email': None, 'contact_phone': None}
-        return {
-            'contact_name': contact.name,
-            'contact_email': contact.email,
-            'contact_phone': contact.phone or None,
-        }
+    def _feed(self, request):
+        from .services.action_center_service import ActionCenterFeed, parse_sections
+        sections = parse_sections(request.query_params.get('sections', ''))
+        return ActionCenterFeed(request.user, sections=sections)
 
     def list(self, request):
-        user = request.user
-        now = timezone.now()
-        today = now.date()
-        tomorrow = today + timedelta(days=1)
-        day_after_tomorrow = today + timedelta(days=2)
-        week_end = today + timedelta(days=7)
-        two_weeks = today + timedelta(days=14)
-        sixty_days = today + timedelta(days=60)
-        stale_threshold = now - timedelta(days=14)
-
-        items = []
-
-        # --- Helper: role-based task filter ---
-        task_qs = Task.objects.select_related('company', 'assigned_to', 'related_contact')
-        if user.role == 'Sales':
-            task_qs = task_qs.filter(assigned_to=user)
-
-        # --- OVERDUE TASKS ---
-        for t in task_qs.filter(status__in=['To Do', 'In Progress'], due_date__lt=now):
-            days = (today - t.due_date.date()).days
-            contact = t.related_contact or self._get_primary_contact(t.company)
-            items.append({
-                'id': str(t.id), 'type': 'task', 'urgency': 'overdue',
-                'title': t.title, 'subtitle': t.company.name if t.company else '',
-                **self._contact_dict(contact),
-                'time_context': f'{days} day{"s" if days != 1 else ""} overdue',
-                'priority': t.priority, 'amount': None, 'currency': None,
-                'link_url': '/tasks', 'link_id': str(t.id),
-                'meta': {
-                    'task_type': t.task_type,
-                    'assigned_to': t.assigned_to.get_full_name() if t.assigned_to else None,
-                },
-            })
-
-        # --- OVERDUE INVOICES ---
-        overdue_invoices = Invoice.objects.filter(
-            status__in=['Sent', 'Overdue'], due_date__lt=today
-        ).select_related('company')
-        for inv in overdue_invoices:
-            company = inv.company
-            contact = self._get_primary_contact(company) if company else None
-            items.append({
-                'id': str(inv.id), 'type': 'invoice', 'urgency': 'overdue',
-                'title': f'Invoice {inv.invoice_number}',
-                'subtitle': company.name if company else '',
-                **self._contact_dict(contact),
-                'time_context': f'{inv.days_overdue} day{"s" if inv.days_overdue != 1 else ""} overdue',
-                'priority': 'High' if inv.days_overdue > 30 else 'Medium',
-                'amount': float(inv.total_amount), 'currency': inv.currency,
-                'link_url': '/invoices', 'link_id': str(inv.id),
-                'meta': {'status': inv.status},
-            })
-
-        # --- STALE OPPORTUNITIES ---
-        stale_opps = Opportunity.objects.filter(
-            is_active=True
-        ).exclude(
-            stage__in=['Won', 'Lost']
-        ).filter(
-            Q(follow_up_date__lt=today) |
-            Q(follow_up_date__isnull=True, updated_at__lt=stale_threshold)
-        ).select_related('company', 'owner')
-        if user.role == 'Sales':
-            stale_opps = stale_opps.filter(owner=user)
-
-        for opp in stale_opps:
-            contact = self._get_primary_contact(opp.company) if opp.company else None
-            ref_date = opp.follow_up_date if opp.follow_up_date else opp.updated_at.date()
-            days_stale = (today - ref_date).days
-            items.append({
-                'id': str(opp.id), 'type': 'opportunity', 'urgency': 'overdue',
-                'title': opp.name, 'subtitle': f'{opp.company.name} — {opp.stage}' if opp.company else opp.stage,
-                **self._contact_dict(contact),
-                'time_context': f'No activity for {days_stale} days',
-                'priority': 'High',
-                'amount': float(opp.expected_value) if opp.expected_value else None,
-                'currency': None,
-                'link_url': '/opportunities', 'link_id': str(opp.id),
-                'meta': {'stage': opp.stage, 'owner': opp.owner.get_full_name() if opp.owner else None},
-            })
-
-        # --- TASKS DUE TODAY & TOMORROW ---
-        tomorrow_end = now.replace(hour=23, minute=59, second=59) + timedelta(days=1)
-        for t in task_qs.filter(status__in=['To Do', 'In Progress'], due_date__gte=now, due_date__lte=tomorrow_end):
-            is_today = t.due_date.date() == today
-            contact = t.related_contact or self._get_primary_contact(t.company)
-            items.append({
-                'id': str(t.id), 'type': 'task', 'urgency': 'today',
-                'title': t.title, 'subtitle': t.company.name if t.company else '',
-                **self._contact_dict(contact),
-                'time_context': 'Due today' if is_today else 'Due tomorrow',
-                'priority': t.priority, 'amount': None, 'currency': None,
-                'link_url': '/tasks', 'link_id': str(t.id),
-                'meta': {
-                    'task_type': t.task_type,
-                    'assigned_to': t.assigned_to.get_full_name() if t.assigned_to else None,
-                },
-            })
-
-        # --- INVOICES DUE THIS WEEK ---
-        for inv in Invoice.objects.filter(
-            status='Sent', due_date__gte=today, due_date__lte=week_end
-        ).select_related('company'):
-            company = inv.company
-            contact = self._get_primary_contact(company) if company else None
-            days_until = (inv.due_date - today).days
-            items.append({
-                'id': str(inv.id), 'type': 'invoice', 'urgency': 'today',
-                'title': f'Invoice {inv.invoice_number}',
-                'subtitle': company.name if company else '',
-                **self._contact_dict(contact),
-                'time_context': 'Due today' if days_until == 0 else f'Due in {days_until} day{"s" if days_until != 1 else ""}',
-                'priority': 'Medium', 'amount': float(inv.total_amount), 'currency': inv.currency,
-                'link_url': '/invoices', 'link_id': str(inv.id),
-                'meta': {'status': inv.status},
-            })
-
-        # --- CONTRACTS EXPIRING WITHIN 60 DAYS ---
-        for c in Contract.objects.filter(
-            status='Active', end_date__gte=today, end_date__lte=sixty_days
-        ).select_related('company'):
-            contact_name = c.customer_signatory_name
-            contact = None
-            if not contact_name and c.company:
-                contact = self._get_primary_contact(c.company)
-            days_until = (c.end_date - today).days
-            items.append({
-                'id': str(c.id), 'type': 'contract', 'urgency': 'upcoming',
-                'title': f'Contract {c.contract_number}',
-                'subtitle': c.company.name if c.company else '',
-                **(self._contact_dict(contact) if contact else {
-                    'contact_name': contact_name or None,
-                    'contact_email': None, 'contact_phone': None,
-                }),
-                'time_context': f'Expires in {days_until} day{"s" if days_until != 1 else ""}',
-                'priority': 'High' if days_until <= 30 else 'Medium',
-                'amount': float(c.value) if c.value else None,
-                'currency': c.currency,
-                'link_url': '/contracts', 'link_id': str(c.id),
-                'meta': {'auto_renew': c.auto_renew},
-            })
-
-        # --- TASKS DUE THIS WEEK (not today/tomorrow) ---
-        week_start = now + timedelta(days=2)
-        week_end_dt = now.replace(hour=23, minute=59, second=59) + timedelta(days=7)
-        for t in task_qs.filter(status__in=['To Do', 'In Progress'], due_date__gt=tomorrow_end, due_date__lte=week_end_dt):
-            days_until = (t.due_date.date() - today).days
-            contact = t.related_contact or self._get_primary_contact(t.company)
-            items.append({
-                'id': str(t.id), 'type': 'task', 'urgency': 'upcoming',
-                'title': t.title, 'subtitle': t.company.name if t.company else '',
-                **self._contact_dict(contact),
-                'time_context': f'Due in {days_until} days',
-                'priority': t.priority, 'amount': None, 'currency': None,
-                'link_url': '/tasks', 'link_id': str(t.id),
-                'meta': {
-                    'task_type': t.task_type,
-                    'assigned_to': t.assigned_to.get_full_name() if t.assigned_to else None,
-                },
-            })
-
-        # --- UPCOMING OPPORTUNITY FOLLOW-UPS ---
-        upcoming_opps = Opportunity.objects.filter(
-            is_active=True, follow_up_date__gte=today, follow_up_date__lte=two_weeks
-        ).exclude(stage__in=['Won', 'Lost']).select_related('company', 'owner')
-        if user.role == 'Sales':
-            upcoming_opps = upcoming_opps.filter(owner=user)
-
-        for opp in upcoming_opps:
-            contact = self._get_primary_contact(opp.company) if opp.company else None
-            days_until = (opp.follow_up_date - today).days
-            items.append({
-                'id': str(opp.id), 'type': 'opportunity', 'urgency': 'upcoming',
-                'title': opp.name, 'subtitle': f'{opp.company.name} — {opp.stage}' if opp.company else opp.stage,
-                **self._contact_dict(contact),
-                'time_context': 'Follow up today' if days_until == 0 else f'Follow up in {days_until} day{"s" if days_until != 1 else ""}',
-                'priority': 'Medium',
-                'amount': float(opp.expected_value) if opp.expected_value else None,
-                'currency': None,
-                'link_url': '/opportunities', 'link_id': str(opp.id),
-                'meta': {'stage': opp.stage, 'owner': opp.owner.get_full_name() if opp.owner else None},
-            })
-
-        # Sort: overdue first (oldest first), then today, then upcoming
-        urgency_order = {'overdue': 0, 'today': 1, 'upcoming': 2}
-        items.sort(key=lambda x: urgency_order.get(x['urgency'], 9))
+        from .services.action_center_service import InvalidFeedRequest, parse_limit
+        try:
+            feed = self._feed(request)
+            cursor = request.query_params.get('cursor')
+            page = feed.page(cursor=cursor, limit=parse_limit(request.query_params.get('limit')))
+        except InvalidFeedRequest as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Build summary
-        summary = {
-            'overdue_count': sum(1 for i in items if i['urgency'] == 'overdue'),
-            'today_count': sum(1 for i in items if i['urgency'] == 'today'),
-            'upcoming_count': sum(1 for i in items if i['urgency'] == 'upcoming'),
-            'expiring_count': sum(1 for i in items if i['type'] == 'contract'),
-        }
+        if not cursor:
+            page['summary'] = feed.summary()['summary']
+        return Response(page)
 
-        return Response({'items': items, 'summary': summary})
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Feed counts per urgency and per section, computed with count aggregates"""
+        from .services.action_center_service import InvalidFeedRequest
+        try:
+            feed = self._feed(request)
+        except InvalidFeedRequest as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(feed.summary())
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -7244,8 +6882,10 @@ class CampaignViewSet(BaseModelViewSet):
         return super().get_serializer_class()
 
     def get_queryset(self):
-        """Optimize queryset with select_related"""
-        queryset = super().get_queryset()
+        """Optimize queryset with select_related; recipient counters are annotated in SQL"""
+        queryset = super().get_queryset().select_related('template')
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.annotate(**EmailCampaign.recipient_count_annotations())
         if self.action == 'retrieve':
             queryset = queryset.prefetch_related('recipients__contact__company')
         return queryset
@@ -7293,120 +6933,53 @@ class CampaignViewSet(BaseModelViewSet):
     def send(self, request, pk=None):
         """
         POST /api/v1/campaigns/{id}/send/
-        Send campaign to all recipients
+        Queue campaign for sending to all pending recipients.
+
+        With CAMPAIGN_SEND_MODE='queued' (default) this only marks the campaign
+        'sending' and returns 202; the process_campaign_queue worker sends it.
+        With 'sync' the emails are sent before the response returns.
         """
-        from .models import CampaignRecipient, Contact, EmailLog
-        from .services.email_service import EmailService
-        from django.db import transaction
+        from django.conf import settings
+        from .services.campaign_send_service import CampaignSendError, CampaignSendService
 
         campaign = self.get_object()
-        email_service = EmailService()
-
-        # Validate campaign can be sent
-        if campaign.status == 'sent':
-            return Response(
-                {'error': 'Campaign has already been sent'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if campaign.status == 'cancelled':
-            return Response(
-                {'error': 'Cannot send cancelled campaign'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Get or create recipients based on target_audience or manually selected contacts
-        recipient_contact_ids = request.data.get('recipient_ids', [])
-
-        if not campaign.recipients.exists() and recipient_contact_ids:
-            # Create recipients from provided contact IDs
-            for contact_id in recipient_contact_ids:
-                try:
-                    contact = Contact.objects.get(id=contact_id, is_active=True)
-                    CampaignRecipient.objects.get_or_create(
-                        campaign=campaign,
-                        contact=contact,
-                        defaults={'status': 'pending'}
-                    )
-                except Contact.DoesNotExist:
-                    pass
-
-        # Get all pending recipients
-        pending_recipients = campaign.recipients.filter(status='pending')
-
-        if not pending_recipients.exists():
-            return Response(
-                {'error': 'No pending recipients to send to'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Update campaign status
-        campaign.status = 'sending'
-        campaign.actual_send_date = timezone.now()
-        campaign.save()
-
-        # Send emails to each recipient
-        sent_count = 0
-        failed_count = 0
-
-        for recipient in pending_recipients:
-            try:
-                # Prepare email context
-                context = {
-                    'company_name': recipient.contact.company.name if recipient.contact.company else '',
-                    'contact_name': recipient.contact.name,
-                    'contact_email': recipient.contact.email,
-                }
+        service = CampaignSendService()
 
-                # Render body with context if needed
-                if campaign.template:
-                    # Use template if specified
-                    from .services.email_service import EmailService
-                    body = EmailService().render_template(campaign.template, context)
-                else:
-                    # No template - extract custom body from target_audience JSON
-                    # For Phase 1, campaigns store custom content in target_audience.custom_body
-                    if campaign.target_audience and isinstance(campaign.target_audience, dict):
-                        body = campaign.target_audience.get('custom_body', campaign.subject)
-                    else:
-                        body = campaign.subject
-
-                # Send email
-                success, message = email_service.send_email(
-                    to_email=recipient.contact.email,
-                    subject=campaign.subject,
-                    body=body,
-                    sender_email=campaign.sender_email or request.user.email,
-                    request=request
-                )
-
-                if success:
-                    recipient.mark_as_sent()
-                    sent_count += 1
-                else:
-                    recipient.mark_as_failed(message)
-                    failed_count += 1
-
-            except Exception as e:
-                recipient.mark_as_failed(str(e))
-                failed_count += 1
+        try:
+            progress = service.enqueue(
+                campaign,
+                contact_ids=request.data.get('recipient_ids', []),
+                sender_email=request.user.email,
+            )
+        except CampaignSendError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if getattr(settings, 'CAMPAIGN_SEND_MODE', 'queued') != 'sync':
+            self.log_action('UPDATE', campaign, {
+                'action': 'Campaign queued',
+                'queued_count': progress['pending']
+            })
+            return Response({
+                'message': f"Campaign queued for {progress['pending']} recipients",
+                'queued_count': progress['pending'],
+                'status': campaign.status,
+                'progress': progress
+            }, status=status.HTTP_202_ACCEPTED)
 
-        # Update campaign analytics
-        campaign.update_analytics()
-        campaign.status = 'sent'
-        campaign.save()
+        result = service.process_campaign(campaign)
 
         self.log_action('UPDATE', campaign, {
             'action': 'Campaign sent',
-            'sent_count': sent_count,
-            'failed_count': failed_count
+            'sent_count': result['sent_count'],
+            'failed_count': result['failed_count']
         })
 
         return Response({
-            'message': f'Campaign sent to {sent_count} recipients',
-            'sent_count': sent_count,
-            'failed_count': failed_count,
-            'status': campaign.status
+            'message': f"Campaign sent to {result['sent_count']} recipients",
+            'sent_count': result['sent_count'],
+            'failed_count': result['failed_count'],
+            'status': result['status'],
+            'progress': result['progress']
         })
 
     @action(detail=True, methods=['post'])
@@ -7532,6 +7105,8 @@ class CampaignViewSet(BaseModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        from .services.campaign_send_service import CampaignSendService
+
         campaign.status = 'paused'
         campaign.save()
 
@@ -7541,7 +7116,8 @@ class CampaignViewSet(BaseModelViewSet):
 
         return Response({
             'message': 'Campaign paused',
-            'status': campaign.status
+            'status': campaign.status,
+            'progress': CampaignSendService.progress(campaign)
         })
 
     @action(detail=True, methods=['post'])
@@ -7558,8 +7134,14 @@ class CampaignViewSet(BaseModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Resume to appropriate status
-        if campaign.scheduled_send_date:
+        from .services.campaign_send_service import CampaignSendService
+
+        progress = CampaignSendService.progress(campaign)
+
+        # Resume to appropriate status: a send that was paused part-way goes back to the queue
+        if campaign.actual_send_date and progress['pending']:
+            campaign.status = 'sending'
+        elif campaign.scheduled_send_date:
             campaign.status = 'scheduled'
         else:
             campaign.status = 'draft'
@@ -7571,7 +7153,8 @@ class CampaignViewSet(BaseModelViewSet):
 
         return Response({
             'message': 'Campaign resumed',
-            'status': campaign.status
+            'status': campaign.status,
+            'progress': progress
         })
 
     @action(detail=True, methods=['post'])
@@ -10409,6 +9992,86 @@ class ZoneViewSet(viewsets.ModelViewSet):
             'orphaned_count': orphaned_count,
         })
 
+    @action(detail=True, methods=['get'])
+    def uptime(self, request, pk=None):
+        """
+        Daily uptime for one zone, served from the nightly rollups.
+
+        GET /api/v1/zones/{zone_id}/uptime/?start=YYYY-MM-DD&end=YYYY-MM-DD
+
+        Query params:
+        - start, end: inclusive date range (default: last 30 complete days)
+
+        Returns: totals (online/monitored minutes, uptime_percent) and a daily series
+        """
+        from crm_app.services.zone_uptime_service import parse_range, zone_uptime
+
+        zone = self.get_object()
+        try:
+            start, end = parse_range(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': f'Invalid date range: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'zone_id': str(zone.id),
+            'zone_name': zone.name,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **zone_uptime(zone, start, end),
+        })
+
+    @action(detail=False, methods=['get'], url_path='uptime')
+    def uptime_summary(self, request):
+        """
+        Uptime per zone for a company or a contract, served from the nightly rollups.
+
+        GET /api/v1/zones/uptime/?company=<uuid>&start=YYYY-MM-DD&end=YYYY-MM-DD
+        GET /api/v1/zones/uptime/?contract=<uuid>&start=YYYY-MM-DD&end=YYYY-MM-DD
+
+        Query params:
+        - company or contract (one is required); for a contract, each zone only
+          counts the days it was linked to the contract
+        - start, end: inclusive date range (default: last 30 complete days)
+
+        Returns: overall totals and per-zone totals
+        """
+        from crm_app.services.zone_uptime_service import contract_filter, parse_range, uptime_by_zone
+
+        company_id = request.query_params.get('company')
+        contract_id = request.query_params.get('contract')
+        if not company_id and not contract_id:
+            return Response(
+                {'error': 'company or contract query parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, end = parse_range(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': f'Invalid date range: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            contract_id = uuid.UUID(contract_id) if contract_id else None
+            company_id = uuid.UUID(company_id) if company_id else None
+        except ValueError:
+            return Response({'error': 'company and contract must be UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if contract_id:
+            try:
+                contract = Contract.objects.get(pk=contract_id)
+            except Contract.DoesNotExist:
+                return Response({'error': 'Contract not found'}, status=status.HTTP_404_NOT_FOUND)
+            condition = contract_filter(contract)
+            scope = {'contract_id': str(contract.id)}
+        else:
+            condition = Q(zone__company_id=company_id)
+            scope = {'company_id': str(company_id)}
+
+        return Response({
+            **scope,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **uptime_by_zone(condition, start, end),
+        })
+
     @action(detail=False, methods=['get'], url_path='check-overlaps')
     def check_overlaps(self, request):
         """
@@ -12958,19 +12621,43 @@ TRACKING_PIXEL = base64.b64decode(
 def email_tracking_pixel(request, token):
     """
     Unauthenticated endpoint that serves a 1x1 transparent GIF.
-    When loaded by an email client, records the open event.
+    When loaded by an email client, records the open event through the
+    open tracking buffer (applied in batches by flush_email_tracking).
     """
+    from crm_app.services.tracking_buffer import open_tracking_buffer
+
     try:
-        email_log = EmailLog.objects.get(tracking_token=token)
-        if not email_log.opened_at:
-            email_log.opened_at = timezone.now()
-            if email_log.status in ('sent', 'pending'):
-                email_log.status = 'opened'
-            email_log.save(update_fields=['opened_at', 'status'])
-    except EmailLog.DoesNotExist:
-        pass  # Silently ignore invalid tokens
+        open_tracking_buffer.record(token)  # Unknown tokens are retried for a while, then dropped
+    except Exception as e:
+        logger.warning(f"Email open not recorded for token {token[:12]}: {e}")
 
     response = HttpResponse(TRACKING_PIXEL, content_type='image/gif')
     response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
     response['Pragma'] = 'no-cache'
     return response
+
+
+@csrf_exempt
+@never_cache
+def email_click_redirect(request, token):
+    """
+    Unauthenticated endpoint behind the rewritten links of tracked emails.
+    The signed token carries the destination, so the redirect needs no
+    database access; the click is recorded through the click tracking buffer.
+    """
+    from django.core import signing
+    from django.http import Http404, HttpResponseRedirect
+    from crm_app.services.click_tracking import decode_click_token
+    from crm_app.services.tracking_buffer import click_tracking_buffer
+
+    try:
+        tracking_token, url = decode_click_token(token)
+    except signing.BadSignature:
+        raise Http404("Unknown link")
+
+    try:
+        click_tracking_buffer.record(tracking_token, url)
+    except Exception as e:
+        logger.warning(f"Email click not recorded for token {tracking_token[:12]}: {e}")
+
+    return HttpResponseRedirect(url)